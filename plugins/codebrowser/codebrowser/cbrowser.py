@@ -23,7 +23,6 @@ __revision__ = "$Revision: 71180 $"
 
 #--------------------------------------------------------------------------#
 # Imports
-import StringIO
 import wx
 
 # Editra Libraries
@@ -31,12 +30,11 @@ import ed_glob
 import ebmlib
 from profiler import Profile_Get, Profile_Set
 import ed_msg
-import ed_thread
 
 # Local Imports
 import cbconfig
 import gentag.taglib as taglib
-from tagload import TagLoader
+import tagservice
 import IconFile
 
 #--------------------------------------------------------------------------#
@@ -75,11 +73,12 @@ class CodeBrowserTree(wx.TreeCtrl):
         self._cjob = 0
         self._lastjob = u'' # Name of file in last sent out job
         self._cdoc = None   # Current DocStruct
+        self._service = tagservice.TagService()
         self.icons = dict()
         self.il = None
 
         # struct used in buffer-tree sync
-        self._ds_flat = list() # list of tuples - [(line, item_id),(line, item_id)...]
+        self._ds_items = dict() # id(code object) -> item_id
 
         self._timer = wx.Timer(self)
         self._sync_timer = wx.Timer(self)
@@ -129,6 +128,7 @@ class CodeBrowserTree(wx.TreeCtrl):
         """Unsubscribe from messages on destroy"""
         if self:
             self._menu.Clear()
+            self._service.Shutdown()
             ed_msg.Unsubscribe(self.OnUpdateTree)
             ed_msg.Unsubscribe(self.OnThemeChange)
             ed_msg.Unsubscribe(self.OnUpdateFont)
@@ -163,7 +163,7 @@ class CodeBrowserTree(wx.TreeCtrl):
     def _ClearTree(self):
         """Clear the tree and caches"""
         self._cdoc = None
-        self._ds_flat = list()
+        self._ds_items = dict()
         self.Unselect() # XXX: workaround focus issue in 2.9
         self.DeleteChildren(self.root)
 
@@ -173,19 +173,14 @@ class CodeBrowserTree(wx.TreeCtrl):
         @returns: tree node id
 
         """
-        # HACK This should probably be done with bisect search
         rval = None
-        line += 1
-        if self._ds_flat:
-            for citem in self._ds_flat:
-                if citem[0] < line:
-                    cline = citem[0]
-                    rval = citem[1]
-                else:
+        if self._cdoc is not None and self._ds_items:
+            index = self._cdoc.GetScopeIndex()
+            # Use the innermost element that has a node in the tree
+            for cobj in reversed(index.GetElementChain(line)):
+                rval = self._ds_items.get(id(cobj), None)
+                if rval is not None:
                     break
-
-#        self._log("[codebrowser][info] For line %d found item %s" % \
-#                  (line, self._GetFQN(rval)))
         return rval
 
     def _SetupImageList(self):
@@ -291,7 +286,7 @@ class CodeBrowserTree(wx.TreeCtrl):
 
         """
         item_id = self.AppendItem(node, u"%s [%d]" % (cobj.GetName(), 1 + cobj.GetLine()), img)
-        self._ds_flat.append((cobj.GetLine(), item_id))
+        self._ds_items[id(cobj)] = item_id
         self.SetPyData(item_id, cobj.GetLine())
         # If the item is a scope it may have sub items
         if isinstance(cobj, taglib.Scope):
@@ -494,6 +489,9 @@ class CodeBrowserTree(wx.TreeCtrl):
             if not self._timer.IsRunning():
                 self._cpage = None
 
+            # Generate the tags of the other open buffers in the background
+            self._service.Prewarm(self._mw.GetNotebook().GetTextControls())
+
     def OnUpdateFont(self, msg):
         """Update the ui font when a message comes saying to do so."""
         font = msg.GetData()
@@ -540,23 +538,33 @@ class CodeBrowserTree(wx.TreeCtrl):
                 return
 
         # Get the generator method
-        genfun = TagLoader.GetGenerator(self._cpage.GetLangId())
+        genfun = self._service.GetGenerator(self._cpage)
         self._cjob += 1 # increment job Id
 
         # Check if we need to do updates
         if genfun is not None and (self._force or self._ShouldUpdate()):
             self._force = False
 
+            # Use the cached tags if the buffer has not changed
+            tags = self._service.GetTags(self._cpage)
+            if tags is not None:
+                self.OnTagsReady(TagGenEvent(edEVT_JOB_FINISHED,
+                                             self._cjob, tags))
+                return
+
             # Start progress indicator in pulse mode
             ed_msg.PostMessage(ed_msg.EDMSG_PROGRESS_SHOW,
                                (self._mw.GetId(), True))
             ed_msg.PostMessage(ed_msg.EDMSG_PROGRESS_STATE,
                                (self._mw.GetId(), -1, -1))
 
-            # Create and start the worker thread
-            task = TagGenJob(self, self._cjob, genfun,
-                             StringIO.StringIO(self._cpage.GetText()))
-            ed_thread.EdThreadPool().QueueJob(task.DoTask)
+            # Generate the tags on a background thread
+            job_id = self._cjob
+            def PostTags(tags):
+                if self:
+                    evt = TagGenEvent(edEVT_JOB_FINISHED, job_id, tags)
+                    wx.PostEvent(self, evt)
+            self._service.RequestTags(self._cpage, PostTags)
         else:
             self._ClearTree()
             ed_msg.PostMessage(ed_msg.EDMSG_PROGRESS_SHOW,
@@ -600,8 +608,12 @@ class CodeBrowserTree(wx.TreeCtrl):
             self._cpage = page
             self._force = force
 
-            # Start the oneshot timer for beginning the tag generator job
-            self._timer.Start(300, True)
+            # Show cached tags right away, otherwise start the oneshot timer
+            # for beginning the tag generator job
+            if self._service.GetTags(page) is not None:
+                self.OnStartJob(None)
+            else:
+                self._timer.Start(300, True)
     
     def OnShowAUIPane(self):
         """Interface method that the main Editra window will call
@@ -653,42 +665,9 @@ class CodeBrowserTree(wx.TreeCtrl):
         for node in [ node for node in self.nodes.values()
                       if node is not None and node != self.nodes['globals']]:
             self.Expand(node)
-        
-        self._ds_flat.sort(cmp=lambda x,y: cmp(x[0],y[0]))
-        self._SyncTree()
-
-#--------------------------------------------------------------------------#
-# Tag Generator
-class TagGenJob(object):
-    """Thread for running tag parser on and returning the results for
-    display in the tree.
 
-    """
-    def __init__(self, reciever, job_id, genfun, buff):
-        """Create the thread object
-        @param reciever: Window to recieve result
-        @param job_id: id of this job
-        @param genfun: tag generator function
-        @param buff: string buffer to pass to genfun
-
-        """
-        super(TagGenJob, self).__init__()
-
-        # Attributes
-        self.reciever = reciever
-        self.job = job_id
-        self.buff = buff
-        self.task = genfun
-
-    def DoTask(self):
-        """Run the generator function and return the docstruct to
-        the main thread.
+        self._SyncTree()
 
-        """
-        tags = self.task(self.buff)
-        evt = TagGenEvent(edEVT_JOB_FINISHED, self.job, tags)
-        wx.CallAfter(wx.PostEvent, self.reciever, evt)
-        
 #--------------------------------------------------------------------------#
 # Tag Generator Thread Event(s)
 
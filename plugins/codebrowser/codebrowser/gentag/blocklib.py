@@ -0,0 +1,213 @@
+###############################################################################
+# Name: blocklib.py                                                           #
+# Purpose: Incremental tag generation over top level document blocks         #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+FILE: blocklib.py
+AUTHOR: Cody Precord
+LANGUAGE: Python
+SUMMARY:
+  Split a document into top level blocks that a tag generator can parse
+independently of each other and put the L{taglib.DocStruct} objects of the
+blocks back together. The DocStruct of each block is cached by the text of
+the block so that only the blocks that changed since the last run need to be
+parsed again.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Imports
+import re
+import StringIO
+
+# Local Imports
+import taglib
+
+#--------------------------------------------------------------------------#
+# Globals
+
+# Tokens that affect the block structure of brace delimited languages
+RE_BRACE_TOKENS = re.compile(r"//[^\n]*|/\*.*?\*/|"
+                             r"\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|"
+                             r"[{};\n]", re.DOTALL)
+
+# Tokens that affect the block structure of indentation based languages
+RE_INDENT_TOKENS = re.compile(r"#[^\n]*|\"\"\".*?\"\"\"|'''.*?'''|"
+                              r"\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|"
+                              r"[\[\](){}\n]|\\\n", re.DOTALL)
+
+#--------------------------------------------------------------------------#
+
+def SplitBraceBlocks(txt):
+    """Split the text of a brace delimited language (C, C++, ...) in to
+    top level blocks. A new block is started at the beginning of a line that
+    is outside of any braces, comments or strings and follows a statement
+    ending ';' or '}'.
+    @param txt: string
+    @return: list of (line, text) tuples
+
+    """
+    blocks = list()
+    depth = 0
+    line = start = bline = 0
+    ended = False
+    for match in RE_BRACE_TOKENS.finditer(txt):
+        tok = match.group(0)
+        if tok == u'\n':
+            line += 1
+            pos = match.end()
+            if depth == 0 and ended and pos < len(txt) and \
+               not txt[pos].isspace():
+                blocks.append((bline, txt[start:pos]))
+                start = pos
+                bline = line
+                ended = False
+            continue
+        elif tok == u'{':
+            depth += 1
+        elif tok == u'}':
+            depth -= 1
+        elif tok[0] == u'/' or tok[0] in u'"\'':
+            line += tok.count(u'\n')
+            continue
+        ended = tok in u';}'
+    blocks.append((bline, txt[start:]))
+    return blocks
+
+def SplitIndentBlocks(txt):
+    """Split the text of an indentation based language (Python) in to top
+    level blocks. A new block is started at every line that starts in the
+    first column and is not a comment or a continuation of the previous line.
+    @param txt: string
+    @return: list of (line, text) tuples
+
+    """
+    blocks = list()
+    depth = 0
+    line = start = bline = 0
+    for match in RE_INDENT_TOKENS.finditer(txt):
+        tok = match.group(0)
+        if tok == u'\n':
+            line += 1
+            pos = match.end()
+            if depth == 0 and pos < len(txt) and \
+               not txt[pos].isspace() and txt[pos] not in u'#)]}':
+                if pos != start:
+                    blocks.append((bline, txt[start:pos]))
+                start = pos
+                bline = line
+        elif tok in u'([{':
+            depth += 1
+        elif tok in u')]}':
+            depth = max(0, depth - 1)
+        else:
+            line += tok.count(u'\n')
+    blocks.append((bline, txt[start:]))
+    return blocks
+
+def ShiftCode(cobj, offset):
+    """Make a copy of a code object and all the objects it contains with
+    their line numbers moved by the given offset.
+    @param cobj: L{taglib.Code}
+    @param offset: number of lines to move by
+    @return: L{taglib.Code}
+
+    """
+    nobj = cobj.__class__.__new__(cobj.__class__)
+    nobj.__dict__.update(cobj.__dict__)
+    nobj.line = cobj.line + offset
+    if cobj.GetEndLine() is not None:
+        nobj.end = cobj.GetEndLine() + offset
+    if isinstance(cobj, taglib.Scope):
+        nobj.elements = dict()
+        nobj.descript = dict(cobj.descript)
+        nobj.prio = dict(cobj.prio)
+        nobj._lscope = nobj
+        for otype, elist in cobj.elements.iteritems():
+            nobj.elements[otype] = [ ShiftCode(elem, offset)
+                                     for elem in elist if elem is not cobj ]
+    return nobj
+
+def MergeBlockTags(blocks, coalesce=False):
+    """Put the DocStructs of the blocks of a document back together in to
+    one DocStruct for the whole document. The top level elements of a block
+    end at the end of the block at the latest.
+    @param blocks: list of (line, L{taglib.DocStruct}) tuples in document order
+    @keyword coalesce: merge top level scopes of the same type and name
+                       (i.e C++ methods defined outside of their class)
+    @return: L{taglib.DocStruct}
+
+    """
+    rtags = taglib.DocStruct()
+    variables = set()
+    scopes = dict() # (type, name) -> top level Scope
+    for bidx, (offset, tags) in enumerate(blocks):
+        end = None
+        if bidx + 1 < len(blocks):
+            end = blocks[bidx + 1][0] - 1
+        rtags.descript.update(tags.descript)
+        for otype, prio in tags.prio.iteritems():
+            rtags.prio[otype] = max(prio, rtags.prio.get(otype, prio))
+        for otype, elist in tags.elements.iteritems():
+            for elem in elist:
+                if otype == 'variable':
+                    # Global variables are only listed once per document
+                    if elem.GetName() in variables:
+                        continue
+                    variables.add(elem.GetName())
+
+                nobj = ShiftCode(elem, offset)
+                if end is not None and nobj.GetEndLine() is None:
+                    nobj.SetEndLine(end)
+                key = (otype, elem.GetName())
+                if coalesce and key in scopes:
+                    current = scopes[key]
+                    for ctype, clist in nobj.elements.iteritems():
+                        for child in clist:
+                            if end is not None and child.GetEndLine() is None:
+                                child.SetEndLine(end)
+                            current.AddElement(ctype, child)
+                    nobj = current
+                else:
+                    rtags.AddElement(otype, nobj)
+                    if isinstance(nobj, taglib.Scope):
+                        scopes.setdefault(key, nobj)
+
+                if otype == 'class':
+                    rtags.lastclass = nobj
+    return rtags
+
+def GenerateBlockTags(genfun, txt, splitter, cache=None, coalesce=False):
+    """Generate the tags for a document one top level block at a time.
+    Blocks that are found in the cache from the previous run are not parsed
+    again.
+    @param genfun: tag generator function (GenerateTags)
+    @param txt: document text
+    @param splitter: block splitting function (L{SplitBraceBlocks})
+    @keyword cache: dict of block text to DocStruct from the previous run
+    @keyword coalesce: see L{MergeBlockTags}
+    @return: (L{taglib.DocStruct}, cache) the new cache only holds the blocks
+             of the current document.
+
+    """
+    if cache is None:
+        cache = dict()
+    ncache = dict()
+    blocks = list()
+    for line, btxt in splitter(txt):
+        tags = ncache.get(btxt, None)
+        if tags is None:
+            tags = cache.get(btxt, None)
+            if tags is None:
+                tags = genfun(StringIO.StringIO(btxt))
+            ncache[btxt] = tags
+        blocks.append((line, tags))
+    return MergeBlockTags(blocks, coalesce), ncache
@@ -34,6 +34,10 @@ __author__ = "Cody Precord <cprecord@editra.org>"
 __svnid__ = "$Id: taglib.py 69238 2011-09-29 23:30:16Z CJP $"
 __revision__ = "$Revision: 69238 $"
 
+#-----------------------------------------------------------------------------#
+# Imports
+import bisect
+
 #-----------------------------------------------------------------------------#
 # Code Object Base Classes
 
@@ -59,6 +63,7 @@ class Code(object):
         self.type = obj
         self.doc = name
         self.scope = scope
+        self.end = None
 
     def __eq__(self, other):
         if type(other) != type(self):
@@ -92,6 +97,13 @@ class Code(object):
         """
         self.doc = doc
 
+    def GetEndLine(self):
+        """Get the last line of the code object if it is known
+        @return: int or None
+
+        """
+        return self.end
+
     def GetLine(self):
         """Returns the line of the code object
         @return: int
@@ -99,6 +111,13 @@ class Code(object):
         """
         return self.line
 
+    def SetEndLine(self, line):
+        """Set the last line of the code object
+        @param line: int or None
+
+        """
+        self.end = line
+
     def SetLine(self, line):
         """Set this items line number
         @param line: int
@@ -331,6 +350,16 @@ class DocStruct(Scope):
     def __init__(self):
         Scope.__init__(self, 'docstruct', None)
         self.lastclass = None
+        self._index = None
+
+    def AddElement(self, obj, element):
+        """Add an element to the document
+        @param obj: object identifier string
+        @param element: L{Code} object to add to the document
+
+        """
+        Scope.AddElement(self, obj, element)
+        self._index = None
 
     def AddClass(self, cobj):
         """Convenience method for adding a L{Class} to the document
@@ -368,6 +397,17 @@ class DocStruct(Scope):
         """
         return sorted(self.GetElementType('function'))
 
+    def GetScopeIndex(self):
+        """Get the L{ScopeIndex} of the lines covered by the elements of the
+        document. The index is built the first time it is needed, so the
+        document should be complete before calling this.
+        @return: L{ScopeIndex}
+
+        """
+        if self._index is None:
+            self._index = ScopeIndex(self)
+        return self._index
+
     def GetScopes(self):
         """Get all Scope type elements in this document object."""
         relem = list()
@@ -390,3 +430,172 @@ class DocStruct(Scope):
 
         """
         return self.lastclass
+
+#-----------------------------------------------------------------------------#
+
+class ScopeIndex(object):
+    """Interval index of the lines covered by the elements of a L{DocStruct}.
+    Tag generators only record the line an element starts on, so an element
+    is taken to extend up to the line before the next element that is not
+    nested inside of it and not past the end of the element that it is
+    nested in. An end line set on the element with L{Code.SetEndLine} limits
+    the extent further. Finding the innermost element on a line is a binary
+    search on the start lines.
+
+    """
+    def __init__(self, docstruct):
+        """Build the index
+        @param docstruct: L{DocStruct}
+
+        """
+        super(ScopeIndex, self).__init__()
+
+        # Attributes
+        self._nodes = list()   # elements in document order
+        self._starts = list()  # start line of each element
+        self._ends = list()    # end line of each element (None for last)
+        self._parents = list() # index of the enclosing element or -1
+        self._depths = list()  # nesting level of each element
+        self._pos = dict()     # id(element) -> index
+
+        self._Build(docstruct)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _Build(self, docstruct):
+        """Collect the elements of the document and compute their extents
+        @param docstruct: L{DocStruct}
+
+        """
+        items = list() # (line, depth, seq, element, parent seq)
+        seen = set([id(docstruct)])
+        stack = [(docstruct, -1, 0)]
+        while len(stack):
+            scope, parent, depth = stack.pop()
+            for elist in scope.elements.values():
+                for elem in elist:
+                    # Guard against bad doc trees that contain themselves
+                    if id(elem) in seen:
+                        continue
+                    seen.add(id(elem))
+                    seq = len(items)
+                    items.append((elem.GetLine(), depth, seq, elem, parent))
+                    if isinstance(elem, Scope):
+                        stack.append((elem, seq, depth + 1))
+
+        items.sort()
+        rank = dict([ (item[2], idx) for idx, item in enumerate(items) ])
+        for line, depth, seq, elem, parent in items:
+            self._pos[id(elem)] = len(self._nodes)
+            self._nodes.append(elem)
+            self._starts.append(line)
+            self._depths.append(depth)
+            self._parents.append(rank.get(parent, -1))
+
+        # An element ends before the next element that is not nested in it
+        count = len(self._nodes)
+        for idx in xrange(count):
+            nxt = idx + 1
+            while nxt < count and self._IsNested(nxt, idx):
+                nxt += 1
+            end = None
+            if nxt < count:
+                end = self._starts[nxt] - 1
+            cend = self._nodes[idx].GetEndLine()
+            if cend is not None and (end is None or cend < end):
+                end = cend
+            # Elements inside of their parent end with it at the latest
+            parent = self._parents[idx]
+            if -1 < parent < idx:
+                pend = self._ends[parent]
+                if pend is not None and self._starts[idx] <= pend and \
+                   (end is None or pend < end):
+                    end = pend
+            self._ends.append(end)
+
+    def _Find(self, line):
+        """Get the index of the innermost element that contains the line
+        @param line: int
+        @return: int (-1 if no element contains the line)
+
+        """
+        idx = bisect.bisect_right(self._starts, line) - 1
+        while idx != -1:
+            end = self._ends[idx]
+            if self._starts[idx] <= line and (end is None or line <= end):
+                break
+            idx = self._parents[idx]
+        return idx
+
+    def _IsNested(self, idx, outer):
+        """Check if the element at idx is nested in the element at outer
+        @param idx: int
+        @param outer: int
+        @return: bool
+
+        """
+        depth = self._depths[outer]
+        idx = self._parents[idx]
+        while idx != -1 and self._depths[idx] > depth:
+            idx = self._parents[idx]
+        return idx == outer
+
+    def GetElement(self, line):
+        """Get the innermost element that contains the given line
+        @param line: int (0 based)
+        @return: L{Code} or None
+
+        """
+        idx = self._Find(line)
+        if idx != -1:
+            return self._nodes[idx]
+        return None
+
+    def GetElementChain(self, line):
+        """Get the elements that enclose the given line
+        @param line: int (0 based)
+        @return: list of L{Code} ordered from the outermost to the innermost
+
+        """
+        chain = list()
+        idx = self._Find(line)
+        while idx != -1:
+            chain.append(self._nodes[idx])
+            idx = self._parents[idx]
+        chain.reverse()
+        return chain
+
+    def GetExtent(self, element):
+        """Get the lines covered by an element of the document
+        @param element: L{Code}
+        @return: (start, end) or None if the element is not in the document.
+                 The end is None for an element that extends to the end of
+                 the document.
+
+        """
+        idx = self._pos.get(id(element), -1)
+        if idx != -1:
+            return (self._starts[idx], self._ends[idx])
+        return None
+
+    def GetIntervals(self):
+        """Get the extents of all the elements in the document
+        @return: list of (start line, end line, L{Code}) in document order
+
+        """
+        return zip(self._starts, self._ends, self._nodes)
+
+    def GetScope(self, line):
+        """Get the innermost scope (function, class, ...) that contains the
+        given line.
+        @param line: int (0 based)
+        @return: L{Scope} or None if the line is at the top level
+
+        """
+        idx = self._Find(line)
+        while idx != -1:
+            if isinstance(self._nodes[idx], Scope):
+                return self._nodes[idx]
+            idx = self._parents[idx]
+        return None
@@ -0,0 +1,210 @@
+###############################################################################
+# Name: tagservice.py                                                         #
+# Purpose: Background tag generation and caching service                     #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+FILE: tagservice.py
+AUTHOR: Cody Precord
+LANGUAGE: Python
+SUMMARY:
+    Tag generation service for the CodeBrowser. The DocStruct of each buffer
+is kept for the revision of the buffer it was generated from, so switching
+back to an unchanged buffer does not need to run the tag generator again.
+For the languages in L{BLOCK_SPLITTERS} only the top level blocks that were
+edited since the last run are parsed again. The tags of the other open
+buffers can be generated ahead of time on a single low priority thread.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Imports
+import weakref
+import StringIO
+import wx
+
+# Editra Libraries
+import ebmlib
+import ed_msg
+import ed_thread
+import syntax.synglob as synglob
+
+# Local Imports
+import gentag.blocklib as blocklib
+import gentag.taglib as taglib
+from tagload import TagLoader
+
+#--------------------------------------------------------------------------#
+# Globals
+
+# Languages whose tag generators can parse top level blocks independently
+# lang_id : (splitter, coalesce scopes)
+BLOCK_SPLITTERS = { synglob.ID_LANG_C : (blocklib.SplitBraceBlocks, True),
+                    synglob.ID_LANG_CPP : (blocklib.SplitBraceBlocks, True),
+                    synglob.ID_LANG_PYTHON : (blocklib.SplitIndentBlocks, False) }
+
+#--------------------------------------------------------------------------#
+
+class TagService(object):
+    """Generates and caches the tags of the buffers in a main window"""
+    def __init__(self):
+        super(TagService, self).__init__()
+
+        # Attributes
+        self._revs = weakref.WeakKeyDictionary()  # buffer -> revision
+        self._cache = weakref.WeakKeyDictionary() # buffer -> (rev, lang, tags, blocks)
+        self._pending = list()                    # buffers to prewarm
+        self._warming = False
+
+        # Editra Message Handlers
+        ed_msg.Subscribe(self.OnBufferChanged, ed_msg.EDMSG_UI_STC_CHANGED)
+
+    def _OnGenerated(self, buff, rev, lang, result, callback):
+        """Store the results of a tag generation job
+        @param buff: buffer the tags were generated for
+        @param rev: revision of the buffer when the job was started
+        @param lang: language id of the buffer when the job was started
+        @param result: (DocStruct, blocks)
+        @param callback: callable(DocStruct)
+
+        """
+        tags, blocks = result
+        if buff:
+            current = self._cache.get(buff, None)
+            if current is None or current[0] <= rev:
+                self._cache[buff] = (rev, lang, tags, blocks)
+        callback(tags)
+
+    def _PrewarmNext(self):
+        """Generate the tags for the next buffer in the prewarm queue"""
+        while len(self._pending):
+            buff = self._pending.pop(0)()
+            if buff and self.GetTags(buff) is None and \
+               self.RequestTags(buff, lambda tags: self._PrewarmNext(),
+                                IdleThreadPool()):
+                self._warming = True
+                return
+        self._warming = False
+
+    @staticmethod
+    def GenerateTags(genfun, txt, lang, blocks=None):
+        """Run the tag generator on the given text
+        @param genfun: tag generator function
+        @param txt: document text
+        @param lang: language id of the document
+        @keyword blocks: block cache from a previous run on this document
+        @return: (DocStruct, blocks)
+
+        """
+        if lang in BLOCK_SPLITTERS:
+            splitter, coalesce = BLOCK_SPLITTERS[lang]
+            return blocklib.GenerateBlockTags(genfun, txt, splitter,
+                                              blocks, coalesce)
+        else:
+            return genfun(StringIO.StringIO(txt)), None
+
+    def GetGenerator(self, buff):
+        """Get the tag generator for the given buffer
+        @param buff: EditraStc
+        @return: function or None
+
+        """
+        return TagLoader.GetGenerator(buff.GetLangId())
+
+    def GetRevision(self, buff):
+        """Get the current revision of the given buffer
+        @param buff: EditraStc
+        @return: int
+
+        """
+        return self._revs.get(buff, 0)
+
+    def GetTags(self, buff):
+        """Get the cached tags of the buffer if they are up to date
+        @param buff: EditraStc
+        @return: DocStruct or None
+
+        """
+        cached = self._cache.get(buff, None)
+        if cached is not None and cached[0] == self.GetRevision(buff) and \
+           cached[1] == buff.GetLangId():
+            return cached[2]
+        return None
+
+    def OnBufferChanged(self, msg):
+        """Update the revision of a buffer when its text changes
+        @param msg: EDMSG_UI_STC_CHANGED
+
+        """
+        buff = msg.GetContext()
+        if buff is not None:
+            self._revs[buff] = self._revs.get(buff, 0) + 1
+
+    def Prewarm(self, buffers):
+        """Generate the tags of the given buffers one at a time in the
+        background.
+        @param buffers: list of EditraStc
+
+        """
+        self._pending = [ weakref.ref(buff) for buff in buffers ]
+        if not self._warming:
+            self._PrewarmNext()
+
+    def RequestTags(self, buff, callback, pool=None):
+        """Generate the tags for the buffer on a background thread. Only the
+        blocks of the buffer that changed since the last run are parsed.
+        @param buff: EditraStc
+        @param callback: callable(DocStruct) called on the main thread
+        @keyword pool: ThreadPool to run the job on (EdThreadPool by default)
+        @return: bool (False if there is no tag generator for the buffer)
+
+        """
+        genfun = self.GetGenerator(buff)
+        if genfun is None:
+            return False
+
+        rev = self.GetRevision(buff)
+        lang = buff.GetLangId()
+        blocks = None
+        cached = self._cache.get(buff, None)
+        if cached is not None and cached[1] == lang:
+            blocks = cached[3]
+
+        def DoTask(txt):
+            try:
+                result = TagService.GenerateTags(genfun, txt, lang, blocks)
+                # Build the scope index here instead of on the main thread
+                result[0].GetScopeIndex()
+                trev = rev
+            except Exception:
+                # Report empty tags that are never seen as up to date so the
+                # next request tries again.
+                result = (taglib.DocStruct(), None)
+                trev = -1
+            wx.CallAfter(self._OnGenerated, buff, trev, lang, result, callback)
+
+        if pool is None:
+            pool = ed_thread.EdThreadPool()
+        pool.QueueJob(DoTask, buff.GetText())
+        return True
+
+    def Shutdown(self):
+        """Stop listening for buffer changes and cancel any prewarming"""
+        ed_msg.Unsubscribe(self.OnBufferChanged)
+        self._pending = list()
+        self._cache.clear()
+
+#--------------------------------------------------------------------------#
+
+class IdleThreadPool(ebmlib.ThreadPool):
+    """Single threaded pool for low priority background jobs"""
+    __metaclass__ = ebmlib.Singleton
+    def __init__(self):
+        super(IdleThreadPool, self).__init__(1)
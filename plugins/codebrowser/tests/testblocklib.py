@@ -0,0 +1,128 @@
+###############################################################################
+# Name: testblocklib.py                                                       #
+# Purpose: Unittest for blocklib.py                                           #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import unittest
+import StringIO
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('../codebrowser/gentag'))
+
+import blocklib
+import ctags
+import pytags
+
+#-----------------------------------------------------------------------------#
+
+C_SOURCE = """#include <stdio.h>
+#define MAX 10
+
+/* int commented(void) { } */
+static int count;
+
+int Foo::Bar(int a) {
+    return a; /* } */
+}
+
+void
+main(int argc, char **argv)
+{
+    if (argc) { puts("}"); }
+}
+
+int Foo::Baz(void) {
+    return 0;
+}
+"""
+
+PY_SOURCE = '''import os
+
+VALUE = 1
+
+class Foo(object):
+    """class doc
+def NotAFunction():
+"""
+    def Bar(self):
+        return (1,
+2)
+
+def Baz(arg):
+    VALUE = 2
+    return arg
+
+VALUE = 3
+'''
+
+class TestBlockLib(unittest.TestCase):
+    def _tree2list(self, tags):
+        rval = list()
+        for elem in tags.GetElements():
+            for otype, objs in elem.items():
+                for obj in objs:
+                    children = list()
+                    if hasattr(obj, 'GetElements'):
+                        children = self._tree2list(obj)
+                    rval.append((otype, obj.GetName(), obj.GetLine(), children))
+        return rval
+
+    def _Compare(self, genfun, txt, splitter, coalesce):
+        full = genfun(StringIO.StringIO(txt))
+        tags, cache = blocklib.GenerateBlockTags(genfun, txt, splitter,
+                                                 coalesce=coalesce)
+        self.assertEquals(self._tree2list(tags), self._tree2list(full))
+        return cache
+
+    def testSplitBraceBlocks(self):
+        """Test splitting C source in to top level blocks"""
+        blocks = blocklib.SplitBraceBlocks(C_SOURCE)
+        self.assertEquals([ line for line, txt in blocks ], [0, 6, 10, 16])
+        self.assertEquals(u"".join([ txt for line, txt in blocks ]), C_SOURCE)
+
+    def testSplitIndentBlocks(self):
+        """Test splitting Python source in to top level blocks"""
+        blocks = blocklib.SplitIndentBlocks(PY_SOURCE)
+        self.assertEquals([ line for line, txt in blocks ],
+                          [0, 2, 4, 12, 16])
+        self.assertEquals(u"".join([ txt for line, txt in blocks ]), PY_SOURCE)
+
+    def testGenerateBlockTags(self):
+        """Test that block parsing gives the same tags as a full parse"""
+        self._Compare(ctags.GenerateTags, C_SOURCE,
+                      blocklib.SplitBraceBlocks, True)
+        self._Compare(pytags.GenerateTags, PY_SOURCE,
+                      blocklib.SplitIndentBlocks, False)
+
+    def testBlockCache(self):
+        """Test that only the changed blocks are parsed again"""
+        cache = self._Compare(ctags.GenerateTags, C_SOURCE,
+                              blocklib.SplitBraceBlocks, True)
+        parsed = list()
+        def GenTags(buff):
+            parsed.append(buff.getvalue())
+            return ctags.GenerateTags(buff)
+
+        txt = C_SOURCE.replace("return 0;", "return 1;\n    return 0;")
+        tags, cache = blocklib.GenerateBlockTags(GenTags, txt,
+                                                 blocklib.SplitBraceBlocks,
+                                                 cache, True)
+        self.assertEquals(len(parsed), 1)
+        self.assertTrue(u"return 1;" in parsed[0])
+        self.assertEquals(self._tree2list(tags),
+                 self._tree2list(ctags.GenerateTags(StringIO.StringIO(txt))))
+        self.assertEquals(len(cache), 4)
+
+#-----------------------------------------------------------------------------#
+if __name__ == '__main__':
+    unittest.main()
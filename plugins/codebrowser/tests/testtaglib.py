@@ -0,0 +1,127 @@
+###############################################################################
+# Name: testtaglib.py                                                         #
+# Purpose: Unittest for taglib.py                                             #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import unittest
+import StringIO
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('../codebrowser/gentag'))
+
+import taglib
+import blocklib
+import ctags
+import pytags
+
+#-----------------------------------------------------------------------------#
+
+PY_SOURCE = '''import os
+
+VALUE = 1
+
+class Foo(object):
+    def Bar(self):
+        return 1
+
+    def Baz(self):
+        return 2
+
+print VALUE
+
+def Func(arg):
+    return arg
+'''
+
+C_SOURCE = """static int count;
+
+int Foo::Bar(int a) {
+    return a;
+}
+
+void
+main(int argc, char **argv)
+{
+    return;
+}
+
+int Foo::Baz(void) {
+    return 0;
+}
+"""
+
+class TestScopeIndex(unittest.TestCase):
+    def _Names(self, elements):
+        return [ elem.GetName() for elem in elements ]
+
+    def testNested(self):
+        """Test finding the enclosing scopes of a line"""
+        tags = pytags.GenerateTags(StringIO.StringIO(PY_SOURCE))
+        index = tags.GetScopeIndex()
+        self.assertTrue(index is tags.GetScopeIndex())
+        self.assertEquals(len(index), 5)
+
+        self.assertEquals(index.GetElement(0), None)
+        self.assertEquals(index.GetElement(2).GetName(), u"VALUE")
+        self.assertEquals(index.GetScope(2), None)
+        self.assertEquals(self._Names(index.GetElementChain(6)),
+                          [u"Foo", u"Bar"])
+        self.assertEquals(self._Names(index.GetElementChain(9)),
+                          [u"Foo", u"Baz"])
+        self.assertEquals(index.GetScope(4).GetName(), u"Foo")
+        self.assertEquals(index.GetScope(14).GetName(), u"Func")
+
+        intervals = index.GetIntervals()
+        self.assertEquals([ (start, end) for start, end, node in intervals ],
+                          [(2, 3), (4, 12), (5, 7), (8, 12), (13, None)])
+        self.assertEquals(index.GetExtent(intervals[1][2]), (4, 12))
+        self.assertEquals(index.GetExtent(taglib.Function(u"Func", 13)), None)
+
+    def testEndLine(self):
+        """Test limiting the extents with the end lines of the elements"""
+        tags = pytags.GenerateTags(StringIO.StringIO(PY_SOURCE))
+        tags.GetElementType('class')[0].SetEndLine(10)
+        index = taglib.ScopeIndex(tags)
+        self.assertEquals(index.GetScope(9).GetName(), u"Baz")
+        self.assertEquals(index.GetScope(11), None)
+        self.assertEquals(index.GetElementChain(12), list())
+
+        # The index is rebuilt when an element is added to the document
+        tags.AddFunction(taglib.Function(u"Last", 20))
+        self.assertEquals(len(tags.GetScopeIndex()), 6)
+        self.assertEquals(tags.GetScopeIndex().GetExtent(
+                             tags.GetElementType('function')[0]), (13, 19))
+
+    def testBlockTags(self):
+        """Test the extents of the tags generated one block at a time"""
+        tags = blocklib.GenerateBlockTags(pytags.GenerateTags, PY_SOURCE,
+                                          blocklib.SplitIndentBlocks)[0]
+        index = tags.GetScopeIndex()
+        self.assertEquals(index.GetScope(9).GetName(), u"Baz")
+        # Top level code after the class is not in its scope
+        self.assertEquals(index.GetScope(11), None)
+
+        # Coalesced C++ methods are found in their class
+        tags = blocklib.GenerateBlockTags(ctags.GenerateTags, C_SOURCE,
+                                          blocklib.SplitBraceBlocks,
+                                          coalesce=True)[0]
+        index = tags.GetScopeIndex()
+        self.assertEquals(self._Names(index.GetElementChain(3)),
+                          [u"Foo", u"Bar"])
+        self.assertEquals(self._Names(index.GetElementChain(9)), [u"main"])
+        self.assertEquals(self._Names(index.GetElementChain(13)),
+                          [u"Foo", u"Baz"])
+
+#-----------------------------------------------------------------------------#
+if __name__ == '__main__':
+    unittest.main()
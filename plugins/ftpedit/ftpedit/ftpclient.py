@@ -15,6 +15,12 @@ to use FTP client interface with both blocking and non blocking methods. To
 use the non-blocking methods the client must be initialized with a window object
 to recieve the event callbacks from the Async method calls.
 
+Files are transfered in binary mode in blocks of L{BLOCK_SIZE} bytes. The Async
+methods of all clients are run in order on a single L{FtpWorker} thread.
+Logged in connections to a site can be reused through the L{ConnectionPool}
+and directory listings are cached for L{LIST_TTL} seconds in the
+L{ListCache}.
+
 """
 
 __author__ = "Cody Precord <cprecord@editra.org>"
@@ -24,8 +30,11 @@ __revision__ = "$Revision: 834 $"
 #-----------------------------------------------------------------------------#
 # Imports
 import os
+import time
 import threading
+import Queue
 import ftplib
+import posixpath
 import tempfile
 from StringIO import StringIO
 import wx
@@ -35,6 +44,13 @@ from eclib.infodlg import CalcSize
 from util import Log
 
 #-----------------------------------------------------------------------------#
+# Globals
+
+BLOCK_SIZE = 65536  # Size of the blocks files are transfered in
+LIST_TTL = 30       # Seconds a cached directory listing is valid for
+KEEPALIVE = 60      # Seconds between keep alive commands on idle connections
+MAX_IDLE = 300      # Seconds an unused pooled connection is kept open
+MAX_POOLED = 2      # Max number of idle connections kept for a site
 
 # Event that ftp LIST command has completed value == dict of updates
 edEVT_FTP_REFRESH = wx.NewEventType()
@@ -149,6 +165,34 @@ class FtpClient(ftplib.FTP):
         self._data.append(processed)
         self._busy.release()
 
+    def _InvalidateList(self, path=None):
+        """Remove a cached directory listing of this clients site
+        @keyword path: file path on the server, invalidates the listing of
+                       the directory containing it (default current directory)
+
+        """
+        dname = self._curdir
+        if path is not None:
+            dname = posixpath.dirname(posixpath.join(self._curdir, path))
+        ListCache.Invalidate(self._ListKey(dname))
+
+    def _ListKey(self, path):
+        """Get the key of the given directory in the L{ListCache}
+        @param path: directory path on the server
+        @return: tuple
+
+        """
+        return (self._host, int(self._port), posixpath.normpath(path))
+
+    def _PostJob(self, funct, etype, args=list()):
+        """Run the callable on the worker thread and send the result to the
+        parent window.
+        @param funct: callable
+        @param etype: event type
+
+        """
+        PostJob(self._parent, funct, etype, args)
+
     def _RefreshCommand(self, cmd, args=list()):
         """Run a refresh command
         @param cmd: callable
@@ -183,9 +227,7 @@ class FtpClient(ftplib.FTP):
         @note: Generates a refresh event when finished
 
         """
-        ftp_t = FtpThread(self._parent, self.ChangeDir,
-                          edEVT_FTP_REFRESH, args=[path,])
-        ftp_t.start()
+        self._PostJob(self.ChangeDir, edEVT_FTP_REFRESH, args=[path,])
 
     def CheckConnection(self):
         """Check the connection to see if the client is still logged in.
@@ -276,6 +318,7 @@ class FtpClient(ftplib.FTP):
             self._ProcessException(msg)
             Log("[ftpedit][err] DeleteFile: %s" % msg)
             return False
+        self._InvalidateList(fname)
         return True
 
     def DeleteFileAsync(self, fname):
@@ -285,58 +328,56 @@ class FtpClient(ftplib.FTP):
         @note: fires EVT_FTP_REFRESH when complete
 
         """
-        ftp_t = FtpThread(self._parent, self._RefreshCommand,
-                          edEVT_FTP_REFRESH, args=[self.DeleteFile, [fname,]])
-        ftp_t.start()
+        self._PostJob(self._RefreshCommand,
+                      edEVT_FTP_REFRESH, args=[self.DeleteFile, [fname,]])
 
-    def Download(self, fname):
+    def Download(self, fname, progress=None):
         """Download the file at the given path
         @param fname: string
+        @keyword progress: callable(received, total) called after each block
         @return: (ftppath, temppath)
 
         """
         if not self.IsActive():
             raise FtpClientNotConnected, "FtpClient is not connected"
 
+        if not fname.startswith('.') and '.' in fname:
+            pre, suf = fname.rsplit('.', 1)
+            suf = u'.' + suf
+        else:
+            pre = fname
+            suf = ''
+
+        fid = None
         name = None
         try:
             try:
-                if not fname.startswith('.') and '.' in fname:
-                    pre, suf = fname.rsplit('.', 1)
-                    suf = u'.' + suf
-                else:
-                    pre = fname
-                    suf = ''
-
-                fid, name = tempfile.mkstemp(suf, pre, text=True)
-                def GetFileData(data, fid=fid):
-                    """Write the downloaded data to disk"""
-                    os.write(fid, data + u"\n")
-
-                self.retrlines('RETR ' + fname, GetFileData)
+                fid, name = tempfile.mkstemp(suf, pre)
+                self.Retrieve(fname, lambda data: os.write(fid, data), progress)
             except Exception, msg:
                 self._ProcessException(msg)
                 Log("[ftpedit][err] Download: %s" % msg)
         finally:
-            os.close(fid)
+            if fid is not None:
+                os.close(fid)
 
         return (u"/".join([self._curdir, fname]), name)
 
-    def DownloadAsync(self, fname):
+    def DownloadAsync(self, fname, progress=None):
         """Do an asynchronous download
         @param fname: filename to download
+        @keyword progress: callable(received, total) called after each block
         @note: EVT_FTP_DOWNLOAD will be fired when complete containing the
                location of the on disk file.
 
         """
-        ftp_t = FtpThread(self._parent, self.Download,
-                          edEVT_FTP_DOWNLOAD, args=[fname,])
-        ftp_t.start()
+        self._PostJob(self.Download, edEVT_FTP_DOWNLOAD, args=[fname, progress])
 
-    def DownloadTo(self, fname, dest):
+    def DownloadTo(self, fname, dest, progress=None):
         """Download the file from the server to the destination
         @param fname: file on server to download
         @param dest: destination file on local machine
+        @keyword progress: callable(received, total) called after each block
 
         """
         if not self.IsActive():
@@ -344,31 +385,32 @@ class FtpClient(ftplib.FTP):
 
         ftppath = u"/".join([self._curdir, fname])
         succeed = True
+        fhandle = None
         try:
             try:
                 fhandle = open(dest, 'wb')
-                self.retrbinary('RETR ' + fname,
-                                lambda data: fhandle.write(data))
+                self.Retrieve(fname, fhandle.write, progress)
             except Exception, msg:
                 self._ProcessException(msg)
                 Log("[ftpedit][err] DownloadTo: %s" % msg)
                 succeed = False
         finally:
-            fhandle.close()
+            if fhandle is not None:
+                fhandle.close()
 
         return (ftppath, dest, succeed)
 
-    def DownloadToAsync(self, fname, dest):
+    def DownloadToAsync(self, fname, dest, progress=None):
         """Do an asynchronous download to a specified file.
         @param fname: filename to download
         @param dest: destination file
+        @keyword progress: callable(received, total) called after each block
         @note: EVT_FTP_DOWNLOAD_TO will be fired when complete containing the
                location of the on disk file.
 
         """
-        ftp_t = FtpThread(self._parent, self.DownloadTo,
-                          edEVT_FTP_DOWNLOAD_TO, args=[fname, dest])
-        ftp_t.start()
+        self._PostJob(self.DownloadTo, edEVT_FTP_DOWNLOAD_TO,
+                      args=[fname, dest, progress])
 
     def GetCurrentDirectory(self):
         """Get the current working directory
@@ -377,19 +419,28 @@ class FtpClient(ftplib.FTP):
         """
         return self._curdir
 
-    def GetFileList(self):
+    def GetFileList(self, refresh=False):
         """Get list of files at the given path
+        @keyword refresh: bypass the L{ListCache}
         @return: list of dict(isdir, name, size, date)
 
         """
         if not self.IsActive():
             raise FtpClientNotConnected, "FtpClient is not connected"
 
+        key = self._ListKey(self._curdir)
+        if not refresh:
+            rval = ListCache.Get(key)
+            if rval is not None:
+                return rval
+
+        failed = False
         try:
             code = self.retrlines('LIST', self._ProcessInput)
         except Exception, msg:
             Log("[ftpedit][err] GetFileList: %s" % msg)
             self._ProcessException(msg)
+            failed = True
 
         #-- Critical section --#
         self._busy.acquire()
@@ -419,7 +470,10 @@ class FtpClient(ftplib.FTP):
 
         # Return ordered list of directories followed by files in alphanumeric
         # sorted order.
-        return dirs + files
+        rval = dirs + files
+        if not failed:
+            ListCache.Set(key, rval)
+        return rval
 
     def GetHostname(self):
         """Get the name of the currently connected host
@@ -442,6 +496,13 @@ class FtpClient(ftplib.FTP):
         """
         return self._lastlogin
 
+    def GetPort(self):
+        """Get the port number of the host
+        @return: int
+
+        """
+        return self._port
+
     def GetParent(self):
         """Get the clients parent window
         @return: parent window or None
@@ -456,6 +517,19 @@ class FtpClient(ftplib.FTP):
         """
         return self._active
 
+    def KeepAlive(self):
+        """Send a NOOP to keep an idle connection from timing out
+        @return: bool (False if the connection was lost)
+
+        """
+        try:
+            self.voidcmd('NOOP')
+        except Exception, msg:
+            self._ProcessException(msg)
+            Log("[ftpedit][warn] KeepAlive: %s" % msg)
+            return False
+        return True
+
     def Login(self, user, password):
         """Login to the server
         @param user: username
@@ -493,6 +567,7 @@ class FtpClient(ftplib.FTP):
             self._ProcessException(msg)
             Log("[ftpedit][err] NewDir: %s" % msg)
             return False
+        self._InvalidateList(dname)
         return True
 
     def NewDirAsync(self, dname):
@@ -500,9 +575,8 @@ class FtpClient(ftplib.FTP):
         @param dname: string
 
         """
-        ftp_t = FtpThread(self._parent, self._RefreshCommand,
-                          edEVT_FTP_REFRESH, args=[self.NewDir, [dname,]])
-        ftp_t.start()
+        self._PostJob(self._RefreshCommand,
+                      edEVT_FTP_REFRESH, args=[self.NewDir, [dname,]])
 
     def NewFile(self, fname):
         """Create a new file relative to the current path
@@ -513,12 +587,12 @@ class FtpClient(ftplib.FTP):
             raise FtpClientNotConnected, "FtpClient is not connected"
 
         try:
-            buff = StringIO('')
-            self.storlines('STOR ' + fname, buff)
+            self.storbinary('STOR ' + fname, StringIO(''))
         except Exception, msg:
             self._ProcessException(msg)
             Log("[ftpedit][err] Upload: %s" % msg)
             return False
+        self._InvalidateList(fname)
         return True
 
     def NewFileAsync(self, fname):
@@ -527,18 +601,16 @@ class FtpClient(ftplib.FTP):
         @param fname: name of file.
 
         """
-        ftp_t = FtpThread(self._parent, self._RefreshCommand,
+        self._PostJob(self._RefreshCommand,
                       edEVT_FTP_REFRESH, args=[self.NewFile, [fname,]])
-        ftp_t.start()
 
     def RefreshPath(self):
         """Refresh the current working directory.
-        Runs L{GetFileList} asynchronously and returns the results
-        in a EVT_FTP_REFRESH event.
+        Runs L{GetFileList} asynchronously bypassing the L{ListCache} and
+        returns the results in a EVT_FTP_REFRESH event.
 
         """
-        ftp_t = FtpThread(self._parent, self.GetFileList, edEVT_FTP_REFRESH)
-        ftp_t.start()
+        self._PostJob(self.GetFileList, edEVT_FTP_REFRESH, args=[True,])
 
     def Rename(self, old, new):
         """Rename the file
@@ -556,6 +628,8 @@ class FtpClient(ftplib.FTP):
             self._ProcessException(msg)
             Log("[ftpedit][err] Rename: %s" % msg)
             return False
+        self._InvalidateList(old)
+        self._InvalidateList(new)
         return True
 
     def RenameAsync(self, old, new):
@@ -564,9 +638,36 @@ class FtpClient(ftplib.FTP):
         @param new: new file name
 
         """
-        ftp_t = FtpThread(self._parent, self._RefreshCommand,
-                          edEVT_FTP_REFRESH, args=[self.Rename, [old, new]])
-        ftp_t.start()
+        self._PostJob(self._RefreshCommand,
+                      edEVT_FTP_REFRESH, args=[self.Rename, [old, new]])
+
+    def Retrieve(self, fname, callback, progress=None):
+        """Retrieve a file in binary mode
+        @param fname: file on server
+        @param callback: callable(data) called with each block of data
+        @keyword progress: callable(received, total) called after each block,
+                           total is -1 if the server does not report the size
+
+        """
+        received = [0]
+        total = -1
+        if progress is not None:
+            self.voidcmd('TYPE I')
+            try:
+                total = self.size(fname)
+            except ftplib.all_errors:
+                pass
+            if total is None:
+                total = -1
+
+        def OnBlock(data):
+            """Pass the block on and report the progress"""
+            callback(data)
+            received[0] += len(data)
+            if progress is not None:
+                progress(received[0], total)
+
+        self.retrbinary('RETR ' + fname, OnBlock, BLOCK_SIZE)
 
     def SetDefaultPath(self, dpath):
         """Set the default path
@@ -589,73 +690,431 @@ class FtpClient(ftplib.FTP):
         """
         self._port = port
 
-    def Upload(self, src, dest):
+    def Upload(self, src, dest, progress=None):
         """Upload a file to the server
         @param src: source file
         @param dest: destination file on server
+        @keyword progress: callable(sent, total) called after each block
         @return: bool
 
         """
         if not self.IsActive():
             raise FtpClientNotConnected, "FtpClient is not connected"
 
+        sent = [0]
+        def OnBlock(data):
+            """Report the upload progress"""
+            sent[0] += len(data)
+            if progress is not None:
+                progress(sent[0], total)
+
+        fhandle = None
         try:
-            fhandle = open(src, 'r')
-            buff = StringIO(fhandle.read())
-            fhandle.close()
-            self.storlines('STOR ' + dest, buff)
-        except Exception, msg:
-            self._ProcessException(msg)
-            Log("[ftpedit][err] Upload: %s" % msg)
-            return False
+            try:
+                total = os.path.getsize(src)
+                fhandle = open(src, 'rb')
+                self.storbinary('STOR ' + dest, fhandle, BLOCK_SIZE, OnBlock)
+            except Exception, msg:
+                self._ProcessException(msg)
+                Log("[ftpedit][err] Upload: %s" % msg)
+                return False
+        finally:
+            if fhandle is not None:
+                fhandle.close()
+
+        self._InvalidateList(dest)
         return True
 
-    def UploadAsync(self, src, dest):
+    def UploadAsync(self, src, dest, progress=None):
         """Upload the file asyncronously
         @param src: source file
         @param dest: destination file on server
+        @keyword progress: callable(sent, total) called after each block
         @note: completion notified by EVT_FTP_UPLOAD
 
         """
-        ftp_t = FtpThread(self._parent, self.Upload,
-                          edEVT_FTP_UPLOAD, args=[src, dest])
-        ftp_t.start()
+        self._PostJob(self.Upload, edEVT_FTP_UPLOAD, args=[src, dest, progress])
+
+#-----------------------------------------------------------------------------#
+
+class FtpConnectionPool(object):
+    """Pool of logged in connections that are kept open between uploads
+    to avoid connecting and logging in to the site for every transfer.
+    Clients are taken from the pool with L{Acquire} and must be given back
+    with L{Release} when done.
+
+    """
+    def __init__(self, maxidle=MAX_POOLED, timeout=MAX_IDLE,
+                 keepalive=KEEPALIVE):
+        """Create the pool
+        @keyword maxidle: max number of idle connections kept for a site
+        @keyword timeout: seconds an unused connection is kept open
+        @keyword keepalive: seconds between keep alive commands
+
+        """
+        super(FtpConnectionPool, self).__init__()
+
+        # Attributes
+        self._maxidle = maxidle
+        self._timeout = timeout
+        self._keepalive = keepalive
+        self._lock = threading.Lock()
+        self._idle = dict() # (host, port, user, pass) -> [[client, used, alive],]
+
+    @staticmethod
+    def _Close(client):
+        """Close the connection of a client that is no longer used
+        @param client: L{FtpClient}
+
+        """
+        if client.IsActive():
+            client.Disconnect()
+        client.close()
+
+    def _Return(self, entry):
+        """Put an idle connection back in the pool
+        @param entry: [client, used, alive]
+
+        """
+        client = entry[0]
+        user, password = client.GetLastLogin()
+        key = (client.GetHostname(), int(client.GetPort()), user, password)
+        self._lock.acquire()
+        try:
+            entries = self._idle.setdefault(key, list())
+            if len(entries) < self._maxidle:
+                entries.append(entry)
+                client = None
+        finally:
+            self._lock.release()
+
+        if client is not None:
+            self._Close(client)
+
+    def _TakeIdle(self, check=None):
+        """Remove idle connections from the pool
+        @keyword check: callable(entry) to select the connections to remove
+        @return: list of [client, used, alive]
+
+        """
+        rval = list()
+        self._lock.acquire()
+        try:
+            for site in self._idle.keys():
+                entries = self._idle[site]
+                taken = [ entry for entry in entries
+                          if check is None or check(entry) ]
+                rval.extend(taken)
+                entries = [ entry for entry in entries if entry not in taken ]
+                if entries:
+                    self._idle[site] = entries
+                else:
+                    del self._idle[site]
+        finally:
+            self._lock.release()
+        return rval
+
+    def Acquire(self, host, port, user, password, path=u'.'):
+        """Get a logged in client for the site, an idle connection is reused
+        if there is one otherwise a new connection is made.
+        @param host: host name
+        @param port: port number
+        @param user: username
+        @param password: password
+        @keyword path: default path of a new connection
+        @return: L{FtpClient} (check IsActive and GetLastError for failures)
+
+        """
+        key = (host, int(port), user, password)
+        while True:
+            client = None
+            self._lock.acquire()
+            try:
+                entries = self._idle.get(key, list())
+                if entries:
+                    client, used, alive = entries.pop()
+                    if not entries:
+                        del self._idle[key]
+            finally:
+                self._lock.release()
+
+            if client is None:
+                break
+
+            # Check connections that have been idle for a while
+            if time.time() - alive < self._keepalive or client.KeepAlive():
+                client.ClearLastError()
+                return client
+
+            self._Close(client)
+
+        client = FtpClient(None)
+        client.SetHostname(host)
+        client.SetPort(port)
+        client.SetDefaultPath(path)
+        client.Connect(user, password)
+        return client
+
+    def CloseAll(self):
+        """Close all the idle connections"""
+        for entry in self._TakeIdle():
+            self._Close(entry[0])
+
+    def CloseSite(self, host, port):
+        """Close the idle connections to the given site
+        @param host: host name
+        @param port: port number
+
+        """
+        site = (host, int(port))
+        def IsSite(entry):
+            """Check if the connection is to the site"""
+            client = entry[0]
+            return (client.GetHostname(), int(client.GetPort())) == site
+
+        for entry in self._TakeIdle(check=IsSite):
+            self._Close(entry[0])
+
+    def GetIdleCount(self):
+        """Get the number of idle connections in the pool
+        @return: int
+
+        """
+        self._lock.acquire()
+        try:
+            return sum([ len(entries) for entries in self._idle.values() ])
+        finally:
+            self._lock.release()
+
+    def GetKeepAlive(self):
+        """Get the interval of the keep alive commands
+        @return: seconds
+
+        """
+        return self._keepalive
+
+    def KeepAlive(self):
+        """Close the connections that have been unused for too long and send
+        a keep alive command on the ones that have been idle since the last
+        keep alive.
+
+        """
+        now = time.time()
+        due = lambda entry: now - entry[2] >= self._keepalive
+        for entry in self._TakeIdle(check=due):
+            client = entry[0]
+            if now - entry[1] < self._timeout and client.KeepAlive():
+                entry[2] = time.time()
+                self._Return(entry)
+            else:
+                self._Close(client)
+
+    def Release(self, client):
+        """Return a client from L{Acquire} to the pool. The connection is
+        closed if it failed or there are enough idle connections to the site.
+        @param client: L{FtpClient}
+
+        """
+        if not client.IsActive() or client.GetLastError() is not None or \
+           client.GetLastLogin() is None:
+            self._Close(client)
+        else:
+            now = time.time()
+            self._Return([client, now, now])
+
+    def SetKeepAlive(self, keepalive):
+        """Set the interval of the keep alive commands
+        @param keepalive: seconds
+
+        """
+        self._keepalive = keepalive
+
+    def SetTimeout(self, timeout):
+        """Set how long unused connections are kept open
+        @param timeout: seconds
+
+        """
+        self._timeout = timeout
 
 #-----------------------------------------------------------------------------#
 
-class FtpThread(threading.Thread):
-    """Thread for running asyncronous ftp jobs"""
-    def __init__(self, parent, funct, etype, args=list()):
+class FtpListCache(object):
+    """Cache of the directory listings of the ftp sites. Listings expire
+    after a time to live and are invalidated by the L{FtpClient} methods
+    that modify the directory.
+
+    """
+    def __init__(self, ttl=LIST_TTL):
+        """Create the cache
+        @keyword ttl: seconds a listing is valid for
+
+        """
+        super(FtpListCache, self).__init__()
+
+        # Attributes
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._cache = dict() # (host, port, path) -> (time, listing)
+
+    def Get(self, key):
+        """Get a cached listing
+        @param key: (host, port, path)
+        @return: list or None if not cached or expired
+
+        """
+        self._lock.acquire()
+        try:
+            entry = self._cache.get(key, None)
+            if entry is None:
+                return None
+            elif time.time() - entry[0] >= self._ttl:
+                del self._cache[key]
+                return None
+            return list(entry[1])
+        finally:
+            self._lock.release()
+
+    def Invalidate(self, key=None):
+        """Remove a listing from the cache
+        @keyword key: (host, port, path) or None to clear the cache
+
+        """
+        self._lock.acquire()
+        try:
+            if key is None:
+                self._cache.clear()
+            elif key in self._cache:
+                del self._cache[key]
+        finally:
+            self._lock.release()
+
+    def Set(self, key, listing):
+        """Cache a listing
+        @param key: (host, port, path)
+        @param listing: list
+
+        """
+        self._lock.acquire()
+        try:
+            self._cache[key] = (time.time(), list(listing))
+        finally:
+            self._lock.release()
+
+    def SetTTL(self, ttl):
+        """Set how long the listings are valid for
+        @param ttl: seconds
+
+        """
+        self._ttl = ttl
+
+#-----------------------------------------------------------------------------#
+
+class FtpWorker(threading.Thread):
+    """Thread for running asyncronous ftp jobs. The jobs are run one at a
+    time in the order they were added, while there are none the keep alive
+    of the L{ConnectionPool} is run.
+
+    """
+    def __init__(self, pool):
         """Create the thread object
-        @param parent: Parent window to recieve event(s) (can be None)
-        @param funct: method to run in a thread
-        @param etype: event type
-        @keyword args: list of args to pass to funct
+        @param pool: L{FtpConnectionPool} to keep alive
 
         """
         threading.Thread.__init__(self)
 
         # Attributes
-        self._parent = parent
-        self._funct = funct
-        self._etype = etype
-        self._args = args
+        self._pool = pool
+        self._jobs = Queue.Queue()
+
+        # Setup
+        self.setDaemon(True)
+
+    def _GetFailedResult(self, etype, args):
+        """Get the event value to send for a job that raised an exception,
+        so that the parent is still notified that the job has finished.
+        @param etype: event type
+        @param args: args the job was run with
+        @return: value in the form of the jobs normal result
+
+        """
+        if etype == edEVT_FTP_DOWNLOAD:
+            return (args[0], None)
+        elif etype == edEVT_FTP_DOWNLOAD_TO:
+            return (args[0], args[1], False)
+        elif etype == edEVT_FTP_UPLOAD:
+            return False
+        else:
+            return list()
+
+    def AddJob(self, parent, funct, etype, args=list()):
+        """Add a job to the queue
+        @param parent: Parent window to recieve event(s) (can be None)
+        @param funct: method to run in the thread
+        @param etype: event type
+        @keyword args: list of args to pass to funct
+
+        """
+        self._jobs.put((parent, funct, etype, args))
 
     def run(self):
-        """Run the command"""
-        result = self._funct(*self._args)
+        """Run the jobs"""
+        while True:
+            try:
+                job = self._jobs.get(True, self._pool.GetKeepAlive())
+            except Queue.Empty:
+                self._pool.KeepAlive()
+                continue
 
-        # HACK: too lazy to fix now...
-        cdir = self._funct.im_self.GetCurrentDirectory()
+            parent, funct, etype, args = job
+            try:
+                result = funct(*args)
+            except Exception, msg:
+                Log("[ftpedit][err] FtpWorker: %s" % msg)
+                client = getattr(funct, 'im_self', None)
+                if isinstance(client, FtpClient):
+                    client._ProcessException(msg)
+                result = self._GetFailedResult(etype, args)
+
+            # Fire a notification event if we have a parent
+            if parent is not None:
+                try:
+                    # HACK: too lazy to fix now...
+                    cdir = funct.im_self.GetCurrentDirectory()
+                    evt = FtpClientEvent(etype, result, cdir)
+                    wx.PostEvent(parent, evt)
+                except Exception, msg:
+                    Log("[ftpedit][err] FtpWorker notify: %s" % msg)
+
+#-----------------------------------------------------------------------------#
 
-        # Fire a notification event if we have a parent
-        if self._parent is not None:
-            evt = FtpClientEvent(self._etype, result, cdir)
-            wx.PostEvent(self._parent, evt)
+ConnectionPool = FtpConnectionPool()
+ListCache = FtpListCache()
+
+_WORKER = None
+_WORKER_LOCK = threading.Lock()
 
 #-----------------------------------------------------------------------------#
 # Utility
 
+def PostJob(parent, funct, etype, args=list()):
+    """Run a job on the L{FtpWorker} thread, the worker is started on the
+    first call.
+    @param parent: Parent window to recieve event(s) (can be None)
+    @param funct: method to run in the thread
+    @param etype: event type
+    @keyword args: list of args to pass to funct
+
+    """
+    global _WORKER
+    _WORKER_LOCK.acquire()
+    try:
+        if _WORKER is None:
+            _WORKER = FtpWorker(ConnectionPool)
+            _WORKER.start()
+    finally:
+        _WORKER_LOCK.release()
+    _WORKER.AddJob(parent, funct, etype, args)
+
 def ParseFtpOutput(line):
     """Parse output from the ftp RETR/LIST commands and render a dictionary
     of tokens.
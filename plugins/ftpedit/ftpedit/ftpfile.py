@@ -19,6 +19,7 @@ __revision__ = "$Revision: 834 $"
 #-----------------------------------------------------------------------------#
 # Imports
 import os
+import posixpath
 import wx
 
 # Editra Libraries
@@ -89,13 +90,24 @@ class FtpFile(ed_txt.EdFile):
         else:
             ed_msg.PostMessage(ed_msg.EDMSG_PROGRESS_SHOW, (self._pid, False))
 
-    def _NotifyError(self):
-        """Notify of errors"""
+    def _NotifyError(self, msg):
+        """Notify of errors
+        @param msg: error message
+
+        """
         if isinstance(self._window, wx.Frame):
-            msg = self._client.GetLastError()
             wx.MessageBox(unicode(msg), _("Ftp Save Error"),
                           wx.OK|wx.CENTER|wx.ICON_ERROR)
 
+    def _OnProgress(self, sent, total):
+        """Update the frames progress indicator with the upload progress
+        @param sent: bytes sent
+        @param total: file size
+
+        """
+        wx.CallAfter(ed_msg.PostMessage, ed_msg.EDMSG_PROGRESS_STATE,
+                     (self._pid, sent, total))
+
     @staticmethod
     def _PostStatusMsg(msg):
         """Post a message to update the status text to inform of file changes"""
@@ -120,41 +132,48 @@ class FtpFile(ed_txt.EdFile):
         self._ftp = False
 
     def DoFtpUpload(self):
-        """Upload the contents of the on disk temp file to the server"""
+        """Upload the contents of the on disk temp file to the server using
+        a connection from the ftpclient.ConnectionPool.
+
+        """
         if self._client is None:
             return
 
-        # Cant reuse ftp ojects...
-        self._client = self._client.Clone()
-        self._client.SetHostname(self._site['url'])
-        self._client.SetPort(self._site['port'])
-        connected = self._client.Connect(self._site['user'],
-                                         self._site['pword'])
-
-        if not connected:
-            # TODO: report error to upload in ui
-            err = self._client.GetLastError()
-            Log("[ftpedit][err] DoFtpUpload: %s" % err)
-            wx.CallAfter(self._NotifyError)
-            wx.CallAfter(self._PostStatusMsg, _("Ftp upload failed: %s") % self.ftppath)
-        else:
-            wx.CallAfter(self._Busy, True)
-            success = self._client.Upload(self.GetPath(), self.ftppath)
-            if not success:
-                wx.CallAfter(self._NotifyError)
+        client = ftpclient.ConnectionPool.Acquire(self._site['url'],
+                                                  self._site['port'],
+                                                  self._site['user'],
+                                                  self._site['pword'])
+
+        try:
+            if not client.IsActive():
+                # TODO: report error to upload in ui
+                err = client.GetLastError()
+                Log("[ftpedit][err] DoFtpUpload: %s" % err)
+                wx.CallAfter(self._NotifyError, err)
                 wx.CallAfter(self._PostStatusMsg, _("Ftp upload failed: %s") % self.ftppath)
             else:
-                wx.CallAfter(self._PostStatusMsg, _("Ftp upload succeeded: %s") % self.ftppath)
-                parent = self._client.GetParent()
-                if parent is not None:
-                    files = self._client.GetFileList()
-                    evt = ftpclient.FtpClientEvent(ftpclient.edEVT_FTP_REFRESH, files)
-                    wx.PostEvent(parent, evt)
-            self._client.Disconnect()
-            wx.CallAfter(self._Busy, False)
+                wx.CallAfter(self._Busy, True)
+                try:
+                    success = client.Upload(self.GetPath(), self.ftppath,
+                                            self._OnProgress)
+                    if not success:
+                        wx.CallAfter(self._NotifyError, client.GetLastError())
+                        wx.CallAfter(self._PostStatusMsg, _("Ftp upload failed: %s") % self.ftppath)
+                    else:
+                        wx.CallAfter(self._PostStatusMsg, _("Ftp upload succeeded: %s") % self.ftppath)
+                        # Refresh the owners file list if it is showing the directory
+                        owner = self._client
+                        if owner is not None and owner.GetParent() is not None and \
+                           owner.IsActive() and \
+                           owner.GetCurrentDirectory() == posixpath.dirname(self.ftppath):
+                            owner.RefreshPath()
+                finally:
+                    wx.CallAfter(self._Busy, False)
+        finally:
+            ftpclient.ConnectionPool.Release(client)
 
     def GetCurrentDirectory(self):
-        """Hack for compatibility with FtpThread"""
+        """Hack for compatibility with FtpWorker"""
         return self._client.GetCurrentDirectory()
 
     def GetFtpPath(self):
@@ -212,9 +231,7 @@ class FtpFile(ed_txt.EdFile):
 
         # Upload the file to the server
         if self._ftp:
-            ftp_t = ftpclient.FtpThread(None, self.DoFtpUpload,
-                                    ftpclient.EVT_FTP_UPLOAD)
-            ftp_t.start()
+            ftpclient.PostJob(None, self.DoFtpUpload, ftpclient.edEVT_FTP_UPLOAD)
 
 #-----------------------------------------------------------------------------#
 
@@ -69,6 +69,7 @@ class FtpWindow(ed_basewin.EdBaseCtrlBox):
         self._files = list()
         self._select = None
         self._open = list()   # Open ftpfile objects
+        self._pid = self._mw.GetId()
 
         # Ui controls
         self._cbar = None     # ControlBar
@@ -160,6 +161,17 @@ class FtpWindow(ed_basewin.EdBaseCtrlBox):
         del self._client
         self._client = tmp
 
+    def _OnProgress(self, received, total):
+        """Update the main windows progress indicator with the progress of
+        a download. Called from the ftp worker thread.
+        @param received: bytes received
+        @param total: file size (-1 if unknown)
+
+        """
+        if total > 0:
+            wx.CallAfter(ed_msg.PostMessage, ed_msg.EDMSG_PROGRESS_STATE,
+                         (self._pid, received, total))
+
     def _StartBusy(self, busy=True):
         """Start/Stop the main windows busy indicator
         @keyword busy: bool
@@ -223,7 +235,11 @@ class FtpWindow(ed_basewin.EdBaseCtrlBox):
 #                    if result == wx.NO:
 #                        return
 
-                # Disconnect from server
+                # Disconnect from server and close the pooled connections
+                # used for saving files to it.
+                ftpclient.PostJob(None, ftpclient.ConnectionPool.CloseSite,
+                                  None, args=[self._client.GetHostname(),
+                                              self._client.GetPort()])
                 result = self._client.Disconnect()
                 if not result:
                     err = self._client.GetLastError()
@@ -518,7 +534,7 @@ class FtpWindow(ed_basewin.EdBaseCtrlBox):
                                    (ed_glob.SB_INFO,
                                    _("Retrieving file") + u"..."))
         self._StartBusy(True)
-        self._client.DownloadAsync(path)
+        self._client.DownloadAsync(path, self._OnProgress)
 
     def RefreshControlBar(self):
         """Refresh the status of the control bar"""
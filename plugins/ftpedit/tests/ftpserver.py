@@ -0,0 +1,263 @@
+###############################################################################
+# Name: ftpserver.py                                                          #
+# Purpose: Local ftp server stand-in for the ftpedit tests and benchmarks     #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Minimal ftp server that keeps its files in memory. It implements the subset
+of the protocol used by ftplib and ftpclient.FtpClient with passive mode
+data connections, and counts the logins and commands it receives so the
+tests can check how the client uses the server. A delay can be given to
+simulate the round trip time of a remote server.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import socket
+import threading
+import time
+import posixpath
+import SocketServer
+
+#-----------------------------------------------------------------------------#
+
+class FtpHandler(SocketServer.StreamRequestHandler):
+    """Handle the commands of one control connection"""
+    def setup(self):
+        # ftplib sends ABOR as urgent data
+        self.request.setsockopt(socket.SOL_SOCKET, socket.SO_OOBINLINE, 1)
+        # Don't hold back the small replies like a real server
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        SocketServer.StreamRequestHandler.setup(self)
+        self.cwd = u'/'
+        self.binary = False
+        self.pasv = None
+        self.rnfr = None
+
+    def Reply(self, line):
+        """Send a reply after the servers delay"""
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.wfile.write(line + '\r\n')
+        self.wfile.flush()
+
+    def Path(self, arg):
+        """Get the absolute path of a command argument"""
+        return posixpath.normpath(posixpath.join(self.cwd, arg))
+
+    def Transfer(self, func):
+        """Run a data transfer on the passive connection"""
+        if self.pasv is None:
+            self.Reply('425 Use PASV first')
+            return
+        self.Reply('150 Opening data connection')
+        conn = self.pasv.accept()[0]
+        self.pasv.close()
+        self.pasv = None
+        try:
+            func(conn)
+        finally:
+            conn.close()
+        self.Reply('226 Transfer complete')
+
+    def handle(self):
+        """Process the commands"""
+        server = self.server
+        server.Count('CONNECT')
+        self.Reply('220 Editra test server')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            cmd, arg = (line.strip() + ' ').split(' ', 1)
+            cmd = cmd.lstrip('\xff\xf4\xf2').upper()
+            arg = arg.strip()
+            server.Count(cmd)
+            handler = getattr(self, 'Do' + cmd, None)
+            if handler is None:
+                self.Reply('502 Command not implemented')
+            elif handler(arg):
+                break
+        if self.pasv is not None:
+            self.pasv.close()
+
+    #---- Commands ----#
+
+    def DoABOR(self, arg):
+        self.Reply('225 No transfer to abort')
+
+    def DoCWD(self, arg):
+        path = self.Path(arg)
+        if path in self.server.dirs:
+            self.cwd = path
+            self.Reply('250 Directory changed')
+        else:
+            self.Reply('550 No such directory')
+
+    def DoDELE(self, arg):
+        path = self.Path(arg)
+        if path in self.server.files:
+            del self.server.files[path]
+            self.Reply('250 Deleted')
+        else:
+            self.Reply('550 No such file')
+
+    def DoLIST(self, arg):
+        server = self.server
+        entries = list()
+        for path in sorted(server.dirs):
+            if path != self.cwd and posixpath.dirname(path) == self.cwd:
+                entries.append("drwxr-xr-x 1 user group 0 Jan 01 00:00 %s" % \
+                               posixpath.basename(path))
+        for path in sorted(server.files):
+            if posixpath.dirname(path) == self.cwd:
+                entries.append("-rw-r--r-- 1 user group %d Jan 01 00:00 %s" % \
+                               (len(server.files[path]),
+                                posixpath.basename(path)))
+        data = ''.join([ entry + '\r\n' for entry in entries ])
+        self.Transfer(lambda conn: conn.sendall(data))
+
+    def DoMKD(self, arg):
+        path = self.Path(arg)
+        self.server.dirs.add(path)
+        self.Reply('257 "%s" created' % path)
+
+    def DoNOOP(self, arg):
+        self.Reply('200 NOOP ok')
+
+    def DoPASS(self, arg):
+        self.server.Count('LOGIN')
+        self.Reply('230 Logged in')
+
+    def DoPASV(self, arg):
+        if self.pasv is not None:
+            self.pasv.close()
+        self.pasv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.pasv.bind(('127.0.0.1', 0))
+        self.pasv.listen(1)
+        port = self.pasv.getsockname()[1]
+        self.Reply('227 Entering Passive Mode (127,0,0,1,%d,%d)' % \
+                   (port >> 8, port & 0xff))
+
+    def DoPWD(self, arg):
+        self.Reply('257 "%s" is the current directory' % self.cwd)
+
+    def DoQUIT(self, arg):
+        self.Reply('221 Goodbye')
+        return True
+
+    def DoRETR(self, arg):
+        path = self.Path(arg)
+        if path not in self.server.files:
+            self.Reply('550 No such file')
+            return
+        data = self.server.files[path]
+        if not self.binary:
+            data = data.replace('\n', '\r\n')
+        self.Transfer(lambda conn: conn.sendall(data))
+
+    def DoRNFR(self, arg):
+        self.rnfr = self.Path(arg)
+        self.Reply('350 Ready for RNTO')
+
+    def DoRNTO(self, arg):
+        files = self.server.files
+        if self.rnfr in files:
+            files[self.Path(arg)] = files.pop(self.rnfr)
+            self.Reply('250 Renamed')
+        else:
+            self.Reply('550 No such file')
+        self.rnfr = None
+
+    def DoSIZE(self, arg):
+        path = self.Path(arg)
+        if self.binary and path in self.server.files:
+            self.Reply('213 %d' % len(self.server.files[path]))
+        else:
+            self.Reply('550 Could not get file size')
+
+    def DoSTOR(self, arg):
+        path = self.Path(arg)
+        def Receive(conn):
+            data = list()
+            while True:
+                block = conn.recv(65536)
+                if not block:
+                    break
+                data.append(block)
+            data = ''.join(data)
+            if not self.binary:
+                data = data.replace('\r\n', '\n')
+            self.server.files[path] = data
+        self.Transfer(Receive)
+
+    def DoTYPE(self, arg):
+        self.binary = arg.upper().startswith('I')
+        self.Reply('200 Type set to %s' % arg)
+
+    def DoUSER(self, arg):
+        self.Reply('331 Password required')
+
+#-----------------------------------------------------------------------------#
+
+class FtpServer(SocketServer.ThreadingTCPServer):
+    """Ftp server on a free local port"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, delay=0):
+        """Create the server
+        @keyword delay: seconds to wait before each reply
+
+        """
+        SocketServer.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0),
+                                                 FtpHandler)
+
+        # Attributes
+        self.delay = delay
+        self.files = dict()     # path -> data
+        self.dirs = set([u'/'])
+        self.counts = dict()    # command -> number received
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def Count(self, cmd):
+        """Count a command"""
+        self._lock.acquire()
+        self.counts[cmd] = self.counts.get(cmd, 0) + 1
+        self._lock.release()
+
+    def GetCount(self, cmd):
+        """Get the number of times a command was received
+        @return: int
+
+        """
+        return self.counts.get(cmd, 0)
+
+    def GetPort(self):
+        """Get the port the server is listening on
+        @return: int
+
+        """
+        return self.server_address[1]
+
+    def Start(self):
+        """Start serving on a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        kwargs=dict(poll_interval=0.05))
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def Stop(self):
+        """Stop the server"""
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
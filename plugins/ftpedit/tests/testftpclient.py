@@ -0,0 +1,218 @@
+###############################################################################
+# Name: testftpclient.py                                                      #
+# Purpose: Unittest for ftpclient.py                                          #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import unittest
+import tempfile
+import threading
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('../ftpedit'))
+
+import ftpclient
+import ftpserver
+
+#-----------------------------------------------------------------------------#
+
+class FtpTestBase(unittest.TestCase):
+    def setUp(self):
+        self.server = ftpserver.FtpServer()
+        self.server.Start()
+        self.port = self.server.GetPort()
+        ftpclient.ListCache.Invalidate()
+
+        fid, self.path = tempfile.mkstemp()
+        os.close(fid)
+
+    def tearDown(self):
+        self.server.Stop()
+        os.remove(self.path)
+
+    def Connect(self):
+        client = ftpclient.FtpClient(None)
+        client.SetHostname(u"127.0.0.1")
+        client.SetPort(self.port)
+        self.assertTrue(client.Connect(u"user", u"pass"))
+        return client
+
+class TestFtpClient(FtpTestBase):
+    def testTransfer(self):
+        """Test binary transfers with progress"""
+        data = "line 1\r\nline 2\n\x00\xff" * 20000
+        handle = open(self.path, 'wb')
+        handle.write(data)
+        handle.close()
+
+        client = self.Connect()
+        progress = list()
+        self.assertTrue(client.Upload(self.path, u"/file.txt",
+                                      lambda *args: progress.append(args)))
+        self.assertEquals(self.server.files[u"/file.txt"], data)
+        self.assertEquals(progress[-1], (len(data), len(data)))
+        self.assertEquals(len(progress),
+                          len(data) / ftpclient.BLOCK_SIZE + 1)
+
+        del progress[:]
+        ftppath, path = client.Download(u"file.txt",
+                                        lambda *args: progress.append(args))
+        try:
+            self.assertEquals(ftppath, u"//file.txt")
+            self.assertEquals(open(path, 'rb').read(), data)
+            self.assertEquals(progress[-1], (len(data), len(data)))
+        finally:
+            os.remove(path)
+        client.Disconnect()
+
+    def testListCache(self):
+        """Test caching the directory listings"""
+        self.server.files[u"/a.txt"] = "abc"
+        client = self.Connect()
+        files = client.GetFileList()
+        self.assertEquals([ item['name'] for item in files ],
+                          [u"..", u"a.txt"])
+        self.assertEquals(client.GetFileList(), files)
+        self.assertEquals(self.server.GetCount('LIST'), 1)
+
+        # Changes made by the client invalidate the listing
+        self.assertTrue(client.NewFile(u"b.txt"))
+        self.assertEquals(len(client.GetFileList()), 3)
+        self.assertEquals(self.server.GetCount('LIST'), 2)
+
+        # Listings expire and can be refreshed
+        client.GetFileList(refresh=True)
+        self.assertEquals(self.server.GetCount('LIST'), 3)
+        ftpclient.ListCache.SetTTL(0)
+        try:
+            client.GetFileList()
+            self.assertEquals(self.server.GetCount('LIST'), 4)
+        finally:
+            ftpclient.ListCache.SetTTL(ftpclient.LIST_TTL)
+        client.Disconnect()
+
+class TestConnectionPool(FtpTestBase):
+    def setUp(self):
+        FtpTestBase.setUp(self)
+        self.pool = ftpclient.FtpConnectionPool()
+
+    def tearDown(self):
+        self.pool.CloseAll()
+        FtpTestBase.tearDown(self)
+
+    def Acquire(self):
+        return self.pool.Acquire(u"127.0.0.1", self.port, u"user", u"pass")
+
+    def testReuse(self):
+        """Test reusing the connections to a site"""
+        client = self.Acquire()
+        self.assertTrue(client.IsActive())
+        self.assertTrue(client.Upload(self.path, u"/one.txt"))
+        self.pool.Release(client)
+        self.assertEquals(self.pool.GetIdleCount(), 1)
+
+        client2 = self.Acquire()
+        self.assertTrue(client2 is client)
+        self.assertTrue(client2.Upload(self.path, u"/two.txt"))
+        self.assertEquals(self.server.GetCount('LOGIN'), 1)
+
+        # Other credentials get their own connection
+        client3 = self.pool.Acquire(u"127.0.0.1", self.port, u"other", u"pw")
+        self.assertFalse(client3 is client)
+        self.pool.Release(client3)
+        self.pool.Release(client2)
+        self.assertEquals(self.pool.GetIdleCount(), 2)
+
+        self.pool.CloseSite(u"127.0.0.1", self.port)
+        self.assertEquals(self.pool.GetIdleCount(), 0)
+        self.assertEquals(self.server.GetCount('QUIT'), 2)
+
+    def testKeepAlive(self):
+        """Test keeping the idle connections alive"""
+        self.pool.Release(self.Acquire())
+        self.pool.SetKeepAlive(0)
+        self.pool.KeepAlive()
+        self.assertEquals(self.server.GetCount('NOOP'), 1)
+        self.assertEquals(self.pool.GetIdleCount(), 1)
+
+        # Unused connections are closed after the timeout
+        self.pool.SetTimeout(0)
+        self.pool.KeepAlive()
+        self.assertEquals(self.pool.GetIdleCount(), 0)
+
+        # Lost connections are replaced
+        self.pool.SetTimeout(ftpclient.MAX_IDLE)
+        client = self.Acquire()
+        self.pool.Release(client)
+        client.sock.close()
+        client2 = self.Acquire()
+        self.assertFalse(client2 is client)
+        self.assertTrue(client2.IsActive())
+        self.assertEquals(self.server.GetCount('LOGIN'), 3)
+        self.pool.Release(client2)
+
+class TestFtpWorker(unittest.TestCase):
+    def testJobs(self):
+        """Test running the jobs in order on one thread"""
+        done = threading.Event()
+        results = list()
+        def Job(idx):
+            results.append((idx, threading.currentThread()))
+            if idx == 9:
+                done.set()
+
+        for idx in range(10):
+            ftpclient.PostJob(None, Job, None, args=[idx,])
+        done.wait(5)
+        self.assertEquals([ idx for idx, thread in results ], range(10))
+        self.assertEquals(len(set([ thread for idx, thread in results ])), 1)
+        self.assertFalse(results[0][1] is threading.currentThread())
+
+    def testFailedJob(self):
+        """Test notifying the parent of a job that raised an exception"""
+        done = threading.Event()
+        events = list()
+        def PostEvent(parent, evt):
+            events.append((parent, evt))
+            done.set()
+
+        parent = object()
+        client = ftpclient.FtpClient(None)
+        postevent = ftpclient.wx.PostEvent
+        ftpclient.wx.PostEvent = PostEvent
+        try:
+            # Download raises when the client is not connected
+            ftpclient.PostJob(parent, client.Download,
+                              ftpclient.edEVT_FTP_DOWNLOAD, args=[u"a.txt",])
+            done.wait(5)
+        finally:
+            ftpclient.wx.PostEvent = postevent
+        self.assertEquals(len(events), 1)
+        self.assertTrue(events[0][0] is parent)
+        self.assertEquals(events[0][1].GetValue(), (u"a.txt", None))
+        self.assertTrue(isinstance(client.GetLastError(),
+                                   ftpclient.FtpClientNotConnected))
+
+    def testFailedNotify(self):
+        """Test that the worker keeps running when notifying a parent fails"""
+        done = threading.Event()
+        def Job():
+            pass # Not a client method so the notification fails
+
+        ftpclient.PostJob(object(), Job, ftpclient.edEVT_FTP_DOWNLOAD)
+        ftpclient.PostJob(None, done.set, None)
+        done.wait(5)
+        self.assertTrue(done.isSet())
+
+#-----------------------------------------------------------------------------#
+if __name__ == '__main__':
+    unittest.main()
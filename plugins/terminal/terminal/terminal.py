@@ -32,24 +32,23 @@ __revision__ = "$Revision: 669 $"
 import sys
 import os
 import signal
-#import threading
+import locale
 import re
 import time
 import wx
 import wx.stc
 
+# Local Imports
+import vtscreen
+
 # On windows need to use pipes as pty's are not available
 try:
     if sys.platform == 'win32':
         import popen2
-        import stat
-        import msvcrt
-        import ctypes
         USE_PTY = False
     else:
         import pty
         import tty
-        import select
         USE_PTY = True
 except ImportError, msg:
     print "[terminal] Error importing required libs: %s" % str(msg)
@@ -60,14 +59,19 @@ except ImportError, msg:
 #---- Variables ----#
 DEBUG = True
 MAX_HIST = 50       # Max command history to save
+SCROLLBACK = 5000   # Max lines of output to keep
+FRAME_DELAY = 33    # Milliseconds between screen updates
+FRAME_READ = 262144 # Max bytes of output to process in one screen update
 
 if sys.platform == 'win32':
     SHELL = 'cmd.exe'
+    ENCODING = locale.getpreferredencoding() or 'utf-8'
 else:
     if 'SHELL' in os.environ:
         SHELL = os.environ['SHELL']
     else:
         SHELL = '/bin/sh'
+    ENCODING = 'utf-8'
 #---- End Variables ----#
 
 #---- Callables ----#
@@ -75,61 +79,13 @@ _ = wx.GetTranslation
 
 #---- End Callables ----#
 
-#---- ANSI color code support ----#
-# ANSI_FORE_BLACK   = 1
-# ANSI_FORE_RED     = 2
-# ANSI_FORE_GREEN   = 3
-# ANSI_FORE_YELLOW  = 4
-# ANSI_FORE_BLUE    = 5
-# ANSI_FORE_MAGENTA = 6
-# ANSI_FORE_CYAN    = 7
-# ANSI_FORE_WHITE   = 8
-
-# ANSI_BACK_BLACK
-# ANSI_BACK_RED
-# ANSI_BACK_GREEN
-# ANSI_BACK_YELLOW
-# ANSI_BACK_BLUE
-# ANSI_BACK_MAGENTA
-# ANSI_BACK_CYAN
-# ANSI_BACK_WHITE
-
-ANSI = {
-        ## Forground colours ##
-        '[30m' : (1, '#000000'),
-        '[31m' : (2, '#FF0000'),
-        '[32m' : (3, '#00FF00'),
-        '[33m' : (4, '#FFFF00'),  # Yellow
-        '[34m' : (5, '#0000FF'),
-        '[35m' : (6, '#FF00FF'),
-        '[36m' : (7, '#00FFFF'),
-        '[37m' : (8, '#FFFFFF'),
-        #'[39m' : default
-
-        ## Background colour ##
-        '[40m' : (011, '#000000'),  # Black
-        '[41m' : (012, '#FF0000'),  # Red
-        '[42m' : (013, '#00FF00'),  # Green
-        '[43m' : (014, '#FFFF00'),  # Yellow
-        '[44m' : (015, '#0000FF'),  # Blue
-        '[45m' : (016, '#FF00FF'),  # Magenta
-        '[46m' : (017, '#00FFFF'),  # Cyan
-        '[47m' : (020, '#FFFFFF'),  # White
-        #'[49m' : default
-        }
-
-RE_COLOUR_START = re.compile('\[[34][0-9]m')
-RE_COLOUR_FORE = re.compile('\[3[0-9]m')
-RE_COLOUR_BLOCK = re.compile('\[[34][0-9]m*.*?\[m')
-RE_COLOUR_END = '[m'
-RE_CLEAR_ESC = re.compile('\[[0-9]+m')
-#---- End ANSI Colour Support ----#
-
 #---- Font Settings ----#
 # TODO make configurable from interface
 FONT = None
 FONT_FACE = None
 FONT_SIZE = None
+FORE = "#FFFFFF" #"#000000"
+BACK = "#000000" #"#DBE0C4"
 #----- End Font Settings ----#
 
 #-----------------------------------------------------------------------------#
@@ -153,16 +109,22 @@ class Xterm(wx.stc.StyledTextCtrl):
         self._setspecs = [0]
         self._history = dict(cmds=[''], index=-1, lastexe='')  # Command history
         self._menu = None
+        self._screen = vtscreen.VtScreen(SCROLLBACK, encoding=ENCODING)
+        self._screen.SetLineFeedMode(not USE_PTY)
+        self._readers = list()
+        self._frame = wx.Timer(self)
 
         # Setup
         self.__Configure()
         self.__ConfigureStyles()
         self.__ConfigureKeyCmds()
         self._SetupPTY()
+        self._StartReaders()
 
         #---- Event Handlers ----#
         # General Events
-        self.Bind(wx.EVT_IDLE, self.OnIdle)
+        self.Bind(wx.EVT_TIMER, lambda evt: self.Read(), self._frame)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.OnDestroy)
 
         # Stc events
         self.Bind(wx.stc.EVT_STC_DO_DROP, self.OnDrop)
@@ -217,6 +179,7 @@ class Xterm(wx.stc.StyledTextCtrl):
         self.SetUseTabs(False)
         self.SetWrapMode(True)
         self.SetEndAtLastLine(False)
+        self.SetUndoCollection(False)
         self.SetVisiblePolicy(1, wx.stc.STC_VISIBLE_STRICT)
 
     def __ConfigureStyles(self):
@@ -235,8 +198,8 @@ class Xterm(wx.stc.StyledTextCtrl):
 
         # Configure text styles
         # TODO make this configurable
-        fore = "#FFFFFF" #"#000000"
-        back = "#000000" #"#DBE0C4"
+        fore = FORE
+        back = BACK
         global FONT
         global FONT_SIZE
         global FONT_FACE
@@ -255,49 +218,52 @@ class Xterm(wx.stc.StyledTextCtrl):
         self.Colourise(0, -1)
 
     #---- Protected Members ----#
-    def _ApplyStyles(self, data):
-        """Apply style bytes to regions of text that require them, starting
-        at self._fpos and using the postional data as on offset from that point.
-
-        @param data: list of tuples [ (style_start, colour, style_end) ]
+    def _ApplyUpdate(self, update):
+        """Copy the lines that changed in the screen model to the control
+        with one text replacement and one styling call.
+        @param update: tuple from L{vtscreen.VtScreen.TakeUpdate}
 
         """
-        spec = 0
-        for pos in data:
-            if len(pos[1]) > 1:
-                spec = ANSI[pos[1][1]][0] | ANSI[pos[1][0]][0]
-            elif len(pos[1]):
-                spec = ANSI[pos[1][0]][0]
-            else:
-                pass
-
-            if spec not in self._setspecs:
-                DebugLog("[terminal][styles] Setting Spec: %d" % spec)
-                self._setspecs.append(spec)
-                if len(pos[1]) > 1:
-                    if RE_COLOUR_FORE.match(pos[1][0]):
-                        fore = ANSI[pos[1][0]][1]
-                        back = ANSI[pos[1][1]][1]
-                    else:
-                        fore = ANSI[pos[1][1]][1]
-                        back = ANSI[pos[1][0]][1]
-
-                    self.StyleSetSpec(spec, 
-                                      "fore:%s,back:%s,face:%s,size:%d" % \
-                                      (fore, back, FONT_FACE, FONT_SIZE))
-                else:
-                    self.StyleSetSpec(spec, 
-                                      "fore:%s,back:#000000,face:%s,size:%d" % \
-                                     (ANSI[pos[1][0]][1], FONT_FACE, FONT_SIZE))
+        trimmed, first, nlines, text, styles = update
+        readonly = self.GetReadOnly()
+        self.SetReadOnly(False)
 
-            # Adjust styling start position if necessary
-            spos = self._fpos + pos[0]
-            if unichr(self.GetCharAt(spos)).isspace():
-                spos += 1
+        # Take out the input that has not been sent to the shell yet
+        pending = self.GetTextRange(self._fpos, self.GetLength())
+        self.SetTargetStart(self._fpos)
+        self.SetTargetEnd(self.GetLength())
+        self.ReplaceTarget(u'')
+
+        # Remove the lines that were dropped from the scrollback
+        if trimmed >= self.GetLineCount():
+            self.ClearAll()
+        elif trimmed:
+            self.SetTargetStart(0)
+            self.SetTargetEnd(self.PositionFromLine(trimmed))
+            self.ReplaceTarget(u'')
+
+        # Replace the lines from the first changed one on
+        if first < self.GetLineCount():
+            start = self.PositionFromLine(first)
+        else:
+            start = self.GetLength()
+            if nlines:
+                text = u'\n' + text
+                styles = chr(0) + styles
+        self.SetTargetStart(start)
+        self.SetTargetEnd(self.GetLength())
+        self.ReplaceTarget(text)
+
+        for style in set(styles):
+            self._SetStyle(ord(style))
+        self.StartStyling(start, 0xff)
+        self.SetStyleBytes(len(styles), styles)
 
-            # Set style bytes for a given region
-            self.StartStyling(spos, 0xff)
-            self.SetStyling(pos[2] - pos[0] + 1, spec)
+        self._fpos = self.GetLength()
+        if len(pending):
+            self.AppendText(pending)
+        self.GotoPos(self.GetLength())
+        self.SetReadOnly(readonly)
 
     def _CheckAfterExe(self):
         """Check std out for anything left after an execution"""
@@ -311,6 +277,10 @@ class Xterm(wx.stc.StyledTextCtrl):
             DebugLog("[terminal][exit] Already exited")
             return
 
+        self._frame.Stop()
+        for reader in self._readers:
+            reader.Stop()
+
         try:
             DebugLog("[terminal][exit] Closing FD and killing process")
             if not USE_PTY:
@@ -325,21 +295,23 @@ class Xterm(wx.stc.StyledTextCtrl):
         except Exception, msg:
             DebugLog("[terminal][err] %s" % str(msg))
 
+        self._exited = True
         DebugLog("[terminal][cleanup] Finished Cleanup")
 
-    def _EndRead(self, any_lines_read):
-        """Finish up after reading"""
-        # Mark earliest valid cursor position in buffer
-        self._fpos = self.GetCurrentPos()
-        if (not USE_PTY and any_lines_read):
-            self.LineDelete()
-            DebugLog("[terminal][endread] Deleted trailing line")
-            self._fpos = self.GetCurrentPos()
+    def _CommitInput(self):
+        """Take the input typed at the prompt out of the control. Echo is
+        turned off in the pty so the input is moved in to the screen model,
+        on Windows the shell echoes the command back in its output.
+        @return: the input text
 
-        DebugLog("[terminal][info] Set valid cursor to > %d" % self._fpos)
-        self.PrintPrompt()
-        self.EnsureCaretVisible()
-        self.EnsureVisibleEnforcePolicy(self.GetCurrentLine())
+        """
+        cmd = self.GetTextRange(self._fpos, self.GetLength())
+        self.SetTargetStart(self._fpos)
+        self.SetTargetEnd(self.GetLength())
+        self.ReplaceTarget(u'')
+        if USE_PTY:
+            self._screen.Write(cmd.rstrip(u'\r\n') + u'\r\n')
+        return cmd
 
     def _HandleExit(self, cmd):
         """Handle closing the shell connection"""
@@ -359,34 +331,17 @@ class Xterm(wx.stc.StyledTextCtrl):
                 DebugLog("[terminal][exit] Shell Exited is: " + str(self._exited))
                 self.ExitShell()
 
-    def _ProcessRead(self, lines):
-        """Process the raw lines from stdout"""
-        DebugLog("[terminal][info] Processing Read...")
-        lines_to_print = lines.split(os.linesep)
-
-        #  Filter out invalid blank lines from begining/end input
-        if sys.platform == 'win32':
-            m = re.search(re.escape(self._history['lastexe'].strip()), 
-                                    lines_to_print[0])
-            if m != None or lines_to_print[0] == "":
-                DebugLog('[terminal][info] Win32, removing leading blank line')
-                lines_to_print = lines_to_print[ 1: ]
-
-        # Check for extra blank line at end
-        num_lines = len(lines_to_print)
-        if num_lines > 1:
-            last_line = lines_to_print[num_lines - 1].strip()
-
-            if last_line == "":
-                lines_to_print = lines_to_print[ :-1 ]
+    def _NotifyOutput(self):
+        """Called by the readers when there is output, schedules a screen
+        update on the main thread.
 
-        # Look on StdErr for any error output
-        errors = self.CheckStdErr()
-        if errors:
-            DebugLog("[terminal][err] Process Read stderr --> " + '\n'.join(errors))
-            lines_to_print = errors + lines_to_print
+        """
+        wx.CallAfter(self._ScheduleUpdate)
 
-        return lines_to_print
+    def _ScheduleUpdate(self):
+        """Start the timer for the next screen update"""
+        if self and not self._frame.IsRunning():
+            self._frame.Start(FRAME_DELAY, True)
 
     def _SetupPTY(self):
         """Setup the connection to the real terminal"""
@@ -453,6 +408,32 @@ class Xterm(wx.stc.StyledTextCtrl):
             self.intr_key = ''
             self.eof_key  = ''
 
+    def _SetStyle(self, style):
+        """Define a text style of the screen model in the control
+        @param style: style id
+
+        """
+        if style not in self._setspecs:
+            DebugLog("[terminal][styles] Setting Spec: %d" % style)
+            self._setspecs.append(style)
+            fore, back, bold = self._screen.GetStyleColours(style, FORE, BACK)
+            spec = "fore:%s,back:%s,face:%s,size:%d" % \
+                   (fore, back, FONT_FACE, FONT_SIZE)
+            if bold:
+                spec += ",bold"
+            self.StyleSetSpec(style, spec)
+
+    def _StartReaders(self):
+        """Start reading the output of the shell on background threads"""
+        fds = [self.outd]
+        if self.errd != self.outd:
+            fds.append(self.errd)
+
+        for fd in fds:
+            reader = vtscreen.PtyReader(fd, self._NotifyOutput)
+            reader.start()
+            self._readers.append(reader)
+
     def _SigChildHandler(self, sig, frame):
         """Child process signal handler"""
         DebugLog("[terminal][info] caught SIGCHLD")
@@ -508,27 +489,12 @@ class Xterm(wx.stc.StyledTextCtrl):
                 # send the password to the 
 #                 self.ExecuteCmd([password])
 
-    def CheckStdErr(self):
-        """Check for errors in the shell"""
-        errors  = ''
-        if sys.platform == 'win32':
-            err_txt  = self.PipeRead(self.errd, 0)
-            errors   = err_txt.split(os.linesep)
-
-            num_lines = len(errors)
-            last_line = errors[num_lines - 1].strip()
-
-            if last_line == "":
-                errors = errors[:-1]
-
-        return errors
-
     def ClearScreen(self):
         """Clear the screen so that all commands are scrolled out of
         view and a new prompt is shown on the top of the screen.
 
         """
-        self.AppendText(os.linesep * 5)
+        self._screen.Write(u"\r\n" * 5)
         self.Write(os.linesep)
         self._CheckAfterExe()
         self.Freeze()
@@ -547,10 +513,7 @@ class Xterm(wx.stc.StyledTextCtrl):
         try:
             # Get text from prompt to eol when no command is given
             if cmd is None:
-                cmd = self.GetTextRange(self._fpos, self.GetLength())
-
-            # Move output position past input command
-            self._fpos = self.GetLength()
+                cmd = self._CommitInput()
 
             # Process command
             if len(cmd) and cmd[-1] != '\t':
@@ -585,6 +548,7 @@ class Xterm(wx.stc.StyledTextCtrl):
             self._CleanUp()
 
         self.PrintLines(["[process complete]" + os.linesep,])
+        self.Read()
         self.SetReadOnly(True)
 
     def GetNextCommand(self):
@@ -635,16 +599,17 @@ class Xterm(wx.stc.StyledTextCtrl):
         print "HELLO", self._menu
         self.PopupMenu(self._menu)
 
+    def OnDestroy(self, evt):
+        """Stop reading the output when the control is destroyed"""
+        if self and evt.GetEventObject() is self:
+            self._CleanUp()
+        evt.Skip()
+
     def OnDrop(self, evt):
         """Handle drop events"""
         if evt.GetPosition() < self._fpos:
             evt.SetDragResult(wx.DragCancel)
 
-    def OnIdle(self, evt):
-        """While idle check for more output"""
-        if not self._exited:
-            self.Read()
-
     def OnKeyDown(self, evt):
         """Handle key down events"""
         if self._exited:
@@ -723,62 +688,16 @@ class Xterm(wx.stc.StyledTextCtrl):
             evt.Skip()
 
     def PrintLines(self, lines):
-        """Print lines to the terminal buffer
+        """Print lines to the terminal buffer, each one starts on a new
+        line.
         @param lines: list of strings
 
         """
-        if len(lines) and lines[0].strip() == self._history['lastexe'] .strip():
-            lines.pop(0)
-
         for line in lines:
             DebugLog("[terminal][print] Current line is --> %s" % line)
-            m = False
-            if len(line) > 2 and "\r" in line[-2:]:
-                line = line.rstrip()
-                m = True
-
-            # Parse ANSI escape sequences
-            need_style = False
-            if r'' in line:
-                DebugLog('[terminal][print] found ansi escape sequence(s)')
-                # Construct a list of [ (style_start, (colours), style_end) ]
-                # where the start end positions are offsets of the curent _fpos
-                c_items = re.findall(RE_COLOUR_BLOCK, line)
-                tmp = line
-                positions = list()
-                for pat in c_items:
-                    ind = tmp.find(pat)
-                    colors = re.findall(RE_COLOUR_START, pat)
-                    tpat = pat
-                    for color in colors:
-                        tpat = tpat.replace(color, '')
-                    tpat = tpat.replace(RE_COLOUR_END, '')
-                    tmp = tmp.replace(pat, tpat, 1).replace(RE_COLOUR_END, '', 1)
-                    positions.append((ind, colors, (ind + len(tpat) - 1)))
-
-                # Try to remove any remaining escape sequences
-                line = tmp.replace(RE_COLOUR_END, '')
-                line = re.sub(RE_COLOUR_START, '', line)
-                line = re.sub(RE_CLEAR_ESC, '', line)
-                
-                need_style = True
-
-            # Put text in buffer
-            self.AppendText(line)
-
-            # Apply any colouring that is needed
-            if need_style:
-                DebugLog('[terminal][print] applying styles to output string')
-                self._ApplyStyles(positions)
-
-            # Move cursor to end of buffer
-            self._fpos = self.GetLength()
-            self.GotoPos(self._fpos)
-
-            ##  If there's a '\n' or using pipes and it's not the last line
-            if not USE_PTY or m:
-                DebugLog("[terminal][print] Appending new line since ^M or not using pty")
-                self.AppendText(os.linesep)
+            if self._screen.GetCursor()[1]:
+                self._screen.Write(u"\r\n")
+            self._screen.Write(line.rstrip(u"\r\n") + u"\r\n")
 
     def PrintPrompt(self):
         """Construct a windows prompt and print it to the screen.
@@ -796,107 +715,41 @@ class Xterm(wx.stc.StyledTextCtrl):
                 except:
                     pass
 
-            self.AppendText(u"%s>" % os.getcwd())
-            self._fpos = self.GetLength()
-            self.GotoPos(self._fpos)
-            self.EnsureCaretVisible()
-
-    def PipeRead(self, pipe, minimum_to_read):
-        """Read from pipe, used on Windows. This is needed because select
-        can only be used with sockets on Windows and not with any other type
-        of file descriptor.
-        @param pipe: Pipe to read from
-        @param minimum_to_read: minimum bytes to read at one time
-
-        """
-        DebugLog("[terminal][pipe] minimum to read is " + str(minimum_to_read))
-
-        time.sleep(self.delay)
-        data = u''
-
-        # Take a peek to see if any output is available
-        try:
-            handle = msvcrt.get_osfhandle(pipe)
-            avail = ctypes.c_long()
-            ctypes.windll.kernel32.PeekNamedPipe(handle, None, 0, 0,
-                                                 ctypes.byref(avail), None)
-        except IOError, msg:
-            DebugLog("[terminal][err] Pipe read failed: %s" % msg)
-            return data
-
-        count = avail.value
-        DebugLog("[terminal][pipe] PeekNamedPipe is " + str(count))
-
-        # If there is some output start reading it
-        while (count > 0):
-            tmp = os.read(pipe, 32)
-            data += tmp
-
-            if len(tmp) == 0:
-                DebugLog("[terminal][pipe] count %s but nothing read" % str(count))
-                break
-
-            #  Be sure to break the read, if asked to do so,
-            #  after we've read in a line termination.
-            if minimum_to_read != 0 and len(data) > 0 and data[len(data) - 1] == os.linesep:
-                if len(data) >= minimum_to_read:
-                    DebugLog("[terminal][pipe] read minimum and found termination")
-                    break
-                else:
-                    DebugLog("[terminal][pipe] more data to read: count is " + str(count))
-
-            # Check for more output
-            avail = ctypes.c_long()
-            ctypes.windll.kernel32.PeekNamedPipe(handle, None, 0, 0,
-                                             ctypes.byref(avail), None)
-            count = avail.value
-
-        return data
+            self._screen.Write(u"%s>" % os.getcwd())
 
     def Read(self):
-        """Read output from stdin"""
-        if self._exited:
-            return
-
-        num_iterations = 0  #  counter for periodic redraw
-        any_lines_read = 0  #  sentinel for reading anything at all
-
-        lines = ''
-        while 1:
-            if USE_PTY:
-                try:
-                    r = select.select([self.outd], [], [], self.delay)[0]
-                except select.error, msg:
-                    DebugLog("[terminal][err] Select failed: %s" % str(msg))
-                    r = [1, ]
-            else:
-                r = [1, ]  # pipes, unused
+        """Process the output collected by the reader threads and update
+        the screen. At most L{FRAME_READ} bytes of output are processed at a
+        time, if there is more another update is scheduled.
 
-            for file_iter in r:
-                if USE_PTY:
-                    tmp = os.read(self.outd, 32)
-                else:
-                    tmp = self.PipeRead(self.outd, 2048)
-
-                lines += tmp
-                if tmp == '':
-                    DebugLog('[terminal][read] No more data on stdout Read')
-                    r = []
-                    break
-
-                any_lines_read  = 1 
-                num_iterations += 1
-
-            if not len(r) and len(lines):
-                DebugLog('[terminal][read] End of Read, starting processing and printing' )
-                lines = self._ProcessRead(lines)
-                self.PrintLines(lines)
-                self._EndRead(any_lines_read)
-                break
-            elif not any_lines_read and not num_iterations:
-                break
-            else:
-                pass
+        """
+        read = False
+        for reader in self._readers:
+            data = reader.GetOutput(FRAME_READ)
+            if len(data):
+                self._screen.Feed(data)
+                read = True
+
+        pending = [ reader for reader in self._readers if reader.HasOutput() ]
+        if read and not len(pending):
+            self.PrintPrompt()
+
+        for reply in self._screen.TakeReplies():
+            self.Write(reply)
+
+        update = self._screen.TakeUpdate()
+        if update is not None:
+            self._ApplyUpdate(update)
+            self.EnsureCaretVisible()
+            self.EnsureVisibleEnforcePolicy(self.GetCurrentLine())
+
+        if len(pending):
+            self._ScheduleUpdate()
+        elif not self._exited and len(self._readers) and \
+             not len([ reader for reader in self._readers
+                       if not reader.IsFinished() ]):
+            DebugLog("[terminal][read] End of output, shell has exited")
+            self.ExitShell()
 
     def SetCommand(self, cmd):
         """Set the command that is shown at the current prompt
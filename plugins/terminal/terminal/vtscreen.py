@@ -0,0 +1,736 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+# Name: vtscreen.py                                                           #
+# Purpose: Terminal output reader and screen model                            #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+The parts of the terminal that don't need the ui. L{PtyReader} reads the
+output of the shell process on a background thread in large blocks,
+L{VtScreen} runs the output through an escape sequence state machine and
+applies it to a line based screen model with a capped scrollback. The
+terminal control takes the lines that changed from the screen model with
+their style bytes in one update per frame.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import re
+import sys
+import codecs
+import select
+import threading
+
+#-----------------------------------------------------------------------------#
+# Globals
+
+READ_SIZE = 65536       # Bytes to read from the pty at a time
+MAX_BUFFER = 1048576    # Bytes to buffer before waiting for the ui
+MAX_STYLES = 32         # Style ids 0-31, the control predefines 32 and up
+
+# Parser states
+STATE_GROUND = 0
+STATE_ESCAPE = 1
+STATE_CSI = 2
+STATE_OSC = 3
+STATE_OSC_ESC = 4
+STATE_CHARSET = 5
+
+MAX_OSC = 1024          # Longest operating system command string kept
+
+# ANSI colours 0-7 and their bright variants 8-15
+PALETTE = ('#000000', '#CD0000', '#00CD00', '#CDCD00',
+           '#0000EE', '#CD00CD', '#00CDCD', '#E5E5E5',
+           '#7F7F7F', '#FF0000', '#00FF00', '#FFFF00',
+           '#5C5CFF', '#FF00FF', '#00FFFF', '#FFFFFF')
+
+RE_CONTROL = re.compile(u'[\x00-\x1f\x7f]')
+RE_CSI = re.compile(u'\\[([\x30-\x3f]*)[\x20-\x2f]*([\x40-\x7e])')
+
+#-----------------------------------------------------------------------------#
+
+class PtyReader(threading.Thread):
+    """Reads the output of the shell process on a background thread. The
+    output is collected until the ui takes it with L{GetOutput}, reading
+    stops while more than the buffer limit is waiting so that a fast
+    producer is held back by the pty instead of filling up memory.
+
+    """
+    def __init__(self, fd, notify=None, chunk=READ_SIZE, limit=MAX_BUFFER):
+        """Create the reader
+        @param fd: file descriptor to read
+        @keyword notify: callable() called from the reader thread when output
+                         is available and when the end of the output is
+                         reached.
+        @keyword chunk: number of bytes to read at a time
+        @keyword limit: number of bytes to buffer at most
+
+        """
+        super(PtyReader, self).__init__()
+
+        # Attributes
+        self.daemon = True
+        self._fd = fd
+        self._notify = notify
+        self._chunk = chunk
+        self._limit = limit
+        self._buffer = list()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._abort = False
+        self._eof = False
+
+    def _Read(self):
+        """Read the next block of output
+        @return: string ('' at the end of the output) or None on timeout
+
+        """
+        if sys.platform != 'win32':
+            # Wait with a timeout so that the reader can be stopped
+            ready = select.select([self._fd], [], [], 0.1)[0]
+            if not ready:
+                return None
+        return os.read(self._fd, self._chunk)
+
+    def run(self):
+        while not self._abort:
+            self._cond.acquire()
+            try:
+                while self._size >= self._limit and not self._abort:
+                    self._cond.wait(0.1)
+            finally:
+                self._cond.release()
+
+            try:
+                data = self._Read()
+            except (OSError, IOError, select.error, ValueError):
+                # EIO is raised when the slave side of the pty is closed
+                data = ''
+
+            if data is None:
+                continue
+            elif not data or self._abort:
+                break
+
+            self._cond.acquire()
+            try:
+                notify = not self._size
+                self._buffer.append(data)
+                self._size += len(data)
+            finally:
+                self._cond.release()
+
+            if notify and self._notify is not None:
+                self._notify()
+
+        self._eof = True
+        if self._notify is not None:
+            self._notify()
+
+    def GetOutput(self, limit=None):
+        """Take the output that was read so far
+        @keyword limit: maximum number of bytes to take
+        @return: string
+
+        """
+        self._cond.acquire()
+        try:
+            data = ''.join(self._buffer)
+            if limit is not None and len(data) > limit:
+                self._buffer = [data[limit:]]
+                data = data[:limit]
+            else:
+                self._buffer = list()
+            self._size -= len(data)
+            self._cond.notify()
+        finally:
+            self._cond.release()
+        return data
+
+    def HasOutput(self):
+        """Check if there is output waiting to be taken
+        @return: bool
+
+        """
+        return self._size > 0
+
+    def IsFinished(self):
+        """Check if the end of the output was reached and all of it was
+        taken.
+        @return: bool
+
+        """
+        return self._eof and not self._size
+
+    def Stop(self):
+        """Stop reading, the thread exits within the select timeout"""
+        self._abort = True
+        self._cond.acquire()
+        try:
+            self._cond.notify()
+        finally:
+            self._cond.release()
+
+#-----------------------------------------------------------------------------#
+
+class VtScreen(object):
+    """Screen model of a VT100/xterm style terminal. The output is kept as
+    a list of lines with a style byte for each character. The screen is the
+    last rows of the lines, cursor addressing is relative to it and the lines
+    above it are the scrollback that is limited to a maximum number of lines.
+
+    """
+    def __init__(self, maxlines=5000, rows=24, encoding='utf-8'):
+        """Create the screen
+        @keyword maxlines: number of lines to keep
+        @keyword rows: height of the screen
+        @keyword encoding: encoding of the output
+
+        """
+        super(VtScreen, self).__init__()
+
+        # Attributes
+        self._maxlines = max(rows, maxlines)
+        self._rows = rows
+        self._decoder = codecs.getincrementaldecoder(encoding)('replace')
+        self._lines = [[u'', bytearray()]] # [text, style bytes]
+        self._row = 0
+        self._col = 0
+        self._saved = (0, 0, None)
+        self._lnm = False       # Line feed also returns the carriage
+        self._title = u''
+        self._replies = list()
+
+        # Parser state
+        self._state = STATE_GROUND
+        self._params = u''
+        self._osc = list()
+
+        # Styles
+        self._attrs = [None, None, False, False] # fore, back, bold, reverse
+        self._style = chr(0)
+        self._key = (None, None, False, False)
+        self._styles = { self._key : 0 }
+        self._sgr = dict() # (attributes, params) -> (attributes, style)
+        self._specs = [(None, None, False, False)]
+
+        # Changes since the last update
+        self._dirty = 0
+        self._trimmed = 0
+
+    #---- Screen Operations ----#
+
+    def _Touch(self, row):
+        """Mark a line as changed"""
+        if self._dirty is None or row < self._dirty:
+            self._dirty = row
+
+    def _GetTop(self):
+        """Get the index of the first line of the screen"""
+        return max(0, len(self._lines) - self._rows)
+
+    def _SetRow(self, row):
+        """Move the cursor to a line, adding lines if needed"""
+        row = max(0, row)
+        while row >= len(self._lines):
+            self._lines.append([u'', bytearray()])
+            self._Touch(len(self._lines) - 1)
+        self._row = row
+
+    def _Print(self, text):
+        """Write text at the cursor position"""
+        line = self._lines[self._row]
+        ltext = line[0]
+        col = self._col
+        nchars = len(text)
+        if col == len(ltext):
+            line[0] = ltext + text
+            line[1] += self._style * nchars
+        elif col > len(ltext):
+            pad = col - len(ltext)
+            line[0] = ltext + u' ' * pad + text
+            line[1] += chr(0) * pad + self._style * nchars
+        else:
+            line[0] = ltext[:col] + text + ltext[col + nchars:]
+            line[1][col:col + nchars] = self._style * nchars
+        self._col = col + nchars
+        if self._dirty is None or self._row < self._dirty:
+            self._dirty = self._row
+
+    def _LineFeed(self):
+        """Move the cursor down a line, at the bottom a new line is added"""
+        self._row += 1
+        if self._row == len(self._lines):
+            self._lines.append([u'', bytearray()])
+            if len(self._lines) > self._maxlines * 2:
+                self._Trim()
+        self._Touch(self._row)
+        if self._lnm:
+            self._col = 0
+
+    def _Trim(self):
+        """Drop the lines that don't fit in the scrollback"""
+        drop = len(self._lines) - self._maxlines
+        if drop > 0:
+            self._Drop(drop)
+
+    def _Drop(self, drop):
+        """Drop lines from the top of the scrollback"""
+        del self._lines[:drop]
+        if not self._lines:
+            self._lines.append([u'', bytearray()])
+        self._row = max(0, self._row - drop)
+        self._saved = (max(0, self._saved[0] - drop),) + self._saved[1:]
+        self._trimmed += drop
+        if self._dirty is not None:
+            self._dirty = max(0, self._dirty - drop)
+
+    def _EraseLine(self, row, start, end=None):
+        """Erase the characters of a line in the given range
+        @param row: line index
+        @param start: first column
+        @keyword end: column after the last one (None for end of line)
+
+        """
+        line = self._lines[row]
+        if end is None or end >= len(line[0]):
+            line[0] = line[0][:start]
+            del line[1][start:]
+        elif start < end:
+            line[0] = line[0][:start] + u' ' * (end - start) + line[0][end:]
+            line[1][start:end] = chr(0) * (end - start)
+        self._Touch(row)
+
+    def _EraseDisplay(self, mode):
+        """Erase the screen (CSI J)"""
+        top = self._GetTop()
+        if mode == 0:
+            self._EraseLine(self._row, self._col)
+            del self._lines[self._row + 1:]
+        elif mode == 1:
+            for row in range(top, self._row):
+                self._EraseLine(row, 0)
+            self._EraseLine(self._row, 0, self._col + 1)
+        else:
+            for row in range(top, len(self._lines)):
+                self._EraseLine(row, 0)
+            if mode == 3 and top:
+                self._Drop(top)
+
+    def _SelectGraphic(self, params):
+        """Set the text attributes (CSI m)"""
+        attrs = self._attrs
+        if not params:
+            params = [0]
+        idx = 0
+        while idx < len(params):
+            code = params[idx]
+            if code == 0:
+                attrs[:] = [None, None, False, False]
+            elif code == 1:
+                attrs[2] = True
+            elif code == 22:
+                attrs[2] = False
+            elif code == 7:
+                attrs[3] = True
+            elif code == 27:
+                attrs[3] = False
+            elif 30 <= code <= 37:
+                attrs[0] = code - 30
+            elif 90 <= code <= 97:
+                attrs[0] = code - 82
+            elif code == 39:
+                attrs[0] = None
+            elif 40 <= code <= 47:
+                attrs[1] = code - 40
+            elif 100 <= code <= 107:
+                attrs[1] = code - 92
+            elif code == 49:
+                attrs[1] = None
+            elif code in (38, 48):
+                # Extended colours, only the 16 colour part of the palette
+                # can be shown.
+                colour = None
+                if idx + 2 < len(params) and params[idx + 1] == 5:
+                    if params[idx + 2] < len(PALETTE):
+                        colour = params[idx + 2]
+                    idx += 2
+                elif idx + 4 < len(params) and params[idx + 1] == 2:
+                    idx += 4
+                attrs[code == 48] = colour
+            idx += 1
+        self._UpdateStyle()
+
+    def _UpdateStyle(self):
+        """Get the style id for the current text attributes, new attribute
+        combinations are given the next free id.
+
+        """
+        key = self._key = tuple(self._attrs)
+        style = self._styles.get(key, None)
+        if style is None:
+            style = 0
+            if len(self._specs) < MAX_STYLES:
+                style = len(self._specs)
+                self._styles[key] = style
+                self._specs.append(key)
+        self._style = chr(style)
+
+    #---- Parser ----#
+
+    def _Control(self, char):
+        """Execute a control character"""
+        if char == u'\n' or char == u'\x0b' or char == u'\x0c':
+            self._LineFeed()
+        elif char == u'\r':
+            self._col = 0
+        elif char == u'\x1b':
+            self._state = STATE_ESCAPE
+        elif char == u'\x08':
+            self._col = max(0, self._col - 1)
+        elif char == u'\t':
+            self._col = (self._col // 8 + 1) * 8
+        elif char == u'\x18' or char == u'\x1a':
+            self._state = STATE_GROUND
+
+    def _Escape(self, char):
+        """Handle the character after an ESC"""
+        self._state = STATE_GROUND
+        if char == u'[':
+            self._state = STATE_CSI
+            self._params = u''
+        elif char == u']':
+            self._state = STATE_OSC
+            self._osc = list()
+        elif char in u'()*+':
+            self._state = STATE_CHARSET
+        elif char == u'7':
+            self._saved = (self._row, self._col, tuple(self._attrs))
+        elif char == u'8':
+            self._RestoreCursor()
+        elif char == u'D':
+            self._LineFeed()
+        elif char == u'E':
+            self._LineFeed()
+            self._col = 0
+        elif char == u'M':
+            self._row = max(self._GetTop(), self._row - 1)
+        elif char == u'c':
+            self._SelectGraphic([0])
+            self._EraseDisplay(2)
+            self._SetRow(self._GetTop())
+            self._col = 0
+
+    def _RestoreCursor(self):
+        """Restore the cursor saved with ESC 7 or CSI s"""
+        row, col, attrs = self._saved
+        self._SetRow(row)
+        self._col = col
+        if attrs is not None:
+            self._attrs = list(attrs)
+            self._UpdateStyle()
+
+    def _Csi(self, final):
+        """Execute a control sequence (ESC [ params final)"""
+        params = self._params
+        private = params[:1] in (u'?', u'>', u'=', u'<')
+        if private:
+            params = params[1:]
+        nums = list()
+        for param in params.replace(u':', u';').split(u';'):
+            if param.isdigit():
+                nums.append(int(param))
+            else:
+                nums.append(0)
+        if not params:
+            nums = list()
+        count = max(1, (nums or [1])[0])
+        top = self._GetTop()
+
+        if final == u'm':
+            if not private:
+                key = (self._key, self._params)
+                self._SelectGraphic(nums)
+                if len(self._sgr) > 1024:
+                    self._sgr.clear()
+                self._sgr[key] = (self._key, self._style)
+        elif final == u'K':
+            mode = (nums or [0])[0]
+            if mode == 0:
+                self._EraseLine(self._row, self._col)
+            elif mode == 1:
+                self._EraseLine(self._row, 0, self._col + 1)
+            else:
+                self._EraseLine(self._row, 0)
+        elif final == u'J':
+            self._EraseDisplay((nums or [0])[0])
+        elif final == u'A':
+            self._row = max(top, self._row - count)
+        elif final == u'B':
+            self._row = min(len(self._lines) - 1, self._row + count)
+        elif final == u'C':
+            self._col += count
+        elif final == u'D':
+            self._col = max(0, self._col - count)
+        elif final == u'E':
+            self._row = min(len(self._lines) - 1, self._row + count)
+            self._col = 0
+        elif final == u'F':
+            self._row = max(top, self._row - count)
+            self._col = 0
+        elif final == u'G' or final == u'`':
+            self._col = count - 1
+        elif final == u'H' or final == u'f':
+            nums = nums + [1, 1]
+            self._SetRow(top + max(1, nums[0]) - 1)
+            self._col = max(1, nums[1]) - 1
+        elif final == u'd':
+            self._SetRow(top + count - 1)
+        elif final == u'P':
+            line = self._lines[self._row]
+            line[0] = line[0][:self._col] + line[0][self._col + count:]
+            del line[1][self._col:self._col + count]
+            self._Touch(self._row)
+        elif final == u'@':
+            line = self._lines[self._row]
+            if self._col < len(line[0]):
+                line[0] = line[0][:self._col] + u' ' * count + \
+                          line[0][self._col:]
+                line[1][self._col:self._col] = chr(0) * count
+                self._Touch(self._row)
+        elif final == u'X':
+            self._EraseLine(self._row, self._col, self._col + count)
+        elif final == u'L':
+            blank = [ [u'', bytearray()] for idx in range(count) ]
+            self._lines[self._row:self._row] = blank
+            del self._lines[top + self._rows:]
+            self._Touch(self._row)
+        elif final == u'M':
+            del self._lines[self._row:self._row + count]
+            self._SetRow(self._row)
+            self._Touch(self._row)
+        elif final == u's':
+            self._saved = (self._row, self._col, None)
+        elif final == u'u':
+            self._RestoreCursor()
+        elif final == u'n' and not private:
+            if count == 6:
+                self._replies.append("\x1b[%d;%dR" % (self._row - top + 1,
+                                                       self._col + 1))
+            elif count == 5:
+                self._replies.append("\x1b[0n")
+        elif final == u'c' and not private:
+            self._replies.append("\x1b[?6c")
+        elif final in u'hl' and not private and 20 in nums:
+            self._lnm = final == u'h'
+
+    def _Sequence(self, params, final):
+        """Execute a control sequence, the results of the attribute changes
+        are reused as the same ones are repeated over and over.
+        @param params: parameter characters
+        @param final: final character
+
+        """
+        self._params = params
+        if final == u'm':
+            cached = self._sgr.get((self._key, params), None)
+            if cached is not None:
+                self._key, self._style = cached
+                self._attrs = list(cached[0])
+                return
+        self._Csi(final)
+
+    def _Osc(self):
+        """Execute an operating system command (ESC ] ps ; pt BEL)"""
+        command = u''.join(self._osc)
+        code, sep, text = command.partition(u';')
+        if code in (u'0', u'2'):
+            self._title = text
+
+    def Write(self, text):
+        """Write text to the screen
+        @param text: unicode
+
+        """
+        pos = 0
+        end = len(text)
+        search = RE_CONTROL.search
+        while pos < end:
+            state = self._state
+            if state == STATE_GROUND:
+                match = search(text, pos)
+                if match is None:
+                    self._Print(text[pos:])
+                    break
+                cpos = match.start()
+                if cpos != pos:
+                    self._Print(text[pos:cpos])
+                pos = cpos + 1
+                if text[cpos] == u'\x1b':
+                    # Fast path for a complete control sequence
+                    match = RE_CSI.match(text, pos)
+                    if match is not None:
+                        self._Sequence(match.group(1)[:64], match.group(2))
+                        pos = match.end()
+                        continue
+                self._Control(text[cpos])
+                continue
+
+            char = text[pos]
+            pos += 1
+            if state == STATE_OSC:
+                if char == u'\x07':
+                    self._Osc()
+                    self._state = STATE_GROUND
+                elif char == u'\x1b':
+                    self._state = STATE_OSC_ESC
+                elif len(self._osc) < MAX_OSC:
+                    self._osc.append(char)
+            elif state == STATE_OSC_ESC:
+                self._Osc()
+                self._state = STATE_GROUND
+                if char != u'\\':
+                    # Not a string terminator, start a new escape
+                    self._Escape(char)
+            elif char < u' ' or char == u'\x7f':
+                self._Control(char)
+            elif state == STATE_ESCAPE:
+                self._Escape(char)
+            elif state == STATE_CSI:
+                if u'\x30' <= char <= u'\x3f':
+                    if len(self._params) < 64:
+                        self._params += char
+                elif char >= u'\x40':
+                    self._state = STATE_GROUND
+                    self._Sequence(self._params, char)
+            else:
+                # Character set designation, only ASCII is supported
+                self._state = STATE_GROUND
+
+        if len(self._lines) > self._maxlines:
+            self._Trim()
+
+    def Feed(self, data):
+        """Decode the output of the process and write it to the screen
+        @param data: string
+
+        """
+        self.Write(self._decoder.decode(data))
+
+    #---- Queries ----#
+
+    def GetCursor(self):
+        """Get the cursor position
+        @return: (line, column)
+
+        """
+        return (self._row, self._col)
+
+    def GetLineCount(self):
+        """Get the number of lines on the screen and in the scrollback
+        @return: int
+
+        """
+        return len(self._lines)
+
+    def GetLineText(self, row):
+        """Get the text of a line
+        @param row: line index
+        @return: unicode
+
+        """
+        return self._lines[row][0]
+
+    def GetLineStyles(self, row):
+        """Get the style ids of the characters of a line
+        @param row: line index
+        @return: list of int
+
+        """
+        return list(self._lines[row][1])
+
+    def GetStyleColours(self, style, fore, back):
+        """Get the colours and font weight of a style id
+        @param style: style id from the style bytes
+        @param fore: default foreground colour
+        @param back: default background colour
+        @return: (fore, back, bold)
+
+        """
+        sfore, sback, bold, reverse = self._specs[style]
+        if sfore is not None:
+            fore = PALETTE[sfore + (8 if bold and sfore < 8 else 0)]
+        if sback is not None:
+            back = PALETTE[sback]
+        if reverse:
+            fore, back = back, fore
+        return (fore, back, bold)
+
+    def GetText(self):
+        """Get the text of the whole screen
+        @return: unicode
+
+        """
+        return u'\n'.join([ line[0] for line in self._lines ])
+
+    def GetTitle(self):
+        """Get the title set by the process
+        @return: unicode
+
+        """
+        return self._title
+
+    def SetLineFeedMode(self, newline):
+        """Set if a line feed also returns the carriage to the start of
+        the line, like on a pipe without a terminal driver.
+        @param newline: bool
+
+        """
+        self._lnm = newline
+
+    def TakeReplies(self):
+        """Get the replies to the status requests of the process, they need
+        to be written back to the process.
+        @return: list of strings
+
+        """
+        replies = self._replies
+        self._replies = list()
+        return replies
+
+    def TakeUpdate(self):
+        """Get the changes since the last update. The lines that were
+        dropped from the top are to be removed first, then all the lines from
+        the first changed line on are to be replaced with the new text.
+        @return: (lines dropped, first changed line, number of lines,
+                  text, utf-8 style bytes) or None if nothing changed
+
+        """
+        if self._dirty is None and not self._trimmed:
+            return None
+
+        first = self._dirty
+        if first is None:
+            first = len(self._lines)
+        lines = self._lines[first:]
+        text = u'\n'.join([ line[0] for line in lines ])
+        styles = list()
+        for ltext, lstyles in lines:
+            if len(ltext.encode('utf-8')) == len(ltext):
+                styles.append(str(lstyles))
+            else:
+                styles.append(''.join([ chr(style) * len(char.encode('utf-8'))
+                                        for char, style in zip(ltext, lstyles) ]))
+        update = (self._trimmed, first, len(lines), text, chr(0).join(styles))
+        self._dirty = None
+        self._trimmed = 0
+        return update
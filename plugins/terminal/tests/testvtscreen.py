@@ -0,0 +1,121 @@
+###############################################################################
+# Name: testvtscreen.py                                                       #
+# Purpose: Unittest for vtscreen.py                                           #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('../terminal'))
+
+import vtscreen
+
+#-----------------------------------------------------------------------------#
+
+class TestVtScreen(unittest.TestCase):
+    def setUp(self):
+        self.screen = vtscreen.VtScreen(maxlines=50, rows=10)
+
+    def testText(self):
+        """Test writing text and the cursor movement controls"""
+        self.screen.Feed("hello\r\nworld\r\nab\x08\x08x\tz")
+        self.assertEquals(self.screen.GetText(), u"hello\nworld\nxb      z")
+        self.assertEquals(self.screen.GetCursor(), (2, 9))
+
+        self.screen.Feed("\r\x1b[2A\x1b[2C\x1b[K\r\n\x1b[3Ped")
+        self.assertEquals(self.screen.GetText(), u"he\ned\nxb      z")
+
+    def testSplitSequences(self):
+        """Test sequences and characters split between reads"""
+        for data in ("a\x1b", "[3", "1mb\x1b]0;ti", "tle\x1b", "\\c\xc3",
+                     "\xa9\x1b[0", "m"):
+            self.screen.Feed(data)
+        self.assertEquals(self.screen.GetText(), u"abc\xe9")
+        self.assertEquals(self.screen.GetTitle(), u"title")
+        self.assertEquals(self.screen.GetLineStyles(0), [0, 1, 1, 1])
+        self.assertEquals(self.screen.GetStyleColours(1, "#FFFFFF", "#000000"),
+                          (vtscreen.PALETTE[1], "#000000", False))
+
+    def testStyles(self):
+        """Test the text attributes"""
+        self.screen.Feed("\x1b[1;32;44mA\x1b[7mB\x1b[27;39;49mC\x1b[mD")
+        styles = self.screen.GetLineStyles(0)
+        self.assertEquals(styles[3], 0)
+        self.assertEquals(self.screen.GetStyleColours(styles[2], "#F", "#B"),
+                          ("#F", "#B", True))
+        self.assertEquals(self.screen.GetStyleColours(styles[0], "#F", "#B"),
+                          (vtscreen.PALETTE[10], vtscreen.PALETTE[4], True))
+        self.assertEquals(self.screen.GetStyleColours(styles[1], "#F", "#B"),
+                          (vtscreen.PALETTE[4], vtscreen.PALETTE[10], True))
+
+        # Running out of style ids falls back to the default style
+        for idx in range(vtscreen.MAX_STYLES * 2):
+            self.screen.Feed("\x1b[3%d;4%d;%dm" % (idx % 8, idx / 8 % 8, idx % 2))
+        self.screen.Feed("\x1b[31mE\x1b[0m")
+        self.assertEquals(self.screen.GetLineStyles(0)[-1], 0)
+
+    def testScreen(self):
+        """Test the cursor addressing and erasing on the screen"""
+        self.screen.Feed("\r\n".join([ "line %d" % idx for idx in range(15) ]))
+        self.screen.Feed("\x1b[1;6HX\x1b[6n")
+        # The screen is the last 10 lines
+        self.assertEquals(self.screen.GetLineText(5), u"line X")
+        self.assertEquals(self.screen.TakeReplies(), ["\x1b[1;7R"])
+
+        self.screen.Feed("\x1b[2;1H\x1b[J")
+        self.assertEquals(self.screen.GetLineCount(), 7)
+        self.assertEquals(self.screen.GetLineText(6), u"")
+        # All the lines are on the screen now
+        self.screen.Feed("\x1b[2J")
+        self.assertEquals(self.screen.GetText(), u"\n" * 6)
+
+    def testUpdates(self):
+        """Test collecting the changes for the control"""
+        self.screen.Feed("one\r\ntwo\r\n")
+        self.assertEquals(self.screen.TakeUpdate(),
+                          (0, 0, 3, u"one\ntwo\n", "\x00" * 8))
+        self.assertEquals(self.screen.TakeUpdate(), None)
+
+        self.screen.Feed("\x1b[31m\xc3\xa9\x1b[0m")
+        self.assertEquals(self.screen.TakeUpdate(),
+                          (0, 2, 1, u"\xe9", "\x01\x01"))
+
+        # Lines that don't fit in the scrollback are dropped
+        self.screen.Feed("\r\n" * 60)
+        update = self.screen.TakeUpdate()
+        self.assertEquals(update[:3], (13, 0, 50))
+        self.assertEquals(self.screen.GetLineCount(), 50)
+        self.assertEquals(self.screen.GetCursor(), (49, 0))
+
+class TestPtyReader(unittest.TestCase):
+    def testRead(self):
+        """Test reading the output of a pipe on a thread"""
+        rfd, wfd = os.pipe()
+        reader = vtscreen.PtyReader(rfd, chunk=7, limit=16)
+        reader.start()
+        data = "".join([ "%d\n" % idx for idx in range(1000) ])
+        os.write(wfd, data)
+        os.close(wfd)
+
+        output = list()
+        while not reader.IsFinished():
+            output.append(reader.GetOutput(10))
+            self.assertTrue(len(output[-1]) <= 10)
+        reader.join(5)
+        os.close(rfd)
+        self.assertEquals("".join(output), data)
+        self.assertFalse(reader.isAlive())
+
+#-----------------------------------------------------------------------------#
+if __name__ == '__main__':
+    unittest.main()
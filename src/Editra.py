@@ -63,6 +63,7 @@ import ed_main
 import ed_art
 import ed_txt
 import ed_event
+import ed_msg
 import updater
 import plugin
 import ed_ipc
@@ -215,6 +216,8 @@ class Editra(wx.App, events.AppEventHandlerMixin):
 
         # Load user preferences
         self.profile_updated = InitConfig()
+        if ed_glob.DEBUG:
+            ed_msg.EnableStats(True)
         self._isfirst = False # Is the first instance
         self._instance = None
 
@@ -22,10 +22,13 @@ __revision__ = "$Revision: 70229 $"
 #--------------------------------------------------------------------------#
 # Dependancies
 import os
+import re
 import sys
 import time
 import tokenize
 import types
+import weakref
+import __builtin__
 from token import NAME, DEDENT, STRING
 
 import wx
@@ -76,31 +79,19 @@ class Completer(completer.BaseCompleter):
             return list()
 
         try:
-            cmpl = PyCompleter()
-
             # Put the files directory on the path so eval has a better
             # chance of getting the proper completions
             fname = self._buffer.GetFileName()
+            fpath = u''
             if fname:
                 fpath = os.path.dirname(fname)
-                sys.path.insert(0, fpath)
-            snapshot = list(sys.modules.keys())
 
             t1 = time.time()
-            cmpl.evalsource(self._buffer.GetText(),
-                            self._buffer.GetCurrentLine())
+            model = GetModel(self._buffer)
+            cmpl = model.GetCompleter(self._buffer.GetText(),
+                                      self._buffer.GetCurrentLine(), fpath)
             dbg("[pycomp][info] Completion eval time: %f" % (time.time() - t1))
 
-            if fname:
-                sys.path.pop(0)
-
-            # Dump any other modules that got brought in during eval
-            # so that they get properly updated on next pass through.
-            nsnapshot = sys.modules.keys()
-            nimport = list(set(nsnapshot).difference(set(snapshot)))
-            for k in nimport:
-                del sys.modules[k]
-
             if calltip:
                 return cmpl.get_completions(command + u'(', u'', calltip)
             else:
@@ -194,7 +185,16 @@ class PyCompleter(object):
 
         """
         scope = self.parser.parse(text.replace('\r\n', '\n'), line)
-        src = scope.get_code()
+        self.evalscope(scope)
+
+    def evalscope(self, scope, src=None):
+        """Evaluate a parsed scope for introspection
+        @param scope: L{Scope} returned by L{PyParser.parse}
+        @keyword src: code generated from the scope if already known
+
+        """
+        if src is None:
+            src = scope.get_code()
         # Test
 #        f = open('pycompout.py', 'w')
 #        f.write(src)
@@ -933,12 +933,27 @@ class PyParser(object):
         """Parse the given text
         @param text: python code text to parse
         @keyword curline: current line of cursor for context
+        @return: L{Scope} of what is visible from the current line
+
+        """
+        self.parsescope(text, curline)
+        if self.currentscope is None:
+            self.currentscope = self.top
+        return self._adjustvisibility()
+
+    def parsescope(self, text, curline=0):
+        """Parse the given text into a tree of scopes without resolving
+        the visibility of the current line. After the parse self.top holds
+        the root of the tree and self.currentscope the scope of curline or
+        None if there was no code on the line.
+        @param text: python code text to parse
+        @keyword curline: current line of cursor for context
 
         """
         self.curline = curline
         buf = StringIO(text)
         self.gen = tokenize.generate_tokens(buf.readline)
-        self.currentscope = self.scope
+        self.currentscope = None
 
         try:
             freshscope = True
@@ -998,7 +1013,473 @@ class PyParser(object):
         except:
             dbg("[pycomp][err] Pyparser.parse: %s, %s" %
                 (sys.exc_info()[0], sys.exc_info()[1]))
-        return self._adjustvisibility()
+
+#-----------------------------------------------------------------------------#
+# Completion Model
+
+# Seconds between checks for changes to the files behind a cached import
+MODCACHE_CHECK = 10
+# Maximum number of import statements kept in the module cache
+MODCACHE_SIZE = 128
+
+# Lines that start a new top level block of code
+_BLOCK_RE = re.compile(r"(def|class)[ \t]|@")
+_TRIPLE_RE = re.compile(r"\"\"\"|\'\'\'")
+
+class ModuleCache(object):
+    """Cache of the results of the import statements executed when
+    evaluating a buffer for introspection. Importing large packages like wx
+    or numpy is the most expensive part of building the completion namespace
+    so the imported modules are kept between completion requests instead of
+    being imported again on every request.
+
+    An entry is invalidated when one of the files of the modules that were
+    loaded by its import is modified or removed. The files are checked at
+    most once every L{MODCACHE_CHECK} seconds. When the cache holds more than
+    L{MODCACHE_SIZE} entries the least recently used entry is dropped.
+
+    """
+    def __init__(self):
+        """Create the cache"""
+        super(ModuleCache, self).__init__()
+
+        # Attributes
+        self._cache = dict()    # key -> [module, files, checked, used]
+        self._tick = 0
+        self.generation = 0     # Incremented when entries are invalidated
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    @staticmethod
+    def _Validate(files):
+        """Check if the files of a cache entry are unchanged
+        @param files: list of (path, mtime)
+        @return: bool
+
+        """
+        for fname, mtime in files:
+            try:
+                if os.path.getmtime(fname) != mtime:
+                    return False
+            except (OSError, IOError):
+                return False
+        return True
+
+    def Clear(self):
+        """Invalidate all cached imports"""
+        if len(self._cache):
+            self._cache.clear()
+            self.generation += 1
+
+    def Get(self, key):
+        """Get a cached import
+        @param key: (search path, name, fromlist, level)
+        @return: module or None
+
+        """
+        entry = self._cache.get(key, None)
+        if entry is None:
+            return None
+
+        now = time.time()
+        if now - entry[2] > MODCACHE_CHECK:
+            if not ModuleCache._Validate(entry[1]):
+                del self._cache[key]
+                self.generation += 1
+                return None
+            entry[2] = now
+        self._tick += 1
+        entry[3] = self._tick
+        return entry[0]
+
+    def Set(self, key, module, modules):
+        """Add an import to the cache
+        @param key: (search path, name, fromlist, level)
+        @param module: result of the import
+        @param modules: list of modules that were loaded by the import
+
+        """
+        files = list()
+        for mod in modules:
+            fname = getattr(mod, '__file__', None)
+            if not fname:
+                continue # Builtin module
+            if fname[-4:] in ('.pyc', '.pyo') and os.path.exists(fname[:-1]):
+                fname = fname[:-1]
+            try:
+                files.append((fname, os.path.getmtime(fname)))
+            except (OSError, IOError):
+                pass
+
+        if len(self._cache) >= MODCACHE_SIZE:
+            oldest = min(self._cache.iteritems(), key=lambda x: x[1][3])
+            del self._cache[oldest[0]]
+        self._tick += 1
+        self._cache[key] = [module, files, time.time(), self._tick]
+
+_MODCACHE = ModuleCache()
+
+class _Importer(object):
+    """Replacement for __import__ used while evaluating buffer code that
+    consults the L{ModuleCache} before doing a real import.
+
+    """
+    def __init__(self, cache, path):
+        """@param cache: L{ModuleCache}
+        @param path: directory of the buffers file
+
+        """
+        super(_Importer, self).__init__()
+
+        # Attributes
+        self._cache = cache
+        self._path = path
+        self._import = __builtin__.__import__
+        self._snapshot = None
+
+    def __call__(self, name, globals=None, locals=None, fromlist=None,
+                 level=-1):
+        key = (self._path, name, tuple(fromlist or ()), level)
+        module = self._cache.Get(key)
+        if module is None:
+            before = set(sys.modules.keys())
+            module = self._import(name, globals, locals, fromlist, level)
+            loaded = [ sys.modules[mod]
+                       for mod in set(sys.modules.keys()).difference(before) ]
+            self._cache.Set(key, module, loaded)
+        return module
+
+    def Install(self):
+        """Start using the importer for all imports"""
+        if self._path:
+            sys.path.insert(0, self._path)
+        self._snapshot = set(sys.modules.keys())
+        __builtin__.__import__ = self
+
+    def Uninstall(self):
+        """Restore the normal import mechanism"""
+        __builtin__.__import__ = self._import
+        if self._path and len(sys.path) and sys.path[0] == self._path:
+            sys.path.pop(0)
+
+        # Dump any other modules that got brought in during eval so that the
+        # editors own namespace is not changed by them. The modules that are
+        # needed are kept alive by the module cache.
+        for mod in set(sys.modules.keys()).difference(self._snapshot):
+            del sys.modules[mod]
+
+class CompletionModel(object):
+    """Persistent completion model for a buffer. The source is split into
+    blocks of top level statements and the L{Scope} tree of each block is
+    kept between requests, so only the blocks with changes in them (and the
+    block of the current line) are parsed again. The namespace built from
+    the generated code is reused while the generated code is unchanged.
+
+    """
+    def __init__(self):
+        """Create the model"""
+        super(CompletionModel, self).__init__()
+
+        # Attributes
+        self._blocks = dict()   # block text -> parsed top level Scope
+        self._key = None        # Key of the last evaluated namespace
+        self._completer = None
+        self.parsed = 0         # Number of blocks parsed by last Parse
+
+    def GetCompleter(self, text, line=0, path=u''):
+        """Get a L{PyCompleter} with a namespace built for the given line
+        @param text: buffer text
+        @keyword line: current line of cursor
+        @keyword path: directory of the buffers file
+        @return: L{PyCompleter}
+
+        """
+        scope = self.Parse(text, line)
+        src = scope.get_code()
+        key = (path, src, tuple([loc[1] for loc in scope.locals]),
+               _MODCACHE.generation)
+        if key == self._key and self._completer is not None:
+            return self._completer
+
+        cmpl = PyCompleter()
+        importer = _Importer(_MODCACHE, path)
+        importer.Install()
+        try:
+            cmpl.evalscope(scope, src)
+        finally:
+            importer.Uninstall()
+
+        self._key = (path, src, key[2], _MODCACHE.generation)
+        self._completer = cmpl
+        return cmpl
+
+    def Parse(self, text, line=0):
+        """Update the scope tree for the given text
+        @param text: buffer text
+        @keyword line: current line of cursor
+        @return: L{Scope} of what is visible from the current line
+
+        """
+        blocks = SplitBlocks(text.replace('\r\n', '\n'))
+        gscope = Scope('global', 0)
+        cache = dict()
+        current = None
+        self.parsed = 0
+        for idx, (sline, btxt) in enumerate(blocks):
+            if idx + 1 < len(blocks):
+                nline = blocks[idx + 1][0]
+            else:
+                nline = sys.maxint
+
+            # The block of the current line is always parsed to find the
+            # scope of the line. Note the parser matches the current line
+            # against its one based line numbers.
+            curline = None
+            if sline <= max(0, line - 1) < nline:
+                curline = line - sline
+
+            scope = self._MergeBlock(gscope, btxt, curline, cache)
+            if scope is not None:
+                current = scope
+
+        self._blocks = cache
+        parser = PyParser()
+        parser.currentscope = current or gscope
+        return parser._adjustvisibility()
+
+    def _ParseText(self, text, curline, cache, delta=0):
+        """Parse a block of text or get its cached scope tree
+        @param text: block of code
+        @param curline: current line relative to the block or None
+        @param cache: dict to store the result in
+        @keyword delta: amount to shift the indentation of the results by
+        @return: (top Scope, PyParser or None)
+
+        """
+        key = (delta, text)
+        if curline is None:
+            top = cache.get(key, None) or self._blocks.get(key, None)
+            if top is not None:
+                cache[key] = top
+                return top, None
+
+        parser = PyParser()
+        parser.parsescope(text, curline or 0)
+        if delta:
+            for sub in parser.top.subscopes:
+                _ShiftIndent(sub[1], delta)
+        self.parsed += 1
+        cache[key] = parser.top
+        return parser.top, parser
+
+    def _MergeBlock(self, gscope, text, curline, cache):
+        """Parse a top level block of code and merge its declarations into
+        the global scope.
+        @return: Scope of the current line if it is in the block else None
+
+        """
+        chunks = _SplitClass(text)
+        if chunks is None:
+            return self._MergeText(gscope, text, curline, cache)
+
+        # Classes are split further at their methods. The class statement
+        # and the methods are parsed separately and assembled in a new Class.
+        indent, chunks = chunks
+        current = None
+        cls = None
+        for idx, (cline, ctxt) in enumerate(chunks):
+            if idx + 1 < len(chunks):
+                nline = chunks[idx + 1][0]
+            else:
+                nline = sys.maxint
+
+            ccur = None
+            if curline is not None and cline <= max(0, curline - 1) < nline:
+                ccur = curline - cline
+
+            if idx == 0:
+                top, parser = self._ParseText(ctxt, ccur, cache)
+                hcls = [ sub[1] for sub in top.subscopes
+                         if isinstance(sub[1], Class) ]
+                if not len(hcls):
+                    # Not a class statement after all so parse it whole
+                    chunks = None
+                    break
+                hcls = hcls[-1]
+                cls = Class(hcls.name, hcls.supers, hcls.indent)
+                cls.docstr = hcls.docstr
+                gscope.add(cls)
+                _MergeScope(cls, hcls)
+                scope = hcls
+            else:
+                dtxt = u'\n'.join([ ln[len(indent):] if ln.startswith(indent)
+                                     else ln for ln in ctxt.split(u'\n') ])
+                top, parser = self._ParseText(dtxt, ccur, cache, len(indent))
+                _MergeScope(cls, top)
+                scope = top
+
+            if parser is not None:
+                current = parser.currentscope
+                if current is None:
+                    current = gscope
+                elif current is scope:
+                    current = cls
+
+        if chunks is None:
+            return self._MergeText(gscope, text, curline, dict())
+        return current
+
+    def _MergeText(self, gscope, text, curline, cache):
+        """Parse a block of code as a whole and merge its declarations into
+        the global scope.
+        @return: Scope of the current line if it is in the block else None
+
+        """
+        top, parser = self._ParseText(text, curline, cache)
+        if not gscope.docstr:
+            gscope.docstr = top.docstr
+        _MergeScope(gscope, top)
+        if parser is not None:
+            if parser.currentscope in (None, top):
+                return gscope
+            return parser.currentscope
+        return None
+
+_MODELS = weakref.WeakKeyDictionary()
+
+def GetModel(buff):
+    """Get the completion model for a buffer
+    @param buff: EditraStc
+    @return: L{CompletionModel}
+
+    """
+    model = _MODELS.get(buff, None)
+    if model is None:
+        model = CompletionModel()
+        _MODELS[buff] = model
+    return model
+
+def ClearModuleCache():
+    """Invalidate the cached imports of all buffers"""
+    _MODCACHE.Clear()
+
+def SplitBlocks(text, indent=''):
+    """Split python source into blocks at the class and function definitions
+    at the given level of indentation. At the top level a class definition
+    is also ended by the next statement that is not part of its body.
+    @param text: source code
+    @keyword indent: indentation string of the level to split at
+    @return: list of (first line, block text)
+
+    """
+    blocks = list()
+    lines = text.split('\n')
+    plen = len(indent)
+    start = 0
+    instr = None
+    inclass = False
+    for idx, line in enumerate(lines):
+        if instr is None and line.startswith(indent):
+            if _BLOCK_RE.match(line, plen):
+                if idx and not lines[idx - 1].startswith(indent + '@'):
+                    blocks.append((start, '\n'.join(lines[start:idx]) + '\n'))
+                    start = idx
+                if not line.startswith(indent + '@'):
+                    inclass = not plen and _IsClass(line)
+            elif inclass and line and line[0] not in ' \t#\r':
+                blocks.append((start, '\n'.join(lines[start:idx]) + '\n'))
+                start = idx
+                inclass = False
+
+        # Track triple quoted strings so their contents are not
+        # taken for the start of a block.
+        if instr is None and '"""' not in line and "\'\'\'" not in line:
+            continue
+        pos = 0
+        while True:
+            if instr is None:
+                match = _TRIPLE_RE.search(line, pos)
+                if match is None:
+                    break
+                instr = match.group(0)
+                pos = match.end()
+            else:
+                pos = line.find(instr, pos)
+                if pos == -1:
+                    break
+                instr = None
+                pos += 3
+
+    blocks.append((start, '\n'.join(lines[start:])))
+    return blocks
+
+def _SplitClass(text):
+    """Split a top level class definition into its header and the blocks
+    of its body.
+    @param text: block of code
+    @return: (body indentation, list of (first line, text)) or None
+
+    """
+    lines = text.split('\n')
+    idx = 0
+    while idx < len(lines) and not _IsClass(lines[idx]):
+        idx += 1
+    if idx == len(lines):
+        return None
+
+    # Find the end of the class statement and the indentation of its body
+    while idx < len(lines) and not lines[idx].split('#')[0].rstrip().endswith(':'):
+        idx += 1
+    indent = u''
+    for line in lines[idx + 1:]:
+        body = line.lstrip()
+        if body and not body.startswith('#'):
+            indent = line[:len(line) - len(body)]
+            break
+
+    if not indent:
+        return None
+    chunks = SplitBlocks(text, indent)
+    if len(chunks) < 2:
+        return None
+    return indent, chunks
+
+def _IsClass(line):
+    """Check if a line starts a class statement
+    @param line: line of code
+    @return: bool
+
+    """
+    match = _BLOCK_RE.match(line)
+    return match is not None and match.group(1) == 'class'
+
+def _MergeScope(scope, top):
+    """Add the declarations of a parsed block to a scope
+    @param scope: Scope to add to
+    @param top: top Scope of the parsed block
+
+    """
+    decls = top.subscopes + top.locals
+    decls.sort(key=lambda x: x[0])
+    for decl in [d[1] for d in decls]:
+        if isinstance(decl, Scope):
+            scope.add(decl)
+        else:
+            scope.local(decl)
+
+def _ShiftIndent(scope, delta):
+    """Shift the indentation of a scope and its subscopes
+    @param scope: Scope
+    @param delta: int
+
+    """
+    scope.indent += delta
+    for sub in scope.subscopes:
+        _ShiftIndent(sub[1], delta)
 
 #-----------------------------------------------------------------------------#
 # Utility Functions
@@ -8,6 +8,8 @@
 
 """
 Simple Generic autocompleter for completing words found in the current buffer.
+The words of each buffer are kept in a L{WordIndex} that is built on the first
+request and then kept up to date from the buffers modification events.
 
 """
 
@@ -17,8 +19,10 @@ __revision__ = "$Revision: 72222 $"
 
 #--------------------------------------------------------------------------#
 # Imports
+import re
 import string
-import wx.stc as stc
+import bisect
+import weakref
 
 # Local Imports
 import completer
@@ -59,8 +63,6 @@ class Completer(completer.BaseCompleter):
         if command[0].isdigit() or (command[-1] in fillups):
             return list()
 
-        currentPos = bf.GetCurrentPos()
-
         # Get the real word: segment using autocompFillup
         tmp = command
         for ch in fillups:
@@ -78,35 +80,18 @@ class Completer(completer.BaseCompleter):
         command = u"".join(ls2)
 
         # Available completions so far
-        wordsNear = []
-        maxWordLength = 0
-        nWords = 0
-        minPos = 0
-        maxPos = bf.GetLength()
-        flags = stc.STC_FIND_WORDSTART
-        if self.GetCaseSensitive():
-            flags |= stc.STC_FIND_MATCHCASE
-
-        posFind = bf.FindText(minPos, maxPos, command, flags)
-        while posFind >= 0 and posFind < maxPos:
-            wordEnd = posFind + len(command)
-            if posFind != currentPos:
-                while -1 != Completer.wordCharacters.find(chr(bf.GetCharAt(wordEnd))):
-                    wordEnd += 1
-
-                wordLength = wordEnd - posFind
-                if wordLength > len(command):
-                    word = bf.GetTextRange(posFind, wordEnd)
-                    sym = completer.Symbol(word, completer.TYPE_UNKNOWN)
-                    if not wordsNear.count(sym):
-                        wordsNear.append(sym)
-                        maxWordLength = max(maxWordLength, wordLength)
-                        nWords += 1
-
-            minPos = wordEnd
-            posFind = bf.FindText(minPos, maxPos, command, flags)
-
-        if len(wordsNear) > 0 and (maxWordLength > len(command)):
+        words = set()
+        if _MERGE_BUFFERS:
+            buffers = _GetOpenBuffers(bf)
+        else:
+            buffers = [bf,]
+        for buff in buffers:
+            index = GetIndex(buff)
+            words.update(index.Query(command, self.GetCaseSensitive()))
+
+        wordsNear = [ completer.Symbol(word, completer.TYPE_UNKNOWN)
+                      for word in words if len(word) > len(command) ]
+        if len(wordsNear) > 0:
             return wordsNear
 
         return kwlst
@@ -118,3 +103,143 @@ class Completer(completer.BaseCompleter):
         """
         rlist = self._GetCompletionInfo(command)
         return sorted(list(set(rlist)))
+
+#--------------------------------------------------------------------------#
+# Word Index
+
+_WORD_RE = re.compile(r"[^\W\d]\w*", re.UNICODE)
+_EOL_RE = re.compile(r"\r\n|\r|\n")
+_INDEXES = weakref.WeakKeyDictionary()
+_MERGE_BUFFERS = False
+
+class WordIndex(object):
+    """Index of the words in a document. The words of each line are kept so
+    that the index can be updated by replacing a range of lines, and the
+    distinct words are kept in a sorted list to answer prefix queries with
+    a binary search.
+
+    """
+    def __init__(self, lines=()):
+        """Create the index
+        @keyword lines: list of the documents lines
+
+        """
+        super(WordIndex, self).__init__()
+
+        # Attributes
+        self._lines = list()    # Words on each line
+        self._counts = dict()   # word -> number of occurrences
+        self._keys = list()     # sorted list of (lower case word, word)
+
+        self.Update(0, 0, lines)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, word):
+        return word in self._counts
+
+    LineCount = property(lambda self: len(self._lines))
+
+    def GetCount(self, word):
+        """Get the number of occurrences of a word
+        @param word: unicode
+        @return: int
+
+        """
+        return self._counts.get(word, 0)
+
+    def Query(self, prefix, case=False):
+        """Get the words that start with the given prefix
+        @param prefix: unicode
+        @keyword case: match case
+        @return: list of words in sorted order
+
+        """
+        lower = prefix.lower()
+        idx = bisect.bisect_left(self._keys, (lower,))
+        rlist = list()
+        for key, word in self._keys[idx:]:
+            if not key.startswith(lower):
+                break
+            if not case or word.startswith(prefix):
+                rlist.append(word)
+        return rlist
+
+    def Update(self, line, removed, lines):
+        """Replace a range of lines in the index
+        @param line: first line of the range
+        @param removed: number of lines removed from the index
+        @param lines: list of text of the lines that replace them
+
+        """
+        words = [ _WORD_RE.findall(text) for text in lines ]
+        delta = dict()
+        for lwords in self._lines[line:line+removed]:
+            for word in lwords:
+                delta[word] = delta.get(word, 0) - 1
+        for lwords in words:
+            for word in lwords:
+                delta[word] = delta.get(word, 0) + 1
+        self._lines[line:line+removed] = words
+
+        # Only words that were added or removed change the sorted keys
+        for word, diff in delta.iteritems():
+            if not diff:
+                continue
+            count = self._counts.get(word, 0)
+            if count + diff > 0:
+                if not count:
+                    bisect.insort(self._keys, (word.lower(), word))
+                self._counts[word] = count + diff
+            elif count:
+                del self._counts[word]
+                key = (word.lower(), word)
+                idx = bisect.bisect_left(self._keys, key)
+                if idx < len(self._keys) and self._keys[idx] == key:
+                    del self._keys[idx]
+
+def _GetOpenBuffers(buff):
+    """Get the buffers that are open in the same window as the given one
+    @param buff: EditraStc
+    @return: list
+
+    """
+    try:
+        return buff.GetTopLevelParent().GetNotebook().GetTextControls()
+    except AttributeError:
+        return [buff,]
+
+def GetIndex(buff):
+    """Get the word index of a buffer, building it if needed
+    @param buff: EditraStc
+    @return: L{WordIndex}
+
+    """
+    index = _INDEXES.get(buff, None)
+    if index is None or index.LineCount != buff.GetLineCount():
+        index = WordIndex(_EOL_RE.split(buff.GetText()))
+        _INDEXES[buff] = index
+    return index
+
+def UpdateIndex(buff, line, lines_added):
+    """Update the word index of a buffer after text was inserted or deleted.
+    Does nothing if the buffer has not been indexed yet.
+    @param buff: EditraStc
+    @param line: line the modification started on
+    @param lines_added: number of lines added (negative if removed)
+
+    """
+    index = _INDEXES.get(buff, None)
+    if index is not None:
+        nlines = max(0, lines_added) + 1
+        index.Update(line, max(0, -lines_added) + 1,
+                     [ buff.GetLine(lnum) for lnum in range(line, line + nlines) ])
+
+def SetMergeBuffers(merge):
+    """Set whether to complete words from all open buffers
+    @param merge: bool
+
+    """
+    global _MERGE_BUFFERS
+    _MERGE_BUFFERS = merge
@@ -22,6 +22,9 @@ import sys
 import re
 import traceback
 import time
+import atexit
+import threading
+import collections
 import urllib2
 import webbrowser
 import codecs
@@ -48,6 +51,19 @@ except (LookupError, TypeError):
 
 PYTHONW = 'pythonw' in sys.executable.lower()
 
+# Message types of the log levels
+_LOG_TYPES = { 'err' : ed_msg.EDMSG_LOG_ERROR,
+               'error' : ed_msg.EDMSG_LOG_ERROR,
+               'warn' : ed_msg.EDMSG_LOG_WARN,
+               'warning' : ed_msg.EDMSG_LOG_WARN,
+               'evt' : ed_msg.EDMSG_LOG_EVENT,
+               'event' : ed_msg.EDMSG_LOG_EVENT,
+               'info' : ed_msg.EDMSG_LOG_INFO,
+               'information' : ed_msg.EDMSG_LOG_INFO }
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
 #-----------------------------------------------------------------------------#
 # General Debugging Helper Functions
 def DEBUGP(statement, *args):
@@ -73,59 +89,86 @@ def DEBUGP(statement, *args):
                       of filtering. The second block is the type of message,
                       this is used to indicate the priority of the message and
                       is used as the secondary means of filtering.
+    @note: messages are dropped without being formatted when DEBUG is off
+           and there are no listeners for the messages level. With DEBUG on
+           the messages are written to stdout and the log file on a
+           background thread.
 
     """
+    lbls, info = ParseLabels(statement)
+    if len(args) and (len(lbls) < 2 or u'%' in u''.join(lbls[:2])):
+        # Labels are part of the formatting
+        try:
+            statement = statement % args
+        except:
+            pass
+        args = tuple()
+        lbls, info = ParseLabels(statement)
+
+    msrc = lbls[0] if len(lbls) else u"unknown"
+    msg_type = lbls[1] if len(lbls) > 1 else u"info"
+    mtype = _LOG_TYPES.get(msg_type, ed_msg.EDMSG_LOG_ALL)
+    listeners = ed_msg.HasListeners(mtype)
+    if not ed_glob.DEBUG and not listeners:
+        return
+
     # Check if formatting should be done here
     if len(args):
         try:
-            statement = statement % args
+            info = info % args
         except:
             pass
 
-    # Create a LogMsg object from the statement string
-    lbls = [lbl.strip() for lbl in RE_LOG_LBL.findall(statement)]
-    info = RE_LOG_LBL.sub('', statement, 2).rstrip()
-    if len(lbls) > 1:
-        msg = LogMsg(info, lbls[0], lbls[1])
-    elif len(lbls) == 1:
-        msg = LogMsg(info, lbls[0])
-    else:
-        msg = LogMsg(info)
+    trace = None
+    if ed_glob.VDEBUG and msg_type in ('err', 'error'):
+        trace = traceback.format_exc()
 
-    # Only print to stdout when DEBUG is active
-    # Cant print to stdio if using pythonw
-    msg_type = msg.Type
+    # Only print to stdout and the log file when DEBUG is active
     if ed_glob.DEBUG:
-        mstr = unicode(msg)
-        mstr = mstr.encode('utf-8', 'replace')
-        if not PYTHONW:
-            print(mstr)
+        GetLogWriter().Queue((time.time(), info, msrc, msg_type, trace))
 
-        # Write to log file
-        logfile = EdLogFile()
-        logfile.WriteMessage(mstr)
+    # Dispatch message to all observers
+    if listeners:
+        if trace is not None:
+            info = info + os.linesep + trace
+        ed_msg.PostMessage(mtype, LogMsg(info, msrc, msg_type))
 
-        # Check for trapped exceptions to print
-        if ed_glob.VDEBUG and msg_type in ('err', 'error'):
-            traceback.print_exc()
-            logfile.WriteMessage(traceback.format_exc())
+def GetLogWriter():
+    """Get the log writer that writes the debug messages to stdout and the
+    log file, the writer thread is started by the first call.
+    @return: L{LogWriter}
 
-    # Dispatch message to all observers
-    if msg_type in ('err', 'error'):
-        mtype = ed_msg.EDMSG_LOG_ERROR
-        if ed_glob.VDEBUG:
-            msg = LogMsg(msg.Value + os.linesep + traceback.format_exc(),
-                         msg.Origin, msg.Type)
-    elif msg_type in ('warn', 'warning'):
-        mtype = ed_msg.EDMSG_LOG_WARN
-    elif msg_type in ('evt', 'event'):
-        mtype = ed_msg.EDMSG_LOG_EVENT
-    elif msg.Type in ('info', 'information'):
-        mtype = ed_msg.EDMSG_LOG_INFO
-    else:
-        mtype = ed_msg.EDMSG_LOG_ALL
+    """
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = LogWriter(EdLogFile())
+            _WRITER.start()
+            atexit.register(_WRITER.Shutdown)
+    return _WRITER
+
+def ParseLabels(statement):
+    """Split the [source][type] labels from a log statement
+    @param statement: log statement string
+    @return: (list of labels, message string)
 
-    ed_msg.PostMessage(mtype, msg)
+    """
+    # Fast path for the common "[src][type] message" form
+    if statement.startswith(u'['):
+        end1 = statement.find(u']')
+        if end1 != -1 and statement.startswith(u'[', end1 + 1):
+            end2 = statement.find(u']', end1 + 1)
+            if end2 != -1 and \
+               statement.find(u'[', 1, end1) == -1 and \
+               statement.find(u'[', end1 + 2, end2) == -1:
+                lbls = [statement[1:end1].strip(),
+                        statement[end1 + 2:end2].strip()]
+                if lbls[0] and lbls[1]:
+                    return lbls, statement[end2 + 1:].rstrip()
+
+    lbls = [lbl.strip() for lbl in RE_LOG_LBL.findall(statement)]
+    info = RE_LOG_LBL.sub('', statement, 2).rstrip()
+    return lbls, info
 
 #-----------------------------------------------------------------------------#
 
@@ -136,11 +179,12 @@ class LogMsg(object):
     being expired.
 
     """
-    def __init__(self, msg, msrc=u"unknown", level=u"info"):
+    def __init__(self, msg, msrc=u"unknown", level=u"info", tstamp=None):
         """Create a LogMsg object
         @param msg: the log message string
         @keyword msrc: Source of message
         @keyword level: Priority of the message
+        @keyword tstamp: time of the message (default is now)
 
         """
         assert isinstance(msg, basestring)
@@ -152,7 +196,7 @@ class LogMsg(object):
         self._msg = dict(mstr=DecodeString(msg),
                          msrc=DecodeString(msrc),
                          lvl=DecodeString(level),
-                         tstamp=time.time())
+                         tstamp=tstamp or time.time())
         self._ok = True
 
     def __eq__(self, other):
@@ -256,6 +300,86 @@ class EdLogFile(LogFile):
 
 #-----------------------------------------------------------------------------#
 
+class LogWriter(threading.Thread):
+    """Background thread that formats the queued log records and writes them
+    to stdout and the log file. The records are written in batches, the
+    caller only has to append the record to the queue.
+
+    """
+    def __init__(self, logfile, interval=0.2):
+        """Create the writer
+        @param logfile: L{ebmlib.LogFile} to write to
+        @keyword interval: seconds to collect records for before writing them
+
+        """
+        super(LogWriter, self).__init__()
+
+        # Attributes
+        self.setDaemon(True)
+        self._logfile = logfile
+        self._interval = interval
+        self._queue = collections.deque() # append/popleft are thread safe
+        self._wake = threading.Event()
+        self._running = True
+
+    def run(self):
+        """Write the queued records until shutdown"""
+        while self._running:
+            self._wake.wait()
+            self._wake.clear()
+            if self._running:
+                time.sleep(self._interval) # Let a batch collect
+            self.WritePending()
+        self.WritePending()
+        self._logfile.Close()
+
+    def Queue(self, record):
+        """Queue a record to be written
+        @param record: (timestamp, message, source, level, traceback or None)
+
+        """
+        self._queue.append(record)
+        if not self._wake.isSet():
+            self._wake.set()
+
+    def Shutdown(self, timeout=2.0):
+        """Stop the writer after it has written the queued records
+        @keyword timeout: seconds to wait for the thread to finish
+
+        """
+        self._running = False
+        self._wake.set()
+        if self.isAlive():
+            self.join(timeout)
+
+    def WritePending(self):
+        """Write all of the queued records
+        @note: only call from the writer thread or after it has stopped
+
+        """
+        lines = list()
+        while True:
+            try:
+                tstamp, info, msrc, level, trace = self._queue.popleft()
+            except IndexError:
+                break
+
+            mstr = unicode(LogMsg(info, msrc, level, tstamp))
+            mstr = mstr.encode('utf-8', 'replace')
+            lines.append(mstr)
+            if trace is not None:
+                lines.append(trace)
+
+        if lines:
+            if not PYTHONW:
+                try:
+                    sys.stdout.write(os.linesep.join(lines) + os.linesep)
+                except (IOError, ValueError):
+                    pass
+            self._logfile.WriteMessages(lines)
+
+#-----------------------------------------------------------------------------#
+
 def DecodeString(string, encoding=None):
     """Decode the given string to Unicode using the provided
     encoding or the DEFAULT_ENCODING if None is provided.
@@ -19,6 +19,8 @@ __revision__ = "$Revision: 70230 $"
 # Imports
 import os
 import sys
+import codecs
+import collections
 
 # Editra Libraries
 import util
@@ -32,19 +34,36 @@ class DocPositionMgr(object):
     documents positions between sessions. Through the use of an in memory
     dictionary during run time and on disk dictionary to use when starting
     and stopping the editor.
+    The records are kept in least recently used order and the number of
+    records is limited to max_records. The on disk book is an append only
+    log of path=pos records where later records replace earlier ones, new
+    records are appended to it and it is only rewritten (compacted) when it
+    has grown to twice the size of the record limit. Records that were loaded
+    from the book are only checked for the existence of the file when they are
+    looked up.
     @note: saves config to ~/.Editra/cache/
 
     """
     _poscache = ebmlib.HistoryCache(100)
 
-    def __init__(self):
-        """Creates the position manager object"""
+    def __init__(self, max_records=1000):
+        """Creates the position manager object
+        @keyword max_records: maximum number of positions to remember
+
+        """
         super(DocPositionMgr, self).__init__()
 
         # Attributes
         self._init = False
         self._book = None
-        self._records = dict()
+        self._max = max(1, max_records)
+        self._records = dict()  # file name -> (position, use count)
+        self._order = collections.deque() # (use count, name) oldest first
+        self._uses = 0
+        self._unchecked = set() # Loaded records not validated yet
+        self._pending = list()  # Records not written to the book yet
+        self._nlines = 0        # Number of records in the on disk book
+        self._loaded = False
 
     def InitPositionCache(self, book_path):
         """Initialize and load the on disk document position cache.
@@ -78,7 +97,9 @@ class DocPositionMgr(object):
 
         """
         if len(vals) == 2:
-            self._records[vals[0]] = vals[1]
+            self._SetRecord(vals[0], vals[1])
+            self._unchecked.discard(vals[0])
+            self._pending.append((vals[0], vals[1]))
             return True
         else:
             return False
@@ -152,7 +173,20 @@ class DocPositionMgr(object):
         @return: position value for the given filename
 
         """
-        return self._records.get(name, 0)
+        record = self._records.get(name, None)
+        if record is None:
+            return 0
+
+        if name in self._unchecked:
+            self._unchecked.discard(name)
+            if not os.path.exists(name):
+                del self._records[name]
+                return 0
+
+        # Move to most recently used, also in the book
+        self._SetRecord(name, record[0])
+        self._pending.append((name, record[0]))
+        return record[0]
 
     def IsInitialized(self):
         """Has the cache been initialized
@@ -164,50 +198,46 @@ class DocPositionMgr(object):
     def LoadBook(self, book):
         """Loads a set of records from an on disk dictionary
         the entries are formated as key=value with one entry
-        per line in the file.
+        per line in the file. Later entries replace earlier ones.
         @param book: path to saved file
         @return: whether book was loaded or not
 
         """
-        # If file does not exist create it and return
+        self._loaded = True
         if not os.path.exists(book):
-            try:
-                tfile = util.GetFileWriter(book)
-                tfile.close()
-            except (IOError, OSError):
-                util.Log("[docpositionmgr][err] failed to load book: %s" % book)
-                return False
-            except AttributeError:
-                util.Log("[docpositionmgr][err] Failed to create: %s" % book)
-                return False
+            return True
 
         reader = util.GetFileReader(book, sys.getfilesystemencoding())
-        if reader != -1:
-            lines = list()
-            try:
-                lines = reader.readlines()
-            except:
-                reader.close()
-                return False
-            else:
-                reader.close()
+        if reader == -1:
+            util.Log("[docpositionmgr][err] failed to load book: %s" % book)
+            return False
 
-            for line in lines:
-                line = line.strip()
-                vals = line.rsplit(u'=', 1)
-                if len(vals) != 2 or not os.path.exists(vals[0]):
-                    continue
+        try:
+            lines = reader.readlines()
+        except:
+            reader.close()
+            util.Log("[docpositionmgr][err] failed to read book: %s" % book)
+            return False
+        else:
+            reader.close()
 
-                try:
-                    vals[1] = int(vals[1])
-                except (TypeError, ValueError), msg:
-                    util.Log("[docpositionmgr][err] %s" % str(msg))
-                    continue
-                else:
-                    self._records[vals[0]] = vals[1]
+        self._nlines = len(lines)
+        for line in lines:
+            vals = line.strip().rsplit(u'=', 1)
+            if len(vals) != 2:
+                continue
 
-            util.Log("[docpositionmgr][info] successfully loaded book")
-            return True
+            try:
+                pos = int(vals[1])
+            except (TypeError, ValueError), msg:
+                util.Log("[docpositionmgr][err] %s" % str(msg))
+                continue
+            else:
+                self._SetRecord(vals[0], pos)
+                self._unchecked.add(vals[0])
+
+        util.Log("[docpositionmgr][info] successfully loaded book")
+        return True
 
     @classmethod
     def PeekNavi(cls, pre=False):
@@ -225,20 +255,66 @@ class DocPositionMgr(object):
         return None, None
 
     def WriteBook(self):
-        """Writes the collection of files=pos to the config file
+        """Writes the records that were added since the last write to the
+        end of the config file. The whole file is rewritten with the current
+        records if it has grown larger than twice the record limit.
         @postcondition: in memory doc data is written out to disk
 
         """
-        writer = util.GetFileWriter(self.GetBook(), sys.getfilesystemencoding())
-        if writer != -1:
-            try:
-                for key, val in self._records.iteritems():
-                    try:
-                        writer.write(u"%s=%d\n" % (key, val))
-                    except UnicodeDecodeError:
-                        continue
-                writer.close()
-            except IOError, msg:
-                util.Log("[docpositionmgr][err] %s" % str(msg))
+        if not self._loaded or \
+           self._nlines + len(self._pending) > self._max * 2:
+            records = sorted(self._records.items(), key=lambda rec: rec[1][1])
+            records = [ (name, rec[0]) for name, rec in records ]
+            mode = 'wb'
         else:
+            records = self._pending
+            mode = 'ab'
+
+        try:
+            writer = codecs.open(self.GetBook(), mode,
+                                 sys.getfilesystemencoding())
+        except (IOError, OSError, LookupError, TypeError):
             util.Log("[docpositionmgr][err] Failed to open %s" % self.GetBook())
+            return
+
+        nlines = 0
+        try:
+            for key, val in records:
+                try:
+                    writer.write(u"%s=%d\n" % (key, val))
+                except (UnicodeDecodeError, UnicodeEncodeError):
+                    continue
+                nlines += 1
+            writer.close()
+        except IOError, msg:
+            util.Log("[docpositionmgr][err] %s" % str(msg))
+        else:
+            if mode == 'wb':
+                self._nlines = nlines
+                self._loaded = True
+            else:
+                self._nlines += nlines
+            del self._pending[:]
+
+    def _SetRecord(self, name, pos):
+        """Set the position of a file as the most recently used record and
+        discard the least recently used records that are over the limit.
+        @param name: file name
+        @param pos: position
+
+        """
+        self._uses += 1
+        self._records[name] = (pos, self._uses)
+        self._order.append((self._uses, name))
+        while len(self._records) > self._max:
+            # Entries of records that were used again later are skipped
+            uses, key = self._order.popleft()
+            if self._records.get(key, (0, None))[1] == uses:
+                del self._records[key]
+                self._unchecked.discard(key)
+
+        if len(self._order) > self._max * 2:
+            # Drop the skipped entries
+            order = [ (rec[1], key) for key, rec in self._records.iteritems() ]
+            order.sort()
+            self._order = collections.deque(order)
@@ -19,9 +19,11 @@ __revision__ = "$Revision: 69798 $"
 
 # Text Utils
 from searcheng import *
+from trigram import *
 from fchecker import *
 from fileutil import *
 from _dirmon import *
+from _filemon import *
 from fileimpl import *
 from txtutil import *
 from logfile import *
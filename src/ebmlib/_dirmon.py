@@ -9,6 +9,9 @@
 """
 Editra Business Model Library: DirectoryMonitor
 
+Monitors directories for added, deleted and modified files. On Linux the
+kernels inotify interface is used to get notified of changes, on other
+platforms (or if inotify is not available) the directories are polled.
 
 """
 
@@ -22,12 +25,59 @@ __all__ = ['DirectoryMonitor',]
 # Imports
 import wx
 import os
+import sys
 import time
+import errno
+import select
+import struct
 import threading
 
 # Local imports
 import fileutil
 
+#-----------------------------------------------------------------------------#
+# Globals
+
+# inotify constants (sys/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+              IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | \
+              IN_MOVE_SELF | IN_ONLYDIR
+_SELF_MASK = IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED
+_EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, len
+
+_LIBC = None
+if sys.platform.startswith('linux'):
+    try:
+        import ctypes
+        import ctypes.util
+        _LIBC = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                            use_errno=True)
+        _LIBC.inotify_init.argtypes = []
+        _LIBC.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                            ctypes.c_uint32]
+        _LIBC.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (ImportError, OSError, AttributeError):
+        _LIBC = None
+
+#-----------------------------------------------------------------------------#
+
+def _PathKey(path):
+    """Get the key to compare paths of directory entries by"""
+    return os.path.normcase(path)
+
 #-----------------------------------------------------------------------------#
 
 class DirectoryMonitor(object):
@@ -37,7 +87,16 @@ class DirectoryMonitor(object):
         super(DirectoryMonitor, self).__init__()
 
         # Attributes
-        self._watcher = WatcherThread(self._ThreadNotifier, checkFreq=checkFreq)
+        self._watcher = None
+        if _LIBC is not None:
+            try:
+                self._watcher = InotifyWatcherThread(self._ThreadNotifier,
+                                                     checkFreq=checkFreq)
+            except OSError:
+                pass
+        if self._watcher is None:
+            self._watcher = WatcherThread(self._ThreadNotifier,
+                                          checkFreq=checkFreq)
         self._callbacks = list()
         self._cbackLock = threading.Lock()
         self._running = False
@@ -177,51 +236,12 @@ class WatcherThread(threading.Thread):
                     self._suspendcond.wait()
 
             with self._lock:
-                for dobj in self._PendingRefresh:
+                for dobj in list(self._PendingRefresh):
                     if not self._continue:
                         return
                     elif self._changePending:
                         break
-
-                    # Check if a watched directory has been deleted
-                    if not os.path.exists(dobj.Path):
-                        deleted.append(dobj)
-                        self._dirs.remove(dobj)
-                        continue
-
-                    snapshot = fileutil.GetDirectoryObject(dobj.Path, 
-                                                           False, True)
-
-                    # Check for deletions
-                    dobjFiles = dobj.Files # optimization
-                    dobjIndex = dobjFiles.index # optimization
-                    snapFiles = snapshot.Files # optimization
-                    for tobj in dobjFiles:
-                        if not self._continue:
-                            return
-                        elif self._changePending:
-                            break
-                        if tobj not in snapFiles:
-                            deleted.append(tobj)
-                            dobjFiles.remove(tobj)
-
-                    # Check for additions and modifications
-                    for tobj in snapFiles:
-                        if not self._continue:
-                            return
-                        elif self._changePending:
-                            break
-                        if tobj not in dobjFiles:
-                            # new object was added
-                            added.append(tobj)
-                            dobjFiles.append(tobj)
-                        else:
-                            idx = dobjIndex(tobj)
-                            existing = dobjFiles[idx]
-                            # object was modified
-                            if existing.ModTime < tobj.ModTime:
-                                modified.append(tobj)
-                                existing.ModTime = tobj.ModTime
+                    self._RefreshDirectory(dobj, added, deleted, modified)
 
             # Call Notifier if anything changed
             if any((added, deleted, modified)):
@@ -239,6 +259,47 @@ class WatcherThread(threading.Thread):
 
     #---- Implementation ----#
 
+    def _RefreshDirectory(self, dobj, added, deleted, modified):
+        """Update a watched directory object with a new snapshot of the
+        directory and collect the changes. The snapshots are compared by path
+        so this is linear in the size of the directory.
+        @param dobj: watched L{fileutil.Directory}
+        @param added: list to add new File objects to
+        @param deleted: list to add removed File objects to
+        @param modified: list to add modified File objects to
+
+        """
+        # Check if a watched directory has been deleted
+        try:
+            snapshot = fileutil.GetDirectoryObject(dobj.Path, False, True)
+        except (AssertionError, OSError):
+            snapshot = None
+        if snapshot is None or not os.path.exists(dobj.Path):
+            deleted.append(dobj)
+            if dobj in self._dirs:
+                self._dirs.remove(dobj)
+            return
+
+        current = dict((_PathKey(fobj.Path), fobj) for fobj in dobj.Files)
+        files = list()
+        for tobj in snapshot.Files:
+            existing = current.pop(_PathKey(tobj.Path), None)
+            if existing is None:
+                # new object was added
+                added.append(tobj)
+                files.append(tobj)
+            else:
+                # object was modified
+                if existing.ModTime < tobj.ModTime:
+                    modified.append(existing)
+                    existing.ModTime = tobj.ModTime
+                files.append(existing)
+
+        if current:
+            deleted.extend([ fobj for fobj in dobj.Files
+                             if _PathKey(fobj.Path) in current ])
+        dobj.Files[:] = files
+
     @property
     def _PendingRefresh(self):
         """Get the list of directories pending refresh"""
@@ -329,3 +390,299 @@ class WatcherThread(threading.Thread):
         self._suspend = False
         with self._suspendcond:
             self._suspendcond.notify()
+
+#-----------------------------------------------------------------------------#
+
+class InotifyWatcherThread(WatcherThread):
+    """Background thread that monitors directories with inotify. Changes
+    are only looked at for the directories the kernel reported events for,
+    so the cost of watching large idle directories is nothing. Directories
+    that can not be watched (i.e the watch limit is reached) are polled.
+    @note: requires Linux
+    @note: changes to the contents of a sub directory are only reported if
+           the sub directory is watched as well.
+
+    """
+    def __init__(self, notifier, checkFreq=1000.0):
+        """Create the InotifyWatcherThread
+        @param notifier: callable([added,], [deleted,], [modified,])
+        @keyword checkFreq: minimum time between notifications in
+                            milliseconds. If value is set to zero or less
+                            notifications are only sent on calls to Refresh.
+        @raise OSError: if inotify can not be initialized
+
+        """
+        super(InotifyWatcherThread, self).__init__(notifier, checkFreq)
+
+        # Attributes
+        self._fd = _LIBC.inotify_init()
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._wakeR, self._wakeW = os.pipe()
+        self._wds = dict()      # watch descriptor -> Directory
+        self._events = dict()   # watch descriptor -> [(mask, name),]
+        self._overflow = False
+        self._refreshPending = False
+
+    def run(self):
+        """Run the watcher"""
+        last = 0
+        try:
+            while self._continue:
+                # Watch is empty so wait on things to monitor before continuing
+                if not self._dirs:
+                    with self._listEmptyCond:
+                        self._listEmptyCond.wait()
+
+                # Suspend processing if requested
+                if self._suspend:
+                    with self._suspendcond:
+                        self._suspendcond.wait()
+
+                freq = self._freq / 1000.0
+                timeout = None
+                if freq > 0 and (self._events or self._overflow or \
+                                 len(self._wds) < len(self._dirs)):
+                    timeout = max(0, last + freq - time.time())
+
+                try:
+                    ready = select.select([self._fd, self._wakeR], [], [],
+                                          timeout)[0]
+                except select.error, err:
+                    if err.args[0] == errno.EINTR:
+                        continue
+                    raise
+                if self._wakeR in ready:
+                    os.read(self._wakeR, 512)
+                if self._fd in ready:
+                    self._ReadEvents()
+
+                if not self._continue:
+                    break
+                elif freq > 0:
+                    # Automatic updates
+                    if time.time() < last + freq:
+                        continue
+                    refresh = None
+                elif self._refreshPending:
+                    # Manually controlled updates
+                    refresh = self._refreshDirs
+                    self._refreshDirs = None
+                    self._refreshPending = False
+                else:
+                    continue
+
+                last = time.time()
+                added = list()
+                deleted = list()
+                modified = list()
+                with self._lock:
+                    self._Update(refresh, added, deleted, modified)
+
+                # Call Notifier if anything changed
+                if any((added, deleted, modified)):
+                    self._notifier(added, deleted, modified)
+        finally:
+            for fd in (self._fd, self._wakeR, self._wakeW):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+    #---- Implementation ----#
+
+    def _ApplyEvents(self, wd, dobj, events, added, deleted, modified):
+        """Update a watched directory object from the events reported for it
+        @param wd: watch descriptor
+        @param dobj: watched L{fileutil.Directory}
+        @param events: list of (mask, name)
+
+        """
+        names = set()
+        for mask, name in events:
+            if mask & _SELF_MASK:
+                if not os.path.isdir(dobj.Path):
+                    # Watched directory was deleted or moved
+                    deleted.append(dobj)
+                    self._RemoveWatch(wd)
+                    if dobj in self._dirs:
+                        self._dirs.remove(dobj)
+                    return
+            elif name:
+                names.add(name)
+
+        unicodePath = isinstance(dobj.Path, unicode)
+        encoding = sys.getfilesystemencoding() or 'utf-8'
+        current = dict((_PathKey(fobj.Path), fobj) for fobj in dobj.Files)
+        gone = set()
+        for name in names:
+            if unicodePath:
+                try:
+                    name = name.decode(encoding)
+                except UnicodeDecodeError:
+                    continue
+
+            path = os.path.join(dobj.Path, name)
+            key = _PathKey(path)
+            existing = current.get(key, None)
+            if os.path.exists(path):
+                if existing is None:
+                    # new object was added
+                    if os.path.isdir(path):
+                        tobj = fileutil.Directory(path)
+                    else:
+                        tobj = fileutil.File(path)
+                    added.append(tobj)
+                    dobj.Files.append(tobj)
+                    current[key] = tobj
+                else:
+                    # object was modified
+                    mtime = fileutil.GetFileModTime(path)
+                    if existing.ModTime < mtime:
+                        modified.append(existing)
+                        existing.ModTime = mtime
+            elif existing is not None:
+                deleted.append(existing)
+                gone.add(key)
+
+        if gone:
+            dobj.Files[:] = [ fobj for fobj in dobj.Files
+                              if _PathKey(fobj.Path) not in gone ]
+
+    def _ReadEvents(self):
+        """Read the pending events from the inotify file descriptor"""
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError:
+            return
+
+        pos = 0
+        hsize = _EVENT_HEADER.size
+        while pos + hsize <= len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, pos)
+            name = data[pos + hsize:pos + hsize + length].rstrip('\0')
+            pos += hsize + length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost so everything needs to be checked
+                self._overflow = True
+            else:
+                self._events.setdefault(wd, list()).append((mask, name))
+
+    def _RemoveWatch(self, wd):
+        """Remove a watch descriptor from the inotify instance
+        @param wd: watch descriptor
+
+        """
+        if wd in self._wds:
+            del self._wds[wd]
+            _LIBC.inotify_rm_watch(self._fd, wd)
+        self._events.pop(wd, None)
+
+    def _Update(self, refresh, added, deleted, modified):
+        """Update the watched directories and collect the changes
+        @param refresh: list of directories to update or None for all
+
+        """
+        watched = dict((id(dobj), wd) for wd, dobj in self._wds.iteritems())
+        if refresh is None:
+            dirs = list(self._dirs)
+        else:
+            lookup = dict((_PathKey(dobj.Path), dobj) for dobj in self._dirs)
+            dirs = [ lookup[_PathKey(dobj.Path)] for dobj in refresh
+                     if _PathKey(dobj.Path) in lookup ]
+
+        overflow = self._overflow
+        self._overflow = False
+        for dobj in dirs:
+            wd = watched.get(id(dobj), None)
+            if wd is None or overflow:
+                self._events.pop(wd, None)
+                self._RefreshDirectory(dobj, added, deleted, modified)
+            else:
+                events = self._events.pop(wd, None)
+                if events:
+                    self._ApplyEvents(wd, dobj, events,
+                                      added, deleted, modified)
+
+        if overflow and refresh is not None:
+            # Directories that were not refreshed still need a full check
+            self._overflow = True
+
+        # Drop events for watches that are no longer in use
+        for wd in self._events.keys():
+            if wd not in self._wds:
+                del self._events[wd]
+
+    def _Wake(self):
+        """Wake up the thread if it is waiting for events"""
+        try:
+            os.write(self._wakeW, 'x')
+        except OSError:
+            pass
+
+    def AddWatchDirectory(self, dpath):
+        """Add a directory to the watch list
+        @param dpath: directory path (unicode)
+        @return: bool - True means watch was added, False means unable to list directory
+
+        """
+        # Add the watch before taking the snapshot so no changes are missed
+        path = dpath
+        if isinstance(path, unicode):
+            path = path.encode(sys.getfilesystemencoding() or 'utf-8')
+        wd = _LIBC.inotify_add_watch(self._fd, path, _WATCH_MASK)
+
+        rval = super(InotifyWatcherThread, self).AddWatchDirectory(dpath)
+        with self._lock:
+            if wd >= 0 and wd not in self._wds:
+                key = _PathKey(fileutil.Directory(dpath).Path)
+                for dobj in self._dirs:
+                    if _PathKey(dobj.Path) == key:
+                        self._wds[wd] = dobj
+                        break
+                else:
+                    _LIBC.inotify_rm_watch(self._fd, wd)
+        self._Wake()
+        return rval
+
+    def RemoveWatchDirectory(self, dpath):
+        """Remove a directory from the watch
+        @param dpath: directory path to remove (unicode)
+
+        """
+        super(InotifyWatcherThread, self).RemoveWatchDirectory(dpath)
+        with self._lock:
+            current = set([ id(dobj) for dobj in self._dirs ])
+            for wd, dobj in self._wds.items():
+                if id(dobj) not in current:
+                    self._RemoveWatch(wd)
+
+    def SetFrequency(self, milli):
+        """Set the update frequency
+        @param milli: int (milliseconds)
+
+        """
+        super(InotifyWatcherThread, self).SetFrequency(milli)
+        self._Wake()
+
+    def Refresh(self, paths=None):
+        """Recheck the monitored directories
+        only useful when manually controlling refresh cycle of the monitor.
+        @keyword paths: if None refresh all, else list of specific directories
+
+        """
+        with self._lock:
+            if paths is None:
+                self._refreshDirs = None
+            elif not self._refreshPending:
+                self._refreshDirs = list(paths)
+            elif self._refreshDirs is not None:
+                self._refreshDirs.extend(paths)
+            self._refreshPending = True
+        self._Wake()
+
+    def Shutdown(self):
+        """Shut the thread down"""
+        super(InotifyWatcherThread, self).Shutdown()
+        self._Wake()
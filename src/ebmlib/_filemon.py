@@ -0,0 +1,318 @@
+###############################################################################
+# Name: _filemon.py                                                           #
+# Purpose: Background file state monitor.                                     #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+Editra Business Model Library: FileStateMonitor
+
+Keeps the on disk state (existence, modification time and permissions) of a
+set of files up to date on a background thread so that the state can be
+looked up without doing any file system access. The files are checked in
+batches of a limited size so that watching a large number of files on a slow
+file system (i.e NFS) does not cause a burst of I/O.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+__all__ = ['FileStateMonitor', 'FileState', 'GetFileState']
+
+#-----------------------------------------------------------------------------#
+# Imports
+import wx
+import os
+import time
+import threading
+import collections
+
+#-----------------------------------------------------------------------------#
+
+class FileState(object):
+    """Snapshot of the on disk state of a file"""
+    __slots__ = ('exists', 'mtime', 'readonly')
+    def __init__(self, exists=False, mtime=0, readonly=False):
+        super(FileState, self).__init__()
+
+        # Attributes
+        self.exists = exists
+        self.mtime = mtime
+        self.readonly = readonly
+
+    def __eq__(self, other):
+        return isinstance(other, FileState) and \
+               (self.exists, self.mtime, self.readonly) == \
+               (other.exists, other.mtime, other.readonly)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return "FileState(exists=%s, mtime=%s, readonly=%s)" % \
+               (self.exists, self.mtime, self.readonly)
+
+def GetFileState(path):
+    """Get the current on disk state of a file
+    @param path: file path
+    @return: L{FileState}
+
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except (OSError, EnvironmentError):
+        return FileState()
+    readonly = not os.access(path, os.R_OK|os.W_OK)
+    return FileState(True, mtime, readonly)
+
+#-----------------------------------------------------------------------------#
+
+class FileStateMonitor(object):
+    """Object to manage monitoring the state of a set of files"""
+    def __init__(self, checkFreq=1000.0, batchSize=32):
+        """@keyword checkFreq: time between check cycles in milliseconds
+        @keyword batchSize: maximum number of files to check per cycle
+
+        """
+        super(FileStateMonitor, self).__init__()
+
+        # Attributes
+        self._watcher = FileStateThread(self._ThreadNotifier,
+                                        checkFreq, batchSize)
+        self._watcher.setDaemon(True)
+        self._callbacks = list()
+        self._cbackLock = threading.Lock()
+        self._running = False
+
+    def __del__(self):
+        if self._running:
+            self._watcher.Shutdown()
+
+    def _ThreadNotifier(self, changed):
+        """Notifier callback from background L{FileStateThread}
+        to call notifiers on main thread.
+        @note: this method is invoked from a background thread and
+               is not safe to make direct UI calls from.
+
+        """
+        with self._cbackLock:
+            for cback in self._callbacks:
+                wx.CallAfter(cback, changed)
+
+    #---- Properties ----#
+
+    # Is the monitor currently running
+    Monitoring = property(lambda self: self._running)
+
+    #---- End Properties ----#
+
+    def AddFile(self, path):
+        """Add a file to the monitor. Files are reference counted, a file
+        that was added more than once needs to be removed as many times.
+        @param path: file path
+
+        """
+        self._watcher.AddWatchFile(path)
+
+    def GetState(self, path):
+        """Get the last known state of a file
+        @param path: file path
+        @return: L{FileState} or None if the file has not been checked yet
+
+        """
+        return self._watcher.GetState(path)
+
+    def SubscribeCallback(self, callback):
+        """Subscribe a callback method to be called when the state of one
+        of the monitored files changes.
+        @param callback: callable({path : FileState,})
+
+        """
+        with self._cbackLock:
+            if callback not in self._callbacks:
+                self._callbacks.append(callback)
+
+    def UnsubscribeCallback(self, callback):
+        """Remove a callback method from the monitor"""
+        with self._cbackLock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def RemoveFile(self, path):
+        """Remove a file from the monitor
+        @param path: file path
+
+        """
+        self._watcher.RemoveWatchFile(path)
+
+    def StartMonitoring(self):
+        """Start monitoring the files in the watch list"""
+        self._running = True
+        self._watcher.start()
+
+    def Refresh(self, paths):
+        """Forget the known state of the given files and check them again
+        ahead of the regular cycle. Use this after the file was changed by
+        the application itself (i.e after saving it).
+        @param paths: list of file paths
+
+        """
+        self._watcher.Refresh(paths)
+
+    def Shutdown(self):
+        """Stop the background thread"""
+        self._running = False
+        self._watcher.Shutdown()
+
+#-----------------------------------------------------------------------------#
+
+class FileStateThread(threading.Thread):
+    """Background thread that checks the state of a set of files. Every
+    cycle checks at most batchSize files, starting with the files that were
+    just added or refreshed and continuing with the others in round robin
+    order.
+
+    """
+    def __init__(self, notifier, checkFreq=1000.0, batchSize=32):
+        """Create the FileStateThread. The notifier will be called in the
+        context of this thread with a dictionary of the files whose state
+        has changed since they were last checked.
+        @param notifier: callable({path : FileState,})
+        @keyword checkFreq: time between check cycles in milliseconds
+        @keyword batchSize: maximum number of files to check per cycle
+
+        """
+        super(FileStateThread, self).__init__()
+
+        # Attributes
+        assert callable(notifier)
+        self._notifier = notifier
+        self._freq = checkFreq
+        self._batch = max(1, batchSize)
+        self._continue = True
+        self._cond = threading.Condition()
+        self._refs = dict()                 # path -> reference count
+        self._states = dict()               # path -> FileState
+        self._gens = dict()                 # path -> refresh generation
+        self._order = collections.deque()   # round robin check order
+        self._pending = collections.deque() # paths to check next
+
+    def run(self):
+        """Run the watcher"""
+        cycle = 0
+        while True:
+            with self._cond:
+                while self._continue and not self._pending and \
+                      (not self._order or time.time() < cycle):
+                    timeout = None
+                    if self._order:
+                        timeout = cycle - time.time()
+                    self._cond.wait(timeout)
+
+                if not self._continue:
+                    break
+                batch = self._NextBatch(time.time() >= cycle)
+                if batch[1]:
+                    cycle = time.time() + (self._freq / 1000.0)
+
+            changed = dict()
+            for path, gen in batch[0]:
+                # Check outside of the lock, this is the slow part
+                state = GetFileState(path)
+                with self._cond:
+                    if self._gens.get(path, None) != gen:
+                        continue # Removed or refreshed while checking
+                    current = self._states.get(path, None)
+                    self._states[path] = state
+                if current is not None and current != state:
+                    changed[path] = state
+
+            # Call Notifier if anything changed
+            if changed:
+                self._notifier(changed)
+
+    #---- Implementation ----#
+
+    def _NextBatch(self, regular):
+        """Get the files to check in the next cycle
+        @param regular: include the next files in round robin order
+        @return: ([(path, generation),], bool included round robin files)
+        @note: call with the lock held
+
+        """
+        paths = list()
+        while self._pending and len(paths) < self._batch:
+            path = self._pending.popleft()
+            if path in self._refs and path not in paths:
+                paths.append(path)
+
+        rrobin = regular and len(paths) < self._batch
+        if rrobin:
+            for _ in xrange(min(len(self._order), self._batch - len(paths))):
+                path = self._order[0]
+                self._order.rotate(-1)
+                if path not in paths:
+                    paths.append(path)
+        return [ (path, self._gens[path]) for path in paths ], rrobin
+
+    def AddWatchFile(self, path):
+        """Add a file to the watch list
+        @param path: file path
+
+        """
+        with self._cond:
+            if path in self._refs:
+                self._refs[path] += 1
+            else:
+                self._refs[path] = 1
+                self._gens[path] = 0
+                self._order.append(path)
+                self._pending.append(path)
+                self._cond.notify()
+
+    def GetState(self, path):
+        """Get the last known state of a file
+        @param path: file path
+        @return: L{FileState} or None
+
+        """
+        with self._cond:
+            return self._states.get(path, None)
+
+    def RemoveWatchFile(self, path):
+        """Remove a file from the watch list
+        @param path: file path
+
+        """
+        with self._cond:
+            count = self._refs.get(path, 0) - 1
+            if count > 0:
+                self._refs[path] = count
+            elif count == 0:
+                del self._refs[path]
+                del self._gens[path]
+                self._states.pop(path, None)
+                self._order.remove(path)
+
+    def Refresh(self, paths):
+        """Forget the known state of the given files and check them next
+        @param paths: list of file paths
+
+        """
+        with self._cond:
+            for path in paths:
+                if path in self._refs:
+                    self._gens[path] += 1
+                    self._states.pop(path, None)
+                    self._pending.append(path)
+            self._cond.notify()
+
+    def Shutdown(self):
+        """Shut the thread down"""
+        with self._cond:
+            self._continue = False
+            self._cond.notify()
@@ -9,7 +9,8 @@
 """
 Editra Business Model Library: FileBackupMgr
 
-Helper class for managing and creating backups of files.
+Helper class for managing and creating backups of files and the
+L{EditJournal} for incrementally backing up the edits made to a document.
 
 """
 
@@ -17,12 +18,13 @@ __author__ = "Cody Precord <cprecord@editra.org>"
 __cvsid__ = "$Id: backupmgr.py 67646 2011-04-29 03:07:20Z CJP $"
 __revision__ = "$Revision: 67646 $"
 
-__all__ = [ 'FileBackupMgr', ]
+__all__ = [ 'FileBackupMgr', 'EditJournal' ]
 
 #-----------------------------------------------------------------------------#
 # Imports
 import os
 import shutil
+import threading
 
 # Local Imports
 import fileutil
@@ -177,3 +179,335 @@ class FileBackupMgr(object):
         """
         assert '\n' not in header, "Header must only be a single line"
         self.header = header
+
+#-----------------------------------------------------------------------------#
+
+class EditJournal(object):
+    """Append only journal of the edits made to a document since it was last
+    saved. Edits are recorded as insertions and deletions at byte positions
+    of the utf-8 encoded text and appended to the journal file when it is
+    flushed, so the cost of a backup is proportional to the size of the
+    edits and not to the size of the document. The document can be
+    recovered by replaying the journal over the saved file.
+
+    Journal file format::
+        EDJOURNAL1 <saved file size> <saved file mod time>
+        S <length>\n<data>\n     (snapshot of the whole document)
+        I <pos> <length>\n<data>\n
+        D <pos> <length>\n
+
+    Only files that start with the journal header are removed or
+    overwritten, so other backup files at the journal path are left alone.
+
+    """
+    MAGIC = "EDJOURNAL1"
+
+    def __init__(self, path):
+        """Create the journal
+        @param path: path of the journal file
+
+        """
+        super(EditJournal, self).__init__()
+
+        # Attributes
+        self.path = path
+        self._lock = threading.Lock()  # Protects the pending edits
+        self._wlock = threading.Lock() # Serializes writing of the file
+        self._base = (0, 0)            # (size, mod time) of the saved file
+        self._pending = list()         # [[kind, pos, data or length],]
+        self._snapshot = None          # Pending snapshot data
+        self._rewrite = True           # Rewrite the file on next flush
+        self._size = 0                 # Size of the file
+        self._closed = False           # Journal was closed
+
+    #---- Implementation ----#
+
+    def _ReadHeader(self, handle):
+        """Read and parse the journal header
+        @return: (size, mod time) or None if not a valid journal
+
+        """
+        header = handle.readline().split()
+        if len(header) != 3 or header[0] != EditJournal.MAGIC:
+            return None
+        try:
+            return (int(header[1]), float(header[2]))
+        except ValueError:
+            return None
+
+    def _IsForeign(self):
+        """Check if there is a file at the journal path that is not a journal
+        @return: bool
+
+        """
+        try:
+            handle = open(self.path, 'rb')
+        except (IOError, OSError):
+            return False
+
+        try:
+            return handle.read(len(EditJournal.MAGIC)) != EditJournal.MAGIC
+        finally:
+            handle.close()
+
+    def _RemoveFile(self):
+        """Remove the journal file
+        @note: call with the write lock held
+
+        """
+        try:
+            if os.path.exists(self.path) and not self._IsForeign():
+                os.remove(self.path)
+        except (IOError, OSError):
+            pass
+        self._size = 0
+
+    #---- Public Api ----#
+
+    def AddDelete(self, pos, length):
+        """Record the deletion of text from the document
+        @param pos: byte position
+        @param length: number of bytes deleted
+
+        """
+        if length <= 0 or self._closed:
+            return
+
+        with self._lock:
+            last = self._pending and self._pending[-1] or None
+            if last is not None and last[0] == 'I' and \
+               last[1] <= pos and pos + length == last[1] + len(last[2]):
+                # Deleting the end of the last insertion (i.e backspace)
+                last[2] = last[2][:pos - last[1]]
+                if not last[2]:
+                    self._pending.pop()
+            elif last is not None and last[0] == 'D' and pos == last[1]:
+                last[2] += length # Forward delete
+            elif last is not None and last[0] == 'D' and \
+                 pos + length == last[1]:
+                last[1] = pos     # Backspace
+                last[2] += length
+            else:
+                self._pending.append(['D', pos, length])
+
+    def AddInsert(self, pos, data):
+        """Record the insertion of text into the document
+        @param pos: byte position
+        @param data: utf-8 encoded string of the inserted text
+
+        """
+        if not data or self._closed:
+            return
+
+        with self._lock:
+            last = self._pending and self._pending[-1] or None
+            if last is not None and last[0] == 'I' and \
+               pos == last[1] + len(last[2]):
+                last[2] += data # Typing
+            else:
+                self._pending.append(['I', pos, data])
+
+    def Close(self, remove=True):
+        """Stop recording edits and remove the journal file. Flushes that
+        were queued before the journal was closed do nothing.
+        @keyword remove: remove the journal file
+
+        """
+        with self._wlock:
+            with self._lock:
+                self._closed = True
+                self._pending = list()
+                self._snapshot = None
+                self._rewrite = False
+            if remove:
+                self._RemoveFile()
+
+    def Exists(self):
+        """Does the journal file exist
+        @return: bool
+
+        """
+        return os.path.exists(self.path)
+
+    def Flush(self):
+        """Append the edits recorded since the last flush to the journal
+        file. Safe to call from a background thread.
+        @return: bool (False if the journal could not be written)
+
+        """
+        with self._wlock:
+            if self._closed:
+                return True
+
+            with self._lock:
+                pending = self._pending
+                self._pending = list()
+                snapshot = self._snapshot
+                self._snapshot = None
+                rewrite = self._rewrite
+                self._rewrite = False
+                base = self._base
+
+            if rewrite and snapshot is None and not pending:
+                # Back at the save point, nothing to recover
+                self._RemoveFile()
+                return True
+
+            if not rewrite and snapshot is None and not pending:
+                return True
+
+            # Nothing was written since the save point so start the file
+            rewrite = rewrite or not self._size
+
+            records = list()
+            if rewrite:
+                records.append("%s %d %r\n" % (EditJournal.MAGIC,
+                                                 base[0], base[1]))
+            if snapshot is not None:
+                records.append("S %d\n%s\n" % (len(snapshot), snapshot))
+            for kind, pos, data in pending:
+                if kind == 'I':
+                    records.append("I %d %d\n%s\n" % (pos, len(data), data))
+                else:
+                    records.append("D %d %d\n" % (pos, data))
+
+            data = "".join(records)
+            try:
+                if rewrite and self._IsForeign():
+                    raise IOError("Not a journal file: %s" % self.path)
+                handle = open(self.path, rewrite and 'wb' or 'ab')
+                try:
+                    handle.write(data)
+                finally:
+                    handle.close()
+            except (IOError, OSError):
+                # Rewrite the journal on the next flush
+                with self._lock:
+                    self._rewrite = True
+                return False
+
+            if rewrite:
+                self._size = 0
+            self._size += len(data)
+            return True
+
+    def GetSize(self):
+        """Get the size of the journal file as of the last flush
+        @return: int
+
+        """
+        return self._size
+
+    def HasPending(self):
+        """Are there edits that have not been written to the journal
+        @return: bool
+
+        """
+        return bool(self._pending or self._snapshot is not None or \
+                    self._rewrite)
+
+    def IsRecoverable(self, size, mtime):
+        """Check if the journal file has edits for the given saved state
+        of the file.
+        @param size: current size of the saved file
+        @param mtime: current modification time of the saved file
+        @return: bool
+
+        """
+        try:
+            handle = open(self.path, 'rb')
+            try:
+                base = self._ReadHeader(handle)
+                more = handle.read(1)
+            finally:
+                handle.close()
+        except (IOError, OSError):
+            return False
+        return base == (size, mtime) and bool(more)
+
+    def Recover(self, data):
+        """Replay the journal over the contents of the saved file. If the
+        last record of the journal is incomplete (i.e the application
+        crashed while writing it) the edits up to that record are recovered.
+        @param data: utf-8 encoded contents of the saved file
+        @return: utf-8 encoded contents of the document or None if the
+                 journal is invalid.
+
+        """
+        text = bytearray(data)
+        try:
+            handle = open(self.path, 'rb')
+        except (IOError, OSError):
+            return None
+
+        try:
+            if self._ReadHeader(handle) is None:
+                return None
+
+            while True:
+                record = handle.readline()
+                if not record.endswith("\n"):
+                    break
+                record = record.split()
+                try:
+                    nums = [ int(num) for num in record[1:] ]
+                except ValueError:
+                    break
+
+                if not record:
+                    break
+                elif (record[0], len(nums)) in (('S', 1), ('I', 2)):
+                    value = handle.read(nums[-1] + 1)
+                    if len(value) != nums[-1] + 1 or value[-1] != "\n":
+                        break
+                    if record[0] == 'S':
+                        text = bytearray(value[:-1])
+                    else:
+                        text[nums[0]:nums[0]] = value[:-1]
+                elif record[0] == 'D' and len(nums) == 2:
+                    del text[nums[0]:nums[0] + nums[1]]
+                else:
+                    break
+        finally:
+            handle.close()
+        return str(text)
+
+    def Remove(self):
+        """Remove the journal file and discard the edits that have not been
+        written to it yet. The file is started again by the next flush that
+        has new edits to write.
+
+        """
+        with self._wlock:
+            with self._lock:
+                self._pending = list()
+                self._snapshot = None
+                self._rewrite = False
+            self._RemoveFile()
+
+    def Reset(self, size, mtime):
+        """Start a new journal for the document after it was loaded from or
+        saved to disk. The journal file is removed on the next flush unless
+        new edits are made.
+        @param size: size of the saved file
+        @param mtime: modification time of the saved file
+
+        """
+        with self._lock:
+            self._closed = False
+            self._base = (size, mtime)
+            self._pending = list()
+            self._snapshot = None
+            self._rewrite = True
+
+    def SetSnapshot(self, data):
+        """Compact the journal by replacing all the edits recorded so far
+        with a snapshot of the document. The journal file is rewritten on
+        the next flush.
+        @param data: utf-8 encoded contents of the document
+
+        """
+        with self._lock:
+            self._pending = list()
+            self._snapshot = data
+            self._rewrite = True
@@ -44,6 +44,8 @@ class LogFile(object):
         # Attributes
         self.prefix = prefix
         self.logdir = logdir
+        self._handle = None # Open handle of the current log file
+        self._path = None
 
         # Setup
         if self.logdir is None:
@@ -55,29 +57,57 @@ class LogFile(object):
     Prefix = property(lambda self: self.prefix,
                       lambda self, prefix: setattr(self, 'prefix', prefix))
 
-    #---- Public Interface ----#
-    def WriteMessage(self, msg):
-        """Append the message to the current log file
-        @param msg: string object
+    #---- Implementation ----#
+    def _GetHandle(self):
+        """Get the handle of the current log file. The file is kept open
+        between writes and is switched when the date changes.
+        @return: file object or None
 
         """
         # Files are named as prefix_YYYY_MM_DD.log
         logstamp = "%d_%d_%d" % time.localtime()[:3]
         logname = "%s_%s.log" % (self.prefix, logstamp)
         logpath = os.path.join(self.logdir, logname)
-        if os.path.exists(logpath):
-            opencmd = "ab"
-        else:
-            opencmd = "wb"
-
-#        with open(logpath, opencmd) as handle:
-#            handle.write(msg.rstrip() + os.linesep)
-        try:
-            handle = open(logpath, opencmd)
-            handle.write(msg.rstrip() + os.linesep)
-            handle.close()
-        except IOError:
-            pass
+        if logpath != self._path:
+            self.Close()
+            try:
+                self._handle = open(logpath, "ab")
+            except IOError:
+                return None
+            self._path = logpath
+        return self._handle
+
+    #---- Public Interface ----#
+    def Close(self):
+        """Close the log file, it is reopened by the next write"""
+        if self._handle is not None:
+            try:
+                self._handle.close()
+            except IOError:
+                pass
+        self._handle = None
+        self._path = None
+
+    def WriteMessage(self, msg):
+        """Append the message to the current log file
+        @param msg: string object
+
+        """
+        self.WriteMessages([msg])
+
+    def WriteMessages(self, msgs):
+        """Append a batch of messages to the current log file and flush it
+        @param msgs: list of string objects
+
+        """
+        handle = self._GetHandle()
+        if handle is not None:
+            try:
+                handle.write("".join([ msg.rstrip() + os.linesep
+                                       for msg in msgs ]))
+                handle.flush()
+            except IOError:
+                self.Close()
 
     def PurgeOldLogs(self, days):
         """Purge all log files older than n days
@@ -17,7 +17,7 @@ __author__ = "Cody Precord <cprecord@editra.org>"
 __svnid__ = "$Id: $"
 __revision__ = "$Revision: $"
 
-__all__ = ['InstallTermHandler',
+__all__ = ['InstallTermHandler', 'GetPeakMemoryUsage',
            'GetWindowsDrives', 'GetWindowsDriveType',
            'GenericDrive', 'FixedDrive', 'CDROMDrive', 'RamDiskDrive', 'RemoteDrive',
            'RemovableDrive' ]
@@ -38,6 +38,11 @@ if wx.Platform == '__WXMSW__':
     else:
         HASWIN32 = True
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
 #-----------------------------------------------------------------------------#
 # Windows Drive Utilities
 
@@ -103,6 +108,19 @@ def GetWindowsDriveType(dname):
 
 #-----------------------------------------------------------------------------#
 
+def GetPeakMemoryUsage():
+    """Get the peak resident memory size of the process
+    @return: int (bytes) or -1 if not available on the platform
+
+    """
+    if resource is None:
+        return -1
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if wx.Platform == '__WXMAC__':
+        return peak # OSX reports bytes
+    return peak * 1024
+
 def InstallTermHandler(callback, *args, **kwargs):
     """Install exit app handler for sigterm (unix/linux)
     and uses SetConsoleCtrlHandler on Windows.
@@ -9,7 +9,9 @@
 """
 Editra Business Model Library: SearchEngine
 
-Text Search Engine for finding text and grepping files
+Text Search Engine for finding text and grepping files. Searches in
+directories and lists of files are fanned out to a pool of worker processes
+when more than one worker is configured (see L{SearchEngine.SetWorkers}).
 
 """
 
@@ -17,20 +19,52 @@ __author__ = "Cody Precord <cprecord@editra.org>"
 __cvsid__ = "$Id: searcheng.py 70206 2011-12-30 20:41:02Z CJP $"
 __revision__ = "$Revision: 70206 $"
 
-__all__ = [ 'SearchEngine', ]
+__all__ = [ 'SearchEngine', 'GetDefaultWorkers', 'SCAN_LINES', 'SCAN_MMAP' ]
 
 #-----------------------------------------------------------------------------#
 # Imports
 import os
 import re
+import sys
+import mmap
 import fnmatch
 import types
+import itertools
 import unicodedata
 from StringIO import StringIO
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
 
 # Local imports
 import fchecker
 
+#-----------------------------------------------------------------------------#
+# Globals
+
+# File scanning modes
+SCAN_LINES = 0  # Search each line of the file separately
+SCAN_MMAP = 1   # Search the whole memory mapped file at once
+
+# Minimum number of files in a list of files to use the worker processes for
+PARALLEL_MIN_FILES = 16
+# Number of files sent to a worker process at a time
+PARALLEL_CHUNK = 8
+
+def GetDefaultWorkers():
+    """Get the default number of worker processes for file searches
+    @return: int (1 if searches should not use worker processes)
+
+    """
+    # Frozen applications can not spawn the interpreter for new processes
+    if multiprocessing is None or getattr(sys, 'frozen', False):
+        return 1
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
 #-----------------------------------------------------------------------------#
 
 class SearchEngine(object):
@@ -64,6 +98,9 @@ class SearchEngine(object):
         self._lmatch = None             # Last match object
         self._filters = None            # File Filters
         self._formatter = lambda f, l, m: u"%s %d: %s" % (f, l+1, m)
+        self._workers = GetDefaultWorkers()
+        self._scanmode = SCAN_MMAP
+        self._cancel = False
         self._CompileRegex()
 
     def _CompileRegex(self):
@@ -112,6 +149,13 @@ class SearchEngine(object):
                 self._regex = None
         self._data = (tmp, self._pool)
 
+    def Cancel(self):
+        """Cancel the currently running file search. The worker processes
+        of the search are stopped when the search generator exits.
+
+        """
+        self._cancel = True
+
     def ClearPool(self):
         """Clear the search pool"""
         del self._pool
@@ -239,6 +283,20 @@ class SearchEngine(object):
         """
         return self._pool
 
+    def GetScanMode(self):
+        """Get the mode used for scanning files
+        @return: SCAN_LINES or SCAN_MMAP
+
+        """
+        return self._scanmode
+
+    def GetWorkers(self):
+        """Get the number of worker processes used for file searches
+        @return: int
+
+        """
+        return self._workers
+
     def IsMatchCase(self):
         """Is the engine set to a case sensitive search
         @return: bool
@@ -277,9 +335,30 @@ class SearchEngine(object):
         if self._regex is None:
             return
 
+        self._cancel = False
+        paths = self._WalkDirectory(directory, recursive)
+        if self._workers > 1:
+            search = self._SearchParallel(paths)
+        else:
+            search = self._SearchSequential(paths)
+
+        for match in search:
+            yield match
+        return
+
+    def _WalkDirectory(self, directory, recursive=True):
+        """Generate the paths of the files to search in a directory
+        @param directory: directory path
+        @keyword recursive: decend into sub directories
+
+        """
         # Get all files in the directories
-        paths = [os.path.join(directory, fname)
-                for fname in os.listdir(directory) if not fname.startswith('.')]
+        try:
+            paths = [os.path.join(directory, fname)
+                     for fname in os.listdir(directory)
+                     if not fname.startswith('.')]
+        except (IOError, OSError):
+            return
 
         # Filter out files that don't match the current filter(s)
         if self._filters is not None and len(self._filters):
@@ -292,18 +371,64 @@ class SearchEngine(object):
                 for pat in self._filters:
                     if fnmatch.fnmatch(fname, pat):
                         filtered.append(fname)
+                        break
             paths = filtered
 
-        # Begin searching in the paths
         for path in paths:
-            if recursive and os.path.isdir(path):
-                # Recursive call to decend into directories
-                for match in self.SearchInDirectory(path, recursive):
-                    yield match
+            if self._cancel:
+                break
+
+            if os.path.isdir(path):
+                if recursive:
+                    # Recursive call to decend into directories
+                    for fname in self._WalkDirectory(path, recursive):
+                        yield fname
             else:
-                for match in self.SearchInFile(path):
-                    yield match
-        return
+                yield path
+
+    def _SearchSequential(self, paths):
+        """Search in the given files one after another in this thread
+        @param paths: iterable of file names
+
+        """
+        for fname in paths:
+            for match in self.SearchInFile(fname):
+                yield match
+            if self._cancel:
+                break
+
+    def _SearchParallel(self, paths):
+        """Search in the given files using a pool of worker processes. The
+        results are yielded in the same order as the files.
+        @param paths: iterable of file names
+
+        """
+        try:
+            pool = multiprocessing.Pool(self._workers)
+        except (OSError, ImportError, NotImplementedError):
+            # Platform does not support process pools
+            for match in self._SearchSequential(paths):
+                yield match
+            return
+
+        regex = (self._regex.pattern, self._regex.flags, self._scanmode)
+        jobs = itertools.izip(paths, itertools.repeat(regex))
+        try:
+            for fname, lines in pool.imap(_SearchFileJob, jobs,
+                                          PARALLEL_CHUNK):
+                if self._cancel:
+                    break
+                if lines is None:
+                    continue # Not a readable text file
+
+                # Special token to signify start of a search
+                yield (None, fname)
+                for lnum, line in lines:
+                    yield self._formatter(fname, lnum, line)
+        finally:
+            # Also reached when the consumer stops iterating the results
+            pool.terminate()
+            pool.join()
 
     def SearchInFile(self, fname):
         """Search in a file for all lines with matches of the set query and
@@ -325,10 +450,12 @@ class SearchEngine(object):
                 # Special token to signify start of a search
                 yield (None, fname)
 
-            for lnum, line in enumerate(fobj):
-                if self._regex.search(line) is not None:
+            try:
+                scan = _SCANNERS.get(self._scanmode, _ScanLines)
+                for lnum, line in scan(fobj, self._regex):
                     yield self._formatter(fname, lnum, line)
-            fobj.close()
+            finally:
+                fobj.close()
         return
 
     def SearchInFiles(self, flist):
@@ -339,9 +466,14 @@ class SearchEngine(object):
         if self._regex is None:
             return
 
-        for fname in flist:
-            for match in self.SearchInFile(fname):
-                yield match
+        self._cancel = False
+        if self._workers > 1 and len(flist) >= PARALLEL_MIN_FILES:
+            search = self._SearchParallel(flist)
+        else:
+            search = self._SearchSequential(flist)
+
+        for match in search:
+            yield match
         return
 
     def SearchInString(self, sstring, startpos=0):
@@ -391,6 +523,16 @@ class SearchEngine(object):
         assert callable(funct)
         self._formatter = funct
 
+    def SetScanMode(self, mode):
+        """Set how files are scanned for matches. SCAN_MMAP maps the file
+        into memory and searches all of it with the regular expression at
+        once, which is faster and also allows the expression to match
+        across lines. SCAN_LINES searches each line separately.
+        @param mode: SCAN_LINES or SCAN_MMAP
+
+        """
+        self._scanmode = mode
+
     def SetSearchPool(self, pool):
         """Set the search pool used by the Find methods
         @param pool: string to search in
@@ -408,6 +550,15 @@ class SearchEngine(object):
         self._query = query
         self._CompileRegex()
 
+    def SetWorkers(self, workers):
+        """Set the number of worker processes to use for searching in
+        directories and lists of files. A value of 1 or less searches the
+        files sequentially in the calling thread.
+        @param workers: int
+
+        """
+        self._workers = max(1, workers)
+
     def SetUseRegex(self, use=True):
         """Set whether the engine is using regular expresion searches or
         not.
@@ -416,3 +567,110 @@ class SearchEngine(object):
         """
         self._isregex = use
         self._CompileRegex()
+
+#-----------------------------------------------------------------------------#
+# Worker process functions
+
+_CHECKER = fchecker.FileTypeChecker()
+_REGEX_CACHE = dict()
+
+def _SearchFileJob(job):
+    """Search a file for all lines with matches of a regular expression.
+    Runs in the worker processes of L{SearchEngine._SearchParallel}.
+    @param job: (file name, (regex pattern, regex flags, scan mode))
+    @return: (file name, list of (line number, line)) the list is None if the
+             file is not a readable text file.
+
+    """
+    fname, (pattern, flags, mode) = job
+    regex = _REGEX_CACHE.get((pattern, flags), None)
+    if regex is None:
+        regex = re.compile(pattern, flags)
+        _REGEX_CACHE[(pattern, flags)] = regex
+
+    try:
+        fobj = open(fname, 'rb')
+    except (IOError, OSError):
+        return fname, None
+
+    try:
+        # Check the file type from the same handle used for the search
+        if _CHECKER.IsBinaryBytes(fobj.read(4096)):
+            return fname, None
+        fobj.seek(0)
+        lines = list(_SCANNERS.get(mode, _ScanLines)(fobj, regex))
+    except (IOError, OSError):
+        lines = None
+    finally:
+        fobj.close()
+    return fname, lines
+
+#-----------------------------------------------------------------------------#
+# File scanners
+
+def _ScanLines(fobj, regex):
+    """Search each line of a file
+    @param fobj: file object
+    @param regex: compiled regular expression
+    @return: generator of (line number, line) for each line with a match
+
+    """
+    for lnum, line in enumerate(fobj):
+        if regex.search(line) is not None:
+            yield (lnum, line)
+
+def _ScanMapped(fobj, regex):
+    """Search a file by mapping it into memory and running the regular
+    expression over all of it. The line numbers are only computed for
+    the matches by counting the newlines between them. Each line is
+    reported once even if it contains more than one match, and a match
+    that spans lines is reported on the line it starts on.
+    @param fobj: file object
+    @param regex: compiled regular expression
+    @return: generator of (line number, line) for each line with a match
+
+    """
+    try:
+        fobj.seek(0, os.SEEK_END)
+        size = fobj.tell()
+        fobj.seek(0)
+        if not size:
+            return
+        buff = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+    except (EnvironmentError, ValueError):
+        # Can't map the file (i.e special files) so read it a line at a time
+        for match in _ScanLines(fobj, regex):
+            yield match
+        return
+
+    try:
+        lnum = 0    # Line number of the line starting at pos
+        pos = 0
+        search = regex.search
+        find = buff.find
+        while pos < size:
+            match = search(buff, pos)
+            if match is None:
+                break
+            mstart = match.start()
+            if mstart >= size:
+                break
+
+            end = find('\n', mstart)
+            if end == -1:
+                end = size - 1
+            start = buff.rfind('\n', pos, mstart) + 1
+            if start:
+                lnum += buff[pos:start].count('\n')
+            else:
+                start = pos
+            yield (lnum, buff[start:end + 1])
+
+            # Continue the search on the next line
+            pos = end + 1
+            lnum += 1
+    finally:
+        buff.close()
+
+_SCANNERS = { SCAN_LINES : _ScanLines,
+              SCAN_MMAP : _ScanMapped }
@@ -0,0 +1,396 @@
+###############################################################################
+# Name: trigram.py                                                            #
+# Purpose: Persistent trigram index of the files in a directory tree          #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+Editra Business Model Library: TrigramIndex
+
+Index of the trigrams (three byte sequences) found in the files of a directory
+tree, used for narrowing down the files that need to be searched for a query.
+For each file the set of its (lower case) trigrams is kept as a bloom filter
+stored in a long integer, so testing a file against the trigrams of a query is
+a single bitwise and. The index is kept up to date from the modification time
+and size of the files and can be saved to disk between sessions.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+__all__ = [ 'TrigramIndex', 'GetQueryTrigrams' ]
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import re
+import stat
+import struct
+import fnmatch
+import marshal
+import binascii
+import threading
+
+# Local imports
+import fchecker
+
+#-----------------------------------------------------------------------------#
+# Globals
+INDEX_VERSION = 1
+MAX_FILE_SIZE = 4 * 1024 * 1024 # Larger files are always searched
+BITS_PER_TRIGRAM = 4            # Size of the bloom filters
+
+# Signature values for files without a bloom filter
+_UNINDEXED = -1                 # File is always a candidate
+_BINARY = -2                    # File is never a candidate
+
+_TRIGRAM_RE = re.compile('(?=(...))', re.S)
+_VERBOSE_RE = re.compile(r'\(\?[a-zA-Z]*x')
+_CHECKER = fchecker.FileTypeChecker()
+
+#-----------------------------------------------------------------------------#
+
+class TrigramIndex(object):
+    """Trigram index of the files under a root directory"""
+    def __init__(self, root, path=None):
+        """Create the index
+        @param root: directory to index
+        @keyword path: file to store the index in
+
+        """
+        super(TrigramIndex, self).__init__()
+
+        # Attributes
+        self._root = root
+        self._path = path
+        self._files = dict()    # path -> (mtime, size, bits, signature)
+        self._order = list()    # Paths in directory walk order
+        self._lock = threading.Lock()
+        self._changed = False
+
+        self.Load()
+
+    def __len__(self):
+        return len(self._files)
+
+    Root = property(lambda self: self._root)
+
+    @staticmethod
+    def _Signature(fname):
+        """Compute the bloom filter of a files trigrams
+        @param fname: file path
+        @return: (bits, signature)
+
+        """
+        try:
+            handle = open(fname, 'rb')
+            try:
+                data = handle.read(MAX_FILE_SIZE + 1)
+            finally:
+                handle.close()
+        except (IOError, OSError):
+            return 0, _UNINDEXED
+
+        if _CHECKER.IsBinaryBytes(data[:4096]):
+            return 0, _BINARY
+        if len(data) > MAX_FILE_SIZE:
+            return 0, _UNINDEXED
+
+        trigrams = set(_TRIGRAM_RE.findall(data.lower()))
+        bits = 64
+        while bits < len(trigrams) * BITS_PER_TRIGRAM:
+            bits *= 2
+
+        bloom = bytearray(bits / 8)
+        for tri in trigrams:
+            bit = _Hash(tri, bits)
+            bloom[bit >> 3] |= (1 << (bit & 7))
+        bloom.reverse() # Make bit n of the filter bit n of the long
+        return bits, long(binascii.hexlify(bloom), 16)
+
+    def _Walk(self, directory):
+        """Walk the directory tree updating the files that have changed
+        @param directory: directory path
+
+        """
+        try:
+            names = os.listdir(directory)
+        except (IOError, OSError):
+            return
+
+        for name in names:
+            if name.startswith('.'):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                info = os.stat(path)
+            except (IOError, OSError):
+                continue
+
+            if stat.S_ISDIR(info.st_mode):
+                self._Walk(path)
+            elif stat.S_ISREG(info.st_mode):
+                self._order.append(path)
+                rec = self._files.get(path, None)
+                if rec is None or rec[0] != info.st_mtime or \
+                   rec[1] != info.st_size:
+                    bits, sig = TrigramIndex._Signature(path)
+                    self._files[path] = (info.st_mtime, info.st_size, bits, sig)
+                    self._changed = True
+
+    def GetCandidates(self, trigrams, recursive=True, filters=None):
+        """Get the files that may contain all the given trigrams. The index is
+        refreshed before the query.
+        @param trigrams: list of lower case trigrams
+        @keyword recursive: include the files in sub directories
+        @keyword filters: list of file name patterns the files must match
+        @return: list of file paths in directory walk order
+
+        """
+        self._lock.acquire()
+        try:
+            self.Refresh()
+
+            # Masks for each size of bloom filter
+            masks = dict()
+            rlist = list()
+            for path in self._order:
+                if not recursive and os.path.dirname(path) != self._root:
+                    continue
+                if filters and \
+                   not [ pat for pat in filters if fnmatch.fnmatch(path, pat) ]:
+                    continue
+
+                bits, sig = self._files[path][2:]
+                if sig == _BINARY:
+                    continue
+                if sig != _UNINDEXED and len(trigrams):
+                    mask = masks.get(bits, None)
+                    if mask is None:
+                        mask = 0L
+                        for tri in trigrams:
+                            mask |= (1L << _Hash(tri, bits))
+                        masks[bits] = mask
+                    if sig & mask != mask:
+                        continue
+                rlist.append(path)
+            return rlist
+        finally:
+            self._lock.release()
+
+    def Load(self):
+        """Load the index from disk
+        @return: bool
+
+        """
+        if not self._path or not os.path.exists(self._path):
+            return False
+
+        try:
+            handle = open(self._path, 'rb')
+            try:
+                data = marshal.load(handle)
+            finally:
+                handle.close()
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return False
+
+        if not isinstance(data, dict) or \
+           data.get('version', None) != INDEX_VERSION or \
+           data.get('root', None) != self._root:
+            return False
+
+        self._files = data.get('files', dict())
+        return True
+
+    def Refresh(self):
+        """Bring the index up to date with the files on disk
+        @return: bool (True if the index changed)
+
+        """
+        self._order = list()
+        self._Walk(self._root)
+        if len(self._files) != len(self._order):
+            # Drop the files that have been removed
+            current = set(self._order)
+            for path in self._files.keys():
+                if path not in current:
+                    del self._files[path]
+            self._changed = True
+        changed = self._changed
+        if changed:
+            self.Save()
+        return changed
+
+    def Save(self):
+        """Save the index to disk
+        @return: bool
+
+        """
+        if not self._path:
+            return False
+
+        tmp = self._path + u".tmp"
+        try:
+            handle = open(tmp, 'wb')
+            try:
+                marshal.dump(dict(version=INDEX_VERSION, root=self._root,
+                                  files=self._files), handle)
+            finally:
+                handle.close()
+            if os.path.exists(self._path):
+                os.remove(self._path)
+            os.rename(tmp, self._path)
+        except (IOError, OSError, ValueError):
+            return False
+
+        self._changed = False
+        return True
+
+#-----------------------------------------------------------------------------#
+
+def _Hash(trigram, bits):
+    """Get the bloom filter bit of a trigram
+    @param trigram: three byte string
+    @param bits: size of the bloom filter (power of 2)
+    @return: int
+
+    """
+    val = struct.unpack('>I', '\0' + trigram)[0]
+    return ((val * 2654435761) >> 8) & (bits - 1)
+
+def GetQueryTrigrams(query, regex=False):
+    """Get the trigrams that every file that matches a query must contain.
+    Only the ascii parts of the literal text of the query are used so the
+    result does not depend on the encoding or case of the files.
+    @param query: search string
+    @keyword regex: is the query a regular expression
+    @return: list of lower case trigrams or None if the query can not be
+             narrowed down (i.e complex regular expressions).
+
+    """
+    if regex:
+        literals = _RegexLiterals(query)
+        if literals is None:
+            return None
+    else:
+        literals = [ query, ]
+
+    trigrams = set()
+    for literal in literals:
+        # Split at non ascii characters
+        for part in re.split(u'[^\x00-\x7f]+', literal):
+            part = part.lower().encode('ascii')
+            trigrams.update(_TRIGRAM_RE.findall(part))
+    return sorted(trigrams)
+
+def _RegexLiterals(pattern):
+    """Get the runs of literal text in a simple regular expression. Text in
+    groups and character sets is skipped.
+    @param pattern: regular expression
+    @return: list of strings or None if the expression has top level
+             alternatives or uses verbose mode.
+
+    """
+    if _VERBOSE_RE.search(pattern):
+        return None
+
+    literals = list()
+    current = u''
+    depth = 0
+    idx = 0
+    while idx < len(pattern):
+        char = pattern[idx]
+        if char == u'\\' and idx + 1 < len(pattern):
+            nchar = pattern[idx + 1]
+            idx = _SkipEscape(pattern, idx)
+            if depth:
+                continue
+            elif nchar.isalnum():
+                # Character class (\w, \d, ...), anchor (\b, ...) or a
+                # numeric escape (\x41, \101, ...) whose value is not known
+                literals.append(current)
+                current = u''
+            else:
+                current += nchar
+            continue
+        elif char == u'[':
+            idx = _SkipSet(pattern, idx)
+            if idx == -1:
+                return None
+            char = None
+        elif char == u'(':
+            depth += 1
+        elif char == u')':
+            depth = max(0, depth - 1)
+        elif depth:
+            pass
+        elif char == u'|':
+            return None
+        elif char in u'*?{':
+            # The previous character is optional
+            current = current[:-1]
+            if char == u'{':
+                idx = max(idx, pattern.find(u'}', idx))
+        elif char not in u'.^$+}':
+            current += char
+            idx += 1
+            continue
+
+        literals.append(current)
+        current = u''
+        idx += 1
+    literals.append(current)
+    return [ literal for literal in literals if len(literal) >= 3 ]
+
+def _SkipEscape(pattern, idx):
+    """Find the end of the escape sequence starting at idx, including the
+    digits of numeric escapes such as \\x41, \\u0041, \\101 or \\1.
+    @param pattern: regular expression
+    @param idx: index of the backslash
+    @return: index of the first character after the escape
+
+    """
+    char = pattern[idx + 1]
+    idx += 2
+    if char in u'xuU':
+        digits = u'0123456789abcdefABCDEF'
+        count = { u'x' : 2, u'u' : 4, u'U' : 8 }[char]
+    elif char.isdigit():
+        digits = u'0123456789'
+        count = 2
+    elif char == u'N' and pattern[idx:idx + 1] == u'{':
+        end = pattern.find(u'}', idx)
+        return len(pattern) if end == -1 else end + 1
+    else:
+        return idx
+
+    while count and pattern[idx:idx + 1] and pattern[idx] in digits:
+        idx += 1
+        count -= 1
+    return idx
+
+def _SkipSet(pattern, idx):
+    """Find the end of the character set starting at idx
+    @param pattern: regular expression
+    @param idx: index of the opening bracket
+    @return: index of the closing bracket or -1
+
+    """
+    idx += 1
+    if pattern[idx:idx + 1] == u'^':
+        idx += 1
+    if pattern[idx:idx + 1] == u']':
+        idx += 1
+    while idx < len(pattern):
+        if pattern[idx] == u'\\':
+            idx += 2
+            continue
+        elif pattern[idx] == u']':
+            return idx
+        idx += 1
+    return -1
@@ -11,20 +11,38 @@ Editra Business Model Library: Text Utilities
 
 Utility functions for managing and working with text.
 
+The text edit functions work on the utf-8 encoded text of a document, so the
+positions of the edits are the byte positions used by the StyledTextCtrl. An
+edit is a (start, end, replacement) tuple, edits are in ascending order and
+don't overlap so they can be applied to the control in reverse order without
+adjusting the positions.
+
 """
 
 __author__ = "Cody Precord <cprecord@editra.org>"
 __svnid__ = "$Id: txtutil.py 67991 2011-06-20 23:48:01Z CJP $"
 __revision__ = "$Revision: 67991 $"
 
-__all__ = [ 'IsUnicode', 'DecodeString']
+__all__ = [ 'IsUnicode', 'DecodeString', 'GetTextEdits', 'GetTrimEdits',
+            'GetTabEdits', 'MergeLineEdits', 'ApplyTextEdits',
+            'MapEditPosition']
 
 #-----------------------------------------------------------------------------#
 # Imports
+import re
 import types
 
 #-----------------------------------------------------------------------------#
 
+# Trailing whitespace (any unicode whitespace other than the line endings) of
+# the decoded text, the look behind makes each run only be scanned once
+TRAILING_WS_RE = re.compile(ur'(?<![^\S\r\n])[^\S\r\n]+(?=[\r\n]|\Z)',
+                            re.UNICODE)
+# Trailing ascii whitespace of text that is not valid utf-8
+_BYTES_WS_RE = re.compile(r'(?<![ \t\x0b\x0c])[ \t\x0b\x0c]+(?=[\r\n]|\Z)')
+
+#-----------------------------------------------------------------------------#
+
 def IsUnicode(txt):
     """Is the given string a unicode string
     @param txt: object
@@ -44,3 +62,132 @@ def DecodeString(txt, enc):
     if IsUnicode(txt):
         txt = txt.decode(enc)
     return txt
+
+def GetTextEdits(data, regex, repl, start=0, end=None):
+    """Get the edits for replacing all matches of the regular expression
+    with the replacement string in a single pass over the text.
+    @param data: utf-8 encoded text
+    @param regex: compiled regular expression
+    @param repl: replacement string (not a template)
+    @keyword start: position to start searching at
+    @keyword end: position to stop searching at
+    @return: list of (start, end, replacement) tuples
+
+    """
+    if end is None:
+        end = len(data)
+    return [ match.span() + (repl,)
+             for match in regex.finditer(data, start, end) ]
+
+def MergeLineEdits(data, edits):
+    """Merge the edits that are on the same line into a single edit so
+    that there is at most one edit per line to apply.
+    @param data: utf-8 encoded text the edits are for
+    @param edits: list of (start, end, replacement) tuples
+    @return: list of (start, end, replacement) tuples
+
+    """
+    merged = list()
+    parts = list()
+    seg_start = seg_end = -1
+    for start, end, repl in edits:
+        if seg_start != -1:
+            if data.find('\n', seg_end, start) != -1 or \
+               data.find('\r', seg_end, start) != -1:
+                merged.append((seg_start, seg_end, ''.join(parts)))
+                del parts[:]
+                seg_start = -1
+            else:
+                parts.append(data[seg_end:start])
+
+        if seg_start == -1:
+            seg_start = start
+        seg_end = end
+        parts.append(repl)
+
+    if seg_start != -1:
+        merged.append((seg_start, seg_end, ''.join(parts)))
+    return merged
+
+def GetTrimEdits(data, start=0, end=None):
+    """Get the edits that remove the trailing whitespace from all lines
+    @param data: utf-8 encoded text
+    @keyword start: position to start at
+    @keyword end: position to stop at
+    @return: list of (start, end, replacement) tuples
+
+    """
+    if end is None:
+        end = len(data)
+    try:
+        text = data[start:end].decode('utf-8')
+    except UnicodeDecodeError:
+        return GetTextEdits(data, _BYTES_WS_RE, '', start, end)
+
+    if len(text) == end - start:
+        # Ascii text, character and byte positions are the same
+        return [ (start + match.start(), start + match.end(), '')
+                 for match in TRAILING_WS_RE.finditer(text) ]
+
+    # Map the character positions of the matches to byte positions
+    edits = list()
+    cpos = bpos = start
+    for match in TRAILING_WS_RE.finditer(text):
+        mstart, mend = match.span()
+        bstart = bpos + len(text[cpos - start:mstart].encode('utf-8'))
+        bend = bstart + len(match.group().encode('utf-8'))
+        edits.append((bstart, bend, ''))
+        cpos, bpos = start + mend, bend
+    return edits
+
+def GetTabEdits(data, tabw, to_tabs, start=0, end=None):
+    """Get the edits that convert tabs to spaces or spaces to tabs
+    @param data: utf-8 encoded text
+    @param tabw: number of spaces per tab
+    @param to_tabs: convert spaces to tabs (True) or tabs to spaces (False)
+    @keyword start: position to start at
+    @keyword end: position to stop at
+    @return: list of (start, end, replacement) tuples
+
+    """
+    if to_tabs:
+        regex, repl = re.compile(re.escape(' ' * tabw)), '\t'
+    else:
+        regex, repl = re.compile('\t'), ' ' * tabw
+    return GetTextEdits(data, regex, repl, start, end)
+
+def ApplyTextEdits(data, edits):
+    """Get the text that results from applying the edits
+    @param data: text
+    @param edits: list of (start, end, replacement) tuples
+    @return: new text
+
+    """
+    parts = list()
+    last = 0
+    for start, end, repl in edits:
+        parts.append(data[last:start])
+        parts.append(repl)
+        last = end
+    parts.append(data[last:])
+    return ''.join(parts)
+
+def MapEditPosition(edits, pos):
+    """Get the position in the edited text that corresponds to a position
+    in the original text. Positions inside of an edited range are kept at
+    the same offset in the replacement when possible. Use the edits from
+    before they were merged with L{MergeLineEdits} for exact results.
+    @param edits: list of (start, end, replacement) tuples
+    @param pos: position in the original text
+    @return: int
+
+    """
+    delta = 0
+    for start, end, repl in edits:
+        if end <= pos:
+            delta += len(repl) - (end - start)
+        else:
+            if start < pos:
+                return start + delta + min(pos - start, len(repl))
+            break
+    return pos + delta
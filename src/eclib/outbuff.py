@@ -81,6 +81,7 @@ __all__ = ["OutputBuffer", "OutputBufferEvent", "ProcessBufferMixin",
 import os
 import sys
 import time
+import codecs
 import errno
 import signal
 import threading
@@ -119,6 +120,12 @@ OPB_ALL_STYLES = (wx.stc.STC_STYLE_DEFAULT, wx.stc.STC_STYLE_CONTROLCHAR,
 OPB_ERROR_NONE            = 0
 OPB_ERROR_INVALID_COMMAND = -1
 
+# Output pipeline limits
+OPB_READ_SIZE = 65536     # Max bytes read from a process pipe at a time
+OPB_FRAME_SIZE = 262144   # Max bytes of process output posted in one update
+OPB_FRAME_TIME = 0.05     # Max seconds to collect output for one update
+OPB_FLUSH_SIZE = 1048576  # Max characters added to the buffer per timer tick
+
 #--------------------------------------------------------------------------#
 
 # Event for notifying that the process has started running
@@ -263,13 +270,42 @@ class OutputBuffer(wx.stc.StyledTextCtrl):
         self.__SetupStyles()
 
     def FlushBuffer(self):
-        """Flush the update buffer
-        @postcondition: The update buffer is empty
+        """Flush the update buffer. To keep the ui responsive at most
+        OPB_FLUSH_SIZE characters are added to the buffer per call, and text
+        that would be trimmed right away by the line buffering limit is
+        never added.
+        @postcondition: The update buffer is empty or holds the output that
+                        did not fit in this flush.
 
         """
         self._updating.acquire()
+        txt = u''.join(self._updates)
+        self._updates = list()
+        self._updating.release()
+
+        # Only the last lines of the output are kept when line buffering, if
+        # the update has more lines than that all of the current text goes.
+        trim = self._line_buffer > 0 and \
+               txt.count(u'\n') >= self._line_buffer
+        if trim:
+            idx = len(txt)
+            for line in xrange(self._line_buffer):
+                idx = txt.rfind(u'\n', 0, idx)
+            txt = txt[idx + 1:]
+
+        # Leave the rest of a large update for the next flush
+        if len(txt) > OPB_FLUSH_SIZE:
+            idx = txt.rfind(u'\n', 0, OPB_FLUSH_SIZE)
+            if idx == -1:
+                idx = OPB_FLUSH_SIZE - 1
+            self._updating.acquire()
+            self._updates.insert(0, txt[idx + 1:])
+            self._updating.release()
+            txt = txt[:idx + 1]
+
         self.SetReadOnly(False)
-        txt = u''.join(self._updates[:])
+        if trim:
+            self.ClearAll()
         start = self.GetLength()
         if u'\0' in txt:
             # HACK: handle displaying NULLs in the STC
@@ -277,11 +313,9 @@ class OutputBuffer(wx.stc.StyledTextCtrl):
         else:
             self.AppendText(txt)
         self.GotoPos(self.GetLength())
-        self._updates = list()
         self.ApplyStyles(start, txt)
         self.SetReadOnly(True)
         self.RefreshBufferedLines()
-        self._updating.release()
 
     def __SetupStyles(self, font=None):
         """Setup the default styles of the text in the buffer
@@ -481,11 +515,17 @@ class OutputBuffer(wx.stc.StyledTextCtrl):
         if self._line_buffer < 0:
             return
 
-        self.SetReadOnly(False)
-        while self.GetLineCount() > self._line_buffer:
-            self.SetCurrentPos(0)
-            self.LineDelete()
-        self.SetReadOnly(True)
+        # Remove all the extra lines with a single range delete
+        excess = self.GetLineCount() - self._line_buffer
+        if excess > 0:
+            end = self.PositionFromLine(excess)
+            if end < 0:
+                end = self.GetLength()
+            self.SetReadOnly(False)
+            self.SetTargetStart(0)
+            self.SetTargetEnd(end)
+            self.ReplaceTarget(u'')
+            self.SetReadOnly(True)
         self.SetCurrentPos(self.GetLength())
 
     def SetDefaultColor(self, fore=None, back=None):
@@ -583,7 +623,8 @@ class OutputBuffer(wx.stc.StyledTextCtrl):
     def Stop(self):
         """Stop the update process of the buffer"""
         # Dump any output still left in tmp buffer before stopping
-        self.OnTimer(None)
+        while len(self._updates):
+            self.OnTimer(None)
         self._timer.Stop()
         self.SetReadOnly(True)
 
@@ -690,6 +731,9 @@ class ProcessThreadBase(threading.Thread):
         self._parent = parent       # Parent Window/Event Handler
         self._sig_abort = signal.SIGTERM    # default signal to kill process
         self._last_cmd = u""        # Last run command
+        self._decoder = None        # Incremental decoder for the output
+        self._ready = threading.Event() # Set when last update was processed
+        self._ready.set()
 
     #---- Properties ----#
     LastCommand = property(lambda self: self._last_cmd,
@@ -698,7 +742,11 @@ class ProcessThreadBase(threading.Thread):
     Process = property(lambda self: self._proc)
 
     def __DoOneRead(self):
-        """Read one line of output and post results.
+        """Read the next frame of output and post the results. Only one
+        update is waiting to be processed by the parent at a time, the next
+        frame is not posted until the parent has processed the previous one.
+        A process that outputs faster than it can be displayed is held back by
+        its pipe.
         @return: bool (True if more), (False if not)
 
         """
@@ -726,44 +774,68 @@ class ProcessThreadBase(threading.Thread):
             except (subprocess.pywintypes.error, Exception), msg:
                 if msg[0] in (109, errno.ESHUTDOWN):
                     return False
+            more = True
         else:
             # OSX and Unix nonblocking pipe read implementation
             if self._proc.stdout is None:
                 return False
-
-            flags = fcntl.fcntl(self._proc.stdout, fcntl.F_GETFL)
-            if not self._proc.stdout.closed:
-                fcntl.fcntl(self._proc.stdout,
-                            fcntl.F_SETFL,
-                            flags|os.O_NONBLOCK)
-
-            try:
-                try:
-                    if not select.select([self._proc.stdout], [], [], 1)[0]:
-                        return True
-
-                    read = self._proc.stdout.read(4096)
-                    if read == '':
-                        return False
-                except IOError, msg:
-                    return False
-            finally:
-                if not self._proc.stdout.closed:
-                    fcntl.fcntl(self._proc.stdout, fcntl.F_SETFL, flags)
-
-        # Ignore encoding errors and return an empty line instead
-        try:
-            result = read.decode(sys.getfilesystemencoding())
-        except UnicodeDecodeError:
-            result = os.linesep
+            read, more = self.__ReadFrame()
+            if not len(read):
+                return more
+
+        if self._decoder is None:
+            decoder = codecs.getincrementaldecoder(sys.getfilesystemencoding())
+            self._decoder = decoder('replace')
+        result = self._decoder.decode(read, not more)
+
+        # Wait for the parent to catch up with the last update
+        while not self._ready.isSet():
+            if self.abort or not self.Parent:
+                return False
+            self._ready.wait(0.1)
 
         if self.Parent:
             evt = OutputBufferEvent(edEVT_UPDATE_TEXT, self.Parent.GetId(), result)
+            self._ready.clear()
             wx.PostEvent(self.Parent, evt)
-            return True
+            wx.CallAfter(self._ready.set)
+            return more
         else:
             return False # Parent is dead no need to keep running
 
+    def __ReadFrame(self):
+        """Collect the output that is available from the process pipe for up
+        to OPB_FRAME_TIME seconds or OPB_FRAME_SIZE bytes.
+        @return: (string, bool) (output, True if more)
+
+        """
+        fileno = self._proc.stdout.fileno()
+        chunks = list()
+        size = 0
+        timeout = 1 # wait up to a second for the first output
+        end = None
+        while size < OPB_FRAME_SIZE and not self.abort:
+            try:
+                if not select.select([fileno], [], [], timeout)[0]:
+                    break
+                read = os.read(fileno, OPB_READ_SIZE)
+            except (OSError, IOError, select.error), msg:
+                if msg[0] in (errno.EAGAIN, errno.EINTR):
+                    continue
+                return ''.join(chunks), False
+
+            if not len(read):
+                return ''.join(chunks), False # Process closed its output
+
+            chunks.append(read)
+            size += len(read)
+            if end is None:
+                end = time.time() + OPB_FRAME_TIME
+            timeout = end - time.time()
+            if timeout <= 0:
+                break
+        return ''.join(chunks), True
+
     def __KillPid(self, pid):
         """Kill a process by process id, causing the run loop to exit
         @param pid: Id of process to kill
@@ -833,6 +905,12 @@ class ProcessThreadBase(threading.Thread):
         err = None
         try:
             self._proc = self.DoPopen()
+            if not subprocess.mswindows and self._proc.stdout is not None:
+                # Reads are only done when select reports output, so the
+                # pipe can stay in non-blocking mode for the whole run.
+                fileno = self._proc.stdout.fileno()
+                flags = fcntl.fcntl(fileno, fcntl.F_GETFL)
+                fcntl.fcntl(fileno, fcntl.F_SETFL, flags|os.O_NONBLOCK)
         except OSError, msg:
             # NOTE: throws WindowsError on Windows which is a subclass of
             #       OSError, so it will still get caught here.
@@ -32,7 +32,9 @@ import ed_msg
 import ed_txt
 from syntax import syntax
 from syntax import synglob
+from syntax import synlexer
 import autocomp
+from autocomp import simplecomp
 from extern import vertedit
 from profiler import Profile_Get
 import plugin
@@ -460,6 +462,7 @@ class EditraBaseStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
 
         # Set the Container Lexer Method
         self._code['clexer'] = clexer
+        synlexer.ResetState(self)
         # Auto-indenter function
         self._code['indenter'] = indenter
 
@@ -828,6 +831,7 @@ class EditraBaseStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
             self._code['compsvc'] = completer
         else:
             extend = Profile_Get('AUTO_COMP_EX') # Using extended autocomp?
+            simplecomp.SetMergeBuffers(Profile_Get('AUTO_COMP_ALLBUFF'))
             self._code['compsvc'] = autocomp.AutoCompService.GetCompleter(self, extend)
 
     def LoadFile(self, path):
@@ -900,6 +904,15 @@ class EditraBaseStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
 
     def OnModified(self, evt):
         """Handle modify events, includes style changes!"""
+        if evt.GetModificationType() & (wx.stc.STC_MOD_INSERTTEXT | \
+                                        wx.stc.STC_MOD_DELETETEXT):
+            line = self.LineFromPosition(evt.GetPosition())
+            # Keep the container lexers checkpoints in sync with the text
+            if self._code['clexer'] is not None:
+                synlexer.UpdateState(self, line, evt.GetLinesAdded())
+            # Keep the word completion index in sync with the text
+            simplecomp.UpdateIndex(self, line, evt.GetLinesAdded())
+
         if self.VertEdit.Enabled:
             self.VertEdit.OnModified(evt)
         else:
@@ -1046,6 +1059,7 @@ class EditraBaseStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
             if self._code['clexer'] is not None:
                 self.Unbind(wx.stc.EVT_STC_STYLENEEDED)
                 self._code['clexer'] = None
+                synlexer.ResetState(self)
 
         super(EditraBaseStc, self).SetLexer(lexer)
 
@@ -28,6 +28,7 @@ import ed_menu
 import ed_msg
 import ed_stc
 import ed_tab
+import ed_thread
 from doctools import DocPositionMgr
 from profiler import Profile_Get
 from util import Log, SetClipboardText
@@ -88,6 +89,8 @@ class EdEditorView(ed_stc.EditraStc, ed_tab.EdTabBase):
         self._spell = STCSpellCheck(self, check_region=self.IsNonCode)
         self._caret_w = 1
         self._focused = True
+        self._fmon = (u'', 0) # (path, mod time) registered with file monitor
+        self._fcheck = False  # First state of the registered file not checked
         spref = Profile_Get('SPELLCHECK', default=dict())
         self._spell_data = dict(choices=list(),
                                 word=('', -1, -1),
@@ -122,14 +125,21 @@ class EdEditorView(ed_stc.EditraStc, ed_tab.EdTabBase):
                     'AUTO_INDENT', 'HLCARETLINE', 'SPELLCHECK', 'VI_EMU',
                     'VI_NORMAL_DEFAULT', 'USETABS', 'TABWIDTH', 'INDENTWIDTH',
                     'BSUNINDENT', 'EOL_MODE', 'AALIASING', 'SHOW_EOL', 'SHOW_LN',
-                    'SHOW_WS', 'WRAP', 'VIEWVERTSPACE'):
+                    'SHOW_WS', 'WRAP', 'VIEWVERTSPACE', 'AUTO_COMP_ALLBUFF'):
             ed_msg.Subscribe(self.OnConfigMsg,
                              ed_msg.EDMSG_PROFILE_CHANGE + (opt,))
 
+        # Subscribe for changes to the on disk state of the file
+        ed_thread.EdFileMonitor().SubscribeCallback(self.OnFileStateChange)
+
     def OnDestroy(self, evt):
         """Cleanup message handlers on destroy"""
         if evt.Id == self.Id:
             ed_msg.Unsubscribe(self.OnConfigMsg)
+            fmon = ed_thread.EdFileMonitor()
+            fmon.UnsubscribeCallback(self.OnFileStateChange)
+            if self._fmon[0]:
+                ed_thread.EdFileMonitor().RemoveFile(self._fmon[0])
         evt.Skip()
 
     #---- EdTab Methods ----#
@@ -159,28 +169,13 @@ class EdEditorView(ed_stc.EditraStc, ed_tab.EdTabBase):
             self._focused = False
             self.CallTipCancel()
 
-        # Check for changes to on disk file
-        if not self._has_dlg and Profile_Get('CHECKMOD'):
-            cfile = self.GetFileName()
-            lmod = GetFileModTime(cfile)
-            mtime = self.GetModTime()
-            if mtime and not lmod and not os.path.exists(cfile):
-                # File was deleted since last check
-                wx.CallAfter(self.PromptToReSave, cfile)
-            elif mtime < lmod:
-                # Check if we should automatically reload the file or not
-                if Profile_Get('AUTO_RELOAD', default=False) and \
-                   not self.GetModify():
-                    wx.CallAfter(self.DoReloadFile)
-                else:
-                    wx.CallAfter(self.AskToReload, cfile)
-
-        # Check for changes to permissions
-        if self.File.IsReadOnly() != self._ro_img:
-            self._nb.SetPageBitmap(self.GetTabIndex(), self.GetTabImage())
-            self._nb.Refresh()
-        else:
-            pass
+        # Keep the file monitor watching the file in this buffer. Only the
+        # first state known after the file was opened, saved or reloaded is
+        # checked here, later changes are sent to OnFileStateChange.
+        state = self.GetFileState()
+        if state is not None and self._fcheck and not self._has_dlg:
+            self._fcheck = False
+            self.CheckFileState(state)
 
         # Handle Low(er) priority idle events
         self._lprio += 1
@@ -196,6 +191,31 @@ class EdEditorView(ed_stc.EditraStc, ed_tab.EdTabBase):
                 # Ensure calltips are not shown when this is a background tab.
                 self.CallTipCancel()
 
+    def CheckFileState(self, state):
+        """Prompt for changes to the on disk file and update the tab for
+        changes to its permissions.
+        @param state: ebmlib.FileState of the file in this buffer
+
+        """
+        if Profile_Get('CHECKMOD'):
+            cfile = self.GetFileName()
+            mtime = self.GetModTime()
+            if mtime and not state.exists:
+                # File was deleted since last check
+                wx.CallAfter(self.PromptToReSave, cfile)
+            elif mtime < state.mtime:
+                # Check if we should automatically reload the file or not
+                if Profile_Get('AUTO_RELOAD', default=False) and \
+                   not self.GetModify():
+                    wx.CallAfter(self.DoReloadFile)
+                else:
+                    wx.CallAfter(self.AskToReload, cfile)
+
+        # Check for changes to permissions
+        if (state.readonly or self.File.IsRawBytes()) != self._ro_img:
+            self._nb.SetPageBitmap(self.GetTabIndex(), self.GetTabImage())
+            self._nb.Refresh()
+
     @modalcheck
     def DoReloadFile(self):
         """Reload the current file"""
@@ -241,6 +261,33 @@ class EdEditorView(ed_stc.EditraStc, ed_tab.EdTabBase):
         Log("[ed_editv][info] Tab has file: %s" % self.GetFileName())
         self.PostPositionEvent()
 
+    def GetFileState(self):
+        """Get the last known on disk state of the file in this buffer
+        from the file monitor. When the file or its modification time
+        changed since the last call (i.e it was opened, saved or reloaded)
+        the monitor is told to check it again and None is returned until
+        the new state is known.
+        @return: ebmlib.FileState or None
+
+        """
+        cfile = self.GetFileName()
+        current = (cfile, self.GetModTime())
+        fmon = ed_thread.EdFileMonitor()
+        if current != self._fmon:
+            if cfile != self._fmon[0]:
+                if self._fmon[0]:
+                    fmon.RemoveFile(self._fmon[0])
+                if cfile:
+                    fmon.AddFile(cfile)
+            elif cfile:
+                fmon.Refresh([cfile])
+            self._fmon = current
+            self._fcheck = bool(cfile)
+            return None
+        elif not cfile:
+            return None
+        return fmon.GetState(cfile)
+
     def GetName(self):
         """Gets the unique name for this tab control.
         @return: (unicode) string
@@ -340,12 +387,12 @@ class EdEditorView(ed_stc.EditraStc, ed_tab.EdTabBase):
         if e_id == EdEditorView.ID_ADD_TO_DICT:
             # Permanently add to users spelling dictionary
             if spelld:
-                spelld.add(self._spell_data['word'][0])
+                self._spell.addWord(self._spell_data['word'][0])
                 self.RefreshSpellcheck()
         elif e_id == EdEditorView.ID_IGNORE:
             # Ignore spelling for this session
             if spelld:
-                spelld.add_to_session(self._spell_data['word'][0])
+                self._spell.addWord(self._spell_data['word'][0], session=True)
                 self.RefreshSpellcheck()
         else:
             replace = None
@@ -413,12 +460,16 @@ class EdEditorView(ed_stc.EditraStc, ed_tab.EdTabBase):
         mtype = msg.GetType()[-1]
         mdata = msg.GetData()
         if mtype == 'SPELLCHECK':
+            enabled = self._spell_data['enabled']
             self._spell_data['enabled'] = mdata.get('auto', False)
             self._spell.setDefaultLanguage(mdata.get('dict', 'en_US'))
             if not self._spell_data['enabled']:
                 self._spell.clearAll()
+            elif not enabled and self.IsShown():
+                # Check the rest of the document off of the main thread
+                self._spell.checkAllInBackground()
             return
-        elif mtype == 'AUTO_COMP_EX':
+        elif mtype in ('AUTO_COMP_EX', 'AUTO_COMP_ALLBUFF'):
             self.ConfigureAutoComp()
             return
         elif mtype == 'CARETWIDTH':
@@ -529,6 +580,24 @@ class EdEditorView(ed_stc.EditraStc, ed_tab.EdTabBase):
         self.PopupMenu(self._menu.Menu)
         evt.Skip()
 
+    def OnFileStateChange(self, changed):
+        """Handle changes to the on disk state of the monitored files
+        @param changed: {path : ebmlib.FileState}
+
+        """
+        if not self or self.IsLoading():
+            return
+
+        state = changed.get(self._fmon[0], None)
+        if state is not None and \
+           self._fmon == (self.GetFileName(), self.GetModTime()):
+            if self._has_dlg:
+                # Check again once the dialog is closed
+                self._fcheck = True
+            else:
+                self._fcheck = False
+                self.CheckFileState(state)
+
     def OnMenuEvent(self, evt):
         """Handle context menu events"""
         e_id = evt.GetId()
@@ -160,6 +160,7 @@ ID_PREF_AALIAS   = wx.NewId()
 ID_PREF_AUTOBKUP = wx.NewId()
 ID_PREF_AUTO_RELOAD = wx.NewId()
 ID_PREF_AUTOCOMPEX = wx.NewId()
+ID_PREF_AUTOCOMPALL = wx.NewId()
 ID_PREF_AUTOTRIM = wx.NewId()
 ID_PREF_CHKMOD   = wx.NewId()
 ID_PREF_CHKUPDATE = wx.NewId()
@@ -185,6 +186,7 @@ ID_PREF_UPDATE_BAR = wx.NewId()
 ID_PREF_VIRT_SPACE = wx.NewId()
 ID_PREF_CARET_WIDTH = wx.NewId()
 ID_PREF_WARN_EOL = wx.NewId()
+ID_PREF_SEARCH_INDEX = wx.NewId()
 ID_SESSION       = wx.NewId()
 
 # View Menu IDs
@@ -340,6 +342,7 @@ ID_2_PROF = {
              ID_PREF_AUTOBKUP     : 'AUTOBACKUP',
              ID_AUTOCOMP          : 'AUTO_COMP',
              ID_PREF_AUTOCOMPEX   : 'AUTO_COMP_EX',
+             ID_PREF_AUTOCOMPALL  : 'AUTO_COMP_ALLBUFF',
              ID_AUTOINDENT        : 'AUTO_INDENT',
              ID_PREF_AUTO_RELOAD  : 'AUTO_RELOAD',
              ID_PREF_AUTOTRIM     : 'AUTO_TRIM_WS',
@@ -366,6 +369,7 @@ ID_2_PROF = {
              ID_REPORTER          : 'REPORTER',
              ID_PREF_SPOS         : 'SAVE_POS',
              ID_SESSION           : 'SAVE_SESSION',
+             ID_PREF_SEARCH_INDEX : 'SEARCH_INDEX',
              ID_PREF_WPOS         : 'SET_WPOS',
              ID_PREF_WSIZE        : 'SET_WSIZE',
              ID_SHOW_EDGE         : 'SHOW_EDGE',
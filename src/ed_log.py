@@ -105,6 +105,7 @@ class LogViewer(ed_basewin.EdBaseCtrlBox):
         self.SetWindow(self._buffer)
         self._srcfilter = None
         self._clear = None
+        self._stats = None
 
         # Layout
         self.__DoLayout()
@@ -112,6 +113,7 @@ class LogViewer(ed_basewin.EdBaseCtrlBox):
         # Event Handlers
         self.Bind(wx.EVT_BUTTON,
                   lambda evt: self._buffer.Clear(), self._clear)
+        self.Bind(wx.EVT_BUTTON, self.OnMessageStats, self._stats)
         self.Bind(wx.EVT_CHOICE, self.OnChoice, self._srcfilter)
         self.Bind(wx.EVT_WINDOW_DESTROY, self.OnDestroy)
 
@@ -136,6 +138,9 @@ class LogViewer(ed_basewin.EdBaseCtrlBox):
 
         # Clear Button
         ctrlbar.AddStretchSpacer()
+        self._stats = self.AddPlateButton(_("Message Stats"),
+                                          ed_glob.ID_DOCPROP, wx.ALIGN_RIGHT)
+        self._stats.SetToolTipString(_("Show the message dispatch statistics"))
         self._clear = self.AddPlateButton(_("Clear"), ed_glob.ID_DELETE,
                                           wx.ALIGN_RIGHT)
         
@@ -146,6 +151,20 @@ class LogViewer(ed_basewin.EdBaseCtrlBox):
         """
         self._buffer.SetFilter(self._srcfilter.GetStringSelection())
 
+    def OnMessageStats(self, evt):
+        """Dump the message dispatch statistics into the log. The collection
+        of the statistics is started the first time if it is not on already.
+        @param evt: wx.CommandEvent
+
+        """
+        stats = ed_msg.GetStats()
+        if stats is not None:
+            report = stats.GetReport()
+        else:
+            ed_msg.EnableStats(True)
+            report = _("Started collecting the message statistics")
+        self._buffer.AppendUpdate(report + unicode(os.linesep))
+
     def OnThemeChange(self, msg):
         """Update the buttons icon when the icon theme changes
         @param msg: Message Object
@@ -154,6 +173,9 @@ class LogViewer(ed_basewin.EdBaseCtrlBox):
         cbmp = wx.ArtProvider.GetBitmap(str(ed_glob.ID_DELETE), wx.ART_MENU)
         self._clear.SetBitmap(cbmp)
         self._clear.Refresh()
+        sbmp = wx.ArtProvider.GetBitmap(str(ed_glob.ID_DOCPROP), wx.ART_MENU)
+        self._stats.SetBitmap(sbmp)
+        self._stats.Refresh()
 
     def SetSources(self, srclist):
         """Set the list of available log sources in the choice control
@@ -24,6 +24,7 @@ __revision__ = "$Revision: 72388 $"
 import os
 import sys
 import time
+import tempfile
 import wx
 
 # Editra Libraries
@@ -1112,14 +1113,28 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
 
         """
         gen = generator.Generator(wx.GetApp().GetPluginManager())
-        doc = gen.GenerateText(evt.Id, self.nb.GetCurrentCtrl())
-        if doc:
-            self.nb.NewPage()
-            ctrl = self.nb.GetCurrentCtrl()
-            ctrl.SetText(doc[1])
-            ctrl.FindLexer(doc[0])
-        else:
-            evt.Skip()
+        ctrl = self.nb.GetCurrentCtrl()
+
+        # Export the document to a temporary file and open it, so that the
+        # generated document isn't built up in memory.
+        prefix = ebmlib.GetFileName(ctrl.GetFileName()) or u"untitled"
+        fid, path = tempfile.mkstemp(prefix=prefix + u"_")
+        os.close(fid)
+        try:
+            ext = gen.GenerateFile(evt.Id, ctrl, path)
+            if ext:
+                fname = u"%s.%s" % (path, ext)
+                os.rename(path, fname)
+                path = None
+                self.nb.OpenPage(os.path.dirname(fname),
+                                 os.path.basename(fname))
+            else:
+                evt.Skip()
+        except (IOError, OSError), msg:
+            self.LOG("[ed_main][err] OnGenerate: %s" % msg)
+        finally:
+            if path is not None and os.path.exists(path):
+                os.remove(path)
 
     #---- Misc Function Definitions ----#
     def DispatchToControl(self, evt):
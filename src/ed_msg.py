@@ -31,6 +31,10 @@ __all__ = ['PostMessage', 'Subscribe', 'Unsubscribe']
 
 #--------------------------------------------------------------------------#
 # Imports
+import threading
+import timeit
+import collections
+import wx
 from wx import PyDeadObjectError
 from extern.pubsub import Publisher
 
@@ -313,18 +317,174 @@ EDMSG_ADD_FILE_HISTORY = EDMSG_ALL + ('filehistory',)
 # Public Api
 _ThePublisher = Publisher()
 
+# Coalesced message types, msgtype -> key function or None
+_COALESCED = dict()
+# Message types that must not overtake coalesced ones, msgtype -> [msgtype,]
+_BARRIERS = dict()
+# Coalesced messages waiting to be delivered, (msgtype, context, key) -> data
+_PENDING = dict()
+_PENDING_KEYS = collections.deque() # Keys of _PENDING in posting order
+_PENDING_LOCK = threading.Lock()
+_FLUSH_QUEUED = False
+
+_STATS = None # MessageStats when enabled
+
+def EnableStats(enable=True):
+    """Turn the collection of the message dispatch statistics on or off
+    @keyword enable: bool
+
+    """
+    global _STATS
+    if enable:
+        if _STATS is None:
+            _STATS = MessageStats()
+            _ThePublisher.setDeliveryHook(_TimedDelivery)
+    else:
+        _STATS = None
+        _ThePublisher.setDeliveryHook(None)
+
+def FlushMessages():
+    """Deliver the pending coalesced messages now. This is called on the
+    main thread the next time pending events are processed after a
+    coalesced message was posted.
+
+    """
+    global _FLUSH_QUEUED
+    with _PENDING_LOCK:
+        pending = [ (pkey, _PENDING[pkey]) for pkey in _PENDING_KEYS ]
+        _PENDING.clear()
+        _PENDING_KEYS.clear()
+        _FLUSH_QUEUED = False
+
+    for (msgtype, context, key), msgdata in pending:
+        _SendMessage(msgtype, msgdata, context)
+
+def GetStats():
+    """Get the message dispatch statistics
+    @return: L{MessageStats} or None if they are not being collected
+
+    """
+    return _STATS
+
+def HasListeners(msgtype):
+    """Check if a message of the given type would be received by any
+    listeners. Use this to skip building the data for a message that
+    nobody is listening for.
+    @param msgtype: Message Type EDMSG_*
+    @return: bool
+
+    """
+    return _ThePublisher.hasListeners(msgtype)
+
 def PostMessage(msgtype, msgdata=None, context=None):
     """Post a message containing the msgdata to all listeners that are
     interested in the given msgtype from the given context. If context
     is None than default context is assumed.
     Message is always propagated to the default context.
+    Messages of the types that were declared with L{SetCoalesced} are
+    delivered later on the main thread.
     @param msgtype: Message Type EDMSG_*
     @keyword msgdata: Message data to pass to listener (can be anything)
     @keyword context: Context of the message.
 
     """
-    _ThePublisher.sendMessage(msgtype, msgdata, context=context)
-            
+    if msgtype in _COALESCED:
+        _QueueMessage(msgtype, msgdata, context)
+    else:
+        if _BARRIERS.get(msgtype, None):
+            _FlushPending(msgtype, msgdata, context)
+        _SendMessage(msgtype, msgdata, context)
+
+def SetCoalesced(msgtype, coalesce=True, keyfunc=None, barriers=None):
+    """Declare a message type as "latest value wins". Messages of the type
+    are not delivered when they are posted, they are merged until the main
+    loop processes its pending events and then only the data of the last one
+    is delivered. Messages with a different context or key are not merged.
+    @param msgtype: Message Type EDMSG_*
+    @keyword coalesce: bool
+    @keyword keyfunc: callable(msgdata) returning the key of the message
+    @keyword barriers: message types that deliver the pending message with
+                       the same context and key (from keyfunc) before they
+                       are sent, so it does not arrive after them.
+
+    """
+    for coalesced in _BARRIERS.itervalues():
+        if msgtype in coalesced:
+            coalesced.remove(msgtype)
+
+    if coalesce:
+        _COALESCED[msgtype] = keyfunc
+        for barrier in barriers or list():
+            _BARRIERS.setdefault(barrier, list()).append(msgtype)
+    else:
+        _COALESCED.pop(msgtype, None)
+
+def _FlushPending(msgtype, msgdata, context):
+    """Deliver the pending coalesced messages that the given message is
+    a barrier for.
+
+    """
+    pending = list()
+    with _PENDING_LOCK:
+        for coalesced in _BARRIERS.get(msgtype, list()):
+            keyfunc = _COALESCED.get(coalesced, None)
+            key = None
+            if keyfunc is not None:
+                key = keyfunc(msgdata)
+            pkey = (coalesced, context, key)
+            if pkey in _PENDING:
+                _PENDING_KEYS.remove(pkey)
+                pending.append((pkey, _PENDING.pop(pkey)))
+
+    for (ptype, pcontext, key), pdata in pending:
+        _SendMessage(ptype, pdata, pcontext)
+
+def _QueueMessage(msgtype, msgdata, context):
+    """Queue a coalesced message for delivery"""
+    global _FLUSH_QUEUED
+    keyfunc = _COALESCED.get(msgtype, None)
+    key = None
+    if keyfunc is not None:
+        key = keyfunc(msgdata)
+
+    schedule = False
+    with _PENDING_LOCK:
+        pkey = (msgtype, context, key)
+        if pkey in _PENDING:
+            if _STATS is not None:
+                _STATS.AddMerged(msgtype)
+        else:
+            _PENDING_KEYS.append(pkey)
+        _PENDING[pkey] = msgdata
+        if not _FLUSH_QUEUED:
+            _FLUSH_QUEUED = schedule = True
+
+    if schedule:
+        if wx.GetApp() is not None:
+            wx.CallAfter(FlushMessages)
+        else:
+            FlushMessages()
+
+def _SendMessage(msgtype, msgdata, context):
+    """Send the message to the listeners now"""
+    stats = _STATS
+    if stats is None:
+        _ThePublisher.sendMessage(msgtype, msgdata, context=context)
+    else:
+        start = timeit.default_timer()
+        _ThePublisher.sendMessage(msgtype, msgdata, context=context)
+        stats.AddDispatch(msgtype, timeit.default_timer() - start)
+
+def _TimedDelivery(listener, message):
+    """Delivery hook that measures the time each listener takes"""
+    start = timeit.default_timer()
+    try:
+        listener(message)
+    finally:
+        stats = _STATS
+        if stats is not None:
+            stats.AddDelivery(listener, timeit.default_timer() - start)
+
 def Subscribe(callback, msgtype=EDMSG_ALL):
     """Subscribe your listener function to listen for an action of type msgtype.
     The callback must be a function or a _bound_ method that accepts one
@@ -360,6 +520,149 @@ def Unsubscribe(callback, messages=None):
     Publisher().unsubscribe(callback, messages)
 
 
+#---- Dispatch Statistics ----#
+
+class MessageStats(object):
+    """Dispatch counters and latency histograms of the messages and of the
+    listeners that receive them. The times are in seconds.
+
+    """
+    # Upper bounds of the histogram buckets, the last bucket is unbounded
+    BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+    BUCKET_LABELS = (u"<0.1ms", u"<0.5ms", u"<1ms", u"<5ms", u"<10ms",
+                     u"<50ms", u"<100ms", u">100ms")
+
+    def __init__(self):
+        super(MessageStats, self).__init__()
+
+        # Attributes
+        self._lock = threading.Lock()
+        self._topics = dict()    # msgtype -> [sent, merged, total, max, hist]
+        self._listeners = dict() # (class, function) -> [calls, total, max, hist]
+
+    @staticmethod
+    def _Add(record, secs):
+        """Add a time to a [count, total, max, hist] record"""
+        record[0] += 1
+        record[1] += secs
+        record[2] = max(record[2], secs)
+        idx = 0
+        for bound in MessageStats.BUCKETS:
+            if secs < bound:
+                break
+            idx += 1
+        record[3][idx] += 1
+
+    @staticmethod
+    def _NewRecord():
+        return [0, 0.0, 0.0, [0] * (len(MessageStats.BUCKETS) + 1)]
+
+    def AddDelivery(self, listener, secs):
+        """Add the time a listener took to handle a message
+        @param listener: callable
+        @param secs: float
+
+        """
+        key = (getattr(listener, 'im_class', None),
+               getattr(listener, 'im_func', listener))
+        with self._lock:
+            record = self._listeners.get(key, None)
+            if record is None:
+                record = self._listeners[key] = MessageStats._NewRecord()
+            MessageStats._Add(record, secs)
+
+    def AddDispatch(self, msgtype, secs):
+        """Add the time sending a message to all of its listeners took
+        @param msgtype: Message Type EDMSG_*
+        @param secs: float
+
+        """
+        with self._lock:
+            record = self._GetTopic(msgtype)
+            MessageStats._Add(record[1], secs)
+
+    def AddMerged(self, msgtype):
+        """Count a coalesced message that replaced a pending message
+        @param msgtype: Message Type EDMSG_*
+
+        """
+        with self._lock:
+            self._GetTopic(msgtype)[0] += 1
+
+    def _GetTopic(self, msgtype):
+        """Get the [merged, record] of a message type
+        @note: call with the lock held
+
+        """
+        topic = self._topics.get(msgtype, None)
+        if topic is None:
+            topic = self._topics[msgtype] = [0, MessageStats._NewRecord()]
+        return topic
+
+    def Clear(self):
+        """Reset all of the statistics"""
+        with self._lock:
+            self._topics.clear()
+            self._listeners.clear()
+
+    def GetListenerStats(self):
+        """Get the statistics of the listeners, slowest first
+        @return: list of (name, calls, total, max, histogram)
+
+        """
+        with self._lock:
+            items = [ (key, list(val)) for key, val in self._listeners.items() ]
+
+        rval = list()
+        for (cls, func), record in items:
+            name = getattr(func, '__name__', repr(func))
+            if cls is not None:
+                name = u"%s.%s" % (cls.__name__, name)
+            module = getattr(func, '__module__', None)
+            if module:
+                name = u"%s.%s" % (module, name)
+            rval.append((name,) + tuple(record))
+        rval.sort(key=lambda item: item[2], reverse=True)
+        return rval
+
+    def GetTopicStats(self):
+        """Get the statistics of the message types, slowest first
+        @return: list of (topic name, sent, merged, total, max, histogram)
+
+        """
+        with self._lock:
+            items = [ (msgtype, val[0], list(val[1]))
+                      for msgtype, val in self._topics.items() ]
+
+        rval = list()
+        for msgtype, merged, record in items:
+            if isinstance(msgtype, tuple):
+                msgtype = u'.'.join(msgtype)
+            rval.append((msgtype, record[0], merged) + tuple(record[1:]))
+        rval.sort(key=lambda item: item[3], reverse=True)
+        return rval
+
+    def GetReport(self, limit=25):
+        """Get a text report of the statistics
+        @keyword limit: maximum number of listeners to list
+        @return: unicode
+
+        """
+        hist = u" ".join(MessageStats.BUCKET_LABELS)
+        lines = [u"Message dispatch statistics",
+                 u"topic: sent merged total(ms) max(ms) [%s]" % hist]
+        for name, sent, merged, total, tmax, counts in self.GetTopicStats():
+            lines.append(u"  %s: %d %d %.2f %.2f [%s]" % \
+                         (name, sent, merged, total * 1000, tmax * 1000,
+                          u" ".join([ unicode(cnt) for cnt in counts ])))
+
+        lines.append(u"listener: calls total(ms) max(ms) [%s]" % hist)
+        for name, calls, total, tmax, counts in self.GetListenerStats()[:limit]:
+            lines.append(u"  %s: %d %.2f %.2f [%s]" % \
+                         (name, calls, total * 1000, tmax * 1000,
+                          u" ".join([ unicode(cnt) for cnt in counts ])))
+        return u"\n".join(lines)
+
 #---- Helper Decorators ----#
 
 def mwcontext(func):
@@ -494,3 +797,13 @@ def UnRegisterCallback(callback):
 _CALLBACK_REGISTRY = {}
 
 #-----------------------------------------------------------------------------#
+
+#-----------------------------------------------------------------------------#
+# High frequency messages that only need their latest value delivered
+
+SetCoalesced(EDMSG_UI_STC_POS_CHANGED)
+SetCoalesced(EDMSG_UI_STC_KEYUP)
+# Progress of each window (msgdata[0] is the window id) is kept separately
+# and hiding the progress bar must not be followed by a stale state.
+SetCoalesced(EDMSG_PROGRESS_STATE, keyfunc=lambda data: data[0],
+             barriers=(EDMSG_PROGRESS_SHOW,))
@@ -21,6 +21,8 @@ __revision__ = "$Revision: 72278 $"
 import os
 import sys
 import glob
+import time
+import weakref
 import wx
 
 # Editra Libraries
@@ -44,6 +46,7 @@ import ed_book
 # Globals
 ID_IDLE_TIMER = wx.NewId()
 SIMULATED_EVT_ID = -1
+PREFETCH_TIME = 0.05 # Max time (seconds) to spend on session prefetching per idle
 _ = wx.GetTranslation
 
 #--------------------------------------------------------------------------#
@@ -81,6 +84,7 @@ class EdPages(ed_book.EdBaseBook):
         self.control = None
         self.frame = self.GetTopLevelParent() # MainWindow
         self._ses_load = False
+        self._sespages = weakref.WeakKeyDictionary() # placeholder -> file path
         self._menu = ebmlib.ContextMenuManager()
 
         # Setup Tab Navigator
@@ -196,6 +200,91 @@ class EdPages(ed_book.EdBaseBook):
                     # like reloading the file was even tried.
                     wx.Sleep(1)
 
+    def _AddSessionPage(self, path2file):
+        """Add a placeholder tab for a file in a session. The file is not
+        read until the tab is selected or the idle prefetcher gets to it.
+        @param path2file: file path
+
+        """
+        # Resolve links to real file
+        if ebmlib.IsLink(path2file):
+            path2file = ebmlib.ResolveRealPath(path2file)
+
+        if self.HasFileOpen(path2file):
+            return
+
+        filename = ebmlib.GetFileName(path2file)
+        control = self.control
+        if self.GetPageCount() and control not in self._sespages and \
+           not (control.GetModify() or control.GetLength() or \
+                control.GetFileName() != u''):
+            # Use the empty untitled buffer for the first file
+            control.SetFileName(path2file)
+            self._sespages[control] = path2file
+            cpage = control.GetTabIndex()
+            self.SetPageText(cpage, filename)
+            self.SetPageBitmap(cpage, control.GetTabImage())
+        else:
+            control = ed_editv.EdEditorView(self, wx.ID_ANY)
+            control.Hide()
+            control.SetFileName(path2file)
+            self._sespages[control] = path2file
+            self.AddPage(control, filename, select=False)
+
+    def _LoadSessionPage(self, page, quiet=False):
+        """Read the file of a session placeholder tab into its buffer
+        @param page: EdEditorView
+        @keyword quiet: don't show an error dialog if the file can't be read
+        @return: bool (False if the page was not a placeholder or failed)
+
+        """
+        path2file = self._sespages.pop(page, None)
+        if path2file is None:
+            return False
+
+        result = False
+        msg = _("Unable to read the file")
+        try:
+            result = page.LoadFile(path2file)
+        except Exception, msg:
+            self.LOG("[ed_pages][err] Failed to open file %s\n" % path2file)
+            self.LOG("[ed_pages][err] %s" % msg)
+
+        if not result:
+            # The file is gone or can't be decoded anymore, drop its tab
+            if not quiet:
+                ed_mdlg.OpenErrorDlg(self, path2file, msg)
+            page.GetDocument().ClearLastError()
+            page.SetFileName('')
+            wx.CallAfter(self._CloseSessionPage, page)
+            return False
+
+        # Setup Document
+        page.FindLexer()
+        page.EmptyUndoBuffer()
+        doc = page.GetDocument()
+        doc.AddModifiedCallback(page.FireModified)
+        self.SetPageBitmap(page.GetTabIndex(), page.GetTabImage())
+        self.frame.AddFileToHistory(path2file)
+
+        if not quiet and Profile_Get('WARN_EOL', default=True) and \
+           not doc.IsRawBytes():
+            page.CheckEOL()
+
+        if not page.IsLoading():
+            self.DoPostLoad(page)
+
+        self.LOG("[ed_pages][evt] Loaded session page: %s" % path2file)
+        return True
+
+    def _CloseSessionPage(self, page):
+        """Close a session tab that failed to load
+        @param page: EdEditorView
+
+        """
+        if page:
+            self._ClosePageNum(page.GetTabIndex())
+
     def _NeedOpen(self, path):
         """Check if a file needs to be opened. If the file is already open in
         the notebook a dialog will be opened to ask if the user wants to reopen
@@ -376,18 +465,31 @@ class EdPages(ed_book.EdBaseBook):
         # Close current files
         self.CloseAllPages()
 
+        start = time.time()
+        lazy = Profile_Get('LAZY_SESSION', default=True)
         missingfns = []
-        for loadfn in flist:
-            if os.path.exists(loadfn) and os.access(loadfn, os.R_OK):
-                if not ebmlib.IsUnicode(loadfn):
-                    try:
-                        loadfn = loadfn.decode(sys.getfilesystemencoding())
-                    except UnicodeDecodeError:
-                        self.LOG("[ed_pages][err] LoadSessionFile: Failed to decode file name")
-                self.OpenPage(os.path.dirname(loadfn),
-                              os.path.basename(loadfn))
-            else:
-                missingfns.append(loadfn)
+        with eclib.Freezer(self.TopLevelParent) as _tmp:
+            for loadfn in flist:
+                if os.path.exists(loadfn) and os.access(loadfn, os.R_OK):
+                    if not ebmlib.IsUnicode(loadfn):
+                        try:
+                            loadfn = loadfn.decode(sys.getfilesystemencoding())
+                        except UnicodeDecodeError:
+                            self.LOG("[ed_pages][err] LoadSessionFile: Failed to decode file name")
+                    if lazy:
+                        self._AddSessionPage(loadfn)
+                    else:
+                        self.OpenPage(os.path.dirname(loadfn),
+                                      os.path.basename(loadfn))
+                else:
+                    missingfns.append(loadfn)
+
+            # Show the last file of the session like a normal load would
+            if lazy and self.GetPageCount():
+                self.ChangePage(self.GetPageCount() - 1)
+
+        self.LOG("[ed_pages][info] Session %s: %d files interactive in %.3fs" % \
+                 (session, len(flist) - len(missingfns), time.time() - start))
 
         if missingfns:
             rmsg = (_("Missing session files"),
@@ -823,24 +925,30 @@ class EdPages(ed_book.EdBaseBook):
             self.GoCurrentPage()
             self.LOG("[ed_pages][evt] Opened Page: %s" % filename)
 
-    def DoPostLoad(self):
-        """Perform post file open actions"""
+    def DoPostLoad(self, control=None):
+        """Perform post file open actions
+        @keyword control: buffer that was loaded (current buffer by default)
+
+        """
+        if control is None:
+            control = self.control
+
         # Ensure that document buffer is writable after an editable
         # document is opened in the buffer.
-        doc = self.control.GetDocument()
+        doc = control.GetDocument()
         if not doc.IsReadOnly() and not doc.IsRawBytes():
-            self.control.SetReadOnly(False)
+            control.SetReadOnly(False)
 
         # Set last known caret position if the user setting is enabled
         # and the caret position has not been changed during a threaded
         # file loading operation.
-        if Profile_Get('SAVE_POS') and self.control.GetCurrentPos() <= 0:
-            pos = self.DocMgr.GetPos(self.control.GetFileName())
-            self.control.SetCaretPos(pos)
-            self.control.ScrollToColumn(0)
+        if Profile_Get('SAVE_POS') and control.GetCurrentPos() <= 0:
+            pos = self.DocMgr.GetPos(control.GetFileName())
+            control.SetCaretPos(pos)
+            control.ScrollToColumn(0)
 
         ed_msg.PostMessage(ed_msg.EDMSG_FILE_OPENED,
-                           self.control.GetFileName(),
+                           control.GetFileName(),
                            context=self.frame.Id)
 
     def GoCurrentPage(self):
@@ -1024,6 +1132,16 @@ class EdPages(ed_book.EdBaseBook):
                 if page is not None and page.IsShown():
                     page.DoOnIdle()
 
+        # Load the files of session tabs that have not been shown yet
+        if len(self._sespages):
+            start = time.time()
+            for idx in range(self.GetPageCount()):
+                page = self.GetPage(idx)
+                if page in self._sespages:
+                    self._LoadSessionPage(page, quiet=True)
+                    if time.time() - start > PREFETCH_TIME:
+                        break
+
     def OnPageChanging(self, evt):
         """Page changing event handler.
         @param evt: aui.EVT_AUINOTEBOOK_PAGE_CHANGING
@@ -1056,6 +1174,10 @@ class EdPages(ed_book.EdBaseBook):
         window = self.GetPage(pg_num)
         self.control = window
 
+        # Read the file of a session tab when it is first shown
+        if window in self._sespages:
+            self._LoadSessionPage(window, quiet=self._ses_load)
+
         # Update Frame Title
         self.frame.SetTitle(self.control.GetTitleString())
 
@@ -1095,8 +1217,10 @@ class EdPages(ed_book.EdBaseBook):
             sel = self.GetSelection()
             self.LOG("[ed_pages][evt] Closing Page: #%d" % sel)
 
-            # Call the tab specific close handler
-            page.DoTabClosing()
+            # Call the tab specific close handler. Placeholder session tabs
+            # have no caret position of their own to save.
+            if self._sespages.pop(page, None) is None:
+                page.DoTabClosing()
 
             evt.Skip()
             ed_msg.PostMessage(ed_msg.EDMSG_UI_NB_CLOSING,
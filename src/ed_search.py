@@ -24,6 +24,8 @@ __revision__ = "$Revision: 71673 $"
 import os
 import sys
 import re
+import hashlib
+import threading
 import unicodedata
 import wx
 
@@ -43,6 +45,46 @@ import ed_thread
 # Globals
 
 _ = wx.GetTranslation
+
+MAX_INDEXES = 4 # Number of directory indexes to keep in memory
+_INDEXES = list()
+_INDEXLOCK = threading.Lock()
+
+#--------------------------------------------------------------------------#
+
+def GetSearchIndex(directory):
+    """Get the trigram index for the given search directory. The index is
+    stored in the cache directory so it persists between sessions.
+    @param directory: directory path
+    @return: ebmlib.TrigramIndex
+
+    """
+    _INDEXLOCK.acquire()
+    try:
+        for index in _INDEXES:
+            if index.Root == directory:
+                _INDEXES.remove(index)
+                break
+        else:
+            path = None
+            cache = os.path.join(ed_glob.CONFIG['CACHE_DIR'], u"search")
+            try:
+                if not os.path.exists(cache):
+                    os.mkdir(cache)
+                key = directory
+                if ebmlib.IsUnicode(key):
+                    key = key.encode('utf-8')
+                path = os.path.join(cache, hashlib.md5(key).hexdigest())
+            except (IOError, OSError):
+                pass
+            index = ebmlib.TrigramIndex(directory, path)
+
+        _INDEXES.insert(0, index)
+        del _INDEXES[MAX_INDEXES:]
+        return index
+    finally:
+        _INDEXLOCK.release()
+
 #--------------------------------------------------------------------------#
 
 class EdSearchEngine(ebmlib.SearchEngine):
@@ -89,6 +131,29 @@ class EdSearchEngine(ebmlib.SearchEngine):
         query = unicodedata.normalize('NFC', query)
         super(EdSearchEngine, self).SetQuery(query)
 
+    def SearchInDirectory(self, directory, recursive=True):
+        """Search in all the files found in the given directory. When search
+        indexing is enabled only the files the directories trigram index
+        reports as possible matches are searched.
+        @param directory: directory path
+        @keyword recursive: search recursivly
+
+        """
+        trigrams = None
+        if Profile_Get('SEARCH_INDEX', default=False):
+            trigrams = ebmlib.GetQueryTrigrams(self.GetQuery(), self.IsRegEx())
+
+        if trigrams:
+            index = GetSearchIndex(directory)
+            flist = index.GetCandidates(trigrams, recursive, self._filters)
+            search = self.SearchInFiles(flist)
+        else:
+            search = super(EdSearchEngine, self).SearchInDirectory(directory,
+                                                                   recursive)
+
+        for match in search:
+            yield match
+
     def SetSearchPool(self, pool):
         """Set the search pool"""
         if not ebmlib.IsUnicode(pool):
@@ -1402,8 +1467,18 @@ class SearchResultScreen(ed_basewin.EdBaseCtrlBox):
         """Cancel the currently running search"""
         if self._job is not None:
             self._job.Cancel()
+            self._CancelEngine()
         self._cancelb.Disable()
 
+    def _CancelEngine(self):
+        """Stop the search engine of the current job so that it stops
+        feeding files to its worker processes.
+
+        """
+        engine = getattr(self._meth, 'im_self', None)
+        if isinstance(engine, ebmlib.SearchEngine):
+            engine.Cancel()
+
     def StartSearch(self, searchmeth, *args, **kwargs):
         """Start a search with the given method and display the results
         @param searchmeth: callable
@@ -1411,10 +1486,11 @@ class SearchResultScreen(ed_basewin.EdBaseCtrlBox):
         @param **kwargs: keyword arguments to pass to searchmeth
 
         """
-        self._meth = searchmeth
-
         if self._job is not None:
             self._job.Cancel()
+            self._CancelEngine()
+
+        self._meth = searchmeth
 
         self._list.Clear()
         self._job = eclib.TaskObject(self._list, searchmeth, *args, **kwargs)
@@ -25,6 +25,7 @@ __revision__ = "$Revision: 73349 $"
 # Imports
 
 import os
+import time
 import wx, wx.stc
 
 # Local Imports
@@ -125,8 +126,10 @@ class EditraStc(ed_basestc.EditraBaseStc):
         # Attributes
         self.LOG = wx.GetApp().GetLog()
         self._loading = None
+        self._checkeol = False # Check the EOL mode once loading finishes
+        self._loadinfo = None # (start time, deferred settings)
         self.key_handler = KeyHandler(self)
-        self._backup_done = True
+        self._journal = None # ebmlib.EditJournal of the autobackup
         self._bktimer = wx.Timer(self)
         self._dwellsent = False
 
@@ -161,6 +164,7 @@ class EditraStc(ed_basestc.EditraBaseStc):
         self.Bind(wx.EVT_KEY_UP, self.OnKeyUp)
         self.Bind(wx.EVT_LEFT_UP, self.OnLeftUp)
         self.Bind(wx.EVT_TIMER, self.OnBackupTimer)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.OnDestroyBackup, self)
 
         # Async file load events
         self.Bind(ed_txt.EVT_FILE_LOAD, self.OnLoadProgress)
@@ -213,6 +217,105 @@ class EditraStc(ed_basestc.EditraBaseStc):
 #         code = compile(code_txt, self.__module__, 'exec')
 #         exec code in self.__dict__ # Inject new code into this namespace
 
+    def _DoLoadFinished(self):
+        """Restore the settings deferred during an asynchronous load and
+        log the load metrics.
+
+        """
+        if self._loadinfo is None:
+            return
+
+        start, deferred = self._loadinfo
+        self._loadinfo = None
+        if deferred is not None:
+            self.SetWrapMode(deferred['wrap'])
+            self.FoldingOnOff(deferred['folding'])
+            self.SyntaxOnOff(deferred['highlight'])
+
+        peak = ebmlib.GetPeakMemoryUsage()
+        self.LOG("[ed_stc][info] Load: %s finished in %.3fs, peak RSS %s" % \
+                 (self.GetFileName(), time.time() - start,
+                  peak >= 0 and u"%.1fMB" % (peak / 1048576.0) or u"n/a"))
+
+    def _ApplyTextEdits(self, data, edits):
+        """Apply a list of edits from the ebmlib text edit functions to the
+        buffer as a single undo action. Edits on the same line are applied
+        together and the caret and selection are moved to follow the text
+        they were in.
+        @param data: utf-8 encoded text of the buffer the edits are for
+        @param edits: list of (start, end, replacement) tuples
+
+        """
+        if not edits:
+            return
+
+        anchor = ebmlib.MapEditPosition(edits, self.GetAnchor())
+        cpos = ebmlib.MapEditPosition(edits, self.GetCurrentPos())
+        self.BeginUndoAction()
+        for start, end, repl in reversed(ebmlib.MergeLineEdits(data, edits)):
+            self.SetTargetStart(start)
+            self.SetTargetEnd(end)
+            self.ReplaceTarget(repl.decode('utf-8'))
+        self.EndUndoAction()
+        self.SetSelection(anchor, cpos)
+
+    def _RecoverJournal(self, journal):
+        """Offer to restore the unsaved changes recorded in the autobackup
+        journal of the file that was just loaded.
+        @param journal: ebmlib.EditJournal
+
+        """
+        fname = self.GetFileName()
+        msg = _("Unsaved changes to %s were found in its backup.\n\n"
+                "Do you want to restore them?") % fname
+        result = wx.MessageBox(msg, _("Restore Backup"),
+                               style=wx.YES_NO|wx.CENTER|wx.ICON_QUESTION)
+        if result == wx.YES:
+            data = journal.Recover(self.GetText().encode('utf-8'))
+            try:
+                if data is not None:
+                    self.SetText(data.decode('utf-8'))
+                    self.LOG("[ed_stc][info] Restored backup of %s" % fname)
+                    return
+            except UnicodeDecodeError:
+                pass
+            self.LOG("[ed_stc][err] Failed to restore backup of %s" % fname)
+        journal.Remove()
+
+    def _ResetJournal(self, recover=False):
+        """Start a new autobackup journal for the buffer after its file was
+        loaded or saved, or the autobackup setting changed.
+        @keyword recover: offer to restore the changes in an existing journal
+
+        """
+        old = self._journal
+        self._journal = None
+        fname = self.GetFileName()
+        if not self._bktimer.IsRunning() or not fname or \
+           self.File.IsRawBytes():
+            if old is not None:
+                old.Close()
+            return
+
+        suffix = _PGET('AUTOBACKUP_SUFFIX', default=u'.edbkup')
+        bkupmgr = ebmlib.FileBackupMgr(None, u"%s" + suffix)
+        path = _PGET('AUTOBACKUP_PATH', default=u"")
+        if path and os.path.exists(path):
+            bkupmgr.SetBackupDirectory(path)
+        journal = ebmlib.EditJournal(bkupmgr.GetBackupFilename(fname))
+        if old is not None:
+            # Keep the file if the new journal uses it
+            old.Close(old.path != journal.path)
+
+        size = ebmlib.GetFileSize(fname)
+        mtime = ebmlib.GetFileModTime(fname)
+        if recover and journal.IsRecoverable(size, mtime):
+            self._RecoverJournal(journal)
+        journal.Reset(size, mtime)
+        if self.GetModify():
+            journal.SetSnapshot(self.GetText().encode('utf-8'))
+        self._journal = journal
+
     def _MacHandleKey(self, k_code, shift_down, alt_down, ctrl_down, cmd_down):
         """Handler for mac specific actions"""
         if alt_down:
@@ -447,9 +550,11 @@ class EditraStc(ed_basestc.EditraBaseStc):
             # TODO: make backup interval configurable
             if not self._bktimer.IsRunning():
                 self._bktimer.Start(30000) # every 30 seconds
+                self._ResetJournal()
         else:
             if self._bktimer.IsRunning():
                 self._bktimer.Stop()
+                self._ResetJournal()
 
     def InvertCase(self):
         """Invert the case of the selected text
@@ -617,44 +722,56 @@ class EditraStc(ed_basestc.EditraBaseStc):
         return self._config['autocomp']
 
     def OnBackupTimer(self, evt):
-        """Backup the buffer to a backup file.
+        """Write the edits made since the last backup to the buffers
+        autobackup journal.
         @param evt: wx.TimerEvent
 
         """
-        fname = self.GetFileName()
-        # If the file is loading or is over 5MB don't do automatic backups.
-        if self.IsLoading() or ebmlib.GetFileSize(fname) > 5242880:
+        journal = self._journal
+        if journal is None or self.IsLoading():
             return
 
-        # If the file is different than the last save point make the backup.
-        suffix = _PGET('AUTOBACKUP_SUFFIX', default=u'.edbkup')
-        bkupmgr = ebmlib.FileBackupMgr(None, u"%s" + suffix)
-        path = _PGET('AUTOBACKUP_PATH', default=u"")
-        if path and os.path.exists(path):
-            bkupmgr.SetBackupDirectory(path)
+        if not self.GetModify():
+            # Undone back to the save point so there is nothing to recover.
+            # Done here so that no later edit is discarded with the journal.
+            if journal.HasPending() or journal.GetSize():
+                journal.Remove()
+            return
+        elif not journal.HasPending():
+            return
 
-        if not self._backup_done and \
-           (not bkupmgr.HasBackup(fname) or bkupmgr.IsBackupNewer(fname)):
-            msg = _("File backup performed: %s") % fname
-            idval = self.Id
-            target = self.TopLevelParent
-            def BackupJob(fobj, text):
-                writer = bkupmgr.GetBackupWriter(fobj)
-                try:
-                    writer(text)
-                except Exception, msg:
-                    return
+        # Compact the journal once it has grown larger than the document
+        if journal.GetSize() > max(self.GetLength(), 1048576):
+            journal.SetSnapshot(self.GetText().encode('utf-8'))
+
+        msg = _("File backup performed: %s") % self.GetFileName()
+        idval = self.Id
+        target = self.TopLevelParent
+        def BackupJob(journal):
+            if journal.Flush():
                 nevt = ed_event.StatusEvent(ed_event.edEVT_STATUS, idval,
                                             msg, ed_glob.SB_INFO)
                 wx.PostEvent(target, nevt)
-            ed_thread.EdThreadPool().QueueJob(BackupJob, self.File, self.GetText())
-            self._backup_done = True
+        ed_thread.EdThreadPool().QueueJob(BackupJob, journal)
+
+    def OnDestroyBackup(self, evt):
+        """Remove the autobackup journal when the buffer is closed"""
+        if evt.GetId() == self.GetId() and self._journal is not None:
+            self._journal.Close()
+            self._journal = None
+        evt.Skip()
 
     def OnModified(self, evt):
         """Overrides base modified handler"""
         super(EditraStc, self).OnModified(evt)
-        if not self.IsLoading():
-            self._backup_done = False
+        if self._journal is not None and not self.IsLoading():
+            # Record the edit in the autobackup journal
+            mtype = evt.GetModificationType()
+            if mtype & wx.stc.STC_MOD_INSERTTEXT:
+                self._journal.AddInsert(evt.GetPosition(),
+                                        evt.GetText().encode('utf-8'))
+            elif mtype & wx.stc.STC_MOD_DELETETEXT:
+                self._journal.AddDelete(evt.GetPosition(), evt.GetLength())
 
     def OnKeyDown(self, evt):
         """Handles keydown events, currently only deals with
@@ -854,10 +971,14 @@ class EditraStc(ed_basestc.EditraBaseStc):
 #                gauge.Show()
 #                gauge.ProcessPendingEvents()
 #                sb.ProcessPendingEvents()
+                first = not self.GetLength()
                 self.SetReadOnly(False)
                 self.AppendText(evt.GetValue())
                 self.SetSavePoint()
                 self.SetReadOnly(True)
+                if first and self._loadinfo is not None:
+                    self.LOG("[ed_stc][info] Load: first screen in %.3fs" % \
+                             (time.time() - self._loadinfo[0]))
                 # wx.GetApp().Yield(True) # Too slow on windows...
         elif evt.GetState() == ed_txt.FL_STATE_END:
             self.SetReadOnly(False)
@@ -866,17 +987,25 @@ class EditraStc(ed_basestc.EditraBaseStc):
             self.SetUndoCollection(True)
             del self._loading
             self._loading = None
+            self._DoLoadFinished()
+            self._ResetJournal(recover=True)
+            self.CheckIndentation()
+            if self._checkeol:
+                self._checkeol = False
+                self.CheckEOL()
             parent = self.GetParent()
             if hasattr(parent, 'DoPostLoad'):
-                parent.DoPostLoad()
+                parent.DoPostLoad(self)
         elif evt.GetState() == ed_txt.FL_STATE_START:
             ed_msg.PostMessage(ed_msg.EDMSG_PROGRESS_SHOW, (pid, True))
             ed_msg.PostMessage(ed_msg.EDMSG_PROGRESS_STATE, (pid, 0, self.File.GetSize()))
             self.SetReadOnly(True)
             self.SetUndoCollection(False)
         elif evt.GetState() == ed_txt.FL_STATE_ABORTED:
+            self._checkeol = False
             self.SetReadOnly(False)
             self.ClearAll()
+            self._DoLoadFinished()
 
     def OnUpdateUI(self, evt):
         """Check for matching braces
@@ -1186,39 +1315,30 @@ class EditraStc(ed_basestc.EditraBaseStc):
         that the document was saved in is different than the editors
         current mode the editor will switch modes to preserve the eol
         type of the file, if the eol chars are mixed then the editor
-        will toggle on eol visibility.
+        will toggle on eol visibility. The L{ed_txt.TextStats} gathered when
+        the file was read are used to check the line endings, when the file is
+        loaded asynchronously the check is done once loading has finished.
         @postcondition: eol mode is configured to best match file
         @todo: Is showing line endings the best way to show mixed?
 
         """
-        mixed = diff = False
+        if self.IsLoading():
+            # The text statistics are gathered while the file is read
+            self._checkeol = True
+            return
+
         eol_map = {u"\n" : wx.stc.STC_EOL_LF,
                    u"\r\n" : wx.stc.STC_EOL_CRLF,
                    u"\r" : wx.stc.STC_EOL_CR}
 
-        eol = unichr(self.GetCharAt(self.GetLineEndPosition(0)))
-        if eol == u"\r":
-            tmp = unichr(self.GetCharAt(self.GetLineEndPosition(0) + 1))
-            if tmp == u"\n":
-                eol += tmp
+        stats = self.GetTextStats()
+        eol = stats.GetEOL()
+        if eol is None:
+            return # No line endings to check
 
         # Is the eol used in the document the same as what is currently set.
-        if eol != self.GetEOLChar():
-            diff = True
-
-        # Check the lines to see if they are all matching or not.
-        LEPFunct = self.GetLineEndPosition
-        GCAFunct = self.GetCharAt
-        for line in range(self.GetLineCount() - 1):
-            end = LEPFunct(line)
-            tmp = unichr(GCAFunct(end))
-            if tmp == u"\r":
-                tmp2 = unichr(GCAFunct(LEPFunct(0) + 1))
-                if tmp2 == u"\n":
-                    tmp += tmp2
-            if tmp != eol:
-                mixed = True
-                break
+        diff = eol != self.GetEOLChar()
+        mixed = stats.IsMixedEOL()
 
         if mixed or diff:
             if mixed:
@@ -1243,6 +1363,29 @@ class EditraStc(ed_basestc.EditraBaseStc):
         else:
             pass
 
+    def CheckIndentation(self):
+        """Match the use of tabs for indentation to the indentation used by
+        the opened document. The L{ed_txt.TextStats} gathered when the file
+        was read are used, so the buffer isn't scanned again.
+        @postcondition: tab mode is configured to best match file
+
+        """
+        if self.IsLoading():
+            return # Checked once loading has finished
+
+        stats = self.File.GetTextStats()
+        if stats is None:
+            return # Raw bytes or not read from a file
+
+        tabs = stats.UsesTabs()
+        if tabs is not None and tabs != self.GetUseTabs():
+            self.SetUseTabs(tabs)
+        if stats.IsMixedIndent():
+            tabs, spaces = stats.GetIndentCounts()
+            self.LOG("[ed_stc][info] Mixed indentation in %s: %d tab and "
+                     "%d space indented lines" % \
+                     (self.GetFileName(), tabs, spaces))
+
     def ConvertLineMode(self, mode_id):
         """Converts all line endings in a document to a specified
         format.
@@ -1263,27 +1406,15 @@ class EditraStc(ed_basestc.EditraBaseStc):
         """
         if mode_id not in (ed_glob.ID_TAB_TO_SPACE, ed_glob.ID_SPACE_TO_TAB):
             return
-        tabw = self.GetIndent()
-        pos = self.GetCurrentPos()
-        sel = self.GetSelectedText()
-        if mode_id == ed_glob.ID_TAB_TO_SPACE:
-            cmd = (u"\t", u" " * tabw)
-            tabs = False
-        else:
-            cmd = (" " * tabw, u"\t")
-            tabs = True
-
-        if sel != wx.EmptyString:
-            self.ReplaceSelection(sel.replace(cmd[0], cmd[1]))
-        else:
-            self.BeginUndoAction()
-            part1 = self.GetTextRange(0, pos).replace(cmd[0], cmd[1])
-            tmptxt = self.GetTextRange(pos, self.GetLength()).replace(cmd[0], \
-                                                                      cmd[1])
-            self.SetText(part1 + tmptxt)
-            self.GotoPos(len(part1))
-            self.SetUseTabs(tabs)
-            self.EndUndoAction()
+        to_tabs = mode_id == ed_glob.ID_SPACE_TO_TAB
+        data = self.GetText().encode('utf-8')
+        start, end = self.GetSelection()
+        if start == end:
+            # Convert the whole document
+            start, end = 0, len(data)
+            self.SetUseTabs(to_tabs)
+        self._ApplyTextEdits(data, ebmlib.GetTabEdits(data, self.GetIndent(),
+                                                      to_tabs, start, end))
 
     def GetCurrentLineNum(self):
         """Return the number of the line that the caret is currently at
@@ -1292,6 +1423,20 @@ class EditraStc(ed_basestc.EditraBaseStc):
         """
         return self.LineFromPosition(self.GetCurrentPos())
 
+    def GetTextStats(self):
+        """Get the statistics of the text in the buffer. The statistics
+        gathered when the file was read are used when the buffer has not
+        been modified since.
+        @return: L{ed_txt.TextStats}
+
+        """
+        stats = self.File.GetTextStats()
+        if stats is None or self.GetModify():
+            stats = ed_txt.TextStats()
+            stats.Feed(self.GetText())
+            stats.Finish()
+        return stats
+
     def GetEOLModeId(self):
         """Gets the id of the eol format. Convenience for updating
         menu ui.
@@ -1527,60 +1672,8 @@ class EditraStc(ed_basestc.EditraBaseStc):
         @postcondition: all trailing whitespace is removed from document
 
         """
-        cpos = self.GetCurrentPos()
-        cline = self.GetCurrentLine()
-        cline_len = len(self.GetLine(cline))
-        epos = cline_len - (self.GetLineEndPosition(cline) - cpos)
-
-        # Begin stripping trailing whitespace
-        self.BeginUndoAction()
-        for line in xrange(self.GetLineCount()):
-            eol = u''
-            tmp = self.GetLine(line)
-
-            # Scintilla stores text in utf8 internally so we need to
-            # encode to utf8 to get the correct length of the text.
-            try:
-                tlen = len(tmp.encode('utf-8'))
-            except:
-                tlen = len(tmp)
-
-            if tlen:
-                if "\r\n" in tmp:
-                    eol = "\r\n"
-                elif "\n" in tmp:
-                    eol = "\n"
-                else:
-                    eol = tmp[-1]
-
-                if not eol.isspace():
-                    continue
-                elif eol in u' \t':
-                    eol = u''
-            else:
-                continue
-
-            # Strip the extra whitespace from the line
-            end = self.GetLineEndPosition(line) + len(eol)
-            start = max(end - tlen, 0)
-            self.SetTargetStart(start)
-            self.SetTargetEnd(end)
-            rtxt = tmp.rstrip() + eol
-            if rtxt != self.GetTextRange(start, end):
-                self.ReplaceTarget(tmp.rstrip() + eol)
-        self.EndUndoAction()
-
-        # Restore carat position
-        cline_len = len(self.GetLine(cline))
-        end = self.GetLineEndPosition(cline)
-        if epos >= cline_len:
-            epos = end
-        else:
-            start = max(end - cline_len, 0)
-            epos += start
-
-        if epos != cpos:
-            self.GotoPos(epos)
+        data = self.GetText().encode('utf-8')
+        self._ApplyTextEdits(data, ebmlib.GetTrimEdits(data))
 
     def FoldingOnOff(self, switch=None):
         """Turn code folding on and off
@@ -1817,11 +1910,30 @@ class EditraStc(ed_basestc.EditraBaseStc):
         """
         fsize = ebmlib.GetFileSize(path)
         if fsize < 1048576: # 1MB
-            return super(EditraStc, self).LoadFile(path)
+            result = super(EditraStc, self).LoadFile(path)
+            if self.GetFileName():
+                self._ResetJournal(recover=True)
+                self.CheckIndentation()
+            return result
         else:
             ed_msg.PostMessage(ed_msg.EDMSG_FILE_OPENING, path)
             self.file.SetPath(path)
             self._loading = wx.BusyCursor()
+
+            # Defer highlighting, folding and wrapping while the text is
+            # loaded. They are restored when the load finishes unless the
+            # file is large enough to be opened in large file mode.
+            deferred = dict(highlight=self._config['highlight'],
+                            folding=self._config['folding'],
+                            wrap=self.GetWrapMode())
+            self.SyntaxOnOff(False)
+            self.FoldingOnOff(False)
+            self.SetWrapMode(wx.stc.STC_WRAP_NONE)
+            if fsize >= _PGET('LARGE_FILE', 'int', 52428800):
+                self.LOG("[ed_stc][info] Opening %s in large file mode" % path)
+                deferred = None
+            self._loadinfo = (time.time(), deferred)
+
             self.file.ReadAsync(self)
             return True
 
@@ -1854,6 +1966,8 @@ class EditraStc(ed_basestc.EditraBaseStc):
                     self.AddBookmark(mark)
                 self.EndUndoAction()
                 self.SetSavePoint()
+                self._ResetJournal()
+                self.CheckIndentation()
             except (UnicodeDecodeError, AttributeError, OSError, IOError), msg:
                 self.LOG("[ed_stc][err] Failed to Reload %s" % cfile)
                 return False, msg
@@ -1930,6 +2044,7 @@ class EditraStc(ed_basestc.EditraBaseStc):
             self.SetModTime(ebmlib.GetFileModTime(path))
             self.File.FireModified()
             self.SetFileName(path)
+            self._ResetJournal()
 
         wx.CallAfter(ed_msg.PostMessage,
                      ed_msg.EDMSG_FILE_SAVED,
@@ -31,5 +31,12 @@ class EdThreadPool(ebmlib.ThreadPool):
     def __init__(self):
         super(EdThreadPool, self).__init__(5) # 5 Threads
 
+class EdFileMonitor(ebmlib.FileStateMonitor):
+    """Singleton FileStateMonitor for the files open in the editor"""
+    __metaclass__ = ebmlib.Singleton
+    def __init__(self):
+        super(EdFileMonitor, self).__init__(1000.0, 32) # 32 files/second
+        self.StartMonitoring()
+
 #-----------------------------------------------------------------------------#
         
\ No newline at end of file
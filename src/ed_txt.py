@@ -17,9 +17,12 @@ __revision__ = "$Revision: 72103 $"
 
 #--------------------------------------------------------------------------#
 # Imports
+import os
 import sys
 import re
 import time
+import threading
+import collections
 import wx
 import codecs
 import encodings as enclib
@@ -54,6 +57,14 @@ BOM = { 'utf-8'  : codecs.BOM_UTF8,
 # The first group from this expression will be the encoding.
 RE_MAGIC_COMMENT = re.compile("coding[:=]\s*\"*([-\w.]+)\"*")
 
+# Number of bytes used for detecting the encoding of a file
+ENC_SAMPLE = 4096
+ENC_CACHE_SIZE = 256
+
+# Encodings detected from the distribution of NUL bytes
+_WIDE_ENCODINGS = ('utf_16', 'utf_16_le', 'utf_16_be',
+                   'utf_32', 'utf_32_le', 'utf_32_be')
+
 # File Load States
 FL_STATE_START   = 0
 FL_STATE_READING = 1
@@ -61,6 +72,10 @@ FL_STATE_PAUSED  = 2
 FL_STATE_END     = 3
 FL_STATE_ABORTED = 4
 
+# Read sizes for asynchronous file loads (bytes)
+FIRST_CHUNK = 65536     # First chunk to get the first screen up quickly
+LOAD_CHUNK = 1048576    # Size of the following chunks
+
 #--------------------------------------------------------------------------#
 
 class ReadError(Exception):
@@ -97,6 +112,7 @@ class EdFile(ebmlib.FileObjectImpl):
         self._raw = False           # Raw bytes?
         self._fuzzy_enc = False
         self._job = None # async file read job
+        self._stats = None # TextStats of the last read
 
     def _SanitizeBOM(self, bstring):
         """Remove byte order marks that get automatically added by some codecs"""
@@ -151,6 +167,7 @@ class EdFile(ebmlib.FileObjectImpl):
         fileobj.bom = self.bom
         fileobj._magic = dict(self._magic)
         fileobj._fuzzy_enc = self._fuzzy_enc
+        fileobj._stats = self._stats
         for cback in self._mcallback:
             fileobj.AddModifiedCallback(cback)
         return fileobj
@@ -166,32 +183,29 @@ class EdFile(ebmlib.FileObjectImpl):
         bytes_value = self.__buffer.getvalue()
         ustr = u""
         try:
-            if not self._fuzzy_enc or not EdFile._Checker.IsBinaryBytes(bytes_value):
-                if self.bom is not None:
+            if not self._fuzzy_enc or \
+               not EdFile._Checker.IsBinaryBytes(bytes_value[:ENC_SAMPLE]):
+                if self.bom is not None and bytes_value.startswith(self.bom):
                     Log("[ed_txt][info] Stripping %s BOM from text" % self.encoding)
-                    bytes_value = bytes_value.replace(self.bom, '', 1)
+                    bytes_value = bytes_value[len(self.bom):]
 
                 Log("[ed_txt][info] Attempting to decode with: %s" % self.encoding)
                 ustr = bytes_value.decode(self.encoding)
-                # TODO: temporary...maybe
-                # Check for utf-16 encodings which use double bytes
-                # can result in NULLs in the string if decoded with
-                # other encodings.
+                # Check for utf-16/32 text that was decoded with a single
+                # byte encoding (i.e user set encoding) which results in
+                # NULLs in the string.
                 if str('\0') in ustr:
                     Log("[ed_txt][info] NULL terminators found in decoded str")
-                    Log("[ed_txt][info] Attempting UTF-16/32 detection...")
-                    for utf_encoding in ('utf_16', 'utf_32'):
+                    utf_encoding = CheckWideEncoding(bytes_value[:ENC_SAMPLE])
+                    if utf_encoding is not None and \
+                       utf_encoding != self.encoding:
                         try:
-                            tmpstr = bytes_value.decode(utf_encoding)
+                            ustr = bytes_value.decode(utf_encoding)
                         except UnicodeDecodeError:
-                            pass
+                            Log("[ed_txt][info] No valid UTF-16/32 bytes")
                         else:
                             self.encoding = utf_encoding
-                            ustr = tmpstr
                             Log("[ed_txt][info] %s detected" % utf_encoding)
-                            break
-                    else:
-                        Log("[ed_txt][info] No valid UTF-16/32 bytes detected")
             else:
                 # Binary data was read
                 Log("[ed_txt][info] Binary bytes where read")
@@ -243,28 +257,27 @@ class EdFile(ebmlib.FileObjectImpl):
             return
 
         assert self.Handle is not None, "File handle not initialized"
-        lines = [ self.Handle.readline() for x in range(2) ]
+        sample = self.Handle.read(ENC_SAMPLE)
         self.Handle.seek(0)
-        enc = None
-        if len(lines):
-            # First check for a Byte Order Mark
-            enc = CheckBom(lines[0])
-
-            # If no byte-order mark check for an encoding comment
-            if enc is None:
-                Log("[ed_txt][info] DetectEncoding - Check magic comment")
-                self.bom = None
-                if not self._magic['bad']:
-                    enc = CheckMagicComment(lines)
-                    if enc:
-                        self._magic['comment'] = enc
-            else:
-                Log("[ed_txt][info] File Has %s BOM" % enc)
-                self.bom = BOM.get(enc, None)
 
-        if enc is None:
-            Log("[ed_txt][info] Doing brute force encoding check")
-            enc = GuessEncoding(self.GetPath(), 4096)
+        # Check for a cached result from an earlier detection first
+        key = None
+        if not self._magic['bad']:
+            try:
+                info = os.fstat(self.Handle.fileno())
+                key = (self.GetPath(), info.st_mtime, info.st_size)
+            except (OSError, AttributeError, ValueError):
+                pass
+        result = _GetCachedEncoding(key)
+        if result is None:
+            result = DetectSampleEncoding(sample, not self._magic['bad'])
+            _SetCachedEncoding(key, result)
+
+        enc, self.bom, magic = result
+        if magic:
+            self._magic['comment'] = magic
+        if self.bom is not None:
+            Log("[ed_txt][info] File Has %s BOM" % enc)
 
         if enc is None:
             self._fuzzy_enc = True
@@ -359,6 +372,14 @@ class EdFile(ebmlib.FileObjectImpl):
         """
         return self._magic['comment']
 
+    def GetTextStats(self):
+        """Get the statistics of the text from the last time the file was
+        read.
+        @return: L{TextStats} or None if they are not available
+
+        """
+        return self._stats
+
     def HasBom(self):
         """Return whether the file has a bom byte or not
         @return: bool
@@ -406,6 +427,12 @@ class EdFile(ebmlib.FileObjectImpl):
 
             self.Close()
             txt = self.DecodeText()
+            self._stats = None
+            if not self._raw:
+                stats = TextStats(self.encoding)
+                stats.Feed(txt)
+                stats.Finish()
+                self._stats = stats
             self.SetModTime(ebmlib.GetFileModTime(self.GetPath()))
             self._ResetBuffer()
             return txt
@@ -423,49 +450,56 @@ class EdFile(ebmlib.FileObjectImpl):
         filesize = ebmlib.GetFileSize(self.GetPath())
         ed_msg.PostMessage(ed_msg.EDMSG_PROGRESS_STATE, (pid, 1, filesize))
         # Fork off async job to threadpool
-        self._job = FileReadJob(control, self.ReadGenerator, 4096)
+        self._job = FileReadJob(control, self.ReadGenerator, LOAD_CHUNK)
         ed_thread.EdThreadPool().QueueJob(self._job.run)
 
-    def ReadGenerator(self, chunk=512):
+    def ReadGenerator(self, chunk=LOAD_CHUNK):
         """Get the contents of the file as a string, automatically handling
-        any decoding that may be needed.
+        any decoding that may be needed. The file is decoded incrementally so
+        only one chunk of the file is held in memory at a time. The first
+        chunk is kept small so that the start of the file can be shown as
+        soon as possible. The L{TextStats} of the text are gathered while
+        reading and are available from L{GetTextStats} once the generator is
+        exhausted.
 
         @keyword chunk: read size
         @return: unicode (generator)
         @throws: ReadError Failed to open file for reading.
 
         """
+        self._stats = None
         if self.DoOpen('rb'):
-            # Throttle yielded text to reduce event over head
-            filesize = ebmlib.GetFileSize(self.Path)
-            throttle = max(chunk, filesize/100)
-
             self.DetectEncoding()
+            stats = TextStats(self.Encoding)
             try:
-                # Must use codec reader to ensure correct number of
-                # bytes are read in to be decoded.
-                reader = codecs.getreader(self.Encoding)(self.Handle)
-                buffered_data = StringIO()
+                # Incremental decoder handles multibyte characters that are
+                # split across the chunk boundaries.
+                decoder = codecs.getincrementaldecoder(self.Encoding)()
+                data = self.Handle.read(min(chunk, FIRST_CHUNK))
+                if self.bom is not None and data.startswith(self.bom):
+                    Log("[ed_txt][info] Stripping %s BOM from text" % \
+                        self.encoding)
+                    data = data[len(self.bom):]
+
                 while True:
-                    tmp = reader.read(chunk)
-                    if not len(tmp):
-                        if buffered_data.len:
-                            yield buffered_data.getvalue()
-                            buffered_data.close()
+                    final = not len(data)
+                    txt = decoder.decode(data, final)
+                    if len(txt):
+                        stats.Feed(txt)
+                        yield txt
+                    if final:
                         break
-
-                    buffered_data.write(tmp)
-                    if buffered_data.len >= throttle:
-                        yield buffered_data.getvalue()
-                        buffered_data.close()
-                        buffered_data = StringIO()
+                    data = self.Handle.read(chunk)
             except Exception, msg:
                 Log("[ed_txt][err] Error while reading with %s" % self.Encoding)
                 Log("[ed_txt][err] %s" % msg)
                 self.SetLastError(unicode(msg))
-                self.Close()
                 if self._magic['comment']:
                     self._magic['bad'] = True
+            else:
+                stats.Finish()
+                self._stats = stats
+            self.Close()
 
             Log("[ed_txt][info] Decoded %s with %s" % (self.Path, self.Encoding))
             self.SetModTime(ebmlib.GetFileModTime(self.Path))
@@ -487,6 +521,7 @@ class EdFile(ebmlib.FileObjectImpl):
         self._magic = dict(comment=None, bad=False)
         self.encoding = Profile_Get('ENCODING', default=DEFAULT_ENCODING)
         self.bom = None
+        self._stats = None
 
     def SetEncoding(self, enc):
         """Explicitly set/change the encoding of the file
@@ -588,19 +623,20 @@ class FileReadJob(object):
 
     def run(self):
         """Read the text"""
+        # NOTE: events are processed in the order they are posted so the
+        #       start event is handled before any text is received.
         evt = FileLoadEvent(edEVT_FILE_LOAD, wx.ID_ANY, None, FL_STATE_START)
         wx.PostEvent(self.receiver, evt)
-        time.sleep(.75) # give ui a chance to get ready
 
-        count = 1
+        count = 0
         for txt in self._task(*self._args, **self._kwargs):
             if self.cancel:
                 break
 
+            count += len(txt)
             evt = FileLoadEvent(edEVT_FILE_LOAD, wx.ID_ANY, txt)
-            evt.SetProgress(count * self._args[0])
+            evt.SetProgress(count)
             wx.PostEvent(self.receiver, evt)
-            count += 1
 
         evt = FileLoadEvent(edEVT_FILE_LOAD, wx.ID_ANY, None, FL_STATE_END)
         wx.PostEvent(self.receiver, evt)
@@ -656,6 +692,190 @@ class FileLoadEvent(wx.PyEvent):
         """
         self._prog = progress
 
+#-----------------------------------------------------------------------------#
+
+class TextStats(object):
+    """Statistics about the end of line characters, the indentation and the
+    lines of a document that are gathered in a single pass over the text
+    while it is read. The text can be fed in chunks of any size, a line or a
+    CRLF pair that is split between two chunks is handled.
+
+    """
+    _TAB_INDENT = re.compile(u'^\t[ \t]*\S', re.M)
+    _SPACE_INDENT = re.compile(u'^ [ \t]*\S', re.M)
+    _HEAD = 256 # Characters of a split line that are kept for the indentation
+
+    def __init__(self, encoding=None):
+        """Create the statistics object
+        @keyword encoding: encoding the text was decoded with
+
+        """
+        super(TextStats, self).__init__()
+
+        # Attributes
+        self.encoding = encoding
+        self._eols = { u"\n" : 0, u"\r\n" : 0, u"\r" : 0 }
+        self._first = None  # First end of line in the text
+        self._tabs = 0      # Lines indented with tabs
+        self._spaces = 0    # Lines indented with spaces
+        self._longest = 0
+        self._lines = 1
+        self._head = u''    # Start of the unfinished line
+        self._len = 0       # Length of the unfinished line
+        self._cr = False    # Last chunk ended with a \r
+        self._done = False
+
+    def _AddEOL(self, eol, count=1):
+        """Count end of line characters
+        @param eol: end of line string
+        @keyword count: number of times it was found
+
+        """
+        self._eols[eol] += count
+        self._lines += count
+
+    def _AddPartial(self, text):
+        """Add the text to the unfinished line"""
+        self._len += len(text)
+        if len(self._head) < TextStats._HEAD:
+            self._head += text[:TextStats._HEAD - len(self._head)]
+
+    def _EndLine(self):
+        """Finish the current line"""
+        if self._head.strip():
+            if self._head[0] == u'\t':
+                self._tabs += 1
+            elif self._head[0] == u' ':
+                self._spaces += 1
+        self._longest = max(self._longest, self._len)
+        self._head = u''
+        self._len = 0
+
+    def Feed(self, text):
+        """Add the next chunk of text to the statistics
+        @param text: unicode
+
+        """
+        assert not self._done, "TextStats already finished"
+        if self._cr:
+            text = u'\r' + text
+            self._cr = False
+        if text.endswith(u'\r'):
+            # Wait for the next chunk to know if this is a CRLF
+            text = text[:-1]
+            self._cr = True
+        if not len(text):
+            return
+
+        crlf = text.count(u'\r\n')
+        cr = text.count(u'\r') - crlf
+        lf = text.count(u'\n') - crlf
+        if not (crlf or cr or lf):
+            self._AddPartial(text)
+            return
+
+        self._AddEOL(u'\r\n', crlf)
+        self._AddEOL(u'\r', cr)
+        self._AddEOL(u'\n', lf)
+        if self._first is None:
+            idx = min([ pos for pos in (text.find(u'\r'), text.find(u'\n'))
+                        if pos >= 0 ])
+            if text.startswith(u'\r\n', idx):
+                self._first = u'\r\n'
+            else:
+                self._first = text[idx]
+
+        # Normalize the line endings so the lines can be split with one char
+        if crlf:
+            text = text.replace(u'\r\n', u'\n')
+        if cr:
+            text = text.replace(u'\r', u'\n')
+
+        first = text.find(u'\n')
+        last = text.rfind(u'\n')
+        self._AddPartial(text[:first])
+        self._EndLine()
+        if first < last:
+            block = text[first + 1:last]
+            self._tabs += len(TextStats._TAB_INDENT.findall(block))
+            self._spaces += len(TextStats._SPACE_INDENT.findall(block))
+            self._longest = max(self._longest,
+                                max(map(len, block.split(u'\n'))))
+        self._AddPartial(text[last + 1:])
+
+    def Finish(self):
+        """Finish the statistics after the last chunk of text was fed"""
+        if not self._done:
+            if self._cr:
+                # The text ended with a lone \r
+                self._cr = False
+                self._AddEOL(u'\r')
+                if self._first is None:
+                    self._first = u'\r'
+            self._EndLine()
+            self._done = True
+
+    def GetEOL(self):
+        """Get the end of line characters used in the document. This is
+        the first end of line in the text.
+        @return: unicode or None if the text has no line endings
+
+        """
+        return self._first
+
+    def GetEOLCounts(self):
+        """Get the number of times each end of line was used
+        @return: dict { u"\n" : int, u"\r\n" : int, u"\r" : int }
+
+        """
+        return dict(self._eols)
+
+    def GetIndentCounts(self):
+        """Get the number of lines that are indented with tabs and the number
+        of lines that are indented with spaces. Blank lines are not counted.
+        @return: tuple (tabs, spaces)
+
+        """
+        return (self._tabs, self._spaces)
+
+    def GetLineCount(self):
+        """Get the number of lines in the text
+        @return: int
+
+        """
+        return self._lines
+
+    def GetLongestLine(self):
+        """Get the length of the longest line in characters
+        @return: int
+
+        """
+        return self._longest
+
+    def IsMixedEOL(self):
+        """Does the text use more than one kind of end of line?
+        @return: bool
+
+        """
+        return len([ cnt for cnt in self._eols.itervalues() if cnt ]) > 1
+
+    def IsMixedIndent(self):
+        """Does the text have lines indented with tabs and lines indented
+        with spaces?
+        @return: bool
+
+        """
+        return bool(self._tabs and self._spaces)
+
+    def UsesTabs(self):
+        """Are most of the indented lines indented with tabs?
+        @return: bool or None if no lines are indented
+
+        """
+        if not (self._tabs or self._spaces):
+            return None
+        return self._tabs > self._spaces
+
 #-----------------------------------------------------------------------------#
 # Utility Function
 def CheckBom(line):
@@ -696,6 +916,121 @@ def CheckMagicComment(lines):
     Log("[ed_txt][info] MagicComment is %s" % enc)
     return enc
 
+def CheckWideEncoding(sample):
+    """Check if the given bytes are utf-16 or utf-32 text without a byte
+    order mark by looking at the positions of the NUL bytes in it.
+    @param sample: byte string
+    @return: encoding or None
+
+    """
+    size = len(sample) - (len(sample) % 4)
+    if not size or '\0' not in sample:
+        return None
+
+    quarter = size / 4
+    nuls = [ sample[idx:size:4].count('\0') for idx in range(4) ]
+    even = nuls[0] + nuls[2]
+    odd = nuls[1] + nuls[3]
+    enc = None
+    if min(nuls[2:]) >= quarter * 0.9 and nuls[0] < quarter * 0.5:
+        enc = 'utf_32_le'
+    elif min(nuls[:2]) >= quarter * 0.9 and nuls[3] < quarter * 0.5:
+        enc = 'utf_32_be'
+    elif odd >= quarter * 0.5 and odd > even * 4:
+        enc = 'utf_16_le'
+    elif even >= quarter * 0.5 and even > odd * 4:
+        enc = 'utf_16_be'
+
+    if enc is not None:
+        try:
+            sample[:size].decode(enc)
+        except UnicodeDecodeError:
+            enc = None
+    return enc
+
+def DetectSampleEncoding(sample, magic=True):
+    """Detect the encoding of a file from a sample of its first bytes in a
+    single pass over the sample. Checks for a byte order mark, a magic
+    comment, utf-16/32 text, valid utf-8 and then tries the other candidate
+    encodings from L{GetEncodings} on the sample.
+    @param sample: byte string
+    @keyword magic: check for a magic comment
+    @return: (encoding, bom, magic comment encoding). The encoding is None
+             if the sample looks like binary data.
+
+    """
+    enc = CheckBom(sample)
+    if enc is not None:
+        return (enc, BOM[enc], None)
+
+    if magic:
+        enc = CheckMagicComment(sample.split('\n', 2)[:2])
+        if enc:
+            return (enc, None, enc)
+
+    if '\0' in sample:
+        return (CheckWideEncoding(sample), None, None)
+
+    try:
+        sample.decode('ascii')
+    except UnicodeDecodeError:
+        try:
+            # Allow for a multibyte character split at the end of the sample
+            codecs.getincrementaldecoder('utf-8')().decode(sample, False)
+        except UnicodeDecodeError:
+            pass
+        else:
+            return ('utf-8', None, None)
+
+    for enc in GetEncodings():
+        if codecs.lookup(enc).name.replace('-', '_') in _WIDE_ENCODINGS:
+            continue
+
+        try:
+            codecs.getincrementaldecoder(enc)().decode(sample, False)
+        except (UnicodeDecodeError, LookupError):
+            continue
+        else:
+            return (enc, None, None)
+    return (None, None, None)
+
+_ENCCACHE = dict()
+_ENCCACHE_ORDER = collections.deque() # Keys from least to most recently used
+_ENCCACHE_LOCK = threading.Lock()
+
+def _GetCachedEncoding(key):
+    """Get the cached detection result for a file
+    @param key: (path, mtime, size) or None
+    @return: result of L{DetectSampleEncoding} or None
+
+    """
+    if key is None:
+        return None
+
+    with _ENCCACHE_LOCK:
+        result = _ENCCACHE.get(key, None)
+        if result is not None:
+            _ENCCACHE_ORDER.remove(key)
+            _ENCCACHE_ORDER.append(key)
+    return result
+
+def _SetCachedEncoding(key, result):
+    """Cache the detection result for a file
+    @param key: (path, mtime, size) or None
+    @param result: result of L{DetectSampleEncoding}
+
+    """
+    if key is None:
+        return
+
+    with _ENCCACHE_LOCK:
+        if key in _ENCCACHE:
+            _ENCCACHE_ORDER.remove(key)
+        _ENCCACHE[key] = result
+        _ENCCACHE_ORDER.append(key)
+        while len(_ENCCACHE_ORDER) > ENC_CACHE_SIZE:
+            del _ENCCACHE[_ENCCACHE_ORDER.popleft()]
+
 def DecodeString(string, encoding=None):
     """Decode the given string to Unicode using the provided
     encoding or the DEFAULT_ENCODING if None is provided.
@@ -766,18 +1101,12 @@ def GuessEncoding(fname, sample):
     @return: encoding or None
 
     """
-    for enc in GetEncodings():
-        try:
-            with open(fname, 'rb') as handle:
-                with codecs.getreader(enc)(handle) as reader:
-                    value = reader.read(sample)
-                    if str('\0') in value:
-                        continue
-                    else:
-                        return enc
-        except Exception, msg:
-            continue
-    return None
+    try:
+        with open(fname, 'rb') as handle:
+            data = handle.read(sample)
+    except (IOError, OSError):
+        return None
+    return DetectSampleEncoding(data, False)[0]
 
 def GetEncodings():
     """Get a list of possible encodings to try from the locale information
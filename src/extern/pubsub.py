@@ -253,6 +253,10 @@ class _NodeCallback:
         pass
 
 
+# Called as _deliveryHook(listener, message) to deliver each message instead
+# of calling the listener directly when set with Publisher.setDeliveryHook
+_deliveryHook = None
+
 class _TopicTreeNode:
     """A node in the topic tree. This contains a list of callables
     that are interested in the topic that this node is associated
@@ -304,6 +308,13 @@ class _TopicTreeNode:
         """Get callables associated with this topic node"""
         return [cb() for cb in self.__callables if cb() is not None]
     
+    def hasLiveCallables(self):
+        """Return true if any of the callables of this node are alive"""
+        for cb in self.__callables:
+            if cb() is not None:
+                return True
+        return False
+
     def hasCallable(self, callable):
         """Return true if callable in this node"""
         try: 
@@ -315,10 +326,14 @@ class _TopicTreeNode:
     def sendMessage(self, message):
         """Send a message to our callables"""
         deliveryCount = 0
+        hook = _deliveryHook
         for cb in self.__callables:
             listener = cb()
             if listener is not None:
-                listener(message)
+                if hook is None:
+                    listener(message)
+                else:
+                    hook(listener, message)
                 deliveryCount += 1
         return deliveryCount
     
@@ -487,6 +502,20 @@ class _TopicTreeRoot(_TopicTreeNode):
                 break
         return deliveryCount
 
+    def hasListeners(self, topic):
+        """Return true if a message for the given topic would be delivered
+        to at least one live listener."""
+        node = self
+        if node.hasLiveCallables():
+            return True
+        for topicItem in topic:
+            if not node.hasSubtopic(topicItem):
+                return False
+            node = node.getNode(topicItem)
+            if node.hasLiveCallables():
+                return True
+        return False
+
     def numListeners(self):
         """Return a pair (live, dead) with count of live and dead listeners in tree"""
         dead, live = 0, 0
@@ -779,6 +808,20 @@ class PublisherClass:
         """
         return self.__topicTree.getTopics(listener)
     
+    def setDeliveryHook(self, hook):
+        """Set a callable that is used to deliver every message to every
+        listener as hook(listener, message), i.e to measure the time the
+        listeners take. The hook must call listener(message). Use None to
+        remove the hook."""
+        global _deliveryHook
+        _deliveryHook = hook
+
+    def hasListeners(self, topic=ALL_TOPICS):
+        """Return true if a message sent for topic would be received by
+        at least one listener. Use this to avoid building messages that
+        nobody is listening for."""
+        return self.__topicTree.hasListeners(_tupleize(topic))
+
     def sendMessage(self, topic=ALL_TOPICS,
                     data=None, onTopicNeverCreated=None,
                     context=None):
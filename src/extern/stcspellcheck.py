@@ -42,9 +42,12 @@ Currently provides:
  - check the document in either idle time or in a background thread
 
 @author: Rob McMullen
-@version: 1.2
+@version: 1.3
 
 Changelog::
+    1.3:
+        - Added a verdict cache shared by all instances using the same language
+        - Added checking of the entire document in a background thread
     1.2:
         - Rewrote as a standalone class rather than a static mixin
     1.1:
@@ -55,7 +58,9 @@ Changelog::
 """
 
 import os
+import re
 import locale
+import threading
 import wx
 import wx.stc
 
@@ -75,6 +80,89 @@ except:
     import traceback
     traceback.print_exc()
 
+# Runs of letters; the same words found by the default findNextWord
+WORD_RE = re.compile(r'[^\W\d_]+', re.UNICODE)
+
+class SpellingCache(object):
+    """Bounded cache of the spelling verdicts of a dictionary.
+    
+    Looking up a word in the enchant dictionary is expensive compared to the
+    work needed to find the words in the text, and the words of a document
+    repeat a lot, so the results of the lookups are remembered.  The cache
+    holds two generations of words: the words looked up recently and the ones
+    that were looked up before.  When the recent generation is full it
+    replaces the old one, which drops the words that have not been used since
+    the last swap; so the cache is bounded and approximately least recently
+    used.
+    
+    The cache is safe to use from multiple threads.
+    """
+    def __init__(self, size=20000):
+        self.size = max(2, size)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._recent = {}
+        self._old = {}
+    
+    def __len__(self):
+        return len(self._recent) + len(self._old)
+    
+    def check(self, spell, word):
+        """Check the spelling of a word, using the dictionary only if the
+        verdict isn't already known.
+        
+        @param spell: enchant.Dict instance used on a cache miss
+        @param word: word to check
+        @return: True if the word is spelled correctly
+        """
+        verdict = self._recent.get(word)
+        if verdict is not None:
+            self.hits += 1
+            return verdict
+        self._lock.acquire()
+        try:
+            verdict = self._old.get(word)
+            if verdict is None:
+                self.misses += 1
+                verdict = bool(spell.check(word))
+            else:
+                self.hits += 1
+            self._store(word, verdict)
+        finally:
+            self._lock.release()
+        return verdict
+    
+    def setVerdict(self, word, verdict):
+        """Set the verdict of a word, i.e.  after adding it to the dictionary.
+        
+        @param word: word to update
+        @param verdict: True if the word is spelled correctly
+        """
+        self._lock.acquire()
+        try:
+            self._old.pop(word, None)
+            self._store(word, verdict)
+        finally:
+            self._lock.release()
+    
+    def clear(self):
+        """Forget all verdicts"""
+        self._lock.acquire()
+        try:
+            self._recent = {}
+            self._old = {}
+        finally:
+            self._lock.release()
+    
+    def _store(self, word, verdict):
+        # Must be called with the lock held
+        self._recent[word] = verdict
+        if len(self._recent) >= self.size // 2:
+            self._old = self._recent
+            self._recent = {}
+
+
 class STCSpellCheck(object):
     """Spell checking for use with wx.StyledTextControl.
     
@@ -100,6 +188,11 @@ class STCSpellCheck(object):
     _spelling_lang = None
     _spelling_dict = None
     
+    # Verdict caches shared by all instances, by language
+    _spelling_caches = {}
+    _spelling_cache_size = 20000
+    _spelling_cache_lock = threading.Lock()
+    
     def __init__(self, stc, *args, **kwargs):
         """Mixin must be initialized using this constructor.
         
@@ -134,6 +227,9 @@ class STCSpellCheck(object):
         self._no_update = False
         self._last_block = -1
         
+        # Incremented to discard the results of a running background check
+        self._background_id = 0
+        
         self.clearDirtyRanges()
 
     def setIndicator(self, indicator=None, color=None, style=None):
@@ -224,6 +320,38 @@ class STCSpellCheck(object):
         cls._spelling_lang = lang
         cls._spelling_dict = cls._getDict(lang)
 
+    @classmethod
+    def getSpellingCache(cls, lang):
+        """Get the verdict cache shared by all users of a language.
+        
+        @param lang: text string indicating the language
+        @return: L{SpellingCache} instance
+        """
+        cls._spelling_cache_lock.acquire()
+        try:
+            cache = STCSpellCheck._spelling_caches.get(lang)
+            if cache is None:
+                cache = SpellingCache(cls._spelling_cache_size)
+                STCSpellCheck._spelling_caches[lang] = cache
+        finally:
+            cls._spelling_cache_lock.release()
+        return cache
+
+    @classmethod
+    def setCacheSize(cls, size):
+        """Set the maximum number of verdicts kept for each language.
+        
+        Existing caches are emptied.
+        
+        @param size: number of words
+        """
+        cls._spelling_cache_lock.acquire()
+        try:
+            STCSpellCheck._spelling_cache_size = size
+            STCSpellCheck._spelling_caches = {}
+        finally:
+            cls._spelling_cache_lock.release()
+
     @classmethod
     def getSpellingDictionary(cls):
         """Get the currently used spelling dictionary
@@ -244,6 +372,23 @@ class STCSpellCheck(object):
         # Note that this instance variable will shadow the class attribute
         self._spelling_lang = lang
         self._spelling_dict = self._getDict(lang)
+        self._background_id += 1
+    
+    def addWord(self, word, session=False):
+        """Add a word to the dictionary of the current language.
+        
+        @param word: word to add
+        @param session: True to only add the word for the current session
+        instead of to the personal word list
+        """
+        spell = self._spelling_dict
+        if not spell:
+            return
+        if session:
+            spell.add_to_session(word)
+        else:
+            spell.add(word)
+        self.getSpellingCache(self._spelling_lang).setVerdict(word, True)
     
     def hasDictionary(self):
         """Returns True if a dictionary is available to spell check the current
@@ -274,6 +419,9 @@ class STCSpellCheck(object):
             else:
                 mod = __import__('enchant', globals(), locals())
                 globals()['enchant'] = mod
+            # The verdicts may differ with another enchant backend
+            for cache in STCSpellCheck._spelling_caches.values():
+                cache.clear()
         except ImportError:
             return False
         else:
@@ -294,6 +442,7 @@ class STCSpellCheck(object):
     
     def clearAll(self):
         """Clear the stc of all spelling indicators."""
+        self._background_id += 1
         self.stc.StartStyling(0, self._spelling_indicator_mask)
         self.stc.SetStyling(self.stc.GetLength(), 0)
     
@@ -323,48 +472,160 @@ class STCSpellCheck(object):
         self.stc.SetStyling(count, 0)
         
         text = self.stc.GetTextRange(start, end) # note: returns unicode
-        unicode_index = 0
-        max_index = len(text)
+        for offset, raw_count in self.findMisspelled(text, spell):
+            pos = start + offset
+            if self._spell_check_region(pos):
+                if self._spelling_debug:
+                    print("styling (%d,%d) to %d" % (pos, pos + raw_count, mask))
+                self.stc.StartStyling(pos, mask)
+                self.stc.SetStyling(raw_count, mask)
+            elif self._spelling_debug:
+                print("not in valid spell check region.  styling position (%d,%d)" % (pos, pos + raw_count))
+
+    def findMisspelled(self, text, spell=None, cache=None):
+        """Find the misspelled words in a block of text.
         
+        Doesn't use the stc, so it is safe to call from a background thread.
+        
+        @param text: unicode text to check
+        @param spell: dictionary to use, or None to use the current one
+        @param cache: L{SpellingCache} of the dictionary, or None to use the
+        one of the current language
+        @return: list of (offset, length) tuples of the misspelled words in
+        raw bytes relative to the start of the text
+        """
+        if spell is None:
+            spell = self._spelling_dict
+        if not spell:
+            return []
+        if cache is None:
+            cache = self.getSpellingCache(self._spelling_lang)
+        min_size = self._spelling_word_size
+        misspelled = []
+        
+        # Because unicode characters are stored as utf-8 in the stc and the
+        # positions in the stc correspond to the raw bytes, not the number of
+        # unicode characters, the offsets have to be converted to raw bytes.
+        # That is only needed when the text isn't plain ascii.
+        ascii = len(text.encode('utf-8')) == len(text)
         last_index = 0 # last character in text a valid raw byte position
-        last_pos = start # raw byte position corresponding to last_index
-        while unicode_index < max_index:
-            start_index, end_index = self.findNextWord(text, unicode_index, max_index)
-            if end_index >= 0:
-                if end_index - start_index >= self._spelling_word_size:
-                    if self._spelling_debug:
-                        print("checking %s at text[%d:%d]" % (repr(text[start_index:end_index]), start_index, end_index))
-                    if not spell.check(text[start_index:end_index]):
-                        # Because unicode characters are stored as utf-8 in the
-                        # stc and the positions in the stc correspond to the
-                        # raw bytes, not the number of unicode characters, we
-                        # have to find out the offset to the unicode chars in
-                        # terms of raw bytes.
-                        
-                        # find the number of raw bytes from the last calculated
-                        # styling position to the start of the word
-                        last_pos += len(text[last_index:start_index].encode('utf-8'))
-                        
-                        # find the length of the word in raw bytes
-                        raw_count = len(text[start_index:end_index].encode('utf-8'))
-                        
-                        if self._spell_check_region(last_pos):
-                            if self._spelling_debug:
-                                print("styling text[%d:%d] = (%d,%d) to %d" % (start_index, end_index, last_pos, last_pos + raw_count, mask))
-                            self.stc.StartStyling(last_pos, mask)
-                            self.stc.SetStyling(raw_count, mask)
-                        elif self._spelling_debug:
-                            print("not in valid spell check region.  styling position corresponding to text[%d:%d] = (%d,%d)" % (start_index, end_index, last_pos, last_pos + raw_count))
-                        last_pos += raw_count
-                        last_index = end_index
-                unicode_index = end_index
+        last_pos = 0 # raw byte position corresponding to last_index
+        for start_index, end_index in self.iterWords(text):
+            if end_index - start_index < min_size:
+                continue
+            word = text[start_index:end_index]
+            if self._spelling_debug:
+                print("checking %s at text[%d:%d]" % (repr(word), start_index, end_index))
+            if cache.check(spell, word):
+                continue
+            if ascii:
+                misspelled.append((start_index, end_index - start_index))
             else:
-                break
+                # find the number of raw bytes from the last calculated
+                # styling position to the start of the word
+                last_pos += len(text[last_index:start_index].encode('utf-8'))
+                raw_count = len(word.encode('utf-8'))
+                misspelled.append((last_pos, raw_count))
+                last_pos += raw_count
+                last_index = end_index
+        return misspelled
+
+    def iterWords(self, text):
+        """Generate the (start, end) indexes of the words in a block of text.
+        
+        Uses a regular expression to find the words unless L{findNextWord} has
+        been overridden.
+        
+        @param text: unicode text
+        """
+        length = len(text)
+        if getattr(self.findNextWord, 'im_func', None) is not \
+           STCSpellCheck.findNextWord.im_func:
+            index = 0
+            while index < length:
+                start_index, end_index = self.findNextWord(text, index, length)
+                if end_index < 0:
+                    break
+                yield start_index, end_index
+                index = end_index
+            return
+
+        for match in WORD_RE.finditer(text):
+            start_index, end_index = match.span()
+            if match.group().isalpha():
+                yield start_index, end_index
+                continue
+            # Letter-like characters that aren't alphabetic (i.e. some
+            # numerals); split the match the way findNextWord does
+            index = start_index
+            while index < end_index:
+                word_start, word_end = self.findNextWord(text, index, end_index)
+                if word_end < 0:
+                    break
+                yield word_start, word_end
+                index = word_end
 
     def checkAll(self):
         """Perform a spell check on the entire document."""
         return self.checkRange(0, self.stc.GetLength())
     
+    def checkAllInBackground(self, chunk_size=65536):
+        """Perform a spell check on the entire document in a background thread.
+        
+        The text of the document is checked in chunks of whole lines and the
+        indicators of each chunk are applied in a single batch in the main
+        thread.  Any modification of the document, L{clearAll}, or starting
+        another background check cancels the check; the indicators of the
+        chunks that were already processed are kept.
+        
+        @param chunk_size: approximate number of characters in each chunk
+        @return: True if the background check was started
+        """
+        spell = self._spelling_dict
+        if not spell:
+            return False
+        self._background_id += 1
+        text = self.stc.GetText()
+        cache = self.getSpellingCache(self._spelling_lang)
+        worker = threading.Thread(target=self._backgroundCheck,
+                                  args=(self._background_id, text, spell,
+                                        cache, chunk_size))
+        worker.setDaemon(True)
+        worker.start()
+        return True
+    
+    def _backgroundCheck(self, check_id, text, spell, cache, chunk_size):
+        # Runs in the worker thread, so it can't use the stc
+        index = 0
+        pos = 0
+        length = len(text)
+        while index < length and check_id == self._background_id:
+            end = text.find(u'\n', index + chunk_size)
+            if end < 0:
+                end = length
+            else:
+                end += 1
+            chunk = text[index:end]
+            raw_count = len(chunk.encode('utf-8'))
+            misspelled = self.findMisspelled(chunk, spell, cache)
+            wx.CallAfter(self._applyBackgroundBatch, check_id, pos,
+                         raw_count, misspelled)
+            index = end
+            pos += raw_count
+    
+    def _applyBackgroundBatch(self, check_id, start, count, misspelled):
+        """Set the indicators for a chunk checked by the background thread."""
+        if check_id != self._background_id or not self.stc:
+            return # cancelled or stc destroyed
+        mask = self._spelling_indicator_mask
+        self.stc.StartStyling(start, mask)
+        self.stc.SetStyling(count, 0)
+        for offset, raw_count in misspelled:
+            pos = start + offset
+            if self._spell_check_region(pos):
+                self.stc.StartStyling(pos, mask)
+                self.stc.SetStyling(raw_count, mask)
+    
     def checkSelection(self):
         """Perform a spell check on the currently selected region."""
         return self.checkRange(self.stc.GetSelectionStart(), self.stc.GetSelectionEnd())
@@ -517,6 +778,8 @@ class STCSpellCheck(object):
         updated when some idle time is available.
         
         """
+        # The text of a running background check is out of date
+        self._background_id += 1
         count = end - start
         if deleted:
             count = -count
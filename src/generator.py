@@ -27,7 +27,9 @@ __revision__ = "$Revision: 70229 $"
 # Imports
 import wx
 import wx.stc
+import re
 import time
+import codecs
 
 # Editra Libraries
 import ed_glob
@@ -43,6 +45,19 @@ import eclib
 _ = wx.GetTranslation
 
 FONT_FALLBACKS = "Trebuchet, Tahoma, sans-serif"
+# Character substitutions for LaTeX and RTF text
+LATEX_MAP = dict([ (ord(char), sub) for char, sub in
+                   { u"#" : u"\\#", u"$" : u"\\$", u"^" : u"\\^",
+                     u"%" : u"\\%", u"&" : u"\\&", u"_" : u"\\_",
+                     u"{" : u"\\{", u"}" : u"\\}", u"~" : u"\\~",
+                     u"\\": u"$\\backslash$", u"\n" : u"\\\\\n",
+                     u"@" : u"$@$", u"<" : u"$<$", u">" : u"$>$",
+                     u"-" : u"$-$", u"|" : u"$|$" }.iteritems() ])
+RTF_MAP = dict([ (ord(char), sub) for char, sub in
+                 { u"\t" : u"\\tab ", u"{" : u"\\{", u"}" : u"\\}",
+                   u"\\" : u"\\\\", u"\n" : u"\\par\n",
+                   u"\r" : u"\\par\n" }.iteritems() ])
+RUN_RE = re.compile(r'(.)\1*', re.DOTALL) # Runs of the same style byte
 
 #--------------------------------------------------------------------------#
 # Plugin Interface
@@ -131,6 +146,170 @@ class Generator(plugin.Plugin):
                 util.Log("[generator][info] Generation time %f" % (time.time() - start))
         return gentext
 
+    def GenerateFile(self, e_id, txt_ctrl, path):
+        """Generates the new document from the contents of the given ED_STC
+        text control and writes it to a file. Generators that implement
+        WriteDocument(stc, write) and GetFileExtension() stream the document
+        to the file as it is generated.
+        @param e_id: event id originating from menu entry
+        @param txt_ctrl: EditraStc
+        @param path: path of the file to write (utf-8 encoded)
+        @return: file extension of the document or None if there is no
+                 generator for e_id
+
+        """
+        start = time.time()
+        for observer in self.observers:
+            if observer.GetId() == e_id:
+                handle = codecs.open(path, 'wb', 'utf-8')
+                try:
+                    if hasattr(observer, 'WriteDocument') and \
+                       hasattr(observer, 'GetFileExtension'):
+                        ext = observer.GetFileExtension()
+                        observer.WriteDocument(txt_ctrl, handle.write)
+                    else:
+                        ext, text = observer.Generate(txt_ctrl)
+                        handle.write(text)
+                finally:
+                    handle.close()
+                util.Log("[generator][info] Generation time %f" % \
+                         (time.time() - start))
+                return ext
+        return None
+
+#-----------------------------------------------------------------------------#
+
+class StyleRuns(object):
+    """Run length view of the styling of a text control. The styling and
+    text of the document is read in large chunks with GetStyledText and
+    split into runs of text that have the same style, so that generators
+    don't need to query the control for every position in the document.
+
+    """
+    def __init__(self, stc, chunk=65536, join=True):
+        """Create the run reader
+        @param stc: EditraStc
+        @keyword chunk: approximate number of bytes to read from the control
+                        at a time, the reads are extended to the end of line
+        @keyword join: treat a single default styled (0) character between
+                       two runs of the same style as part of that style.
+
+        """
+        super(StyleRuns, self).__init__()
+
+        # Attributes
+        self._stc = stc
+        self._chunk = max(1, chunk)
+        self._join = join
+        self._tags = dict()
+
+        # Strip the indicator bits from the style bytes
+        mask = (1 << stc.GetStyleBits()) - 1
+        self._table = "".join([ chr(val & mask) for val in range(256) ])
+
+    def __iter__(self):
+        return self.Runs()
+
+    def _ReadStyled(self):
+        """Generate the (position, text, styles) byte strings of the
+        document in chunks. The chunks end at the end of a line so that
+        they never end inside of a multibyte character.
+
+        """
+        stc = self._stc
+        length = stc.GetLength()
+        start = 0
+        while start < length:
+            end = min(start + self._chunk, length)
+            if end < length:
+                end = stc.PositionFromLine(stc.LineFromPosition(end) + 1)
+                if end <= start:
+                    end = length # Last line
+            data = stc.GetStyledText(start, end)
+            yield start, data[0::2], data[1::2].translate(self._table)
+            start = end
+
+    def _RawRuns(self):
+        """Generate the (style, start, end, text) runs without joining"""
+        finditer = RUN_RE.finditer
+        last = None
+        for pos, text, styles in self._ReadStyled():
+            utext = text.decode('utf-8', 'replace')
+            ascii = len(utext) == len(text)
+            for match in finditer(styles):
+                start, end = match.span()
+                if ascii:
+                    txt = utext[start:end]
+                else:
+                    txt = text[start:end].decode('utf-8', 'replace')
+                run = (ord(match.group(1)), pos + start, pos + end, txt)
+                if last is not None:
+                    if last[0] == run[0]:
+                        # Run continues from the previous chunk
+                        run = (run[0], last[1], run[2], last[3] + run[3])
+                    else:
+                        yield last
+                last = run
+
+        if last is not None:
+            yield last
+
+    def GetStyleIds(self):
+        """Get the style ids used in the document
+        @return: set of ints
+
+        """
+        used = set()
+        for pos, text, styles in self._ReadStyled():
+            used.update(styles)
+        return set([ ord(style_id) for style_id in used ])
+
+    def GetTag(self, style_id):
+        """Get the style tag of a style id
+        @param style_id: int
+        @return: style tag string (i.e 'default_style')
+
+        """
+        tag = self._tags.get(style_id, None)
+        if tag is None:
+            tag = self._stc.FindTagById(style_id)
+            self._tags[style_id] = tag
+        return tag
+
+    def Runs(self):
+        """Generate the style runs of the document
+        @return: generator of (style id, start, end, unicode text) tuples,
+                 start and end are the byte positions in the control.
+
+        """
+        last = None
+        single = None # Default styled character that may be joined
+        join = self._join
+        for run in self._RawRuns():
+            if single is not None:
+                if run[0] == last[0]:
+                    last = (last[0], last[1], run[2],
+                            last[3] + single[3] + run[3])
+                    single = None
+                    continue
+                yield last
+                last = single
+                single = None
+
+            if join and run[0] == 0 and run[2] - run[1] == 1 and \
+               last is not None and last[0] != 0:
+                single = run
+                continue
+
+            if last is not None:
+                yield last
+            last = run
+
+        if last is not None:
+            yield last
+        if single is not None:
+            yield single
+
 #-----------------------------------------------------------------------------#
 
 class Html(plugin.Plugin):
@@ -153,28 +332,15 @@ class Html(plugin.Plugin):
         self.stc = None
         self.head = wx.EmptyString
         self.css = dict()
-        self.body = wx.EmptyString
 
     def __str__(self):
         """Returns the string of html
         @return: string version of html object
 
         """
-        # Assemble the embedded html
-        style = "<style type=\"text/css\">\n%s</style>"
-        css = wx.EmptyString
-        for key in self.css:
-            css += str(self.css[key]) + "\n"
-        css = css % self.stc.GetFontDictionary()
-        style = style % css
-
-        # Insert the css into the head
-        head = self.head.replace('</head>', style + "\n</head>")
-
-        # Assemble the body of the html
-        html = "<html>\n%s\n%s\n</html>"
-        html = html % (head, self.body)
-        return html
+        html = list()
+        self.WriteDocument(self.stc, html.append)
+        return u"".join(html)
 
     def Unicode(self):
         """Returns the html as Unicode
@@ -189,9 +355,7 @@ class Html(plugin.Plugin):
 
         """
         self.stc = stc_ctrl
-        self.head = self.GenerateHead()
-        self.body = self.GenerateBody()
-        return ("html", self.__str__())
+        return (self.GetFileExtension(), self.__str__())
 
     def GenerateHead(self):
         """Generates the html head block
@@ -206,68 +370,25 @@ class Html(plugin.Plugin):
                               ed_glob.VERSION)
 
     def GenerateBody(self):
-        """Generates the body of the html from the stc's content. To do
-        this it does a character by character parse of the stc to determine
-        style regions and generate css and and styled spans of html in order
-        to generate an 'exact' html representation of the stc's window.
+        """Generates the body of the html from the stc's content. The
+        style runs of the document are converted to styled spans of html
+        in order to generate an 'exact' html representation of the stc's
+        window.
         @return: the body section of the html generated from the text control
 
         """
-        html = list()
-        parse_pos = 0
-        style_start = 0
-        style_end = 0
-        last_pos = self.stc.GetLineEndPosition(self.stc.GetLineCount()) + 1
-
-        # Get Document start point info
-        last_id = self.stc.GetStyleAt(parse_pos)
-        tag = self.stc.FindTagById(last_id)
-        if tag != wx.EmptyString:
-            s_item = StyleItem()
-            s_item.SetAttrFromStr(self.stc.GetStyleByName(tag))
-            self.css[tag] = CssItem(tag.split('_')[0], s_item)
+        runs = StyleRuns(self.stc)
+        self.RegisterCss(runs)
+        body = list()
+        self.WriteBody(runs, body.append)
+        return u"".join(body)
 
-        # Optimizations
-        stc = self.stc
-        GetStyleAt = stc.GetStyleAt
-
-        # Build Html
-        while parse_pos < last_pos:
-            parse_pos += 1
-            curr_id = GetStyleAt(parse_pos)
-            style_end = parse_pos
-            # If style region has changed close section
-            if curr_id == 0 and GetStyleAt(parse_pos + 1) == last_id:
-                curr_id = last_id
-
-            if curr_id != last_id or parse_pos == last_pos:
-                tmp = stc.GetTextRange(style_start, style_end)
-                tmp = self.TransformText(tmp)
-                if tmp.isspace() or tag in ["default_style", "operator_style"]:
-                    html.append(tmp)
-                else:
-                    tmp2 = "<span class=\"%s\">%s</span>"
-                    html.append(tmp2 % (tag.split('_')[0], tmp))
-
-                last_id = curr_id
-                style_start = style_end
-                tag = stc.FindTagById(last_id)
-                if tag not in self.css:
-                    s_item = StyleItem()
-                    s_item.SetAttrFromStr(stc.GetStyleByName(tag))
-                    self.css[tag] = CssItem(tag.split('_')[0], s_item)
-
-        # Case for unstyled documents
-        if len(html) == 0:
-            s_item = StyleItem()
-            s_item.SetAttrFromStr(stc.GetStyleByName('default_style'))
-            self.css['default_style'] = CssItem('default', s_item)
-            html.append(self.TransformText(stc.GetText()))
-        else:
-            self.OptimizeCss()
+    def GetFileExtension(self):
+        """Get the file extension of the generated documents
+        @return: string
 
-        return "<body class=\"default\">\n<pre>\n%s\n</pre>\n</body>" % \
-                                                                   "".join(html)
+        """
+        return "html"
 
     def GetId(self):
         """Returns the menu identifier for the HTML generator
@@ -315,6 +436,21 @@ class Html(plugin.Plugin):
                 if item in self.css[key].GetDecorators():
                     self.css[key].RemoveDecorator(item)
 
+    def RegisterCss(self, runs):
+        """Create the css items for all the styles used in the document
+        @param runs: L{StyleRuns} of the document
+
+        """
+        self.css = dict()
+        tags = set([ runs.GetTag(style_id)
+                     for style_id in runs.GetStyleIds() ])
+        tags.add('default_style')
+        for tag in tags:
+            s_item = StyleItem()
+            s_item.SetAttrFromStr(self.stc.GetStyleByName(tag))
+            self.css[tag] = CssItem(tag.split('_')[0], s_item)
+        self.OptimizeCss()
+
     def TransformText(self, text):
         """Does character substitution on a string and returns
         the html equivalent of the given string.
@@ -328,6 +464,47 @@ class Html(plugin.Plugin):
         text = text.replace("\"", "&quot;")
         return text
 
+    def WriteBody(self, runs, write):
+        """Write the body of the html
+        @param runs: L{StyleRuns} of the document
+        @param write: callable(unicode) to write the output with
+
+        """
+        write(u"<body class=\"default\">\n<pre>\n")
+        TransformText = self.TransformText
+        for style_id, start, end, text in runs:
+            tag = runs.GetTag(style_id)
+            text = TransformText(text)
+            if text.isspace() or tag in ("default_style", "operator_style"):
+                write(text)
+            else:
+                write(u"<span class=\"%s\">%s</span>" % (tag.split('_')[0],
+                                                         text))
+        write(u"\n</pre>\n</body>")
+
+    def WriteDocument(self, stc_ctrl, write):
+        """Write the html document. The css is generated before the body
+        so that the document can be written out as it is generated.
+        @param stc_ctrl: text control to get text from
+        @param write: callable(unicode) to write the output with
+
+        """
+        self.stc = stc_ctrl
+        runs = StyleRuns(self.stc)
+        self.RegisterCss(runs)
+        self.head = self.GenerateHead()
+
+        # Insert the css into the head
+        css = u"".join([ unicode(self.css[key]) + u"\n"
+                         for key in self.css ])
+        css = css % self.stc.GetFontDictionary()
+        style = u"<style type=\"text/css\">\n%s</style>" % css
+        write(u"<html>\n")
+        write(self.head.replace('</head>', style + "\n</head>"))
+        write(u"\n")
+        self.WriteBody(runs, write)
+        write(u"\n</html>")
+
 #-----------------------------------------------------------------------------#
 
 class CssItem:
@@ -534,74 +711,11 @@ class LaTeX(plugin.Plugin):
         @returns: the main body of the reference document marked up with latex
 
         """
+        runs = StyleRuns(self._stc)
+        self.RegisterStyles(runs)
         tex = list()
-        tmp = u''
-        start = parse_pos = 0
-        last_pos = self._stc.GetLineEndPosition(self._stc.GetLineCount())
-
-        # Define the default style
-        self.RegisterStyleCmd('default_style', \
-                              self._stc.GetItemByName('default_style'))
-
-        # Get Document start point info
-        last_id = self._stc.GetStyleAt(parse_pos)
-        tmp = self.TransformText(self._stc.GetTextRange(parse_pos,
-                                                        parse_pos + 1))
-        tag = self._stc.FindTagById(last_id)
-        if tag != wx.EmptyString:
-            self.RegisterStyleCmd(tag, self._stc.GetItemByName(tag))
-
-        # Optimizations
-        stc = self._stc
-        GetStyleAt = stc.GetStyleAt
-        GetTextRange = stc.GetTextRange
-        TransformText = self.TransformText
-
-        # Build LaTeX
-        for parse_pos in xrange(last_pos + 1):
-            curr_id = GetStyleAt(parse_pos)
-            if parse_pos > 1:
-                # This is the performance bottleneck, changing the text
-                # collection to when the style changes is much faster as
-                # it only needs to be done once per style section instead
-                # of once per character. Doing that however causes problems
-                # with the style and resulting document formatting.
-                tmp = TransformText(GetTextRange((parse_pos - 1), parse_pos))
-
-            if curr_id == 0 and GetStyleAt(parse_pos + 1) == last_id:
-                curr_id = last_id
-
-            # If style region has changed close section
-            if curr_id != last_id or tmp[-1] == "\n":
-                tmp_tex = TransformText(GetTextRange(start, parse_pos))
-#                 tmp_tex = u"".join(tmp)
-                if tag == "operator_style" or \
-                   (tag == "default_style" and \
-                    tmp_tex.isspace() and len(tmp_tex) <= 2):
-                    tex.append(tmp_tex)
-                else:
-                    if "\\\\\n" in tmp_tex:
-                        tmp_tex = tmp_tex.replace("\\\\\n", "")
-                        tmp2 = "\\%s{%s}\\\\\n"
-                    else:
-                        tmp2 = "\\%s{%s}"
-
-                    cmd = self.CreateCmdName(tag)
-                    if cmd in [None, wx.EmptyString]:
-                        cmd = "defaultstyle"
-                    tex.append(tmp2 % (cmd, tmp_tex))
-
-                last_id = curr_id
-                tag = stc.FindTagById(last_id)
-                if tag not in [None, wx.EmptyString]:
-                    self.RegisterStyleCmd(tag, stc.GetItemByName(tag))
-                tmp = list()
-                start = parse_pos
-
-        # Case for unstyled documents
-        if tex == wx.EmptyString:
-            tex.append(self.TransformText(stc.GetText()))
-        return "\\begin{document}\n%s\n\\end{document}" % "".join(tex)
+        self.WriteBody(runs, tex.append)
+        return u"".join(tex)
 
     def Generate(self, stc_doc):
         """Generates the LaTeX document
@@ -609,15 +723,9 @@ class LaTeX(plugin.Plugin):
         @return: the reference document marked up in LaTeX.
 
         """
-        self._stc = stc_doc
-        default_si = self._stc.GetItemByName('default_style')
-        self._dstyle.SetBack(default_si.GetBack().split(',')[0])
-        self._dstyle.SetFore(default_si.GetFore().split(',')[0])
-        self._dstyle.SetFace(default_si.GetFace().split(',')[0])
-        self._dstyle.SetSize(default_si.GetSize().split(',')[0])
-        body = self.GenDoc()
-        preamble = self.GenPreamble()
-        return ("tex", u"".join([preamble, body]))
+        tex = list()
+        self.WriteDocument(stc_doc, tex.append)
+        return (self.GetFileExtension(), u"".join(tex))
 
     def GenPreamble(self):
         """Generates the Preamble of the document
@@ -652,6 +760,13 @@ class LaTeX(plugin.Plugin):
         pre += "\n%% End Styling Command Definitions\n\n"
         return pre
 
+    def GetFileExtension(self):
+        """Get the file extension of the generated documents
+        @return: string
+
+        """
+        return "tex"
+
     def GetId(self):
         """Returns the menu identifier for the LaTeX generator
         @return: id of that identifies this generator
@@ -685,6 +800,19 @@ class LaTeX(plugin.Plugin):
         blue = round(float(float(int(r_hex[4:], 16)) / 255), 2)
         return "%s,%s,%s" % (str(red), str(green), str(blue))
 
+    def RegisterStyles(self, runs):
+        """Register the styling commands for all the styles used in the
+        document.
+        @param runs: L{StyleRuns} of the document
+
+        """
+        self.RegisterStyleCmd('default_style', \
+                              self._stc.GetItemByName('default_style'))
+        for style_id in sorted(runs.GetStyleIds()):
+            tag = runs.GetTag(style_id)
+            if tag not in [None, wx.EmptyString]:
+                self.RegisterStyleCmd(tag, self._stc.GetItemByName(tag))
+
     def RegisterStyleCmd(self, cmd_name, s_item):
         """Registers and generates a command from the
         supplied StyleItem.
@@ -739,17 +867,57 @@ class LaTeX(plugin.Plugin):
         @return: txt with all special characters transformed
 
         """
-        ch_map = { "#" : "\\#", "$" : "\\$", "^" : "\\^",
-                   "%" : "\\%", "&" : "\\&", "_" : "\\_",
-                   "{" : "\\{", "}" : "\\}", "~" : "\\~",
-                   "\\": "$\\backslash$", "\n" : "\\\\\n",
-                   "@" : "$@$", "<" : "$<$", ">" : "$>$",
-                   "-" : "$-$", "|" : "$|$"
-                 }
-        tmp = list()
-        for char in txt:
-            tmp.append(ch_map.get(char, char))
-        return u''.join(tmp)
+        return unicode(txt).translate(LATEX_MAP)
+
+    def WriteBody(self, runs, write):
+        """Write the document body. Every line of a style run is marked up
+        with the styles command.
+        @param runs: L{StyleRuns} of the document
+        @param write: callable(unicode) to write the output with
+
+        """
+        write(u"\\begin{document}\n")
+        TransformText = self.TransformText
+        for style_id, start, end, text in runs:
+            tag = runs.GetTag(style_id)
+            cmd = self.CreateCmdName(tag)
+            if cmd in [None, wx.EmptyString]:
+                cmd = "defaultstyle"
+            lines = text.split(u"\n")
+            for idx, line in enumerate(lines):
+                if idx + 1 < len(lines):
+                    line += u"\n"
+                elif not line:
+                    break
+                tmp_tex = TransformText(line)
+                if tag == "operator_style" or \
+                   (tag == "default_style" and \
+                    tmp_tex.isspace() and len(tmp_tex) <= 2):
+                    write(tmp_tex)
+                elif tmp_tex.endswith(u"\\\\\n"):
+                    write(u"\\%s{%s}\\\\\n" % (cmd, tmp_tex[:-3]))
+                else:
+                    write(u"\\%s{%s}" % (cmd, tmp_tex))
+        write(u"\n\\end{document}")
+
+    def WriteDocument(self, stc_doc, write):
+        """Write the LaTeX document. The style commands are defined before
+        the body is generated so that the document can be written out as
+        it is generated.
+        @param stc_doc: text control to generate latex from
+        @param write: callable(unicode) to write the output with
+
+        """
+        self._stc = stc_doc
+        default_si = self._stc.GetItemByName('default_style')
+        self._dstyle.SetBack(default_si.GetBack().split(',')[0])
+        self._dstyle.SetFore(default_si.GetFore().split(',')[0])
+        self._dstyle.SetFace(default_si.GetFace().split(',')[0])
+        self._dstyle.SetSize(default_si.GetSize().split(',')[0])
+        runs = StyleRuns(self._stc)
+        self.RegisterStyles(runs)
+        write(self.GenPreamble())
+        self.WriteBody(runs, write)
 
 #-----------------------------------------------------------------------------#
 
@@ -792,54 +960,9 @@ class Rtf(plugin.Plugin):
         if self._stc is None:
             return u''
 
-        # Optimizations
-        stc = self._stc
-        def_fore = stc.GetDefaultForeColour(as_hex=True)
-        self._colortbl.AddColor(def_fore)
-        def_back = stc.GetDefaultBackColour(as_hex=True)
-        self._colortbl.AddColor(def_back)
-        last_pos = stc.GetLineEndPosition(stc.GetLineCount())
-        parse_pos = 0
-        last_id = None
-        last_fore = None
-        last_back = None
-        start = end = 0
-        tmp_txt = list()
-        font_tmp = "\\f0"
-        fore_tmp = "\\cf%d"
-        back_tmp = "\\cb%d"
-        AddColor = self._colortbl.AddColor
-        GetColorIndex = self._colortbl.GetColorIndex
-        GetStyleAt = stc.GetStyleAt
-
-        # Parse all characters/style bytes in document
-        for parse_pos in xrange(last_pos + 1):
-            sty_id = GetStyleAt(parse_pos)
-            end = parse_pos
-
-            # If style has changed build the previous section
-            if sty_id != last_id:
-                tag = stc.FindTagById(last_id)
-                s_item = stc.GetItemByName(tag)
-                AddColor(s_item.GetFore())
-                AddColor(s_item.GetBack())
-                tplate = font_tmp
-                fid = GetColorIndex(s_item.GetFore())
-                if fid != last_fore:
-                    last_fore = fid
-                    tplate = tplate + (fore_tmp % fid)
-                bid = GetColorIndex(s_item.GetBack())
-                if bid != last_back:
-                    last_back = bid
-                    tplate = tplate + (back_tmp % bid)
-                tmp_txt.append(tplate + " " + \
-                               self.TransformText(stc.GetTextRange(start, end)))
-                start = end
-            last_id = sty_id
-
-        head = "{\\rtf1\\ansi\\deff0{\\fonttbl{\\f0 %s;}}" % \
-                stc.GetDefaultFont().GetFaceName()
-        return u"%s%s%s}" % (head, self._colortbl, "".join(tmp_txt))
+        rtf = list()
+        self.WriteDocument(self._stc, rtf.append)
+        return u"".join(rtf)
 
     #---- End Protected Member Functions ----#
 
@@ -851,7 +974,14 @@ class Rtf(plugin.Plugin):
 
         """
         self._stc = stc_doc
-        return ('rtf', self._GenRtf())
+        return (self.GetFileExtension(), self._GenRtf())
+
+    def GetFileExtension(self):
+        """Get the file extension of the generated documents
+        @return: string
+
+        """
+        return "rtf"
 
     def GetId(self):
         """Implements the GeneratorI's GetId function by returning
@@ -871,18 +1001,56 @@ class Rtf(plugin.Plugin):
                            _("Generate a %s version of the " \
                              "current document") % u"RTF")
 
+    def WriteDocument(self, stc_doc, write):
+        """Write the RTF document. The color table is built before the
+        body is generated so that the document can be written out as it
+        is generated.
+        @param stc_doc: document to generate text from
+        @param write: callable(unicode) to write the output with
+
+        """
+        self._stc = stc = stc_doc
+
+        # Build the color table
+        runs = StyleRuns(stc, join=False)
+        AddColor = self._colortbl.AddColor
+        GetColorIndex = self._colortbl.GetColorIndex
+        AddColor(stc.GetDefaultForeColour(as_hex=True))
+        AddColor(stc.GetDefaultBackColour(as_hex=True))
+        colors = dict() # style id -> (fore, back) color index
+        for style_id in sorted(runs.GetStyleIds()):
+            s_item = stc.GetItemByName(runs.GetTag(style_id))
+            AddColor(s_item.GetFore())
+            AddColor(s_item.GetBack())
+            colors[style_id] = (GetColorIndex(s_item.GetFore()),
+                                GetColorIndex(s_item.GetBack()))
+
+        write(u"{\\rtf1\\ansi\\deff0{\\fonttbl{\\f0 %s;}}" % \
+              stc.GetDefaultFont().GetFaceName())
+        write(unicode(self._colortbl))
+
+        # Write a section for each style run
+        last_fore = None
+        last_back = None
+        for style_id, start, end, text in runs:
+            tplate = u"\\f0"
+            fid, bid = colors[style_id]
+            if fid != last_fore:
+                last_fore = fid
+                tplate += u"\\cf%d" % fid
+            if bid != last_back:
+                last_back = bid
+                tplate += u"\\cb%d" % bid
+            write(tplate + u" " + self.TransformText(text))
+        write(u"}")
+
     def TransformText(self, text):
         """Transforms the given text by converting it to RTF format
         @param text: text to transform
         @return: text with all special characters transformed
         """
-        chmap = { "\t" : "\\tab ", "{" : "\\{", "}" : "\\}",
-                  "\\" : "\\\\", "\n" : "\\par\n", "\r" : "\\par\n"}
-        text = text.replace('\r\n', '\n')
-        tmp = u''
-        for char in text:
-            tmp = tmp + chmap.get(char, char)
-        return tmp
+        text = unicode(text).replace(u'\r\n', u'\n')
+        return text.translate(RTF_MAP)
 
 #-----------------------------------------------------------------------------#
 
@@ -350,6 +350,9 @@ class ConfigPanel(eclib.ControlBox):
         with eclib.Freezer(self._list) as _tmp:
             for item in keys:
                 val = config[item]
+                if val and item not in sys.modules:
+                    # Enabled plugin that has not been used yet
+                    p_mgr.ImportPlugin(item)
                 mod = sys.modules.get(item)
                 dist = p_mgr.GetPluginDistro(item)
                 if dist is not None:
@@ -358,13 +361,22 @@ class ConfigPanel(eclib.ControlBox):
                 else:
                     version = str(getattr(mod, '__version__', _("Unknown")))
 
+                # Use the manifest information for plugins that are
+                # not imported.
+                pinfo = p_mgr.GetPluginData(item)
                 pdata = PluginData()
                 pdata.SetName(item)
                 desc = getattr(mod, '__doc__', None)
                 if not isinstance(desc, basestring):
-                    desc = _("No Description Available")
+                    if pinfo is not None:
+                        desc = pinfo.GetDescription()
+                    else:
+                        desc = _("No Description Available")
                 pdata.SetDescription(desc.strip())
-                pdata.SetAuthor(getattr(mod, '__author__', _("Unknown")))
+                auth = getattr(mod, '__author__', None)
+                if auth is None and pinfo is not None:
+                    auth = pinfo.GetAuthor()
+                pdata.SetAuthor(auth or _("Unknown"))
                 pdata.SetVersion(version)
                 pdata.SetDist(dist)
                 pbi = PBPluginItem(self._list, mod, pdata, None)
@@ -49,11 +49,12 @@ conform to.
 Plugins consist of python egg files that can be created with the use of the
 setuptools package.
 
-There are some issues I dont like with how this is currently working that I
-hope to find a work around for in later revisions. Namely I dont like the fact
-that the plugins are loaded and kept in memory even when they are not activated.
-Although the footprint of the non activated plugin class members being held in
-memory is not likely to be very large.
+The information about the plugins in each egg (name, version, description,
+minimum Editra version and implemented interfaces) is kept in a manifest in the
+cache directory, keyed by the path and modification time of the egg. Only eggs
+that are new or have changed since the manifest was written are imported at
+startup. The other plugins are imported when they are enabled and one of the
+extension points they implement is used for the first time.
 
 @summary: Plugin interface and mananger implementation
 
@@ -67,7 +68,9 @@ __revision__ = "$Revision: 71475 $"
 # Dependancies
 import os
 import sys
+import time
 import shutil
+import cPickle
 import wx
 
 # Editra Libraries
@@ -90,12 +93,23 @@ except ImportError:
 # Globals
 ENTRYPOINT = 'Editra.plugins'
 PLUGIN_CONFIG = "plugin.cfg"
+PLUGIN_MANIFEST = "plugin_manifest"
 _implements = []
 
 _ = wx.GetTranslation
 
 #--------------------------------------------------------------------------#
 
+def _InterfaceKey(interface):
+    """Get the key an interface is recorded by in the plugin manifest
+    @param interface: L{Interface} class
+    @return: string
+
+    """
+    return "%s.%s" % (interface.__module__, interface.__name__)
+
+#--------------------------------------------------------------------------#
+
 class Interface(object):
     """Base class for defining interfaces. Interface classes are
     used to define the method/contract from which the plugin must
@@ -128,6 +142,7 @@ class ExtensionPoint(property):
 
         """
         component = wx.GetApp().GetPluginManager()
+        component.LoadExtensions(self.interface)
         extensions = PluginMeta._registry.get(self.interface, [])
         return filter(None, [component[cls] for cls in extensions])
 
@@ -295,6 +310,9 @@ class PluginData(object):
         self._inst = None
         self._cls = None
         self._distro = None
+        self._entry = u''       # Entry point name
+        self._module = u''      # Name of the module the plugin class is in
+        self._interfaces = list() # Keys of the implemented interfaces
 
     @property
     def Distribution(self):
@@ -332,6 +350,13 @@ class PluginData(object):
         """
         return self._distro
 
+    def GetEntryPoint(self):
+        """Get the name of the entry point the plugin is loaded from
+        @return: string
+
+        """
+        return self._entry
+
     def GetInstance(self):
         """Get the plugin instance
         @return: Plugin
@@ -339,6 +364,20 @@ class PluginData(object):
         """
         return self._inst
 
+    def GetInterfaces(self):
+        """Get the interfaces the plugin implements
+        @return: list of interface keys (module.Name)
+
+        """
+        return self._interfaces
+
+    def GetModuleName(self):
+        """Get the name of the module the plugin class is defined in
+        @return: string
+
+        """
+        return self._module
+
     def GetName(self):
         """@return: Plugin's name string"""
         return self._name
@@ -400,6 +439,13 @@ class PluginData(object):
         """
         self._distro = distro
 
+    def SetEntryPoint(self, name):
+        """Set the name of the entry point the plugin is loaded from
+        @param name: string
+
+        """
+        self._entry = name
+
     def SetInstance(self, inst):
         """Set the plugin instance
         @param inst: Plugin instance
@@ -407,6 +453,20 @@ class PluginData(object):
         """
         self._inst = inst
 
+    def SetInterfaces(self, interfaces):
+        """Set the interfaces the plugin implements
+        @param interfaces: list of interface keys (module.Name)
+
+        """
+        self._interfaces = list(interfaces)
+
+    def SetModuleName(self, module):
+        """Set the name of the module the plugin class is defined in
+        @param module: string
+
+        """
+        self._module = module
+
     def SetName(self, name):
         """Sets the plugins name string
         @param name: String to name plugin with
@@ -468,11 +528,13 @@ class PluginManager(object):
         self._env = self.CreateEnvironment(self._pi_path)
 
         # TODO: Combine enabled into pdata
-        self._pdata = dict()        # Plugin data
+        self._pdata = dict()        # Plugin data by entry point name
+        self._clsmap = dict()       # Plugin data of imported plugin classes
         self._defaults = dict()     # Default plugins
         self._enabled = dict()      # Set of enabled plugins
-        self._loaded = list()       # List of 
+        self._failed = set()        # Entry points that failed to import
         self._obsolete = dict()     # Obsolete plugins list
+        self._manifest = self.LoadManifest()
 
         self.InitPlugins(self._env)
         self.RefreshConfig()
@@ -486,7 +548,7 @@ class PluginManager(object):
         @param cobj: object to look for in loaded plugins
 
         """
-        return cobj in [obj.GetClass() for obj in self._pdata]
+        return cobj in self._clsmap
 
     def __getitem__(self, cls):
         """Gets and returns the instance of given class if it has
@@ -507,7 +569,7 @@ class PluginManager(object):
 
 #        plugin = self._plugins.get(cls)
         plugin = None
-        pdata = self._pdata.get(cls, None)
+        pdata = self._clsmap.get(cls, None)
         if pdata is not None:
             plugin = pdata.GetInstance()
         else:
@@ -526,6 +588,83 @@ class PluginManager(object):
 
         return plugin
 
+    def _ImportPlugin(self, pdata):
+        """Import the module of a plugin and create the plugin instance
+        @param pdata: L{PluginData}
+        @return: Plugin instance or None
+
+        """
+        if pdata.GetClass() is not None:
+            return pdata.GetInstance()
+
+        name = pdata.GetEntryPoint()
+        if name in self._failed:
+            return None
+
+        start = time.time()
+        try:
+            egg = pdata.GetDist()
+            egg.activate()
+            cls = egg.get_entry_info(ENTRYPOINT, name).load()
+            pdata.SetClass(cls)
+            self._clsmap[cls] = pdata
+            enabled = bool(self._config.get(pdata.GetModuleName(), False))
+            self._enabled[cls] = enabled
+            pdata.SetInstance(cls(self))
+        except Exception, msg:
+            self.LOG("[pluginmgr][err] Couldn't Load %s: %s" % (name, msg))
+            self._failed.add(name)
+            return None
+
+        self.LOG("[pluginmgr][info] Imported plugin %s in %.3fs" % \
+                 (name, time.time() - start))
+        return pdata.GetInstance()
+
+    def _ScanEgg(self, egg, mtime):
+        """Import the plugins in an egg to get their manifest information
+        @param egg: Distribution
+        @param mtime: modification time of the egg
+        @return: (manifest entry, dict(entry point name=(cls, instance)),
+                  bool all plugins loaded)
+
+        """
+        egg.activate()
+        entries = list()
+        loaded = dict()
+        failed = False
+        for name in egg.get_entry_map(ENTRYPOINT):
+            start = time.time()
+            try:
+                entry_point = egg.get_entry_info(ENTRYPOINT, name)
+                cls = entry_point.load()
+                self.LOG("[pluginmgr][info] Creating Instance of %s" % name)
+                instance = cls(self)
+                minver = instance.GetMinVersion()
+            except Exception, msg:
+                self.LOG("[pluginmgr][err] Couldn't Load %s: %s" % (name, msg))
+                failed = True
+                continue
+
+            self.LOG("[pluginmgr][info] Imported plugin %s in %.3fs" % \
+                     (name, time.time() - start))
+            mod = sys.modules.get(cls.__module__, None)
+            desc = getattr(mod, '__doc__', None)
+            if not isinstance(desc, basestring):
+                desc = _("No Description Available")
+            auth = getattr(mod, '__author__', None)
+            if not isinstance(auth, basestring):
+                auth = _("Unknown")
+            ifaces = [ _InterfaceKey(iface)
+                       for iface, impl in PluginMeta._registry.iteritems()
+                       if cls in impl ]
+            entries.append(dict(name=name, module=cls.__module__,
+                                minver=minver, descript=desc.strip(),
+                                author=auth.strip(), interfaces=ifaces))
+            loaded[name] = (cls, instance)
+
+        info = dict(mtime=mtime, version=egg.version, entries=entries)
+        return info, loaded, not failed
+
     #---- End Private Members ----#
 
     #---- Public Class Functions ----#
@@ -634,8 +773,8 @@ class PluginManager(object):
 
         """
         plugins = dict()
-        for pdata in self._pdata.values():
-            plugins[pdata.GetClass()] = pdata.GetInstance()
+        for cls, pdata in self._clsmap.iteritems():
+            plugins[cls] = pdata.GetInstance()
         return plugins
 
     def GetPluginDistro(self, pname):
@@ -656,74 +795,88 @@ class PluginManager(object):
 
         """
         distros = dict()
-        for name, pdata in self._pdata:
+        for name, pdata in self._pdata.iteritems():
             distros[name] = pdata.GetDist()
         return distros
 
+    def GetPluginData(self, name):
+        """Get the information about a plugin
+        @param name: plugin (module or project) name
+        @return: L{PluginData} or None
+
+        """
+        for pdata in self._pdata.values():
+            if name.lower() in (pdata.GetModuleName().lower(),
+                                pdata.GetName().lower()):
+                return pdata
+        return None
+
     def InitPlugins(self, env):
         """Initializes the plugins that are contained in the given
         environment. After calling this the list of available plugins
         can be obtained by calling GetPlugins.
         @note: plugins must emit the ENTRY_POINT defined in this file in order
                to be recognized and initialized.
-        @postcondition: all plugins in the environment are initialized
+        @note: plugins in eggs that are in the manifest are not imported
+               until they are used (see L{LoadExtensions}).
+        @postcondition: all plugins in the environment are known
 
         """
         if pkg_resources is None:
             return
 
-        pkg_env = env
-        tmploaded = [ name.lower() for name in self._loaded ]
-        for name in pkg_env:
-            self.LOG("[pluginmgr][info] Found plugin: %s" % name)
-            if name.lower() in tmploaded:
-                self.LOG("[pluginmgr][info] %s is already loaded" % name)
-                continue
-
-            egg = pkg_env[name][0]  # egg is of type Distribution
-            egg.activate()
-            editra_version = CalcVersionValue(ed_glob.VERSION)
-            for name in egg.get_entry_map(ENTRYPOINT):
-                try:
-                    # Only load a given entrypoint once
-                    if name not in self._loaded:
-                        entry_point = egg.get_entry_info(ENTRYPOINT, name)
-                        cls = entry_point.load()
-                        self._loaded.append(name)
-                    else:
-                        self.LOG("[pluginmgr][info] Skip reloading: %s" % name)
-                        continue
-                except Exception, msg:
-                    self.LOG("[pluginmgr][err] Couldn't Load %s: %s" % (name, msg))
+        editra_version = CalcVersionValue(ed_glob.VERSION)
+        manifest = dict()
+        for pname in env:
+            self.LOG("[pluginmgr][info] Found plugin: %s" % pname)
+            egg = env[pname][0]  # egg is of type Distribution
+            try:
+                mtime = os.path.getmtime(egg.location)
+            except (OSError, TypeError):
+                mtime = 0
+
+            # Only import the plugins in eggs that changed since the
+            # manifest was written.
+            info = self._manifest.get(egg.location, None)
+            loaded = dict()
+            if info is None or info.get('mtime') != mtime or \
+               info.get('version') != egg.version:
+                info, loaded, complete = self._ScanEgg(egg, mtime)
+                if complete:
+                    # Eggs with errors are not remembered so they are retried
+                    manifest[egg.location] = info
+            else:
+                manifest[egg.location] = info
+
+            for entry in info['entries']:
+                name = entry['name']
+                if name in self._pdata:
+                    self.LOG("[pluginmgr][info] Skip re-init of %s" % name)
+                    continue
+
+                minv = CalcVersionValue(entry['minver'])
+                if minv <= editra_version:
+                    pdata = PluginData(egg.project_name, entry['descript'],
+                                       entry['author'], egg.version)
+                    pdata.SetDist(egg)
+                    pdata.SetEntryPoint(name)
+                    pdata.SetModuleName(entry['module'])
+                    pdata.SetInterfaces(entry['interfaces'])
+                    if name in loaded:
+                        cls, instance = loaded[name]
+                        pdata.SetClass(cls)
+                        pdata.SetInstance(instance)
+                        self._clsmap[cls] = pdata
+                    self._pdata[name] = pdata
+                    self.LOG("[pluginmgr][info] Cached Plugin: %s" % egg.project_name)
                 else:
-                    try:
-                        # Only initialize plugins that haven't already been
-                        # initialized
-                        if cls not in self._pdata:
-                            self.LOG("[pluginmgr][info] Creating Instance of %s" % name)
-                            instance = cls(self)
-                            minv = CalcVersionValue(instance.GetMinVersion())
-                            if minv <= editra_version:
-                                mod = instance.__module__
-                                desc = getattr(mod, '__doc__', _("No Description Available"))
-                                auth = getattr(mod, '__author__', _("Unknown"))
-                                pdata = PluginData(egg.project_name,
-                                                   desc.strip(),
-                                                   auth.strip(),
-                                                   egg.version)
-                                pdata.SetDist(egg)
-                                pdata.SetInstance(instance)
-                                pdata.SetClass(cls)
-                                self._pdata[cls] = pdata
-                                self.LOG("[pluginmgr][info] Cached Plugin: %s" % egg.project_name)
-                            else:
-                                # Save plugins that are not compatible with
-                                # this version to use for notifications.
-                                self._obsolete[name] = cls.__module__
-                        else:
-                            self.LOG("[pluginmgr][info] Skip re-init of %s" % cls)
-                    finally:
-                        pass
+                    # Save plugins that are not compatible with
+                    # this version to use for notifications.
+                    self._obsolete[name] = entry['module']
+
+        if manifest != self._manifest:
+            self._manifest = manifest
+            self.WriteManifest()
 
         # Activate all default plugins
         for d_pi in ed_glob.DEFAULT_PLUGINS:
@@ -736,6 +889,48 @@ class PluginManager(object):
 
         return True
 
+    def LoadExtensions(self, interface):
+        """Import the enabled plugins that implement the given interface
+        and have not been imported yet.
+        @param interface: L{Interface} class
+
+        """
+        key = None
+        for pdata in self._pdata.values():
+            if pdata.GetClass() is None:
+                if key is None:
+                    key = _InterfaceKey(interface)
+                if key in pdata.GetInterfaces() and \
+                   self._config.get(pdata.GetModuleName(), False):
+                    self._ImportPlugin(pdata)
+
+    def ImportPlugin(self, name):
+        """Import a plugin that has not been used yet
+        @param name: plugin (module or project) name
+        @return: bool
+
+        """
+        pdata = self.GetPluginData(name)
+        return pdata is not None and self._ImportPlugin(pdata) is not None
+
+    def LoadManifest(self):
+        """Load the plugin manifest from the cache directory
+        @return: dict(egg path=dict(mtime, version, entries))
+
+        """
+        manifest = dict()
+        path = os.path.join(ed_glob.CONFIG['CACHE_DIR'], PLUGIN_MANIFEST)
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as handle:
+                    manifest = cPickle.load(handle)
+                if not isinstance(manifest, dict):
+                    raise TypeError("Invalid plugin manifest")
+            except Exception, msg:
+                self.LOG("[pluginmgr][err] Failed to read manifest: %s" % msg)
+                manifest = dict()
+        return manifest
+
     def LoadPluginByName(self, name):
         """Loads a named plugin.
         @todo: Implement this method
@@ -780,7 +975,7 @@ class PluginManager(object):
                         exist any longer are removed from the config
 
         """
-        plugins = [ plugin.GetInstance().__module__
+        plugins = [ plugin.GetModuleName()
                     for plugin in self._pdata.values() ]
 
         config = dict()
@@ -851,12 +1046,23 @@ class PluginManager(object):
 
         """
         for pdata in self._pdata.values():
+            module = pdata.GetModuleName()
+            enabled = bool(self._config.get(module))
+            if not enabled:
+                self._config[module] = False
+
             plugin = pdata.GetClass()
-            if self._config.get(plugin.__module__):
-                self._enabled[plugin] = True
-            else:
-                self._config[plugin.__module__] = False
-                self._enabled[plugin] = False
+            if plugin is not None:
+                self._enabled[plugin] = enabled
+
+    def WriteManifest(self):
+        """Write the plugin manifest to the cache directory"""
+        path = os.path.join(ed_glob.CONFIG['CACHE_DIR'], PLUGIN_MANIFEST)
+        try:
+            with open(path, 'wb') as handle:
+                cPickle.dump(self._manifest, handle, cPickle.HIGHEST_PROTOCOL)
+        except Exception, msg:
+            self.LOG("[pluginmgr][err] Failed to write manifest: %s" % msg)
 
     def WritePluginConfig(self):
         """Writes out the plugin config.
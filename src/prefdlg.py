@@ -321,7 +321,8 @@ class GeneralPanel(wx.Panel, PreferencesPanelBase):
         if e_id in (ed_glob.ID_APP_SPLASH, ed_glob.ID_PREF_SPOS,
                     ed_glob.ID_SESSION,
                     ed_glob.ID_NEW_WINDOW, ed_glob.ID_PREF_CHKUPDATE,
-                    ed_glob.ID_PREF_WARN_EOL, ed_glob.ID_PREF_AUTO_RELOAD):
+                    ed_glob.ID_PREF_WARN_EOL, ed_glob.ID_PREF_AUTO_RELOAD,
+                    ed_glob.ID_PREF_SEARCH_INDEX):
             Profile_Set(ed_glob.ID_2_PROF[e_id], e_obj.GetValue())
         elif e_id == ed_glob.ID_REPORTER:
             Profile_Set(ed_glob.ID_2_PROF[e_id], not e_obj.GetValue())
@@ -522,9 +523,12 @@ class GeneralFilePanel(wx.Panel):
         eolwarn_cb = wx.CheckBox(self, ed_glob.ID_PREF_WARN_EOL,
                                  _("Warn when mixed eol characters are detected"))
         eolwarn_cb.SetValue(Profile_Get('WARN_EOL', default=True))
+        index_cb = wx.CheckBox(self, ed_glob.ID_PREF_SEARCH_INDEX,
+                               _("Index directories to speed up Find in Files"))
+        index_cb.SetValue(Profile_Get('SEARCH_INDEX', default=False))
 
         # Layout items
-        sizer = wx.FlexGridSizer(9, 2, 5, 5)
+        sizer = wx.FlexGridSizer(10, 2, 5, 5)
         sizer.AddMany([((10, 10), 0), ((10, 10), 0),
                        (wx.StaticText(self, label=_("File Settings") + u": "),
                         0, wx.ALIGN_CENTER_VERTICAL), (enc_sz, 0),
@@ -534,6 +538,7 @@ class GeneralFilePanel(wx.Panel):
                        ((5, 5),), (chkmod_cb, 0),
                        ((5, 5),), (autorl_cb, 0),
                        ((5, 5),), (eolwarn_cb, 0),
+                       ((5, 5),), (index_cb, 0),
                        ((5, 5), 0)])
 
         # Auto Backup
@@ -998,6 +1003,12 @@ class DocCodePanel(wx.Panel):
                                      " context insensitive results"))
         compex_sz = wx.BoxSizer(wx.HORIZONTAL)
         compex_sz.AddMany([((16, -1), 0), (compex_cb, 0)])
+        compall_cb = wx.CheckBox(self, ed_glob.ID_PREF_AUTOCOMPALL,
+                                 _("Complete Words From All Open Files"))
+        compall_cb.SetValue(Profile_Get('AUTO_COMP_ALLBUFF'))
+        compall_cb.Enable(comp_cb.GetValue())
+        compall_sz = wx.BoxSizer(wx.HORIZONTAL)
+        compall_sz.AddMany([((16, -1), 0), (compall_cb, 0)])
         ai_cb = wx.CheckBox(self, ed_glob.ID_AUTOINDENT, _("Auto-Indent"))
         ai_cb.SetValue(Profile_Get('AUTO_INDENT'))
         vi_cb = wx.CheckBox(self, ed_glob.ID_VI_MODE, _("Enable Vi Emulation"))
@@ -1010,7 +1021,7 @@ class DocCodePanel(wx.Panel):
         vi_ncb_sz.AddMany([((16, -1), 0), (vi_ncb, 0)])
 
         # Layout the controls
-        sizer = wx.FlexGridSizer(15, 2, 5, 5)
+        sizer = wx.FlexGridSizer(16, 2, 5, 5)
         sizer.AddMany([((10, 10), 0), ((10, 10), 0),
                        (wx.StaticText(self, label=_("General") + u": "),
                         0, wx.ALIGN_CENTER_VERTICAL), (dlex_sz, 0),
@@ -1024,6 +1035,7 @@ class DocCodePanel(wx.Panel):
                        (wx.StaticText(self, label=_("Input Helpers") + u": "),
                         0), (comp_cb, 0),
                        ((5, 5), 0), (compex_sz, 0),
+                       ((5, 5), 0), (compall_sz, 0),
                        ((5, 5), 0), (ai_cb, 0),
                        ((5, 5), 0), (vi_cb, 0),
                        ((5, 5), 0), (vi_ncb_sz, 0),
@@ -1044,7 +1056,7 @@ class DocCodePanel(wx.Panel):
                     ed_glob.ID_PREF_EDGE, ed_glob.ID_VI_MODE,
                     ed_glob.ID_VI_NORMAL_DEFAULT,
                     ed_glob.ID_PREF_DLEXER, ed_glob.ID_HLCARET_LINE,
-                    ed_glob.ID_PREF_AUTOCOMPEX):
+                    ed_glob.ID_PREF_AUTOCOMPEX, ed_glob.ID_PREF_AUTOCOMPALL):
 
             e_val = evt.EventObject.GetValue()
 
@@ -1059,9 +1071,11 @@ class DocCodePanel(wx.Panel):
                 if spin is not None:
                     spin.Enable(e_val)
             elif e_id == ed_glob.ID_AUTOCOMP:
-                cbox = self.FindWindowById(ed_glob.ID_PREF_AUTOCOMPEX)
-                if cbox is not None:
-                    cbox.Enable(e_val)
+                for cid in (ed_glob.ID_PREF_AUTOCOMPEX,
+                            ed_glob.ID_PREF_AUTOCOMPALL):
+                    cbox = self.FindWindowById(cid)
+                    if cbox is not None:
+                        cbox.Enable(e_val)
             elif e_id == ed_glob.ID_VI_MODE:
                 cbox = self.FindWindowById(ed_glob.ID_VI_NORMAL_DEFAULT)
                 if cbox is not None:
@@ -48,6 +48,7 @@ _DEFAULTS = {
            'AUTOBACKUP_SUFFIX' : '.edbkup', # Backup suffix (e.g. .edbkup, ~)
            'AUTO_COMP'  : True,             # Use Auto-comp if available
            'AUTO_COMP_EX' : False,          # Use extended autocompletion
+           'AUTO_COMP_ALLBUFF' : False,     # Complete words from all buffers
            'AUTO_INDENT': True,             # Use Auto Indent
            'AUTO_TRIM_WS' : False,          # Trim whitespace on save
            'AUTO_RELOAD' : False,           # Automatically reload files?
@@ -75,7 +76,9 @@ _DEFAULTS = {
            'ISBINARY'   : False,            # Is this instance a binary
            'KEY_PROFILE': None,             # Keybinding profile
            'LANG'       : 'Default',        # UI language
+           'LARGE_FILE' : 52428800,         # Size of files to open in large file mode
            'LASTCHECK'  : 0,                # Last time update check was done
+           'LAZY_SESSION' : True,           # Load session files when first shown
            #'LEXERMENU'  : [lang_name,]     # Created on an as needed basis
            'MAXIMIZED'  : False,            # Was window maximized on exit
            'MODE'       : 'CODE',           # Overall editor mode
@@ -88,6 +91,7 @@ _DEFAULTS = {
            'SAVE_SESSION' : False,          # Load previous session on startup
            'SEARCH_LOC' : list(),           # Recent Search Locations
            'SEARCH_FILTER' : '',            # Last used search filter
+           'SEARCH_INDEX' : False,          # Index directories for find in files
            'SESSION_KEY' : '',              # Ipc Session Server Key
            'SET_WPOS'   : True,             # Remember window position
            'SET_WSIZE'  : True,             # Remember mainwindow size on exit
@@ -26,6 +26,7 @@ from pygments.lexers import get_lexer_by_name
 #Local Imports
 import synglob
 import syndata
+import synlexer
 
 #-----------------------------------------------------------------------------#
 # Style Id's
@@ -95,35 +96,21 @@ def StyleText(stc, start, end):
     @param end: end position
 
     """
-    cpos = 0
-    stc.StartStyling(cpos, 0x1f)
-    lexer = get_lexer_by_name("html+django")
-    doctxt = stc.GetTextRange(0, end)
-    wineol = stc.GetEOLChar() == "\r\n"
-
-    # Need to convert to UTF-8 in order to calculate
-    # correct positions in STC.
-    try:
-        doctxt = doctxt.encode('utf-8')
-    except:
-        pass
-
-    for token, txt in lexer.get_tokens(doctxt):
-#        print token, txt
-        style = TOKEN_MAP.get(token, STC_DJANGO_DEFAULT)
-        if style == STC_DJANGO_PREPROCESSOR and txt.startswith(u'#'):
-            style = STC_DJANGO_COMMENT
-#        elif style == STC_DJANGO_STRING and txt[-1] not in '"\'':
-#            style = STC_DJANGO_STRINGEOL
-
-        tlen = len(txt)
-        if wineol and "\n" in txt:
-            tlen += txt.count("\n")
-
-        if tlen:
-            stc.SetStyling(tlen, style)
-        cpos += tlen
-        stc.StartStyling(cpos, 0x1f)
+    _STYLER.StyleText(stc, start, end)
+
+def _GetStyle(style, token, txt):
+    """Adjust the style of a token
+    @param style: style id from the token map
+    @param token: pygments token
+    @param txt: token text
+    @return: style id
+
+    """
+    if style == STC_DJANGO_PREPROCESSOR and txt.startswith(u'#'):
+        style = STC_DJANGO_COMMENT
+#    elif style == STC_DJANGO_STRING and txt[-1] not in '"\'':
+#        style = STC_DJANGO_STRINGEOL
+    return style
 
 #-----------------------------------------------------------------------------#
 
@@ -138,4 +125,6 @@ TOKEN_MAP = { Token.Literal.String : STC_DJANGO_STRING,
               Token.Name.Attribute : STC_DJANGO_ATTRIBUTE,
               Token.String.Interpol : STC_DJANGO_SCALAR,
               Token.Name.Tag : STC_DJANGO_TAG }
-              
\ No newline at end of file
+
+_STYLER = synlexer.IncrementalStyler(get_lexer_by_name("html+django"),
+                                     TOKEN_MAP, STC_DJANGO_DEFAULT, _GetStyle)
@@ -26,6 +26,7 @@ from pygments.lexers import get_lexer_by_name
 # Local Imports
 import synglob
 import syndata
+import synlexer
 
 #-----------------------------------------------------------------------------#
 # Style Id's
@@ -96,27 +97,21 @@ def StyleText(stc, start, end):
     @param end: end position
 
     """
-    cpos = 0
-    stc.StartStyling(cpos, 0x1f)
-    lexer = get_lexer_by_name("html+mako")
-    doctxt = stc.GetTextRange(0, end)
-    wineol = stc.GetEOLChar() == "\r\n"
-    for token, txt in lexer.get_tokens(doctxt):
-#        print token, txt
-        style = TOKEN_MAP.get(token, STC_MAKO_DEFAULT)
-        if style == STC_MAKO_PREPROCESSOR and txt.startswith(u'#'):
-            style = STC_MAKO_COMMENT
-#        elif style == STC_MAKO_STRING and txt[-1] not in '"\'':
-#            style = STC_MAKO_STRINGEOL
-
-        tlen = len(txt)
-        if wineol and "\n" in txt:
-            tlen += txt.count("\n")
-
-        if tlen:
-            stc.SetStyling(tlen, style)
-        cpos += tlen
-        stc.StartStyling(cpos, 0x1f)
+    _STYLER.StyleText(stc, start, end)
+
+def _GetStyle(style, token, txt):
+    """Adjust the style of a token
+    @param style: style id from the token map
+    @param token: pygments token
+    @param txt: token text
+    @return: style id
+
+    """
+    if style == STC_MAKO_PREPROCESSOR and txt.startswith(u'#'):
+        style = STC_MAKO_COMMENT
+#    elif style == STC_MAKO_STRING and txt[-1] not in '"\'':
+#        style = STC_MAKO_STRINGEOL
+    return style
 
 #-----------------------------------------------------------------------------#
 
@@ -131,4 +126,6 @@ TOKEN_MAP = { Token.Literal.String : STC_MAKO_STRING,
               Token.Name.Attribute : STC_MAKO_ATTRIBUTE,
               Token.String.Interpol : STC_MAKO_SCALAR,
               Token.Name.Tag : STC_MAKO_TAG }
-              
\ No newline at end of file
+
+_STYLER = synlexer.IncrementalStyler(get_lexer_by_name("html+mako"),
+                                     TOKEN_MAP, STC_MAKO_DEFAULT, _GetStyle)
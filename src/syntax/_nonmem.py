@@ -31,6 +31,7 @@ import re
 #Local Imports
 import synglob
 import syndata
+import synlexer
 
 #-----------------------------------------------------------------------------#
 # Style Id's
@@ -111,15 +112,7 @@ def StyleText(_stc, start, end):
     @param end: end position
 
     """
-    for index, token, txt in lexer.get_tokens_unprocessed(_stc.GetTextRange(0, end)):
-#        print index, token, txt
-        style = TOKEN_MAP.get(token, STC_NONMEM_DEFAULT)
-
-#        print "Text=%s, len=%s" % (txt, len(txt))
-        _stc.StartStyling(index, 0x1f)
-        tlen = len(txt)
-        if tlen:
-            _stc.SetStyling(len(txt), style)
+    _STYLER.StyleText(_stc, start, end)
 
 TOKEN_MAP = { Token.String : STC_NONMEM_STRING,
               Token.Comment.Multiline : STC_NONMEM_COMMENT,
@@ -194,6 +187,7 @@ class NONMEMLexer(RegexLexer):
     }
 
 lexer = NONMEMLexer()
+_STYLER = synlexer.IncrementalStyler(lexer, TOKEN_MAP, STC_NONMEM_DEFAULT)
 
 if __name__=='__main__':
     import codecs, sys
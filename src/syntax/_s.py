@@ -27,6 +27,7 @@ import wx.stc as stc
 #Local Imports
 import synglob
 import syndata
+import synlexer
 
 #-----------------------------------------------------------------------------#
 # Style Id's
@@ -195,27 +196,9 @@ def StyleText(_stc, start, end):
     @param _stc: Styled text control instance
     @param start: Start position
     @param end: end position
-    @todo: performance improvements
-    @todo: style errors caused by unicode characters (related to internal utf8)
 
     """
-    cpos = 0
-    _stc.StartStyling(cpos, 0x1f)
-    lexer = get_lexer_by_name("s")
-    is_wineol = _stc.GetEOLMode() == stc.STC_EOL_CRLF
-    for token, txt in lexer.get_tokens(_stc.GetTextRange(0, end)):
-        style = TOKEN_MAP.get(token, STC_S_DEFAULT)
-
-        tlen = len(txt)
-
-        # Account for \r\n end of line characters
-        if is_wineol and "\n" in txt:
-            tlen += txt.count("\n")
-
-        if tlen:
-            _stc.SetStyling(tlen, style)
-        cpos += tlen
-        _stc.StartStyling(cpos, 0x1f)
+    _STYLER.StyleText(_stc, start, end)
 
 #-----------------------------------------------------------------------------#
 
@@ -228,4 +211,6 @@ TOKEN_MAP = { Token.Literal.String  : STC_S_STRING,
               Token.Literal.Number  : STC_S_NUMBER,
               Token.Keyword         : STC_S_KEYWORD,
               Token.Keyword.Constant: STC_S_KEYWORD }
-              
\ No newline at end of file
+
+_STYLER = synlexer.IncrementalStyler(get_lexer_by_name("s"),
+                                     TOKEN_MAP, STC_S_DEFAULT)
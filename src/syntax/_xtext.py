@@ -29,6 +29,7 @@ import re
 # Local Imports
 import synglob
 import syndata
+import synlexer
 
 #-----------------------------------------------------------------------------#
 # Style Id's
@@ -110,15 +111,7 @@ def StyleText(stc, start, end):
 
     """
 
-    for index, token, txt in lexer.get_tokens_unprocessed(stc.GetTextRange(0, end)):
-#        print index, token, txt
-        style = TOKEN_MAP.get(token, STC_XTEXT_DEFAULT)
-
-#        print "Text=%s, len=%s" % (txt, len(txt))
-        stc.StartStyling(index, 0x1f)
-        tlen = len(txt)
-        if tlen:
-            stc.SetStyling(len(txt), style)
+    _STYLER.StyleText(stc, start, end)
 
 def AutoIndenter(estc, pos, ichar):
     """Auto indent xtext code.
@@ -248,6 +241,7 @@ class XTextLexer(RegexLexer):
     }
 
 lexer = XTextLexer()
+_STYLER = synlexer.IncrementalStyler(lexer, TOKEN_MAP, STC_XTEXT_DEFAULT)
 
 if __name__=='__main__':
     import codecs, sys
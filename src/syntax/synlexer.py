@@ -0,0 +1,657 @@
+###############################################################################
+# Name: synlexer.py                                                           #
+# Purpose: Incremental styling support for pygments based container lexers    #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+FILE: synlexer.py
+AUTHOR: Cody Precord
+@summary: Shared engine for the container lexers that use pygments to do
+          their styling. Instead of re-tokenizing the document from the first
+          byte each time the control asks for styling the engine stores
+          snapshots of the lexers state every L{CHECKPOINT_INTERVAL} lines.
+          Styling is resumed from the nearest checkpoint before the edit and
+          stops as soon as the lexer state matches the state of the previous
+          run on text that has not been modified.
+
+          Some rules can look at all of the text that follows the position
+          they are tried at (i.e a lazy '.*?' that finds no end delimiter),
+          so an edit can change the tokens long before it. Checkpoints that
+          follow such a match are marked with the line it was tried on and
+          styling is resumed from before that line instead.
+
+          The engine is independent of wx and only requires the following
+          subset of the StyledTextCtrl api from the control it styles:
+          GetTextRange, LineFromPosition, PositionFromLine, GetLineEndPosition,
+          StartStyling and SetStyling.
+
+@example: StyleText = synlexer.IncrementalStyler(lexer, TOKEN_MAP,
+                                                 STC_DEFAULT).StyleText
+@note: lexer state can only be captured for RegexLexer based lexers and
+       DelegatingLexers made of them. Other lexers are always restyled from
+       the start of the document.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+__all__ = ['CHECKPOINT_INTERVAL', 'IncrementalStyler',
+           'UpdateState', 'ResetState']
+
+#-----------------------------------------------------------------------------#
+# Imports
+import weakref
+import sre_parse
+import sre_compile
+import sre_constants
+from pygments.lexer import RegexLexer, ExtendedRegexLexer, DelegatingLexer
+from pygments.token import Text, Error, _TokenType
+
+#-----------------------------------------------------------------------------#
+# Globals
+
+# Number of lines between stored lexer state checkpoints
+CHECKPOINT_INTERVAL = 32
+
+# Initial lexer stack of a pygments RegexLexer
+_ROOT = ('root',)
+
+# Per control lexer state
+_DOCSTATE = weakref.WeakKeyDictionary()
+
+# Lexer class -> token definitions with the rule analysis of L{_AnalyzeRule}
+_RULES = dict()
+
+# Characters used to check what text a repeated sub pattern can run over
+_PROBE_TEXT = u'a<{'
+_PROBE_ALL = u'\na<{>"\'%-#/ '
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+#-----------------------------------------------------------------------------#
+
+class DocState(object):
+    """Incremental lexing information for a single document"""
+    def __init__(self, owner):
+        super(DocState, self).__init__()
+
+        # Attributes
+        self.owner = owner      # Styler that created the checkpoints
+        # line -> (column, char column, state, dependency line). The
+        # dependency line is the first line lexed with a rule that may have
+        # looked at the text following the checkpoint, or None.
+        self.checkpoints = dict()
+        self.dirty = -1         # Last line modified since previous run
+        self.styled = 0         # Number of lines known to have valid styles
+
+    def Modified(self, line, lines_added):
+        """Update the stored checkpoints after a modification to the text
+        @param line: line the modification started on
+        @param lines_added: number of lines added (negative for deletions)
+
+        """
+        if lines_added:
+            moved = dict()
+            for cline, cpoint in self.checkpoints.iteritems():
+                dep = cpoint[3]
+                if dep is not None and dep > line:
+                    cpoint = cpoint[:3] + (max(line, dep + lines_added),)
+                if cline < line or (cline == line and not cpoint[0]):
+                    moved[cline] = cpoint
+                elif cline > line - min(lines_added, 0):
+                    moved[cline + lines_added] = cpoint
+                # else: checkpoint was in the modified range
+            self.checkpoints = moved
+
+            for attr in ('dirty', 'styled'):
+                val = getattr(self, attr)
+                if val > line:
+                    setattr(self, attr, max(line, val + lines_added))
+        elif self.checkpoints.get(line, (0,))[0]:
+            # Column of the checkpoint may have moved
+            del self.checkpoints[line]
+
+        self.dirty = max(self.dirty, line + max(lines_added, 0))
+
+    def Reset(self):
+        """Discard all stored lexer information"""
+        self.checkpoints = dict()
+        self.dirty = -1
+        self.styled = 0
+
+#-----------------------------------------------------------------------------#
+
+def UpdateState(stc, line, lines_added):
+    """Notify the engine of a text modification in a control. Should be
+    called for every insert and delete of text in a control that uses an
+    L{IncrementalStyler}.
+    @param stc: StyledTextCtrl
+    @param line: line the modification started on
+    @param lines_added: number of lines added by the modification
+
+    """
+    state = _DOCSTATE.get(stc, None)
+    if state is not None:
+        state.Modified(line, lines_added)
+
+def ResetState(stc):
+    """Discard any stored lexer checkpoints for the given control. Should be
+    called when the controls styling is cleared or its lexer is changed.
+    @param stc: StyledTextCtrl
+
+    """
+    if stc in _DOCSTATE:
+        del _DOCSTATE[stc]
+
+#-----------------------------------------------------------------------------#
+
+class IncrementalStyler(object):
+    """Checkpointed container lexer that styles a StyledTextCtrl from the
+    tokens generated by a pygments lexer.
+
+    """
+    def __init__(self, lexer, token_map, default, stylefunc=None):
+        """Create the styler
+        @param lexer: pygments lexer instance
+        @param token_map: dict mapping pygments tokens to style ids
+        @param default: default style id for unmapped tokens
+        @keyword stylefunc: optional callable(style, token, txt) that returns
+                            the final style id for a token.
+
+        """
+        super(IncrementalStyler, self).__init__()
+
+        # Attributes
+        self.lexer = lexer
+        self.token_map = token_map
+        self.default = default
+        self.stylefunc = stylefunc
+        self.interval = CHECKPOINT_INTERVAL
+
+    def GetDocState(self, stc):
+        """Get the checkpoint information for the given control
+        @param stc: StyledTextCtrl
+        @return: DocState
+
+        """
+        state = _DOCSTATE.get(stc, None)
+        if state is None or state.owner is not self:
+            state = DocState(self)
+            _DOCSTATE[stc] = state
+        return state
+
+    def GetStartPoint(self, state, line):
+        """Find the checkpoint to resume lexing from for the given line.
+        Checkpoints that the text before them depends on are skipped.
+        @param state: DocState
+        @param line: first line that needs styling
+        @return: (line, column, char column, lexer state)
+
+        """
+        while True:
+            cline = -1
+            for cpoint, cstate in state.checkpoints.iteritems():
+                if cline < cpoint < line or (cpoint == line and not cstate[0]):
+                    cline = cpoint
+            if cline < 0:
+                return 0, 0, 0, None
+
+            col, tcol, lstate, dep = state.checkpoints[cline]
+            if dep is None or dep >= line:
+                return cline, col, tcol, lstate
+            line = dep
+
+    def StyleText(self, stc, start, end):
+        """Style the text
+        @param stc: Styled text control instance
+        @param start: Start position
+        @param end: end position
+
+        """
+        state = self.GetDocState(stc)
+        sline = stc.LineFromPosition(start)
+        if sline == 0 and state.dirty < 0:
+            # Full restyle requested (i.e style was cleared)
+            state.Reset()
+
+        # Always style through to the end of the requested line so that the
+        # last token and checkpoint are not split.
+        eline = stc.LineFromPosition(end)
+        end = max(end, stc.GetLineEndPosition(eline))
+
+        # Pygments lexers use look ahead assertions, so an edit can change the
+        # tokens leading up to it. Back off an interval to leave them room.
+        cline, ccol, tcol, lstate = self.GetStartPoint(state,
+                                                       sline - self.interval)
+        cpos = stc.PositionFromLine(cline) + ccol
+
+        # Include the previous line as context for look behind assertions
+        ppos = stc.PositionFromLine(max(0, cline - 1))
+        doctxt = stc.GetTextRange(ppos, end)
+        try:
+            doctxt = unicode(doctxt)
+            ascii = len(doctxt) == len(doctxt.encode('utf-8'))
+        except (NameError, UnicodeError):
+            ascii = True
+
+        # Only allow stopping early when the text following the checkpoint
+        # is unchanged from the previous run and already has valid styles.
+        oldpoints = state.checkpoints
+        can_sync = state.dirty >= 0 and eline < state.styled
+        newpoints = dict()
+        if cline in oldpoints:
+            newpoints[cline] = oldpoints[cline]
+        lastpoint = cline
+        deps = list()   # Position of the first match that scanned to the end
+        dep = None      # Line of deps[0] once a checkpoint follows it
+
+        line = cline
+        lstart = 0      # Character position of current line in doctxt
+        if cline:
+            lstart = doctxt.index(u'\n') + 1
+        bpos = cpos     # Byte position in control
+        tpos = lstart + tcol # Character position in doctxt
+        synced = False
+        stc.StartStyling(cpos, 0x1f)
+        for index, token, txt in _Tokenize(self.lexer, doctxt, tpos,
+                                           lstate, deps):
+            if token is None:
+                # Resume point marker (txt is the lexers state)
+                if line == cline or index != tpos:
+                    continue
+                if dep is None and deps and deps[0] < index:
+                    dep = max(0, cline - 1) + doctxt.count(u'\n', 0, deps[0])
+                col = doctxt[lstart:index]
+                if not ascii:
+                    col = col.encode('utf-8')
+                cpoint = (len(col), index - lstart, txt, dep)
+                if can_sync and line > state.dirty and \
+                   oldpoints.get(line, (None,))[:3] == cpoint[:3]:
+                    synced = True
+                    break
+                if line - lastpoint >= self.interval:
+                    newpoints[line] = cpoint
+                    lastpoint = line
+                continue
+
+            # Lexer output can contain gaps or overlaps (i.e skipped groups
+            # in a bygroups rule) so always style the real text in between.
+            tend = index + len(txt)
+            if tend <= tpos:
+                continue
+            seg = doctxt[tpos:tend]
+
+            style = self.token_map.get(token, self.default)
+            if self.stylefunc is not None:
+                style = self.stylefunc(style, token, txt)
+            tlen = len(seg) if ascii else len(seg.encode('utf-8'))
+            stc.SetStyling(tlen, style)
+            bpos += tlen
+            nlines = seg.count(u'\n')
+            if nlines:
+                line += nlines
+                lstart = tpos + seg.rindex(u'\n') + 1
+            tpos = tend
+
+        if synced:
+            # Remaining styles are the same as the previous run, the
+            # checkpoints after a match that scanned to the end depend on it
+            for cpoint, cstate in oldpoints.iteritems():
+                if cpoint >= line and dep is not None and \
+                   (cstate[3] is None or dep < cstate[3]):
+                    cstate = cstate[:3] + (dep,)
+                if cpoint < cline or cpoint >= line:
+                    newpoints[cpoint] = cstate
+            stc.StartStyling(end, 0x1f)
+        else:
+            for cpoint, cstate in oldpoints.iteritems():
+                if cpoint < cline:
+                    newpoints[cpoint] = cstate
+            if bpos < end:
+                # Text not covered by lexer output
+                stc.SetStyling(end - bpos, self.default)
+            state.styled = eline + 1
+
+        state.checkpoints = newpoints
+        state.dirty = -1
+
+#-----------------------------------------------------------------------------#
+# Resumable tokenizers
+
+def _Tokenize(lexer, text, pos, state, deps=None):
+    """Tokenize the text starting from the given lexer state. Yields the
+    tokens as (index, token, value) with additional (index, None, state)
+    markers at the first token boundary following each new line where the
+    lexer can later be resumed from.
+    @param lexer: pygments Lexer
+    @param text: unicode
+    @param pos: position in text to start at
+    @param state: state from a previous marker or None to start fresh
+    @keyword deps: list that the position of the first match that may have
+                   looked at all of the following text is added to
+
+    """
+    if isinstance(lexer, DelegatingLexer) and \
+       _IsResumable(lexer.language_lexer) and _IsResumable(lexer.root_lexer):
+        return _DelegatingTokens(lexer, text, pos, state, deps)
+    elif _IsResumable(lexer):
+        return _RegexTokens(lexer, text, pos, state or _ROOT, deps=deps)
+    else:
+        # Lexer state can't be captured, always lex from the start
+        return lexer.get_tokens_unprocessed(text)
+
+def _IsResumable(lexer):
+    """Can the lexers state be captured?
+    @param lexer: pygments Lexer
+    @return: bool
+
+    """
+    return isinstance(lexer, RegexLexer) and \
+           not isinstance(lexer, ExtendedRegexLexer)
+
+def _RegexTokens(lexer, text, pos=0, stack=_ROOT, every=1, wanted=None,
+                 split=None, deps=None):
+    """Equivalent of RegexLexer.get_tokens_unprocessed that additionally
+    yields the state stack at token boundaries following a new line.
+    @param lexer: RegexLexer
+    @param text: unicode
+    @keyword pos: position to start at
+    @keyword stack: initial state stack
+    @keyword every: number of token boundaries to mark after each new line
+    @keyword wanted: set of positions to mark instead of the new lines
+    @keyword split: token type that is split at new lines, with a mark after
+                    each one. Only suitable for catch all tokens such as the
+                    'Other' text of a template language.
+    @keyword deps: list to add the position of the first match that may have
+                   looked at all of the following text to
+
+    """
+    pending = 0
+    tokendefs = _GetRules(lexer)
+    statestack = list(stack)
+    statetokens = tokendefs[statestack[-1]]
+    if deps is None:
+        deps = [-1] # Not wanted
+    while 1:
+        if pending or (wanted and pos in wanted):
+            pending = max(0, pending - 1)
+            yield pos, None, tuple(statestack)
+        for rexmatch, action, new_state, gate, scans in statetokens:
+            m = rexmatch(text, pos)
+            if m:
+                if scans and not deps:
+                    deps.append(pos)
+                if type(action) is _TokenType:
+                    items = ((pos, action, m.group()),)
+                else:
+                    items = action(lexer, m)
+
+                for item in items:
+                    if item[1] is split and u'\n' in item[2][:-1]:
+                        # Statestack is still the stack the match started in
+                        idx, val = item[0], item[2]
+                        lstart = 0
+                        while lstart < len(val):
+                            lend = val.find(u'\n', lstart) + 1 or len(val)
+                            if lstart:
+                                yield idx + lstart, None, tuple(statestack)
+                            yield idx + lstart, split, val[lstart:lend]
+                            lstart = lend
+                    else:
+                        yield item
+                if wanted is None and text.find(u'\n', pos, m.end()) != -1:
+                    pending = every
+                pos = m.end()
+                if new_state is not None:
+                    # state transition
+                    if isinstance(new_state, tuple):
+                        for nstate in new_state:
+                            if nstate == '#pop':
+                                statestack.pop()
+                            elif nstate == '#push':
+                                statestack.append(statestack[-1])
+                            else:
+                                statestack.append(nstate)
+                    elif isinstance(new_state, int):
+                        del statestack[new_state:]
+                    elif new_state == '#push':
+                        statestack.append(statestack[-1])
+                    statetokens = tokendefs[statestack[-1]]
+                break
+            elif gate is not None and not deps and \
+                 (gate is True or gate(text, pos)):
+                # The failed match may have looked at all of the following text
+                deps.append(pos)
+        else:
+            if pos >= len(text):
+                break
+            if text[pos] == u'\n':
+                # at EOL, reset state to "root"
+                statestack = list(_ROOT)
+                statetokens = tokendefs['root']
+                yield pos, Text, u'\n'
+                pos += 1
+                if wanted is None:
+                    pending = every
+                continue
+            yield pos, Error, text[pos]
+            pos += 1
+
+def _GetRules(lexer):
+    """Get the lexers token definitions with each rule extended by the
+    analysis of L{_AnalyzeRule}.
+    @param lexer: RegexLexer
+    @return: dict state -> [(rexmatch, action, new_state, gate, scans),]
+
+    """
+    rules = _RULES.get(lexer.__class__, None)
+    if rules is None:
+        rules = dict()
+        for name, tokens in lexer._tokens.iteritems():
+            rules[name] = [ rule[:3] + _AnalyzeRule(rule[0])
+                            for rule in tokens ]
+        _RULES[lexer.__class__] = rules
+    return rules
+
+def _AnalyzeRule(rexmatch):
+    """Find out if matching a rule can look at all of the text following
+    the position it is tried at.
+    @param rexmatch: bound match method of a compiled regex
+    @return: (gate, scans) gate is None when a failed match only looks at
+             a bounded amount of text, True when it may always have looked
+             at the rest of the text and otherwise the match method of the
+             part of the rule that comes before the unbounded repeat. scans
+             is True when a successful match may also have done so.
+
+    """
+    regex = getattr(rexmatch, '__self__', None)
+    try:
+        parsed = sre_parse.parse(regex.pattern, regex.flags)
+        flags = regex.flags | parsed.pattern.flags
+        items = list(parsed)
+        wide = [ _HasWideRepeat(parsed.pattern, [item], flags)
+                 for item in items ]
+        gate = None
+        if True in wide:
+            first = wide.index(True)
+            if first:
+                sub = sre_parse.SubPattern(parsed.pattern, items[:first])
+                gate = sre_compile.compile(sub, flags).match
+            elif len(items) > 1 or items[0][0] not in _REPEATS:
+                # A lone repeat just stops where it can't continue
+                gate = True
+        return gate, _Overshoots(parsed.pattern, items, flags)
+    except Exception:
+        # Can't tell so assume the worst
+        return True, True
+
+def _Consumes(pattern, items, flags, chars):
+    """Check if the sub pattern matches each of the given characters
+    @return: bool
+
+    """
+    sub = sre_parse.SubPattern(pattern, list(items))
+    match = sre_compile.compile(sub, flags).match
+    for char in chars:
+        m = match(char)
+        if not m or not m.end():
+            return False
+    return True
+
+def _HasWideRepeat(pattern, items, flags):
+    """Check for an unbounded repeat that can run over new lines and
+    ordinary text.
+    @return: bool
+
+    """
+    for op, av in items:
+        if op in _REPEATS:
+            if av[1] == sre_constants.MAXREPEAT and \
+               _Consumes(pattern, av[2], flags, u'\n') and \
+               [ char for char in _PROBE_TEXT
+                 if _Consumes(pattern, av[2], flags, char) ]:
+                return True
+            subs = [av[2]]
+        elif op == sre_constants.BRANCH:
+            subs = av[1]
+        elif op in (sre_constants.SUBPATTERN, sre_constants.ASSERT,
+                    sre_constants.ASSERT_NOT):
+            subs = [av[1]]
+        else:
+            continue
+
+        for sub in subs:
+            if _HasWideRepeat(pattern, sub, flags):
+                return True
+    return False
+
+def _Overshoots(pattern, items, flags, last=True):
+    """Check if a successful match can look past its end to the rest of the
+    text. That is a greedy repeat of any character that backs off to find
+    what follows it or a look ahead with an unbounded repeat.
+    @keyword last: items are at the end of the pattern
+    @return: bool
+
+    """
+    items = list(items)
+    for idx, (op, av) in enumerate(items):
+        tail = last and idx == len(items) - 1
+        if op == sre_constants.MAX_REPEAT:
+            if not tail and av[1] == sre_constants.MAXREPEAT and \
+               _Consumes(pattern, av[2], flags, _PROBE_ALL):
+                return True
+            if _Overshoots(pattern, av[2], flags, False):
+                return True
+        elif op == sre_constants.MIN_REPEAT:
+            if _Overshoots(pattern, av[2], flags, False):
+                return True
+        elif op == sre_constants.SUBPATTERN:
+            if _Overshoots(pattern, av[1], flags, tail):
+                return True
+        elif op == sre_constants.BRANCH:
+            for sub in av[1]:
+                if _Overshoots(pattern, sub, flags, tail):
+                    return True
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            if _HasWideRepeat(pattern, av[1], flags):
+                return True
+    return False
+
+def _DelegatingTokens(lexer, text, pos, state, deps=None):
+    """Resumable equivalent of DelegatingLexer.get_tokens_unprocessed. The
+    state is the pair of language and root lexer stacks.
+    @param lexer: DelegatingLexer
+    @param text: unicode
+    @param pos: position in text to start at
+    @param state: (language stack, root stack) or None
+    @keyword deps: see L{_Tokenize}
+    @note: unlike do_insertions the real position of each token is kept so
+           that text skipped by a lexer does not shift the following tokens.
+
+    """
+    lstack, rstack = state or (_ROOT, _ROOT)
+    buffered = list()
+    blen = 0
+    tokens = list() # language tokens and (index, None, buffered range)
+    lmarks = list() # (index, buffered index, language stack)
+    ldeps = list()
+    for i, t, v in _RegexTokens(lexer.language_lexer, text, pos, lstack,
+                                split=lexer.needle, deps=ldeps):
+        if t is None:
+            lmarks.append((i, blen, v))
+        elif t is lexer.needle:
+            buffered.append(v)
+            tokens.append((i, None, (blen, blen + len(v))))
+            blen += len(v)
+        else:
+            tokens.append((i, t, v))
+
+    # Lex the buffered text while recording the root lexers state at the
+    # positions that correspond to the language lexers resume points.
+    # The root lexer is resumed on a fresh buffer, so only positions that
+    # follow a new line in the buffered text behave the same way when
+    # matched against anchors and look behind assertions.
+    buffered = u''.join(buffered)
+    rtokens = list()
+    rstates = { 0 : tuple(rstack) }
+    wanted = set([ mark[1] for mark in lmarks
+                   if mark[1] and buffered[mark[1] - 1] == u'\n' ])
+    rdeps = list()
+    for item in _RegexTokens(lexer.root_lexer, buffered, 0,
+                             rstack, wanted=wanted, deps=rdeps):
+        if item[1] is None:
+            rstates[item[0]] = item[2]
+        else:
+            rtokens.append(item)
+    rtokens.reverse()
+
+    # Map the root lexers dependency back to a position in the text
+    if deps is not None:
+        for bidx in rdeps:
+            for i, t, v in tokens:
+                if t is None and v[0] <= bidx < v[1]:
+                    ldeps.append(i + bidx - v[0])
+                    break
+            else:
+                ldeps.append(len(text))
+        if ldeps:
+            deps.append(min(ldeps))
+
+    # Only positions that are a boundary for both lexers can be resumed from
+    markers = list()
+    for i, bidx, lstate in lmarks:
+        if bidx in rstates:
+            markers.append((i, (lstate, rstates[bidx])))
+    markers.reverse()
+
+    def merged():
+        """Merge the root lexers tokens back in to the language tokens"""
+        for i, t, v in tokens:
+            if t is not None:
+                yield i, t, v
+                continue
+
+            # Map root tokens that overlap this piece of buffered text
+            bstart, bend = v
+            while rtokens and rtokens[-1][0] < bend:
+                rpos, rtok, rval = rtokens[-1]
+                rend = rpos + len(rval)
+                tstart = max(rpos, bstart)
+                tend = min(rend, bend)
+                if tend > tstart:
+                    yield i + tstart - bstart, rtok, \
+                          rval[tstart - rpos:tend - rpos]
+                if rend > bend:
+                    break
+                rtokens.pop()
+
+    for i, t, v in merged():
+        while markers and markers[-1][0] <= i:
+            midx, mstate = markers.pop()
+            if midx == i:
+                yield midx, None, mstate
+        yield i, t, v
@@ -0,0 +1,200 @@
+###############################################################################
+# Name: benchExport.py                                                        #
+# Purpose: Benchmark the HTML/LaTeX/RTF document generators                   #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Measure the time to export the sample files in tests/syntax with the HTML,
+LaTeX and RTF generators. Each sample is repeated until it has the given
+number of lines and is styled with a simple tokenizer, the exporters don't
+depend on which lexer styled the document. The old position by position scan
+of the styling (GetStyleAt for every position) is compared to reading the
+style runs with generator.StyleRuns, then each generator writes the document
+to a temporary file.
+
+usage: python benchExport.py [number of lines] [sample file...]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import re
+import sys
+import codecs
+import tempfile
+
+# Local Imports
+import common
+import generator
+from ed_style import StyleItem
+
+#-----------------------------------------------------------------------------#
+
+NLINES = 50000
+TOKEN_RE = re.compile(r'("[^"\n]*"|\'[^\'\n]*\')|([0-9]+)|([A-Za-z_]+)|(#.*|//.*)')
+STYLES = ((0, 'default_style', u"fore:#000000,back:#FFFFFF,face:%(mono)s,size:%(size)d"),
+          (1, 'string_style', u"fore:#A00000,back:#FFFFFF"),
+          (2, 'number_style', u"fore:#0000A0,back:#FFFFFF"),
+          (3, 'keyword_style', u"fore:#00A000,back:#FFFFFF,modifiers:bold"),
+          (4, 'comment_style', u"fore:#808080,back:#FFFFFF,modifiers:italic"),
+          (5, 'operator_style', u"fore:#000000,back:#FFFFFF"))
+
+class DefaultFont(object):
+    """Stand in for the default wx.Font of the control"""
+    def GetFaceName(self):
+        return u"Courier"
+
+class ExportBuffer(common.TextBuffer):
+    """TextBuffer with the styling and style sheet api used by the
+    generators.
+
+    """
+    def __init__(self, text):
+        common.TextBuffer.__init__(self, text)
+
+        # Tokenize the text to give it some style runs
+        for match in TOKEN_RE.finditer(text):
+            for group in range(1, 5):
+                if match.group(group) is not None:
+                    start, end = match.span(group)
+                    self._styles[start:end] = chr(group) * (end - start)
+
+    def GetStyleAt(self, pos):
+        if pos < len(self._styles):
+            return self._styles[pos]
+        return 0
+
+    def GetStyledText(self, start, end):
+        data = bytearray((end - start) * 2)
+        data[0::2] = self._text[start:end].encode('ascii', 'replace')
+        data[1::2] = self._styles[start:end]
+        return str(data)
+
+    def GetStyleBits(self):
+        return 5
+
+    def FindTagById(self, style_id):
+        for data in STYLES:
+            if style_id == data[0]:
+                return data[1]
+        return 'default_style'
+
+    def GetStyleByName(self, name):
+        for data in STYLES:
+            if name == data[1]:
+                return data[2]
+        return u""
+
+    def GetItemByName(self, name):
+        item = StyleItem()
+        item.SetAttrFromStr(self.GetStyleByName(name) % \
+                            self.GetFontDictionary())
+        return item
+
+    def GetFontDictionary(self):
+        return dict(mono=u"Courier", size=10)
+
+    def GetFileName(self):
+        return u"bench.txt"
+
+    def GetDefaultForeColour(self, as_hex=False):
+        return u"#000000"
+
+    def GetDefaultBackColour(self, as_hex=False):
+        return u"#FFFFFF"
+
+    def GetDefaultFont(self):
+        return DefaultFont()
+
+class PluginMgr(object):
+    """Minimal plugin manager to create the generator plugins with"""
+    def GetPlugins(self):
+        return dict()
+
+    def GetDefaultPlugins(self):
+        return dict()
+
+def BuildText(sample, nlines):
+    """Repeat the sample text until it has at least nlines lines"""
+    lines = sample.splitlines(True)
+    out = list()
+    while len(out) < nlines:
+        out.extend(lines)
+    return u''.join(out[:nlines])
+
+def ScanPositions(buff):
+    """The old way of finding the style regions, one position at a time"""
+    parts = list()
+    last_id = buff.GetStyleAt(0)
+    tag = buff.FindTagById(last_id)
+    start = 0
+    last_pos = buff.GetLength() + 1
+    for pos in xrange(1, last_pos + 1):
+        curr_id = buff.GetStyleAt(pos)
+        if curr_id != last_id or pos == last_pos:
+            parts.append((tag, buff.GetTextRange(start, pos)))
+            last_id = curr_id
+            start = pos
+            tag = buff.FindTagById(last_id)
+    return parts
+
+def ReadRuns(buff):
+    """Read the style regions with StyleRuns"""
+    runs = generator.StyleRuns(buff)
+    return [ (runs.GetTag(run[0]), run[3]) for run in runs ]
+
+def Export(gen, buff, path):
+    """Write the document to a file with a generator"""
+    handle = codecs.open(path, 'wb', 'utf-8')
+    gen.WriteDocument(buff, handle.write)
+    handle.close()
+
+def RunFile(fname, nlines, path):
+    """Benchmark one sample file
+    @return: row of results
+
+    """
+    handle = open(common.GetSyntaxFile(fname), 'rb')
+    sample = handle.read().decode('utf-8', 'replace')
+    handle.close()
+    if not sample.strip():
+        return None
+
+    buff = ExportBuffer(BuildText(sample, nlines))
+    row = [fname]
+    for func in (ScanPositions, ReadRuns):
+        row.append(u"%.1f" % (common.Timeit(func, buff)[0] * 1000))
+
+    mgr = PluginMgr()
+    for gen in (generator.Html(mgr), generator.LaTeX(mgr),
+                generator.Rtf(mgr)):
+        row.append(u"%.1f" % (common.Timeit(Export, gen, buff, path)[0] * 1000))
+    return row
+
+def Main(nlines, fnames):
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        rows = [ RunFile(fname, nlines, path) for fname in fnames ]
+    finally:
+        os.remove(path)
+    common.Report(u"Export time for %d lines (ms)" % nlines,
+                  [ row for row in rows if row is not None ],
+                  (u"file", u"scan", u"runs", u"html", u"latex", u"rtf"))
+
+if __name__ == '__main__':
+    NUM = NLINES
+    if len(sys.argv) > 1:
+        NUM = int(sys.argv[1])
+    FILES = sys.argv[2:]
+    if not FILES:
+        FILES = sorted(os.listdir(os.path.join(common._BASE, u'..', u'syntax')))
+    Main(NUM, FILES)
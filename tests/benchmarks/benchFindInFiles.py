@@ -0,0 +1,96 @@
+###############################################################################
+# Name: benchFindInFiles.py                                                   #
+# Purpose: Benchmark searching in directories with the SearchEngine           #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Measure the throughput of L{ebmlib.SearchEngine.SearchInDirectory} for an
+increasing number of worker processes. A tree of files is generated in a
+temporary directory by copying the files from tests/syntax.
+
+usage: python benchFindInFiles.py [number of files] [search directory]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import shutil
+import tempfile
+
+# Local Imports
+import common
+import ebmlib
+
+#-----------------------------------------------------------------------------#
+
+QUERY = u"(def|class|function)\\s+\\w+"
+DIRSIZE = 100 # Files per directory
+
+def BuildTree(nfiles):
+    """Create a directory tree of sample files
+    @param nfiles: number of files to create
+    @return: path of the tree
+
+    """
+    root = tempfile.mkdtemp(prefix=u"edbench")
+    syntax = common.GetSyntaxFile(u'')
+    samples = [ os.path.join(syntax, fname) for fname in os.listdir(syntax)
+                if os.path.isfile(os.path.join(syntax, fname)) ]
+    for idx in range(nfiles):
+        dname = os.path.join(root, u"dir%d" % (idx / DIRSIZE))
+        if not os.path.exists(dname):
+            os.mkdir(dname)
+        sample = samples[idx % len(samples)]
+        shutil.copy(sample, os.path.join(dname, u"%d_%s" % \
+                                         (idx, os.path.basename(sample))))
+    return root
+
+def RunSearch(path, workers):
+    """Search the directory with the given number of workers
+    @return: (seconds, number of results)
+
+    """
+    engine = ebmlib.SearchEngine(QUERY, regex=True)
+    engine.SetWorkers(workers)
+    return common.Timeit(lambda: len(list(engine.SearchInDirectory(path))))
+
+def Main(nfiles, path=None):
+    tmp = None
+    if path is None:
+        tmp = path = BuildTree(nfiles)
+
+    try:
+        # Warm up the disk cache
+        RunSearch(path, 1)
+        rows = list()
+        workers = 1
+        base = None
+        while workers <= max(1, ebmlib.GetDefaultWorkers()) * 2:
+            secs, results = RunSearch(path, workers)
+            base = base or secs
+            rows.append((workers, u"%.2f" % secs, results,
+                         u"%.2fx" % (base / max(secs, 0.0001))))
+            workers *= 2
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp)
+
+    common.Report(u"Find in files (%s)" % path, rows,
+                  (u"workers", u"seconds", u"results", u"speedup"))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        Main(0, sys.argv[2])
+    elif len(sys.argv) > 1:
+        Main(int(sys.argv[1]))
+    else:
+        Main(5000)
@@ -0,0 +1,103 @@
+###############################################################################
+# Name: benchFtp.py                                                           #
+# Purpose: Benchmark the latency of saving files with the ftpedit plugin      #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Measure the time it takes to save a file to an ftp site with the ftpedit
+plugin. The files are saved to the local ftp server stand-in from the ftpedit
+tests, which can delay its replies to simulate the round trip time of a
+remote server.
+
+The old FtpFile.DoFtpUpload cloned the client, connected and logged in,
+uploaded the file with storlines, listed the directory and disconnected for
+every save. The new one takes a logged in connection from the
+ftpclient.ConnectionPool and uploads the file in binary mode.
+
+usage: python benchFtp.py [number of saves]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import tempfile
+from StringIO import StringIO
+
+# Local Imports
+import common
+sys.path.append(os.path.join(common._BASE, u'..', u'..', u'plugins',
+                             u'ftpedit', u'ftpedit'))
+sys.path.append(os.path.join(common._BASE, u'..', u'..', u'plugins',
+                             u'ftpedit', u'tests'))
+import ftpclient
+import ftpserver
+
+#-----------------------------------------------------------------------------#
+
+NSAVES = 20
+DELAYS = (0, 0.005)
+SIZES = (4096, 4194304)
+
+def OldSave(port, path, nsaves):
+    """Save the file like the old FtpFile.DoFtpUpload"""
+    for idx in xrange(nsaves):
+        client = ftpclient.FtpClient(None)
+        client.SetHostname(u"127.0.0.1")
+        client.SetPort(port)
+        client.Connect(u"user", u"pass")
+        fhandle = open(path, 'r')
+        buff = StringIO(fhandle.read())
+        fhandle.close()
+        client.storlines('STOR /file.txt', buff)
+        client.GetFileList(refresh=True)
+        client.Disconnect()
+
+def NewSave(port, path, nsaves):
+    """Save the file with a pooled connection"""
+    pool = ftpclient.ConnectionPool
+    for idx in xrange(nsaves):
+        client = pool.Acquire(u"127.0.0.1", port, u"user", u"pass")
+        client.Upload(path, u"/file.txt")
+        pool.Release(client)
+    pool.CloseAll()
+
+def Main(nsaves):
+    rows = list()
+    for size in SIZES:
+        fid, path = tempfile.mkstemp()
+        os.write(fid, ("x" * 79 + "\n") * (size / 80))
+        os.close(fid)
+        try:
+            for delay in DELAYS:
+                server = ftpserver.FtpServer(delay)
+                server.Start()
+                try:
+                    for title, func in ((u"reconnect+text", OldSave),
+                                        (u"pooled+binary", NewSave)):
+                        secs = common.Timeit(func, server.GetPort(),
+                                             path, nsaves)[0]
+                        rows.append((title, u"%d" % (size / 1024),
+                                     u"%d" % (delay * 1000),
+                                     u"%.1f" % (secs * 1000 / nsaves)))
+                finally:
+                    server.Stop()
+        finally:
+            os.remove(path)
+
+    common.Report(u"Ftp save latency of %d saves" % nsaves, rows,
+                  (u"method", u"KB", u"delay ms", u"ms/save"))
+
+if __name__ == '__main__':
+    NUM = NSAVES
+    if len(sys.argv) > 1:
+        NUM = int(sys.argv[1])
+    Main(NUM)
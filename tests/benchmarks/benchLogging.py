@@ -0,0 +1,83 @@
+###############################################################################
+# Name: benchLogging.py                                                       #
+# Purpose: Benchmark the cost of debug logging calls                          #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Measure the time spent in the calling thread by dev_tool.DEBUGP when
+nothing is listening for the messages, when a listener is subscribed to
+the log messages and when DEBUG is on and the messages are written to the
+log file by the background writer.
+
+usage: python benchLogging.py [number of calls]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import sys
+import tempfile
+
+# Local Imports
+import common
+import dev_tool
+import ed_glob
+import ed_msg
+import ebmlib
+
+#-----------------------------------------------------------------------------#
+
+NCALLS = 100000
+
+def Log(ncalls):
+    """Make ncalls log calls like the ones in the read and search paths"""
+    for idx in xrange(ncalls):
+        dev_tool.DEBUGP("[ed_txt][info] Read - chunk %d of %s", idx, u"file.txt")
+
+def OnLog(msg):
+    """Log listener"""
+    pass
+
+def Main(ncalls):
+    rows = list()
+    def Run(title):
+        secs = common.Timeit(Log, ncalls)[0]
+        rows.append((title, u"%.3f" % secs,
+                     u"%.2f" % (secs * 1000000 / ncalls)))
+
+    ed_glob.DEBUG = False
+    Run(u"no listeners")
+
+    ed_msg.Subscribe(OnLog, ed_msg.EDMSG_LOG_ALL)
+    Run(u"listener")
+    ed_msg.Unsubscribe(OnLog)
+
+    # Write the log to the temp directory instead of the users log
+    dev_tool._WRITER = dev_tool.LogWriter(ebmlib.LogFile("benchlog",
+                                                         tempfile.mkdtemp()))
+    dev_tool._WRITER.start()
+    sys.stdout, stdout = open(tempfile.mktemp(), 'wb'), sys.stdout
+    ed_glob.DEBUG = True
+    try:
+        Run(u"debug")
+        flush = common.Timeit(dev_tool._WRITER.Shutdown, 60)[0]
+    finally:
+        ed_glob.DEBUG = False
+        sys.stdout = stdout
+    rows.append((u"debug writer", u"%.3f" % flush, u"-"))
+
+    common.Report(u"DEBUGP calls (%d)" % ncalls, rows,
+                  (u"mode", u"seconds", u"usec/call"))
+
+if __name__ == '__main__':
+    NUM = NCALLS
+    if len(sys.argv) > 1:
+        NUM = int(sys.argv[1])
+    Main(NUM)
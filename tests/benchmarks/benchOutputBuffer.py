@@ -0,0 +1,120 @@
+###############################################################################
+# Name: benchOutputBuffer.py                                                  #
+# Purpose: Benchmark process output throughput of the OutputBuffer           #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Measure the throughput and the ui responsiveness of an L{eclib.OutputBuffer}
+showing the output of a process that prints a large number of lines, like a
+build run through the Launch plugin. The throughput is the number of lines
+per second from starting the process until all of its output has been shown.
+The responsiveness is measured with a timer that ticks every 10ms, the gaps
+between its ticks are the time the ui was stalled.
+
+This benchmark needs wxPython and a display.
+
+usage: python benchOutputBuffer.py [number of lines] [line buffering]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import time
+import tempfile
+import wx
+
+# Local Imports
+import common
+import eclib
+
+#-----------------------------------------------------------------------------#
+
+TICK = 10 # ms
+SCRIPT = """import sys
+for num in xrange(int(sys.argv[1])):
+    sys.stdout.write("gcc -c -O2 -Wall -o build/obj/module%d.o src/module%d.c\\n" % (num, num))
+"""
+
+class BenchBuffer(eclib.OutputBuffer, eclib.ProcessBufferMixin):
+    """OutputBuffer setup like the Launch plugin's output display"""
+    def __init__(self, parent, nbuffer):
+        eclib.OutputBuffer.__init__(self, parent)
+        eclib.ProcessBufferMixin.__init__(self)
+
+        # Attributes
+        self.start = None
+        self.end = None
+
+        # Setup
+        self.SetLineBuffering(nbuffer)
+
+    def DoProcessStart(self, cmd=''):
+        self.start = time.time()
+
+    def DoProcessExit(self, code=0):
+        self.Stop()
+        self.end = time.time()
+
+def RunProcess(nlines, nbuffer):
+    """Run the output script and collect the timer gaps
+    @return: (seconds, gaps, lines left in buffer)
+
+    """
+    fd, script = tempfile.mkstemp(suffix=u".py")
+    os.write(fd, SCRIPT)
+    os.close(fd)
+
+    frame = wx.Frame(None, size=(600, 400))
+    buff = BenchBuffer(frame, nbuffer)
+    frame.Show()
+
+    gaps = list()
+    last = [time.time()]
+    timer = wx.Timer(frame)
+    def OnTick(evt):
+        now = time.time()
+        gaps.append(now - last[0])
+        last[0] = now
+        if buff.end is not None:
+            timer.Stop()
+            wx.CallAfter(frame.Close)
+    frame.Bind(wx.EVT_TIMER, OnTick, timer)
+
+    proc = eclib.ProcessThread(buff, sys.executable, script,
+                               args=[str(nlines)], use_shell=False)
+    timer.Start(TICK)
+    proc.start()
+    wx.GetApp().MainLoop()
+    os.remove(script)
+    return buff.end - buff.start, gaps, buff.GetLineCount()
+
+def Main(nlines, nbuffer):
+    app = wx.App(False)
+    total, gaps, left = RunProcess(nlines, nbuffer)
+    gaps.sort()
+    stalls = [ gap for gap in gaps if gap > 0.1 ]
+    rows = [(nlines, u"%.2f" % total, u"%d" % (nlines / total),
+             u"%.1f" % (gaps[-1] * 1000),
+             u"%.1f" % (gaps[int(len(gaps) * 0.99)] * 1000),
+             len(stalls), left)]
+    common.Report(u"Process output (line buffering %d)" % nbuffer, rows,
+                  (u"lines", u"total (s)", u"lines/s", u"max stall (ms)",
+                   u"p99 tick (ms)", u"stalls >100ms", u"buffer lines"))
+
+if __name__ == '__main__':
+    NLINES = 2000000
+    NBUFFER = 1000 # Launch plugin default
+    if len(sys.argv) > 1:
+        NLINES = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        NBUFFER = int(sys.argv[2])
+    Main(NLINES, NBUFFER)
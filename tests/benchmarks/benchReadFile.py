@@ -0,0 +1,117 @@
+###############################################################################
+# Name: benchReadFile.py                                                      #
+# Purpose: Benchmark asynchronous loading of large files                      #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Measure the time to the first chunk of text (first screen), the total load
+time and the peak memory use of L{ed_txt.EdFile.ReadGenerator} on a large
+file, compared to the previous codecs reader based implementation. Each
+reader is run in its own process so the peak memory use can be compared. The
+text is not kept so the peak memory is the overhead of the reader itself.
+
+usage: python benchReadFile.py [size in MB]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import time
+import codecs
+import tempfile
+import subprocess
+from StringIO import StringIO
+
+# Local Imports
+import common
+import ebmlib
+import ed_txt
+
+#-----------------------------------------------------------------------------#
+
+def LegacyReader(path, chunk=4096):
+    """Previous implementation of ReadGenerator, 512 byte reads through a
+    codecs reader throttled to 1% of the file size.
+
+    """
+    throttle = max(chunk, os.path.getsize(path) / 100)
+    reader = codecs.getreader('utf-8')(open(path, 'rb'))
+    buffered_data = StringIO()
+    while True:
+        tmp = reader.read(512)
+        if not len(tmp):
+            if buffered_data.len:
+                yield buffered_data.getvalue()
+            break
+        buffered_data.write(tmp)
+        if buffered_data.len >= throttle:
+            yield buffered_data.getvalue()
+            buffered_data.close()
+            buffered_data = StringIO()
+
+def StreamReader(path):
+    """Current implementation"""
+    fobj = ed_txt.EdFile(path)
+    fobj.SetEncoding('utf-8')
+    return fobj.ReadGenerator()
+
+READERS = dict(legacy=LegacyReader, stream=StreamReader)
+
+def RunReader(name, path):
+    """Run a reader and print (first chunk, total, peak memory)"""
+    start = time.time()
+    first = None
+    for txt in READERS[name](path):
+        if first is None:
+            first = time.time() - start
+    total = time.time() - start
+    print first, total, ebmlib.GetPeakMemoryUsage()
+
+def BuildFile(size):
+    """Create a log file of about the given size
+    @param size: size in MB
+    @return: path
+
+    """
+    line = u"2012-06-01 12:00:00 [info] Request served in 0.25s \xe9\xe8\n"
+    line = line.encode('utf-8')
+    fd, path = tempfile.mkstemp(suffix=u".log")
+    handle = os.fdopen(fd, 'wb')
+    block = line * 10000
+    for rep in range(max(1, (size * 1024 * 1024) / len(block))):
+        handle.write(block)
+    handle.close()
+    return path
+
+def Main(size):
+    path = BuildFile(size)
+    try:
+        rows = list()
+        for name in ('legacy', 'stream'):
+            proc = subprocess.Popen([sys.executable, __file__, '--run',
+                                     name, path], stdout=subprocess.PIPE)
+            first, total, peak = proc.communicate()[0].split()
+            rows.append((name, u"%.3f" % float(first), u"%.3f" % float(total),
+                         u"%.1f" % (int(peak) / 1048576.0)))
+    finally:
+        os.remove(path)
+
+    common.Report(u"Read %dMB file" % size, rows,
+                  (u"reader", u"first (s)", u"total (s)", u"peak RSS (MB)"))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 3 and sys.argv[1] == '--run':
+        RunReader(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) > 1:
+        Main(int(sys.argv[1]))
+    else:
+        Main(200)
@@ -0,0 +1,85 @@
+###############################################################################
+# Name: benchSearchInFile.py                                                  #
+# Purpose: Benchmark the file scanning modes of the SearchEngine              #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Compare the per line (SCAN_LINES) and memory mapped (SCAN_MMAP) file scanning
+modes of L{ebmlib.SearchEngine.SearchInFile} on large files for queries with
+no, few and many matching lines.
+
+usage: python benchSearchInFile.py [size in MB]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import tempfile
+
+# Local Imports
+import common
+import ebmlib
+
+#-----------------------------------------------------------------------------#
+
+QUERIES = ((u"no matches", u"ThisIsNotInTheFile"),
+           (u"rare matches", u"def\\s+On\\w+"),
+           (u"common matches", u"self"))
+
+def BuildFile(size):
+    """Create a file of about the given size from the editors own source
+    @param size: size in MB
+    @return: path
+
+    """
+    handle = open(os.path.join(common._BASE, u'..', u'..', u'src',
+                               u'ed_stc.py'), 'rb')
+    sample = handle.read()
+    handle.close()
+
+    fd, path = tempfile.mkstemp(suffix=u".py")
+    handle = os.fdopen(fd, 'wb')
+    for rep in range(max(1, (size * 1024 * 1024) / len(sample))):
+        handle.write(sample)
+    handle.close()
+    return path
+
+def RunScan(path, query, mode):
+    """Search the file with the given scan mode
+    @return: (seconds, number of matching lines)
+
+    """
+    engine = ebmlib.SearchEngine(query, regex=True)
+    engine.SetScanMode(mode)
+    return common.Timeit(lambda: len(list(engine.SearchInFile(path))) - 1)
+
+def Main(size):
+    path = BuildFile(size)
+    try:
+        rows = list()
+        for name, query in QUERIES:
+            tline, lines = RunScan(path, query, ebmlib.SCAN_LINES)
+            tmap, mlines = RunScan(path, query, ebmlib.SCAN_MMAP)
+            assert lines == mlines
+            rows.append((name, lines, u"%.3f" % tline, u"%.3f" % tmap,
+                         u"%.1fx" % (tline / max(tmap, 0.0001))))
+    finally:
+        os.remove(path)
+
+    common.Report(u"SearchInFile %dMB" % size, rows,
+                  (u"query", u"lines", u"lines (s)", u"mmap (s)", u"speedup"))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        Main(int(sys.argv[1]))
+    else:
+        Main(50)
@@ -0,0 +1,108 @@
+###############################################################################
+# Name: benchSpellCheck.py                                                    #
+# Purpose: Benchmark spell checking throughput                                #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Measure the spell checking throughput in words per second of STCSpellCheck.
+A document is checked by looking up every word in the enchant dictionary
+(the old behavior), by checkAll with an empty and with a filled verdict cache
+and in chunks like the background checking thread does.
+
+This benchmark needs pyenchant and a dictionary for the language.
+
+usage: python benchSpellCheck.py [language] [sample file]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import sys
+
+# Local Imports
+import common
+import stcspellcheck
+
+#-----------------------------------------------------------------------------#
+
+NLINES = 20000
+CHUNK = 65536
+
+class SpellBuffer(common.TextBuffer):
+    """TextBuffer with the indicator api used by STCSpellCheck"""
+    def GetStyleBits(self):
+        return 5
+
+    def IndicatorSetForeground(self, indic, color):
+        pass
+
+    def IndicatorSetStyle(self, indic, style):
+        pass
+
+def BuildText(sample, nlines):
+    """Repeat the sample text until it has at least nlines lines"""
+    lines = sample.splitlines(True)
+    out = list()
+    while len(out) < nlines:
+        out.extend(lines)
+    return u''.join(out[:nlines])
+
+def CheckUncached(checker, text):
+    """Look up every word in the dictionary"""
+    spell = checker.getSpellingDictionary()
+    for start, end in checker.iterWords(text):
+        if end - start >= checker._spelling_word_size:
+            spell.check(text[start:end])
+
+def CheckChunks(checker, text):
+    """Check the text in chunks like the background thread"""
+    index = 0
+    while index < len(text):
+        end = text.find(u'\n', index + CHUNK)
+        end = len(text) if end < 0 else end + 1
+        checker.findMisspelled(text[index:end])
+        index = end
+
+def main(lang, fname):
+    sample = open(fname, 'rb').read().decode('utf-8', 'replace')
+    text = BuildText(sample, NLINES)
+    buff = SpellBuffer(text)
+    checker = stcspellcheck.STCSpellCheck(buff, language=lang)
+    if not checker.hasDictionary():
+        print "No dictionary available for %s" % lang
+        return
+
+    nwords = len([ word for word in checker.iterWords(text)
+                   if word[1] - word[0] >= checker._spelling_word_size ])
+    cache = checker.getSpellingCache(lang)
+    cache.clear()
+
+    rows = list()
+    def Run(title, func, *args):
+        secs = common.Timeit(func, *args)[0]
+        rows.append((title, u"%.3f" % secs, u"%d" % (nwords / max(secs, 1e-6))))
+
+    Run(u"uncached", CheckUncached, checker, text)
+    Run(u"checkAll cold", checker.checkAll)
+    Run(u"checkAll warm", checker.checkAll)
+    Run(u"chunks warm", CheckChunks, checker, text)
+
+    common.Report(u"Spell check %d words (%d distinct cached), %s" % \
+                  (nwords, len(cache), lang),
+                  rows, (u"mode", u"seconds", u"words/sec"))
+
+if __name__ == '__main__':
+    LANG = u'en_US'
+    FNAME = common.GetSyntaxFile(u'latex.tex')
+    if len(sys.argv) > 1:
+        LANG = sys.argv[1]
+    if len(sys.argv) > 2:
+        FNAME = sys.argv[2]
+    main(LANG, FNAME)
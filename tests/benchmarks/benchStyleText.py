@@ -0,0 +1,100 @@
+###############################################################################
+# Name: benchStyleText.py                                                     #
+# Purpose: Benchmark container lexer restyling latency                        #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Measure the per keystroke restyle latency of the pygments based container
+lexers against the size of the file. For each file size a character is typed
+near the end of the document and the time to restyle the visible area is
+compared between a full restyle from the start of the document (the old
+behavior) and the incremental checkpointed styler.
+
+usage: python benchStyleText.py [lexer alias] [sample file]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import sys
+
+# Local Imports
+import common
+from pygments.token import Token
+from pygments.lexers import get_lexer_by_name
+from syntax import synlexer
+
+#-----------------------------------------------------------------------------#
+
+SIZES = (1000, 5000, 20000)
+SCREEN = 50 # Number of visible lines
+KEYSTROKES = 20
+
+def BuildText(sample, nlines):
+    """Repeat the sample text until it has at least nlines lines"""
+    lines = sample.splitlines(True)
+    out = list()
+    while len(out) < nlines:
+        out.extend(lines)
+    return u''.join(out[:nlines])
+
+def RunSize(lexer, sample, nlines):
+    """Benchmark one file size
+    @return: (lines, full restyle ms, incremental ms, styling calls per key)
+
+    """
+    tmap = { Token.Keyword : 1, Token.Comment : 2, Token.String : 3 }
+    text = BuildText(sample, nlines)
+    buff = common.TextBuffer(text)
+    fbuff = common.TextBuffer(text)
+    styler = synlexer.IncrementalStyler(lexer, tmap, 0)
+
+    # Initial styling of the document
+    styler.StyleText(buff, 0, buff.GetLength())
+
+    eline = max(0, nlines - SCREEN / 2)
+    tfull = tinc = 0.0
+    calls = 0
+    for key in range(KEYSTROKES):
+        pos = buff.GetLineEndPosition(eline)
+        line, added = buff.InsertText(pos, u'x')
+        fbuff.InsertText(pos, u'x')
+        synlexer.UpdateState(buff, line, added)
+        end = buff.PositionFromLine(min(nlines - 1, eline + SCREEN / 2))
+
+        ncalls = buff.styled
+        tinc += common.Timeit(styler.StyleText, buff, pos, end)[0]
+        calls += buff.styled - ncalls
+
+        # Old behavior tokenized the document from the first byte
+        synlexer.ResetState(fbuff)
+        tfull += common.Timeit(styler.StyleText, fbuff, 0, end)[0]
+
+    return (nlines, u"%.2f" % (tfull * 1000 / KEYSTROKES),
+            u"%.2f" % (tinc * 1000 / KEYSTROKES), calls / KEYSTROKES)
+
+def Main(alias, fname):
+    lexer = get_lexer_by_name(alias)
+    handle = open(common.GetSyntaxFile(fname), 'rb')
+    sample = handle.read().decode('utf-8')
+    handle.close()
+
+    rows = [ RunSize(lexer, sample, size) for size in SIZES ]
+    common.Report(u"Restyle latency per keystroke (%s)" % alias, rows,
+                  (u"lines", u"full (ms)", u"incremental (ms)",
+                   u"styling calls"))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        Main(sys.argv[1], sys.argv[2])
+    else:
+        Main(u'html+mako', u'mako.mako')
+        Main(u'html+django', u'django.django')
+        Main(u's', u'r.r')
@@ -0,0 +1,161 @@
+###############################################################################
+# Name: benchTerminal.py                                                      #
+# Purpose: Benchmark the output throughput of the terminal plugin             #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Measure the throughput of the terminal output handling by running cat on a
+large file in a pseudo terminal. A plain text file and a file with ANSI
+colour sequences (like the output of ls --color or make) are generated with
+the given number of lines.
+
+The old Xterm.Read read the pty 32 bytes at a time on the ui thread and
+grew the output by concatenation, then PrintLines parsed the colour
+sequences of each line with regular expressions. Its cost is approximated by
+the same read loop and parsing without the calls to the control. The new
+terminal reads the pty with a vtscreen.PtyReader thread and processes it with
+vtscreen.VtScreen one frame worth of output at a time, the time includes the
+screen updates that are taken for the control.
+
+Requires a platform with pseudo terminals.
+
+usage: python benchTerminal.py [number of lines]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import re
+import sys
+import pty
+import select
+import tempfile
+
+# Local Imports
+import common
+sys.path.append(os.path.join(common._BASE, u'..', u'..', u'plugins',
+                             u'terminal', u'terminal'))
+import vtscreen
+
+#-----------------------------------------------------------------------------#
+
+NLINES = 200000
+FRAME_READ = 262144 # Same as terminal.FRAME_READ
+
+# The colour parsing of the old PrintLines
+RE_COLOUR_START = re.compile('\[[34][0-9]m')
+RE_COLOUR_BLOCK = re.compile('\[[34][0-9]m*.*?\[m')
+RE_COLOUR_END = '[m'
+RE_CLEAR_ESC = re.compile('\[[0-9]+m')
+
+def BuildFile(nlines, colour):
+    """Write a file with the given number of lines
+    @return: (path, size in bytes)
+
+    """
+    if colour:
+        fmt = "\x1b[01;34m%d\x1b[0m: \x1b[32mfile_%d.txt\x1b[0m  size 1024\n"
+    else:
+        fmt = "%d: the quick brown fox jumps over the lazy dog %d\n"
+    fd, path = tempfile.mkstemp()
+    handle = os.fdopen(fd, 'wb')
+    for idx in xrange(nlines):
+        handle.write(fmt % (idx, idx))
+    handle.close()
+    return path, os.path.getsize(path)
+
+def SpawnCat(path):
+    """Run cat on the file in a pseudo terminal
+    @return: (pid, master fd)
+
+    """
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.execv('/bin/cat', ['cat', path])
+    return pid, fd
+
+def OldRead(path):
+    """Read the output like the old Xterm.Read"""
+    pid, fd = SpawnCat(path)
+    lines = ''
+    while True:
+        ready = select.select([fd], [], [], 0.03)[0]
+        if not ready:
+            continue
+        try:
+            tmp = os.read(fd, 32)
+        except OSError:
+            tmp = ''
+        if not tmp:
+            break
+        lines += tmp
+    os.close(fd)
+    os.waitpid(pid, 0)
+
+    for line in lines.split(os.linesep):
+        if '\x1b' in line:
+            tmp = line
+            positions = list()
+            for pat in re.findall(RE_COLOUR_BLOCK, line):
+                ind = tmp.find(pat)
+                colors = re.findall(RE_COLOUR_START, pat)
+                tpat = pat
+                for color in colors:
+                    tpat = tpat.replace(color, '')
+                tpat = tpat.replace(RE_COLOUR_END, '')
+                tmp = tmp.replace(pat, tpat, 1).replace(RE_COLOUR_END, '', 1)
+                positions.append((ind, colors, (ind + len(tpat) - 1)))
+            line = tmp.replace(RE_COLOUR_END, '')
+            line = re.sub(RE_COLOUR_START, '', line)
+            line = re.sub(RE_CLEAR_ESC, '', line)
+
+def NewRead(path):
+    """Read the output with the reader thread and the screen model"""
+    pid, fd = SpawnCat(path)
+    screen = vtscreen.VtScreen(5000)
+    reader = vtscreen.PtyReader(fd)
+    reader.start()
+    updates = 0
+    while not reader.IsFinished():
+        data = reader.GetOutput(FRAME_READ)
+        if not data:
+            reader.join(0.001)
+            continue
+        screen.Feed(data)
+        if screen.TakeUpdate() is not None:
+            updates += 1
+    reader.join()
+    os.close(fd)
+    os.waitpid(pid, 0)
+    return updates
+
+def Main(nlines):
+    rows = list()
+    for colour in (False, True):
+        path, size = BuildFile(nlines, colour)
+        try:
+            for title, func in ((u"old read", OldRead),
+                                (u"reader+screen", NewRead)):
+                secs = common.Timeit(func, path)[0]
+                rows.append((u"%s (%s)" % (title, colour and u"ansi" or u"plain"),
+                             u"%.1f" % (size / 1048576.0), u"%.3f" % secs,
+                             u"%.2f" % (size / 1048576.0 / secs)))
+        finally:
+            os.remove(path)
+
+    common.Report(u"Terminal output of %d lines" % nlines, rows,
+                  (u"method", u"MB", u"seconds", u"MB/s"))
+
+if __name__ == '__main__':
+    NUM = NLINES
+    if len(sys.argv) > 1:
+        NUM = int(sys.argv[1])
+    Main(NUM)
@@ -0,0 +1,91 @@
+###############################################################################
+# Name: benchTransform.py                                                     #
+# Purpose: Benchmark the whitespace transformations of the editor             #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Measure the time to trim the trailing whitespace and to convert between tabs
+and spaces in a large document with the ebmlib text edit functions. A
+document is generated with the given number of lines where some of the lines
+are indented with tabs and some have trailing whitespace.
+
+The old TrimWhitespace did the work line by line through the control, its
+cost is approximated by the same per line loop over a list of lines (without
+the overhead of the control calls). The number of edits that have to be
+applied to the control is reported as well.
+
+usage: python benchTransform.py [number of lines]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import sys
+
+# Local Imports
+import common
+import ebmlib
+
+#-----------------------------------------------------------------------------#
+
+NLINES = 1000000
+LINES = ("id,name,value\r\n",
+         "\t1,first,10  \r\n",
+         "\t\t2,second,20\t\r\n",
+         "3,third,30\r\n",
+         "    4,fourth,40    \r\n")
+
+def BuildText(nlines):
+    """Build a document with the given number of lines"""
+    return "".join([ LINES[idx % len(LINES)] for idx in xrange(nlines) ])
+
+def TrimPerLine(data):
+    """Trim the lines one at a time like the old TrimWhitespace"""
+    lines = data.splitlines(True)
+    replaced = 0
+    for idx, line in enumerate(lines):
+        eol = line[len(line.rstrip('\r\n')):]
+        rtxt = line.rstrip() + eol
+        if rtxt != line:
+            lines[idx] = rtxt
+            replaced += 1
+    return "".join(lines), replaced
+
+def Transform(data, edits):
+    """Merge and apply the edits"""
+    merged = ebmlib.MergeLineEdits(data, edits)
+    return ebmlib.ApplyTextEdits(data, merged), len(merged)
+
+def Main(nlines):
+    data = BuildText(nlines)
+    rows = list()
+
+    secs, result = common.Timeit(TrimPerLine, data)
+    rows.append((u"trim per line", u"-", u"%.3f" % secs, u"%d" % result[1]))
+    expect = result[0]
+
+    tests = ((u"trim", ebmlib.GetTrimEdits, (data,)),
+             (u"tabs to spaces", ebmlib.GetTabEdits, (data, 4, False)),
+             (u"spaces to tabs", ebmlib.GetTabEdits, (data, 4, True)))
+    for title, func, args in tests:
+        find, edits = common.Timeit(func, *args)
+        apply, result = common.Timeit(Transform, data, edits)
+        rows.append((title, u"%.3f" % find, u"%.3f" % apply, u"%d" % result[1]))
+        if func is ebmlib.GetTrimEdits:
+            assert result[0] == expect, "Trim results differ"
+
+    common.Report(u"Transform %d lines (%d bytes)" % (nlines, len(data)), rows,
+                  (u"transform", u"find (s)", u"apply (s)", u"edits"))
+
+if __name__ == '__main__':
+    NUM = NLINES
+    if len(sys.argv) > 1:
+        NUM = int(sys.argv[1])
+    Main(NUM)
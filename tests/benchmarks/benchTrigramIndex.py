@@ -0,0 +1,75 @@
+###############################################################################
+# Name: benchTrigramIndex.py                                                  #
+# Purpose: Benchmark directory searches narrowed by the trigram index         #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Compare searching a whole directory tree with L{ebmlib.SearchEngine} to
+searching only the candidate files reported by an up to date
+L{ebmlib.TrigramIndex} of the tree.
+
+usage: python benchTrigramIndex.py [search directory]
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import tempfile
+
+# Local Imports
+import common
+import ebmlib
+
+#-----------------------------------------------------------------------------#
+
+QUERIES = ((u"SearchInFile", False),
+           (u"def\\s+OnModified", True),
+           (u"ThisIsNotInTheTree", False))
+
+def Main(path):
+    fd, ipath = tempfile.mkstemp(suffix=u".idx")
+    os.close(fd)
+    os.remove(ipath)
+    try:
+        index = ebmlib.TrigramIndex(path, ipath)
+        tbuild = common.Timeit(index.Refresh)[0]
+        tload = common.Timeit(lambda: ebmlib.TrigramIndex(path, ipath))[0]
+
+        rows = list()
+        for query, regex in QUERIES:
+            engine = ebmlib.SearchEngine(query, regex=regex, matchcase=False)
+            tfull, full = common.Timeit(lambda: \
+                            list(engine.SearchInDirectory(path)))
+            trigrams = ebmlib.GetQueryTrigrams(query, regex)
+            def Indexed():
+                flist = index.GetCandidates(trigrams)
+                return flist, list(engine.SearchInFiles(flist))
+            tindex, (flist, indexed) = common.Timeit(Indexed)
+            assert [ r for r in full if type(r) is not tuple ] == \
+                   [ r for r in indexed if type(r) is not tuple ]
+            rows.append((query, len(flist), u"%.3f" % tfull,
+                         u"%.3f" % tindex,
+                         u"%.1fx" % (tfull / max(tindex, 0.0001))))
+    finally:
+        if os.path.exists(ipath):
+            os.remove(ipath)
+
+    common.Report(u"Trigram index (%d files, build %.2fs, load %.2fs)" % \
+                  (len(index), tbuild, tload), rows,
+                  (u"query", u"candidates", u"full (s)", u"indexed (s)",
+                   u"speedup"))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        Main(sys.argv[1])
+    else:
+        Main(os.path.abspath(os.path.join(common._BASE, u'..', u'..', u'src')))
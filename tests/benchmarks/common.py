@@ -0,0 +1,155 @@
+###############################################################################
+# Name: common.py                                                             #
+# Purpose: Common utilities for the benchmark scripts.                        #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""
+Common utilities shared by the benchmark scripts. The benchmarks run without
+a display, so the editor control is represented by L{TextBuffer} that
+implements the subset of the StyledTextCtrl api used by the code under test.
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import sys
+import time
+import bisect
+
+# Put Editra/src on the path
+_BASE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(_BASE, u'..', u'..', u'src'))
+sys.path.append(os.path.join(_BASE, u'..', u'..', u'src', u'extern'))
+
+#-----------------------------------------------------------------------------#
+
+def GetSyntaxFile(fname):
+    """Get the path to one of the sample files in tests/syntax
+    @param fname: file name
+    @return: string
+
+    """
+    return os.path.join(_BASE, u'..', u'syntax', fname)
+
+def Timeit(func, *args, **kwargs):
+    """Run the given callable and return how long it took
+    @param func: callable
+    @return: (seconds, result)
+
+    """
+    start = time.time()
+    rval = func(*args, **kwargs)
+    return time.time() - start, rval
+
+def Report(title, rows, header):
+    """Print a simple table of benchmark results
+    @param title: table title
+    @param rows: list of tuples
+    @param header: tuple of column titles
+
+    """
+    print title
+    print u"-" * len(title)
+    fmt = u"  ".join([u"%14s"] * len(header))
+    print fmt % header
+    for row in rows:
+        print fmt % tuple(row)
+    print
+
+#-----------------------------------------------------------------------------#
+
+class TextBuffer(object):
+    """In memory stand in for the StyledTextCtrl text and styling api. All
+    positions are byte positions in the utf-8 encoded text like in the
+    real control.
+
+    """
+    def __init__(self, text=u''):
+        super(TextBuffer, self).__init__()
+
+        # Attributes
+        self._text = u''
+        self._styles = bytearray()
+        self._lines = [0]
+        self._spos = 0
+        self.styled = 0 # Number of SetStyling calls
+        self.SetText(text)
+
+    def _Reindex(self):
+        self._lines = [0]
+        idx = self._text.find(u'\n')
+        while idx != -1:
+            self._lines.append(idx + 1)
+            idx = self._text.find(u'\n', idx + 1)
+
+    # The buffer is assumed to hold ascii text so positions are characters
+    def SetText(self, text):
+        self._text = text
+        self._styles = bytearray(len(text))
+        self._Reindex()
+
+    def GetText(self):
+        return self._text
+
+    def GetLength(self):
+        return len(self._text)
+
+    def GetLineCount(self):
+        return len(self._lines)
+
+    def GetTextRange(self, start, end):
+        return self._text[start:end]
+
+    def LineFromPosition(self, pos):
+        return bisect.bisect_right(self._lines, pos) - 1
+
+    def PositionFromLine(self, line):
+        if line >= len(self._lines):
+            return len(self._text)
+        return self._lines[line]
+
+    def GetLineEndPosition(self, line):
+        if line + 1 >= len(self._lines):
+            return len(self._text)
+        return self._lines[line + 1] - 1
+
+    def InsertText(self, pos, text):
+        """Insert text and return (line, lines added) like the
+        modification event would.
+
+        """
+        self._text = self._text[:pos] + text + self._text[pos:]
+        self._styles[pos:pos] = bytearray(len(text))
+        self._Reindex()
+        return self.LineFromPosition(pos), text.count(u'\n')
+
+    def DeleteRange(self, pos, length):
+        """Delete text and return (line, lines added)"""
+        removed = self._text[pos:pos+length]
+        self._text = self._text[:pos] + self._text[pos+length:]
+        del self._styles[pos:pos+length]
+        self._Reindex()
+        return self.LineFromPosition(pos), -removed.count(u'\n')
+
+    def StartStyling(self, pos, mask):
+        self._spos = pos
+
+    def SetStyling(self, length, style):
+        self._styles[self._spos:self._spos+length] = \
+            bytearray([style]) * len(self._styles[self._spos:self._spos+length])
+        self._spos += length
+        self.styled += 1
+
+    def GetEndStyled(self):
+        return self._spos
+
+    def GetStyles(self):
+        return bytes(self._styles)
@@ -0,0 +1,124 @@
+###############################################################################
+# Name: testDirMon.py                                                         #
+# Purpose: Unit tests for the directory monitor watcher threads               #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""Unittest cases for testing ebmlib._dirmon"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import time
+import threading
+import unittest
+
+# Local modules
+import common
+
+# Module to test
+import ebmlib._dirmon as _dirmon
+
+#-----------------------------------------------------------------------------#
+# Test Class
+
+class DirMonTest(unittest.TestCase):
+    def setUp(self):
+        self.root = common.GetTempFilePath(u"dirmon")
+        os.mkdir(self.root)
+        for name in (u"a.txt", u"b.txt"):
+            self._Write(name)
+        self.changes = list()
+        self.notified = threading.Event()
+        self.watchers = list()
+
+    def tearDown(self):
+        for watcher in self.watchers:
+            watcher.Shutdown()
+        common.CleanTempDir()
+
+    def _Notifier(self, added, deleted, modified):
+        self.changes.append(([ f.Name for f in added ],
+                             [ f.Name for f in deleted ],
+                             [ f.Name for f in modified ]))
+        self.notified.set()
+
+    def _Start(self, wclass):
+        watcher = wclass(self._Notifier, checkFreq=50)
+        watcher.setDaemon(True)
+        self.watchers.append(watcher)
+        self.assertTrue(watcher.AddWatchDirectory(self.root))
+        watcher.start()
+        return watcher
+
+    def _Wait(self):
+        """Wait for the next change notification"""
+        self.notified.wait(5)
+        self.assertTrue(self.notified.isSet())
+        self.notified.clear()
+        return self.changes.pop()
+
+    def _Write(self, name, mtime=None):
+        path = os.path.join(self.root, name)
+        handle = open(path, 'wb')
+        handle.write(name)
+        handle.close()
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def _CheckChanges(self, wclass):
+        watcher = self._Start(wclass)
+        time.sleep(0.1)
+
+        # Move the new file in so that it is complete when it is created
+        tmp = common.GetTempFilePath(u"c.txt")
+        os.rename(self._Write(u"c.txt"), tmp)
+        time.sleep(0.1)
+        self.changes = list()
+        self.notified.clear()
+        os.rename(tmp, os.path.join(self.root, u"c.txt"))
+        self.assertEquals(self._Wait(), ([u"c.txt"], list(), list()))
+
+        os.remove(os.path.join(self.root, u"a.txt"))
+        self.assertEquals(self._Wait(), (list(), [u"a.txt"], list()))
+
+        self._Write(u"b.txt", time.time() + 10)
+        self.assertEquals(self._Wait(), (list(), list(), [u"b.txt"]))
+
+        dobj = watcher._dirs[0]
+        self.assertEquals(sorted([ f.Name for f in dobj.Files ]),
+                          [u"b.txt", u"c.txt"])
+
+    #---- Test Cases ----#
+
+    def testRefreshDirectory(self):
+        """Test diffing a directory against a new snapshot"""
+        watcher = _dirmon.WatcherThread(self._Notifier)
+        watcher.AddWatchDirectory(self.root)
+        dobj = watcher._dirs[0]
+        self._Write(u"c.txt")
+        self._Write(u"b.txt", time.time() + 10)
+        os.remove(os.path.join(self.root, u"a.txt"))
+
+        added, deleted, modified = list(), list(), list()
+        watcher._RefreshDirectory(dobj, added, deleted, modified)
+        self.assertEquals([ f.Name for f in added ], [u"c.txt"])
+        self.assertEquals([ f.Name for f in deleted ], [u"a.txt"])
+        self.assertEquals([ f.Name for f in modified ], [u"b.txt"])
+        self.assertEquals(len(dobj.Files), 2)
+
+    def testPolling(self):
+        """Test change notifications from the polling watcher"""
+        self._CheckChanges(_dirmon.WatcherThread)
+
+    def testInotify(self):
+        """Test change notifications from the inotify watcher"""
+        if _dirmon._LIBC is not None:
+            self._CheckChanges(_dirmon.InotifyWatcherThread)
@@ -18,6 +18,9 @@ import wx
 import os
 import unittest
 
+# Local modules
+import common
+
 # Module to test
 import doctools
 
@@ -34,7 +37,20 @@ class DocMgrTest(unittest.TestCase):
         self.mgr.AddRecord(('test3.py', 1200))
 
     def tearDown(self):
-        pass
+        common.CleanTempDir()
+
+    def _MakeBook(self, max_records=3):
+        """Get a new manager using a book in the temp directory"""
+        mgr = doctools.DocPositionMgr(max_records)
+        mgr._book = common.GetTempFilePath(u'positions')
+        mgr.LoadBook(mgr.GetBook())
+        return mgr
+
+    def _MakeFile(self, name):
+        """Create a file in the temp directory"""
+        path = common.GetTempFilePath(name)
+        open(path, 'wb').close()
+        return path
 
     #---- Tests ----#
     def testGetBook(self):
@@ -51,6 +67,70 @@ class DocMgrTest(unittest.TestCase):
         # Test trying to get an unknown file
         self.assertEqual(self.mgr.GetPos('fakefile.txt'), 0)
 
+    def testRecordLimit(self):
+        """Test that the least recently used records are discarded"""
+        mgr = doctools.DocPositionMgr(max_records=2)
+        mgr.AddRecord(('a.py', 1))
+        mgr.AddRecord(('b.py', 2))
+        self.assertEqual(mgr.GetPos('a.py'), 1)
+        mgr.AddRecord(('c.py', 3))
+        self.assertEqual(mgr.GetPos('b.py'), 0)
+        self.assertEqual(mgr.GetPos('a.py'), 1)
+        self.assertEqual(mgr.GetPos('c.py'), 3)
+
+    def testWriteBook(self):
+        """Test appending to and compacting the on disk book"""
+        paths = [ self._MakeFile(name) for name in ('a', 'b', 'c', 'd') ]
+        mgr = self._MakeBook()
+        for idx, path in enumerate(paths):
+            mgr.AddRecord((path, idx))
+        mgr.WriteBook()
+        mgr.AddRecord((paths[1], 10))
+        mgr.WriteBook()
+        lines = open(mgr.GetBook(), 'rb').readlines()
+        self.assertEqual(len(lines), 5)
+
+        mgr = self._MakeBook()
+        self.assertEqual(mgr.GetPos(paths[0]), 0)
+        self.assertEqual(mgr.GetPos(paths[1]), 10)
+        self.assertEqual(mgr.GetPos(paths[3]), 3)
+
+        # Book is rewritten with the current records once it is too large
+        mgr.AddRecord((paths[0], 5))
+        mgr.AddRecord((paths[2], 6))
+        mgr.WriteBook()
+        lines = open(mgr.GetBook(), 'rb').readlines()
+        self.assertEqual(len(lines), 3)
+
+    def testValidateOnLookup(self):
+        """Test that loaded records of missing files are discarded"""
+        path = self._MakeFile('a')
+        mgr = self._MakeBook()
+        mgr.AddRecord((path, 20))
+        mgr.AddRecord((path + u'.missing', 30))
+        mgr.WriteBook()
+
+        mgr = self._MakeBook()
+        self.assertEqual(mgr.GetPos(path), 20)
+        self.assertEqual(mgr.GetPos(path + u'.missing'), 0)
+
+    def testLookupOrder(self):
+        """Test that looking up a record is kept in the book"""
+        paths = [ self._MakeFile(name) for name in ('a', 'b', 'c') ]
+        mgr = self._MakeBook(2)
+        mgr.AddRecord((paths[0], 1))
+        mgr.AddRecord((paths[1], 2))
+        mgr.WriteBook()
+
+        mgr = self._MakeBook(2)
+        self.assertEqual(mgr.GetPos(paths[0]), 1)
+        mgr.WriteBook()
+
+        mgr = self._MakeBook(2)
+        mgr.AddRecord((paths[2], 3))
+        self.assertEqual(mgr.GetPos(paths[1]), 0)
+        self.assertEqual(mgr.GetPos(paths[0]), 1)
+
     #-- Test Position Navigator cache --#
     def testCanNavigate(self):
         """Test CanNavigateNext/Prev functions"""
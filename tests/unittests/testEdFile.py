@@ -90,6 +90,16 @@ class EdFileTest(unittest.TestCase):
         self.assertTrue(self.utf8_bom_file.HasBom())
         self.assertTrue(len(txt))
 
+    def testReadGenerator(self):
+        """Test reading the file in chunks that split multibyte characters"""
+        for path in (self.path, self.bpath):
+            txt = ed_txt.EdFile(path).Read()
+            fobj = ed_txt.EdFile(path)
+            chunks = list(fobj.ReadGenerator(7))
+            self.assertTrue(len(chunks) > 1)
+            self.assertEquals(u''.join(chunks), txt)
+            self.assertFalse(fobj.IsOpen())
+
     def testWriteUTF8Bom(self):
         """Test writing a file that has utf8 bom character"""
         txt = self.utf8_bom_file.Read()
@@ -214,3 +224,102 @@ class EdFileTest(unittest.TestCase):
         uni = ed_txt.DecodeString(test, 'utf-8')
         self.assertTrue(isinstance(uni, types.UnicodeType), "Failed decode")
 
+
+    def testDetectSampleEncoding(self):
+        """Test detecting the encoding from a sample of a file"""
+        text = u"Encoding d\xe9tection\n"
+        detect = ed_txt.DetectSampleEncoding
+        self.assertEquals(detect(codecs.BOM_UTF8 + text.encode('utf-8')),
+                          ('utf-8', codecs.BOM_UTF8, None))
+        self.assertEquals(detect("# coding: latin-1\n"),
+                          ('latin-1', None, 'latin-1'))
+        self.assertEquals(detect(text.encode('utf-8')), ('utf-8', None, None))
+        self.assertEquals(detect(text.encode('utf-16-le'))[0], 'utf_16_le')
+        self.assertEquals(detect(text.encode('utf-32-be'))[0], 'utf_32_be')
+        png = common.GetFileContents(self.ipath)[:ed_txt.ENC_SAMPLE]
+        self.assertTrue(detect(png)[0] is None)
+
+    def testCheckWideEncoding(self):
+        """Test detecting utf-16/32 text from the NUL bytes"""
+        text = u"wide text\n" * 4
+        for enc in ('utf_16_le', 'utf_16_be', 'utf_32_le', 'utf_32_be'):
+            self.assertEquals(ed_txt.CheckWideEncoding(text.encode(enc)), enc)
+        self.assertTrue(ed_txt.CheckWideEncoding("no nul bytes") is None)
+
+    def testEncodingCache(self):
+        """Test that detection results are cached per file"""
+        self.file.Read()
+        stat = os.stat(self.path)
+        key = (self.path, stat.st_mtime, stat.st_size)
+        self.assertEquals(ed_txt._GetCachedEncoding(key)[0], 'utf-8')
+        self.assertTrue(ed_txt._GetCachedEncoding((self.path, 0, 0)) is None)
+
+        # The least recently used results are dropped
+        for idx in range(ed_txt.ENC_CACHE_SIZE - 1):
+            ed_txt._SetCachedEncoding((u"file", idx, 0), ('ascii', None, None))
+        ed_txt._GetCachedEncoding(key)
+        ed_txt._SetCachedEncoding((u"file", -1, 0), ('ascii', None, None))
+        self.assertEquals(ed_txt._GetCachedEncoding(key)[0], 'utf-8')
+        self.assertTrue(ed_txt._GetCachedEncoding((u"file", 0, 0)) is None)
+
+    def testTextStats(self):
+        """Test gathering the statistics of text fed in chunks"""
+        text = u"a\r\n\tb\r\n    c\n\r\n  \n\tlonger line\rend"
+        for size in range(1, len(text) + 1):
+            stats = ed_txt.TextStats()
+            for idx in range(0, len(text), size):
+                stats.Feed(text[idx:idx + size])
+            stats.Finish()
+            self.assertEquals(stats.GetEOL(), u"\r\n")
+            self.assertEquals(stats.GetEOLCounts(),
+                              { u"\n" : 2, u"\r\n" : 3, u"\r" : 1 })
+            self.assertTrue(stats.IsMixedEOL())
+            self.assertEquals(stats.GetIndentCounts(), (2, 1))
+            self.assertTrue(stats.UsesTabs())
+            self.assertTrue(stats.IsMixedIndent())
+            self.assertEquals(stats.GetLineCount(), 7)
+            self.assertEquals(stats.GetLongestLine(), 12)
+
+        stats = ed_txt.TextStats()
+        stats.Feed(u"no line endings")
+        stats.Finish()
+        self.assertTrue(stats.GetEOL() is None)
+        self.assertFalse(stats.IsMixedEOL())
+        self.assertTrue(stats.UsesTabs() is None)
+        self.assertFalse(stats.IsMixedIndent())
+        self.assertEquals(stats.GetLineCount(), 1)
+        self.assertEquals(stats.GetLongestLine(), 15)
+
+    def testTextStatsCR(self):
+        """Test the statistics of text that ends with a \\r"""
+        for text, eol, counts, mixed in ((u"abc\r", u"\r", (0, 0, 1), False),
+                                         (u"a\r\nb\r", u"\r\n", (0, 1, 1), True),
+                                         (u"a\rb\r", u"\r", (0, 0, 2), False)):
+            for size in (1, 2, len(text)):
+                stats = ed_txt.TextStats()
+                for idx in range(0, len(text), size):
+                    stats.Feed(text[idx:idx + size])
+                stats.Finish()
+                self.assertEquals(stats.GetEOL(), eol)
+                self.assertEquals(stats.GetEOLCounts(),
+                                  dict(zip((u"\n", u"\r\n", u"\r"), counts)))
+                self.assertEquals(stats.IsMixedEOL(), mixed)
+                self.assertEquals(stats.GetLineCount(), sum(counts) + 1)
+                lines = text.replace(u"\n", u"").split(u"\r")
+                self.assertEquals(stats.GetLongestLine(), max(map(len, lines)))
+
+    def testReadTextStats(self):
+        """Test that the text statistics are gathered while reading"""
+        txt = self.file.Read()
+        stats = self.file.GetTextStats()
+        self.assertEquals(stats.GetLineCount(), len(txt.splitlines()) + \
+                          int(txt.endswith(u"\n")))
+        self.assertEquals(stats.encoding, self.file.Encoding)
+
+        fobj = ed_txt.EdFile(self.path)
+        list(fobj.ReadGenerator(7))
+        gstats = fobj.GetTextStats()
+        self.assertEquals(gstats.GetEOLCounts(), stats.GetEOLCounts())
+        self.assertEquals(gstats.GetLineCount(), stats.GetLineCount())
+        self.assertEquals(gstats.GetLongestLine(), stats.GetLongestLine())
+        self.assertEquals(gstats.GetIndentCounts(), stats.GetIndentCounts())
@@ -0,0 +1,117 @@
+###############################################################################
+# Name: testEdMsg.py                                                          #
+# Purpose: Unit tests for the ed_msg message coalescing and statistics        #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""Unittest cases for testing ed_msg coalesced messages and statistics"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import unittest
+
+# Module to test
+import ed_msg
+
+#-----------------------------------------------------------------------------#
+
+TEST_MSG = ed_msg.EDMSG_ALL + ('unittest', 'test')
+TEST_COALESCED = ed_msg.EDMSG_ALL + ('unittest', 'coalesced')
+
+#-----------------------------------------------------------------------------#
+# Test Class
+
+class EdMsgTest(unittest.TestCase):
+    def setUp(self):
+        self.msgs = list()
+        ed_msg.FlushMessages()
+        ed_msg.SetCoalesced(TEST_COALESCED, keyfunc=lambda data: data[0])
+        ed_msg.Subscribe(self.OnMessage, TEST_MSG)
+        ed_msg.Subscribe(self.OnMessage, TEST_COALESCED)
+        ed_msg.EnableStats(True)
+        ed_msg.GetStats().Clear()
+
+    def tearDown(self):
+        ed_msg.Unsubscribe(self.OnMessage)
+        ed_msg.SetCoalesced(TEST_COALESCED, False)
+        ed_msg.FlushMessages()
+
+    def OnMessage(self, msg):
+        self.msgs.append((msg.GetType(), msg.GetData(), msg.GetContext()))
+
+    #---- Tests ----#
+    def testCoalesce(self):
+        """Test that only the latest coalesced message is delivered"""
+        ed_msg.PostMessage(TEST_COALESCED, (1, 'a'))
+        ed_msg.PostMessage(TEST_COALESCED, (2, 'b'))
+        ed_msg.PostMessage(TEST_COALESCED, (1, 'c'))
+        ed_msg.PostMessage(TEST_COALESCED, (1, 'd'), context=5)
+        ed_msg.PostMessage(TEST_MSG, 'now')
+        self.assertEquals(self.msgs, [(TEST_MSG, 'now', None)])
+
+        ed_msg.FlushMessages()
+        self.assertEquals(self.msgs[1:], [(TEST_COALESCED, (1, 'c'), None),
+                                          (TEST_COALESCED, (2, 'b'), None),
+                                          (TEST_COALESCED, (1, 'd'), 5)])
+        ed_msg.FlushMessages()
+        self.assertEquals(len(self.msgs), 4)
+
+    def testBarrier(self):
+        """Test that a barrier message is not overtaken by a pending one"""
+        ed_msg.SetCoalesced(TEST_COALESCED, keyfunc=lambda data: data[0],
+                            barriers=(TEST_MSG,))
+        ed_msg.PostMessage(TEST_COALESCED, (1, 'a'))
+        ed_msg.PostMessage(TEST_COALESCED, (2, 'b'))
+        ed_msg.PostMessage(TEST_MSG, (1, 'stop'))
+        self.assertEquals(self.msgs, [(TEST_COALESCED, (1, 'a'), None),
+                                      (TEST_MSG, (1, 'stop'), None)])
+        ed_msg.FlushMessages()
+        self.assertEquals(self.msgs[2:], [(TEST_COALESCED, (2, 'b'), None)])
+
+        # Redeclaring the type without barriers removes them
+        ed_msg.SetCoalesced(TEST_COALESCED, keyfunc=lambda data: data[0])
+        ed_msg.PostMessage(TEST_COALESCED, (1, 'c'))
+        ed_msg.PostMessage(TEST_MSG, (1, 'now'))
+        self.assertEquals(self.msgs[3:], [(TEST_MSG, (1, 'now'), None)])
+
+    def testHasListeners(self):
+        """Test checking for listeners of a message type"""
+        self.assertTrue(ed_msg.HasListeners(TEST_MSG))
+        self.assertFalse(ed_msg.HasListeners(ed_msg.EDMSG_ALL + ('unittest',)))
+        ed_msg.Unsubscribe(self.OnMessage)
+        self.assertFalse(ed_msg.HasListeners(TEST_MSG))
+
+    def testStats(self):
+        """Test collecting the dispatch statistics"""
+        for idx in range(3):
+            ed_msg.PostMessage(TEST_MSG, idx)
+        ed_msg.PostMessage(TEST_COALESCED, (1, 'a'))
+        ed_msg.PostMessage(TEST_COALESCED, (1, 'b'))
+        ed_msg.FlushMessages()
+
+        stats = ed_msg.GetStats()
+        topics = dict([ (item[0], item[1:3]) for item in stats.GetTopicStats() ])
+        self.assertEquals(topics['editra.unittest.test'], (3, 0))
+        self.assertEquals(topics['editra.unittest.coalesced'], (1, 1))
+
+        listeners = stats.GetListenerStats()
+        self.assertEquals(len(listeners), 1)
+        self.assertTrue(listeners[0][0].endswith("EdMsgTest.OnMessage"))
+        self.assertEquals(listeners[0][1], 4)
+        self.assertEquals(sum(listeners[0][4]), 4)
+        self.assertTrue(u"EdMsgTest.OnMessage" in stats.GetReport())
+
+        ed_msg.EnableStats(False)
+        self.assertTrue(ed_msg.GetStats() is None)
+        ed_msg.PostMessage(TEST_MSG, 'unmeasured')
+        self.assertEquals(len(self.msgs), 5)
+
+#-----------------------------------------------------------------------------#
+if __name__ == '__main__':
+    unittest.main()
@@ -102,4 +102,117 @@ class FileBackupMgrTest(unittest.TestCase):
         bkup.SetBackupDirectory(common.GetTempDir())
         self.assertTrue(bkup.MakeBackupCopy(__file__))
         path = bkup.GetBackupFilename(__file__)
-        self.assertTrue(os.path.exists(path), "Path Fail: %s" % path)
\ No newline at end of file
+        self.assertTrue(os.path.exists(path), "Path Fail: %s" % path)
+#-----------------------------------------------------------------------------#
+
+class EditJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.path = common.GetTempFilePath(u"test.txt.edbkup")
+        self.journal = ebmlib.EditJournal(self.path)
+        self.journal.Reset(10, 1234.5)
+
+    def tearDown(self):
+        common.CleanTempDir()
+
+    #---- Tests ----#
+
+    def testRecover(self):
+        """Test replaying the recorded edits over the saved text"""
+        self.journal.AddInsert(0, "Hello")
+        self.journal.AddInsert(5, " World") # Coalesced with last insert
+        self.assertTrue(self.journal.Flush())
+        self.journal.AddDelete(0, 6)
+        self.journal.AddInsert(5, "!")
+        self.assertTrue(self.journal.Flush())
+        self.assertTrue(self.journal.IsRecoverable(10, 1234.5))
+        self.assertFalse(self.journal.IsRecoverable(11, 1234.5))
+        self.assertEquals(self.journal.Recover(" text"), "World! text")
+
+    def testCoalesce(self):
+        """Test that typing and deleting makes few records"""
+        for idx, char in enumerate("abcd"):
+            self.journal.AddInsert(idx, char)
+        self.journal.AddDelete(3, 1) # Backspace in the insertion
+        self.journal.AddDelete(10, 1)
+        self.journal.AddDelete(9, 1)
+        self.journal.AddDelete(9, 2)
+        self.assertTrue(self.journal.Flush())
+        lines = common.GetFileContents(self.path).splitlines()
+        self.assertEquals(lines[1:], ["I 0 3", "abc", "D 9 4"])
+
+    def testFlushIncremental(self):
+        """Test that flushing only appends the new edits"""
+        self.journal.AddInsert(0, "x" * 100)
+        self.journal.Flush()
+        size = os.path.getsize(self.path)
+        self.assertEquals(self.journal.GetSize(), size)
+        self.assertFalse(self.journal.HasPending())
+        self.journal.AddInsert(0, "y")
+        self.assertTrue(self.journal.HasPending())
+        self.journal.Flush()
+        self.assertEquals(os.path.getsize(self.path) - size,
+                          len("I 0 1\ny\n"))
+
+    def testSnapshot(self):
+        """Test compacting the journal with a snapshot"""
+        self.journal.AddInsert(0, "abc")
+        self.journal.Flush()
+        self.journal.SetSnapshot("snapshot")
+        self.journal.AddDelete(0, 4)
+        self.journal.Flush()
+        self.assertEquals(self.journal.Recover("anything"), "shot")
+
+    def testResetRemove(self):
+        """Test that the journal is removed at the save point"""
+        self.journal.AddInsert(0, "abc")
+        self.journal.Flush()
+        self.assertTrue(self.journal.Exists())
+        self.journal.Reset(13, 1235.0)
+        self.journal.Flush()
+        self.assertFalse(self.journal.Exists())
+        self.journal.AddInsert(0, "abc")
+        self.journal.Flush()
+        self.journal.Remove()
+        self.assertFalse(self.journal.Exists())
+        self.assertFalse(self.journal.HasPending())
+        self.assertEquals(self.journal.GetSize(), 0)
+        self.journal.Flush()
+        self.assertFalse(self.journal.Exists())
+        self.journal.AddInsert(0, "x")
+        self.journal.Flush()
+        self.assertEquals(self.journal.Recover("abc"), "xabc")
+
+    def testForeignFile(self):
+        """Test that backups that are not journals are not touched"""
+        handle = open(self.path, 'wb')
+        handle.write("full text backup")
+        handle.close()
+        self.journal.Flush()
+        self.assertEquals(common.GetFileContents(self.path), "full text backup")
+        self.journal.AddInsert(0, "abc")
+        self.assertFalse(self.journal.Flush())
+        self.journal.Remove()
+        self.assertEquals(common.GetFileContents(self.path), "full text backup")
+
+    def testClose(self):
+        """Test that flushes after closing the journal do nothing"""
+        self.journal.AddInsert(0, "abc")
+        self.journal.Flush()
+        self.journal.AddInsert(3, "def")
+        self.journal.Close()
+        self.assertFalse(self.journal.Exists())
+        self.journal.AddInsert(0, "ghi")
+        self.assertTrue(self.journal.Flush())
+        self.assertFalse(self.journal.Exists())
+
+    def testTruncated(self):
+        """Test recovering a journal with an incomplete last record"""
+        self.journal.AddInsert(0, "abc")
+        self.journal.Flush()
+        self.journal.AddInsert(0, "0123456789")
+        self.journal.Flush()
+        data = common.GetFileContents(self.path)
+        handle = open(self.path, 'wb')
+        handle.write(data[:-4])
+        handle.close()
+        self.assertEquals(self.journal.Recover(""), "abc")
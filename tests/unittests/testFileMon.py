@@ -0,0 +1,136 @@
+###############################################################################
+# Name: testFileMon.py                                                        #
+# Purpose: Unit tests for the file state monitor thread                       #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""Unittest cases for testing ebmlib._filemon"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import time
+import threading
+import unittest
+
+# Local modules
+import common
+
+# Module to test
+import ebmlib._filemon as _filemon
+
+#-----------------------------------------------------------------------------#
+# Test Class
+
+class FileMonTest(unittest.TestCase):
+    def setUp(self):
+        self.paths = [ self._Write(name) for name in (u"a.txt", u"b.txt") ]
+        self.changes = list()
+        self.notified = threading.Event()
+        self.watcher = None
+
+    def tearDown(self):
+        if self.watcher is not None:
+            self.watcher.Shutdown()
+        common.CleanTempDir()
+
+    def _Notifier(self, changed):
+        self.changes.append(changed)
+        self.notified.set()
+
+    def _Start(self, batchSize=32):
+        self.watcher = _filemon.FileStateThread(self._Notifier, checkFreq=50,
+                                                batchSize=batchSize)
+        self.watcher.setDaemon(True)
+        for path in self.paths:
+            self.watcher.AddWatchFile(path)
+        self.watcher.start()
+        self._WaitState(self.paths)
+
+    def _Wait(self):
+        """Wait for the next change notification"""
+        self.notified.wait(5)
+        self.assertTrue(self.notified.isSet())
+        self.notified.clear()
+        return self.changes.pop()
+
+    def _WaitState(self, paths):
+        """Wait for the state of the given files to be known"""
+        for _ in range(100):
+            if None not in [ self.watcher.GetState(p) for p in paths ]:
+                return
+            time.sleep(0.05)
+        self.fail("File state not checked")
+
+    def _Write(self, name):
+        path = common.GetTempFilePath(name)
+        handle = open(path, 'wb')
+        handle.write(name)
+        handle.close()
+        return path
+
+    #---- Test Cases ----#
+
+    def testGetFileState(self):
+        """Test getting the on disk state of a file"""
+        state = _filemon.GetFileState(self.paths[0])
+        self.assertTrue(state.exists)
+        self.assertEquals(state.mtime, os.path.getmtime(self.paths[0]))
+        self.assertFalse(state.readonly)
+        state = _filemon.GetFileState(self.paths[0] + u".missing")
+        self.assertEquals(state, _filemon.FileState())
+
+    def testChanges(self):
+        """Test change notifications from the monitor thread"""
+        self._Start()
+        mtime = int(time.time()) + 10 # Whole seconds are exact on all fs
+        os.utime(self.paths[1], (mtime, mtime))
+        self.assertEquals(self._Wait(),
+                          { self.paths[1] : _filemon.FileState(True, mtime) })
+
+        os.remove(self.paths[0])
+        self.assertEquals(self._Wait(),
+                          { self.paths[0] : _filemon.FileState() })
+
+    def testBatchSize(self):
+        """Test that each cycle checks a limited number of files"""
+        self.paths.append(self._Write(u"c.txt"))
+        self._Start(batchSize=1)
+        checked = list()
+        GetFileState = _filemon.GetFileState
+        def RecordState(path):
+            checked.append((time.time(), path))
+            return GetFileState(path)
+        _filemon.GetFileState = RecordState
+        try:
+            time.sleep(0.4)
+        finally:
+            _filemon.GetFileState = GetFileState
+        self.assertTrue(len(checked) >= 3)
+        self.assertEquals(set([ path for tstamp, path in checked[:3] ]),
+                          set(self.paths))
+        for idx in range(1, len(checked)):
+            self.assertTrue(checked[idx][0] - checked[idx - 1][0] > 0.03)
+
+    def testRefresh(self):
+        """Test refreshing and removing watched files"""
+        self._Start()
+        self.watcher.Refresh([self.paths[0]])
+        self._WaitState(self.paths)
+
+        # Files are reference counted
+        self.watcher.AddWatchFile(self.paths[1])
+        self.watcher.RemoveWatchFile(self.paths[1])
+        self.assertFalse(self.watcher.GetState(self.paths[1]) is None)
+        self.watcher.RemoveWatchFile(self.paths[1])
+        self.assertTrue(self.watcher.GetState(self.paths[1]) is None)
+
+#-----------------------------------------------------------------------------#
+if __name__ == '__main__':
+    unittest.main()
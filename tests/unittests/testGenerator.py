@@ -0,0 +1,159 @@
+###############################################################################
+# Name: testGenerator.py                                                      #
+# Purpose: Unit tests for the document generators                             #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""Unittest cases for testing generator.StyleRuns and the generators"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import unittest
+import tempfile
+
+# Module to test
+import generator
+
+#-----------------------------------------------------------------------------#
+
+class StyledDoc(object):
+    """Styled text and the parts of the stc api used by StyleRuns"""
+    def __init__(self, segments):
+        """@param segments: list of (unicode text, style id)"""
+        super(StyledDoc, self).__init__()
+
+        # Attributes
+        self.text = "".join([ txt.encode('utf-8') for txt, sty in segments ])
+        self.styles = "".join([ chr(sty) * len(txt.encode('utf-8'))
+                                for txt, sty in segments ])
+        self.reads = 0
+
+    def GetLength(self):
+        return len(self.text)
+
+    def GetStyleBits(self):
+        return 5
+
+    def LineFromPosition(self, pos):
+        return self.text.count("\n", 0, pos)
+
+    def PositionFromLine(self, line):
+        pos = 0
+        for idx in range(line):
+            pos = self.text.find("\n", pos) + 1
+            if not pos:
+                return -1
+        return pos
+
+    def GetStyledText(self, start, end):
+        self.reads += 1
+        data = list()
+        for idx in xrange(start, end):
+            data.append(self.text[idx])
+            data.append(self.styles[idx])
+        return "".join(data)
+
+    def FindTagById(self, style_id):
+        return { 0 : 'default_style', 1 : 'keyword_style',
+                 2 : 'comment_style' }.get(style_id, 'default_style')
+
+class StreamGen(object):
+    """Generator that writes its document in parts"""
+    def GetId(self):
+        return 1
+
+    def GetFileExtension(self):
+        return "txt"
+
+    def WriteDocument(self, stc, write):
+        for part in stc:
+            write(part)
+
+class TextGen(object):
+    """Generator that only returns the whole document"""
+    def GetId(self):
+        return 2
+
+    def Generate(self, stc):
+        return ("html", u"".join(stc))
+
+class GeneratorStub(object):
+    """The Generator file api without the plugin manager"""
+    observers = [StreamGen(), TextGen()]
+    GenerateFile = generator.Generator.GenerateFile.im_func
+
+#-----------------------------------------------------------------------------#
+# Test Class
+
+class StyleRunsTest(unittest.TestCase):
+    def testRuns(self):
+        """Test splitting the document into style runs"""
+        doc = StyledDoc([(u"def", 1), (u" ", 0), (u"# caf\xe9\n", 2),
+                         (u"# \xe9t\xe9", 2), (u"\n", 0), (u"pass", 1)])
+        runs = list(generator.StyleRuns(doc, chunk=3))
+        self.assertEquals(runs, [(1, 0, 3, u"def"), (0, 3, 4, u" "),
+                                 (2, 4, 19, u"# caf\xe9\n# \xe9t\xe9"),
+                                 (0, 19, 20, u"\n"), (1, 20, 24, u"pass")])
+        # Reads are extended to the end of the line
+        self.assertEquals(doc.reads, 3)
+
+    def testJoin(self):
+        """Test joining single default characters into the style run"""
+        doc = StyledDoc([(u"# a", 2), (u" ", 0), (u"b", 2), (u"  ", 0),
+                         (u"c", 2)])
+        runs = [ run[0:3] for run in generator.StyleRuns(doc) ]
+        self.assertEquals(runs, [(2, 0, 5), (0, 5, 7), (2, 7, 8)])
+        runs = [ run[0:3] for run in generator.StyleRuns(doc, join=False) ]
+        self.assertEquals(len(runs), 5)
+
+    def testIndicators(self):
+        """Test that indicator bits don't split the style runs"""
+        doc = StyledDoc([(u"if", 1), (u"else", 1 | 0x20), (u" ", 0)])
+        runs = generator.StyleRuns(doc)
+        self.assertEquals([ run[0:3] for run in runs ],
+                          [(1, 0, 6), (0, 6, 7)])
+        self.assertEquals(runs.GetStyleIds(), set([0, 1]))
+        self.assertEquals(runs.GetTag(1), 'keyword_style')
+
+    def testEmpty(self):
+        """Test an empty document"""
+        runs = generator.StyleRuns(StyledDoc([]))
+        self.assertEquals(list(runs), list())
+        self.assertEquals(runs.GetStyleIds(), set())
+
+    def testTransformText(self):
+        """Test the character substitutions of the generators"""
+        self.assertEquals(u"a_b\n".translate(generator.LATEX_MAP),
+                          u"a\\_b\\\\\n")
+        self.assertEquals(u"{\t}\n".translate(generator.RTF_MAP),
+                          u"\\{\\tab \\}\\par\n")
+
+class GeneratorTest(unittest.TestCase):
+    def setUp(self):
+        fid, self.path = tempfile.mkstemp()
+        os.close(fid)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testGenerateFile(self):
+        """Test writing the generated documents to a file"""
+        gen = GeneratorStub()
+        parts = [u"caf\xe9 ", u"<b>", u"\n"]
+        for e_id, ext in ((1, "txt"), (2, "html")):
+            self.assertEquals(gen.GenerateFile(e_id, parts, self.path), ext)
+            handle = open(self.path, 'rb')
+            self.assertEquals(handle.read(), u"".join(parts).encode('utf-8'))
+            handle.close()
+        self.assertTrue(gen.GenerateFile(3, parts, self.path) is None)
+
+#-----------------------------------------------------------------------------#
+if __name__ == '__main__':
+    unittest.main()
@@ -17,11 +17,17 @@ __revision__ = "$Revision: 72223 $"
 
 #-----------------------------------------------------------------------------#
 # Imports
+import os
 import unittest
 
+# Local modules
+import common
+
 # Module to test
 import dev_tool
 import ebmlib
+import ed_glob
+import ed_msg
 
 #-----------------------------------------------------------------------------#
 
@@ -100,3 +106,63 @@ class LogMsgTest(unittest.TestCase):
         self.assertTrue(isinstance(self.err.Value, basestring))
         self.assertTrue(isinstance(self.warn.Value, basestring))
         self.assertTrue(isinstance(self.info.Value, basestring))
+
+#-----------------------------------------------------------------------------#
+
+class DebugpTest(unittest.TestCase):
+    def setUp(self):
+        self.msgs = list()
+        self.debug = ed_glob.DEBUG
+        ed_glob.DEBUG = False
+
+    def tearDown(self):
+        ed_glob.DEBUG = self.debug
+        ed_msg.Unsubscribe(self.OnLog)
+        common.CleanTempDir()
+
+    def OnLog(self, msg):
+        self.msgs.append(msg)
+
+    def testParseLabels(self):
+        """Test splitting the labels from the log statement"""
+        parse = dev_tool.ParseLabels
+        self.assertEquals(parse("[ed_main][err] Failed [x]"),
+                          (["ed_main", "err"], " Failed [x]"))
+        self.assertEquals(parse("[ed_main] one label"),
+                          (["ed_main"], " one label"))
+        self.assertEquals(parse("no labels"), ([], "no labels"))
+        self.assertEquals(parse("[a][b"), (["a"], "[b"))
+
+    def testDispatch(self):
+        """Test that messages are only built for interested listeners"""
+        ed_msg.Subscribe(self.OnLog, ed_msg.EDMSG_LOG_WARN)
+        self.assertTrue(ed_msg.HasListeners(ed_msg.EDMSG_LOG_WARN))
+        self.assertFalse(ed_msg.HasListeners(ed_msg.EDMSG_LOG_ERROR))
+
+        dev_tool.DEBUGP("[test][info] not sent")
+        dev_tool.DEBUGP("[test][warn] value %d", 5)
+        dev_tool.DEBUGP("[%s][warn] formatted label", "src")
+        self.assertEquals(len(self.msgs), 2)
+        log = self.msgs[0].GetData()
+        self.assertEquals((log.Origin, log.Type, log.Value),
+                          ("test", "warn", " value 5"))
+        self.assertEquals(self.msgs[1].GetData().Origin, "src")
+
+    def testLogWriter(self):
+        """Test writing the queued records on the writer thread"""
+        logfile = ebmlib.LogFile("test", common.GetTempDir())
+        writer = dev_tool.LogWriter(logfile, interval=0.01)
+        writer.start()
+        for idx in range(3):
+            writer.Queue((0, u"message %d" % idx, u"test", u"info", None))
+        writer.Shutdown()
+        self.assertFalse(writer.isAlive())
+
+        logs = [ name for name in os.listdir(common.GetTempDir())
+                 if name.startswith("test_") ]
+        self.assertEquals(len(logs), 1)
+        lines = common.GetFileContents(common.GetTempFilePath(logs[0]))
+        lines = lines.splitlines()
+        self.assertEquals(len(lines), 3)
+        self.assertTrue(lines[2].endswith("[test][info]message 2"))
+
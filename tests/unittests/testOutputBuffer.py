@@ -0,0 +1,74 @@
+###############################################################################
+# Name: testOutputBuffer.py                                                   #
+# Purpose: Unit tests for eclib.outbuff                                       #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""Unittest cases for testing the OutputBuffer"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import unittest
+import common
+
+# Module to test
+import eclib.outbuff as outbuff
+
+#-----------------------------------------------------------------------------#
+# Test Class
+
+class OutputBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.frame = common.TestFrame(None)
+        self.buff = outbuff.OutputBuffer(self.frame)
+        self.lines = [ u"line %d\n" % num for num in range(100) ]
+
+    def tearDown(self):
+        self.frame.Destroy()
+
+    #---- Test Cases ----#
+
+    def testFlushBuffer(self):
+        """Test displaying the queued updates"""
+        for line in self.lines:
+            self.buff.AppendUpdate(line)
+        self.buff.FlushBuffer()
+        self.assertEquals(self.buff.GetText(), u"".join(self.lines))
+        self.assertFalse(len(self.buff.GetUpdateQueue()))
+
+    def testFlushSizeLimit(self):
+        """Test that large updates are shown over multiple flushes"""
+        flush_size = outbuff.OPB_FLUSH_SIZE
+        outbuff.OPB_FLUSH_SIZE = 100
+        try:
+            self.buff.AppendUpdate(u"".join(self.lines))
+            self.buff.FlushBuffer()
+            self.assertTrue(self.buff.GetLength() <= 100)
+            self.assertTrue(self.buff.GetText().endswith(u"\n"))
+            self.buff.Stop()
+            self.assertEquals(self.buff.GetText(), u"".join(self.lines))
+        finally:
+            outbuff.OPB_FLUSH_SIZE = flush_size
+
+    def testLineBuffering(self):
+        """Test that only the last lines are kept when line buffering"""
+        self.buff.AppendUpdate(u"partial")
+        self.buff.FlushBuffer()
+        self.buff.SetLineBuffering(10)
+        for line in self.lines:
+            self.buff.AppendUpdate(line)
+        self.buff.FlushBuffer()
+        self.assertEquals(self.buff.GetLineCount(), 10)
+        self.assertEquals(self.buff.GetText(), u"".join(self.lines[-9:]))
+
+        self.buff.AppendUpdate(u"last line")
+        self.buff.FlushBuffer()
+        self.assertEquals(self.buff.GetLineCount(), 10)
+        self.assertEquals(self.buff.GetText(),
+                          u"".join(self.lines[-9:]) + u"last line")
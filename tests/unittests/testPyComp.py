@@ -0,0 +1,121 @@
+###############################################################################
+# Name: testPyComp.py                                                         #
+# Purpose: Unit tests for the python completion model                         #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""Unittest cases for testing autocomp.pycomp"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import unittest
+import __builtin__
+
+# Module to test
+import autocomp.pycomp as pycomp
+
+#-----------------------------------------------------------------------------#
+
+SOURCE = '''"""Module docstring"""
+import os
+import sys as system
+
+class Foo(object):
+    """Foo class"""
+    value = 0
+
+    def __init__(self, param):
+        self.param = param
+
+    @property
+    def Value(self):
+        """Get the value"""
+        return self.value
+
+def Bar(arg1, arg2=None):
+    """Bar function
+    def NotAFunction():
+    """
+    return arg1
+
+class Baz(Foo):
+    pass
+
+x = Foo(1)
+'''
+
+#-----------------------------------------------------------------------------#
+# Test Class
+
+class PyCompTest(unittest.TestCase):
+    def setUp(self):
+        self.model = pycomp.CompletionModel()
+
+    def tearDown(self):
+        pass
+
+    #---- Test Cases ----#
+
+    def testSplitBlocks(self):
+        """Test splitting source at the top level definitions"""
+        blocks = pycomp.SplitBlocks(SOURCE)
+        self.assertEquals([ blk[0] for blk in blocks ], [0, 4, 16, 22, 25])
+        self.assertEquals(''.join([ blk[1] for blk in blocks ]), SOURCE)
+
+    def testParse(self):
+        """Test that the model gives the same scope as a full parse"""
+        for line in range(SOURCE.count('\n') + 1):
+            ref = pycomp.PyParser().parse(SOURCE, line)
+            scope = self.model.Parse(SOURCE, line)
+            self.assertEquals(scope.get_code(), ref.get_code())
+
+    def testReparse(self):
+        """Test that only the edited blocks are parsed again"""
+        self.model.Parse(SOURCE, 0)
+        self.assertEquals(self.model.parsed, 7)
+        self.model.Parse(SOURCE, 0)
+        self.assertEquals(self.model.parsed, 1)
+
+        # Edit a method of Foo
+        text = SOURCE.replace('self.param = param', 'self.param = 1')
+        self.model.Parse(text, 0)
+        self.assertEquals(self.model.parsed, 2)
+
+    def testNotAClass(self):
+        """Test blocks with lines that start with class but are not a class
+        statement.
+
+        """
+        text = "classes = []\nif classes:\n    def Foo():\n        pass\n" \
+               "    def Bar(self):\n        return 1\n"
+        for source in (text, "class\n" + text):
+            for line in range(source.count('\n') + 1):
+                ref = pycomp.PyParser().parse(source, line)
+                scope = self.model.Parse(source, line)
+                self.assertEquals(scope.get_code(), ref.get_code())
+
+    def testModuleCache(self):
+        """Test caching of imported modules"""
+        cache = pycomp.ModuleCache()
+        key = (u'', 'unittest', (), -1)
+        self.assertTrue(cache.Get(key) is None)
+        cache.Set(key, unittest, [unittest])
+        self.assertTrue(key in cache)
+        self.assertTrue(cache.Get(key) is unittest)
+
+        gen = cache.generation
+        cache.Clear()
+        self.assertEquals(len(cache), 0)
+        self.assertTrue(cache.generation > gen)
+
+    def testImporter(self):
+        """Test that imports done in evaluation are cached"""
+        self.model.GetCompleter(SOURCE, 0)
+        self.assertTrue((u'', 'os', (), -1) in pycomp._MODCACHE)
+        self.assertFalse(isinstance(__builtin__.__import__, pycomp._Importer))
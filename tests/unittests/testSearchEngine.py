@@ -17,6 +17,7 @@ __revision__ = "$Revision: 70128 $"
 # Imports
 import unittest
 import unicodedata
+import common
 
 # Module to test
 import ebmlib
@@ -217,6 +218,60 @@ class SearchEngineTest(unittest.TestCase):
         val = search.Find()
         self.assertTrue(val is not None)
 
+    def testSearchInDirectory(self):
+        """Test searching in the files of a directory"""
+        search = ebmlib.SearchEngine(u"test", regex=False)
+        search.SetWorkers(1)
+        results = list(search.SearchInDirectory(common.GetDataDir()))
+        self.assertTrue(len(results))
+        fnames = [ res[1] for res in results if isinstance(res, tuple) ]
+        self.assertTrue(common.GetDataFilePath(u'test_read_utf8.txt') in fnames)
+        self.assertFalse(common.GetDataFilePath(u'image_test.png') in fnames)
+
+        # Worker processes must give the same results in the same order
+        search.SetWorkers(2)
+        search.SetResultFormatter(lambda f, l, m: u"%s %d" % (f, l))
+        presults = list(search.SearchInDirectory(common.GetDataDir()))
+        search.SetWorkers(1)
+        self.assertEquals(presults,
+                          list(search.SearchInDirectory(common.GetDataDir())))
+
+    def testSearchInFile(self):
+        """Test the file scanning modes"""
+        path = common.MakeTempFile(u"search.txt")
+        handle = open(path, 'wb')
+        handle.write("first line\ndef foo(a,\n        b):\nfoo foo\nlast")
+        handle.close()
+
+        search = ebmlib.SearchEngine(u"foo|last", regex=True)
+        search.SetResultFormatter(lambda f, l, m: (l, m))
+        for mode in (ebmlib.SCAN_LINES, ebmlib.SCAN_MMAP):
+            search.SetScanMode(mode)
+            self.assertEquals(search.GetScanMode(), mode)
+            results = list(search.SearchInFile(path))
+            self.assertEquals(results, [(None, path),
+                                        (1, "def foo(a,\n"),
+                                        (3, "foo foo\n"),
+                                        (4, "last")])
+
+        # Multiline expressions only match when scanning the whole file
+        search.SetQuery(u"a,\\s+b")
+        search.SetScanMode(ebmlib.SCAN_LINES)
+        self.assertEquals(len(list(search.SearchInFile(path))), 1)
+        search.SetScanMode(ebmlib.SCAN_MMAP)
+        self.assertEquals(list(search.SearchInFile(path))[1:],
+                          [(1, "def foo(a,\n")])
+        common.CleanTempDir()
+
+    def testSearchCancel(self):
+        """Test canceling a search in a directory"""
+        search = ebmlib.SearchEngine(u"test", regex=False)
+        search.SetWorkers(2)
+        results = search.SearchInDirectory(common.GetDataDir())
+        self.assertTrue(isinstance(results.next(), tuple))
+        search.Cancel()
+        self.assertTrue(len(list(results)) < 5)
+
 #-----------------------------------------------------------------------------#
 
 if __name__ == '__main__':
@@ -0,0 +1,87 @@
+###############################################################################
+# Name: testSimpleComp.py                                                     #
+# Purpose: Unit tests for the word completion index                           #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""Unittest cases for testing autocomp.simplecomp"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import unittest
+
+# Module to test
+import autocomp.simplecomp as simplecomp
+
+#-----------------------------------------------------------------------------#
+
+TEXT = u"""SELECT name, value FROM table1;
+SELECT Name, nameless FROM table2 WHERE value2 > 10;
+-- comment with naming
+"""
+
+class Buffer(object):
+    """Minimal text buffer with the line api of the stc"""
+    def __init__(self, text):
+        super(Buffer, self).__init__()
+        self.text = text
+
+    def GetText(self):
+        return self.text
+
+    def GetLineCount(self):
+        return self.text.count(u'\n') + 1
+
+    def GetLine(self, line):
+        return self.text.splitlines(True)[line]
+
+#-----------------------------------------------------------------------------#
+# Test Class
+
+class SimpleCompTest(unittest.TestCase):
+    def setUp(self):
+        self.index = simplecomp.WordIndex(TEXT.split(u'\n'))
+
+    def tearDown(self):
+        pass
+
+    #---- Test Cases ----#
+
+    def testBuild(self):
+        """Test building the index"""
+        self.assertEquals(self.index.LineCount, 4)
+        self.assertEquals(self.index.GetCount(u'SELECT'), 2)
+        self.assertEquals(self.index.GetCount(u'value2'), 1)
+        self.assertFalse(u'10' in self.index)
+
+    def testQuery(self):
+        """Test prefix queries"""
+        self.assertEquals(self.index.Query(u'nam'),
+                          [u'Name', u'name', u'nameless', u'naming'])
+        self.assertEquals(self.index.Query(u'nam', True),
+                          [u'name', u'nameless', u'naming'])
+        self.assertEquals(self.index.Query(u'xyz'), list())
+
+    def testUpdate(self):
+        """Test replacing a range of lines"""
+        self.index.Update(1, 2, [u'INSERT INTO table3'])
+        self.assertEquals(self.index.LineCount, 3)
+        self.assertFalse(u'nameless' in self.index)
+        self.assertEquals(self.index.GetCount(u'name'), 1)
+        self.assertEquals(self.index.Query(u'tab'), [u'table1', u'table3'])
+
+    def testUpdateIndex(self):
+        """Test keeping the index of a buffer in sync with edits"""
+        buff = Buffer(TEXT)
+        index = simplecomp.GetIndex(buff)
+        buff.text = TEXT.replace(u'nameless', u'nameless\nvaluable')
+        simplecomp.UpdateIndex(buff, 1, 1)
+        self.assertTrue(simplecomp.GetIndex(buff) is index)
+        self.assertEquals(index.Query(u'val'), [u'valuable', u'value',
+                                                u'value2'])
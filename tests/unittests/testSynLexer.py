@@ -0,0 +1,194 @@
+###############################################################################
+# Name: testSynLexer.py                                                       #
+# Purpose: Unit tests for the incremental container lexer engine              #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""Unittest cases for testing syntax.synlexer"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import unittest
+import random
+from pygments.lexers import get_lexer_by_name
+from pygments.token import Token
+
+# Module to test
+import syntax.synlexer as synlexer
+
+#-----------------------------------------------------------------------------#
+
+TEMPLATE = u"""<html>
+  <head><title>{{ title }}</title></head>
+  <body class="main">
+  {% for item in items %}
+    <p>{{ item.name|lower }}</p>
+  {% endfor %}
+  {# a comment #}
+  </body>
+</html>
+"""
+
+SCRIPTS = u"""<%def name="x()">
+  <script type="text/javascript">
+    var a = "<b>${ y }</b>";
+    if (a < b) { f('{{ v }}'); }
+  </script>
+</%def>
+% for i in items:
+  <p class="c ${i}" title='{% url x %}'>${ i | h }</p>
+% endfor
+<%doc> doc </%doc>
+"""
+
+# Fragments that open or close tokens spanning many lines
+FRAGMENTS = (u'<script>', u'</script>', u'<style>', u'</style>', u'"', u"'",
+             u'{%', u'%}', u'{{', u'}}', u'{#', u'#}', u'<%', u'%>', u'${',
+             u'}', u'<!--', u'-->', u'<', u'>', u'\n', u'\n% ', u'x ')
+
+TOKEN_MAP = { Token.Comment.Preproc : 1,
+              Token.Comment : 2,
+              Token.Keyword : 3,
+              Token.Name.Tag : 4,
+              Token.Literal.String : 5 }
+
+class Buffer(object):
+    """Minimal ascii text buffer with the styling api of the stc"""
+    def __init__(self, text):
+        super(Buffer, self).__init__()
+        self.text = text
+        self.styles = [0] * len(text)
+        self.spos = 0
+
+    def Insert(self, pos, txt):
+        self.text = self.text[:pos] + txt + self.text[pos:]
+        self.styles[pos:pos] = [0] * len(txt)
+        return self.LineFromPosition(pos), txt.count(u'\n')
+
+    def Delete(self, pos, length):
+        txt = self.text[pos:pos+length]
+        self.text = self.text[:pos] + self.text[pos+length:]
+        del self.styles[pos:pos+length]
+        return self.LineFromPosition(pos), -txt.count(u'\n')
+
+    def GetTextRange(self, start, end):
+        return self.text[start:end]
+
+    def LineFromPosition(self, pos):
+        return self.text.count(u'\n', 0, pos)
+
+    def PositionFromLine(self, line):
+        pos = 0
+        for lnum in range(line):
+            pos = self.text.find(u'\n', pos) + 1
+        return pos
+
+    def GetLineEndPosition(self, line):
+        pos = self.text.find(u'\n', self.PositionFromLine(line))
+        return len(self.text) if pos == -1 else pos
+
+    def StartStyling(self, pos, mask):
+        self.spos = pos
+
+    def SetStyling(self, length, style):
+        self.styles[self.spos:self.spos+length] = [style] * length
+        self.spos += length
+
+#-----------------------------------------------------------------------------#
+# Test Class
+
+class SynLexerTest(unittest.TestCase):
+    def setUp(self):
+        self.lexer = get_lexer_by_name('html+django')
+        self.text = TEMPLATE * 40
+        self.styler = synlexer.IncrementalStyler(self.lexer, TOKEN_MAP, 0)
+        self.styler.interval = 8
+
+    def tearDown(self):
+        pass
+
+    def _Reference(self, text, lexer=None):
+        buff = Buffer(text)
+        styler = synlexer.IncrementalStyler(lexer or self.lexer, TOKEN_MAP, 0)
+        styler.StyleText(buff, 0, len(text))
+        return buff.styles
+
+    #---- Test Cases ----#
+
+    def testFullStyle(self):
+        """Test styling a document from the start"""
+        buff = Buffer(self.text)
+        self.styler.StyleText(buff, 0, len(self.text))
+        self.assertTrue(1 in buff.styles)
+        self.assertTrue(4 in buff.styles)
+        state = self.styler.GetDocState(buff)
+        self.assertTrue(len(state.checkpoints) > 0)
+
+    def testIncrementalEdit(self):
+        """Test that restyling after an edit matches a full restyle"""
+        buff = Buffer(self.text)
+        self.styler.StyleText(buff, 0, len(buff.text))
+        for pos, txt in ((200, u'{{ x }}'), (1200, u'\n<b>'),
+                         (3000, u'{% if y %}\n'), (10, u'"')):
+            line, added = buff.Insert(pos, txt)
+            synlexer.UpdateState(buff, line, added)
+            self.styler.StyleText(buff, pos, len(buff.text))
+            self.assertEquals(buff.styles, self._Reference(buff.text))
+
+    def testRandomEdits(self):
+        """Test that restyling after random edits matches a full restyle"""
+        for seed in (2, 8):
+            rand = random.Random(seed)
+            for alias in ('html+django', 'html+mako'):
+                self._RandomEdits(rand, get_lexer_by_name(alias), 80)
+
+    def _RandomEdits(self, rand, lexer, count):
+        """Restyle after each random edit and compare with a full restyle"""
+        styler = synlexer.IncrementalStyler(lexer, TOKEN_MAP, 0)
+        styler.interval = 8
+        buff = Buffer((TEMPLATE + SCRIPTS) * 6)
+        styler.StyleText(buff, 0, len(buff.text))
+        for edit in range(count):
+            pos = rand.randint(0, len(buff.text))
+            if rand.random() < 0.3:
+                line, added = buff.Delete(pos, rand.randint(1, 12))
+            else:
+                line, added = buff.Insert(pos, rand.choice(FRAGMENTS))
+            synlexer.UpdateState(buff, line, added)
+            styler.StyleText(buff, buff.PositionFromLine(line),
+                             len(buff.text))
+            self.assertEquals(buff.styles, self._Reference(buff.text, lexer),
+                              "%s edit %d" % (lexer.name, edit))
+
+    def testStartPoint(self):
+        """Test that checkpoints the text before depends on are skipped"""
+        state = synlexer.DocState(None)
+        state.checkpoints = { 0 : (0, 0, None, None),
+                              10 : (0, 0, None, None),
+                              20 : (0, 0, None, 12),
+                              30 : (0, 0, None, 15) }
+        self.assertEquals(self.styler.GetStartPoint(state, 35)[0], 10)
+        self.assertEquals(self.styler.GetStartPoint(state, 25)[0], 10)
+        self.assertEquals(self.styler.GetStartPoint(state, 15)[0], 10)
+        state.checkpoints[10] = (0, 0, None, 4)
+        self.assertEquals(self.styler.GetStartPoint(state, 35), (0, 0, 0, None))
+
+    def testUpdateState(self):
+        """Test moving the checkpoints when lines are added and removed"""
+        state = synlexer.DocState(None)
+        state.checkpoints = { 0 : (0, 0, None, None), 10 : (0, 0, None, 8),
+                              20 : (4, 4, None, None) }
+        state.Modified(5, 2)
+        self.assertEquals(sorted(state.checkpoints.keys()), [0, 12, 22])
+        self.assertEquals(state.checkpoints[12][3], 10)
+        self.assertEquals(state.dirty, 7)
+        state.Modified(12, -3)
+        self.assertEquals(sorted(state.checkpoints.keys()), [0, 12, 19])
+        state.Modified(19, 0)
+        self.assertEquals(sorted(state.checkpoints.keys()), [0, 12])
@@ -0,0 +1,109 @@
+###############################################################################
+# Name: testTrigramIndex.py                                                   #
+# Purpose: Unit tests for the search trigram index                            #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2012 Cody Precord <staff@editra.org>                         #
+# License: wxWindows License                                                  #
+###############################################################################
+
+"""Unittest cases for testing ebmlib.TrigramIndex"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#-----------------------------------------------------------------------------#
+# Imports
+import os
+import unittest
+
+# Local modules
+import common
+
+# Module to test
+import ebmlib
+
+#-----------------------------------------------------------------------------#
+# Test Class
+
+class TrigramIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.root = common.GetTempFilePath(u"trigram")
+        os.mkdir(self.root)
+        os.mkdir(os.path.join(self.root, u"sub"))
+        self.files = dict(a=u"import os\nos.getcwd()\n",
+                          b=u"def SearchInFile(fname):\n    pass\n",
+                          c=u"Some Plain TEXT\n")
+        self.files[os.path.join(u"sub", u"d")] = u"searchinfile = 1\n"
+        for name, txt in self.files.iteritems():
+            self._Write(name, txt)
+        self.path = common.GetTempFilePath(u"trigram.idx")
+        self.index = ebmlib.TrigramIndex(self.root, self.path)
+
+    def tearDown(self):
+        common.CleanTempDir()
+
+    def _Candidates(self, query, regex=False, **kwargs):
+        trigrams = ebmlib.GetQueryTrigrams(query, regex)
+        return sorted([ os.path.relpath(path, self.root) for path in
+                        self.index.GetCandidates(trigrams, **kwargs) ])
+
+    def _Write(self, name, txt):
+        handle = open(os.path.join(self.root, name), 'wb')
+        handle.write(txt)
+        handle.close()
+
+    #---- Test Cases ----#
+
+    def testGetQueryTrigrams(self):
+        """Test getting the trigrams required by a query"""
+        self.assertEquals(ebmlib.GetQueryTrigrams(u"Text"), ['ext', 'tex'])
+        self.assertEquals(ebmlib.GetQueryTrigrams(u"ab"), list())
+        self.assertEquals(ebmlib.GetQueryTrigrams(u"def\\s+\\w+", True),
+                          ['def'])
+        self.assertEquals(ebmlib.GetQueryTrigrams(u"abcd?(efg)*[hij]", True),
+                          ['abc'])
+        self.assertEquals(ebmlib.GetQueryTrigrams(u"ab\\.cd{2,3}", True),
+                          ['ab.', 'b.c'])
+        self.assertTrue(ebmlib.GetQueryTrigrams(u"abc|def", True) is None)
+        self.assertTrue(ebmlib.GetQueryTrigrams(u"(?x)a b c", True) is None)
+
+    def testRegexEscapes(self):
+        """Test that the digits of numeric escapes are not taken as text"""
+        for query in (u"\\x41bcd", u"\\101bcd", u"\\u0041bcd",
+                      u"\\N{LATIN CAPITAL LETTER A}bcd", u"(a)\\1bcd"):
+            self.assertEquals(ebmlib.GetQueryTrigrams(query, True), ['bcd'],
+                              query)
+        self.assertEquals(ebmlib.GetQueryTrigrams(u"ab\\x20cd", True),
+                          list())
+
+    def testGetCandidates(self):
+        """Test narrowing down the files to search"""
+        self.assertEquals(len(self.index), 0)
+        self.assertEquals(self._Candidates(u"SearchInFile"),
+                          [u'b', os.path.join(u"sub", u"d")])
+        self.assertEquals(len(self.index), 4)
+        self.assertEquals(self._Candidates(u"plain text"), [u'c'])
+        self.assertEquals(self._Candidates(u"getcwd", recursive=False), [u'a'])
+        self.assertEquals(self._Candidates(u"SearchInFile",
+                                           filters=[u'*.py']), list())
+        self.assertEquals(self._Candidates(u"ab"), sorted(self.files.keys()))
+
+    def testRefresh(self):
+        """Test that changed files are indexed again"""
+        self.assertEquals(self._Candidates(u"getcwd"), [u'a'])
+        self._Write(u'c', u"os.getcwd()\n")
+        # Make sure the modification time changes
+        mtime = os.path.getmtime(os.path.join(self.root, u'a')) + 10
+        os.utime(os.path.join(self.root, u'c'), (mtime, mtime))
+        os.remove(os.path.join(self.root, u'a'))
+        self.assertEquals(self._Candidates(u"getcwd"), [u'c'])
+        self.assertEquals(len(self.index), 3)
+
+    def testPersistence(self):
+        """Test saving and loading the index"""
+        self.index.Refresh()
+        index = ebmlib.TrigramIndex(self.root, self.path)
+        self.assertEquals(len(index), 4)
+        self.assertFalse(index.Refresh())
+        self.assertFalse(ebmlib.TrigramIndex(u"/other", self.path))
@@ -16,9 +16,6 @@ __revision__ = "$Revision: 61504 $"
 # Imports
 import unittest
 
-# Local modules
-import common
-
 # Module to test
 import ebmlib
 
@@ -40,3 +37,55 @@ class TxtUtilTest(unittest.TestCase):
         self.assertTrue(ebmlib.IsUnicode(u"HELLO"))
         self.assertFalse(ebmlib.IsUnicode("Hello"))
 
+    def testGetTrimEdits(self):
+        """Test finding the trailing whitespace of all lines"""
+        data = "a  \r\n\t b\t\n c \t\x0c\r \nend  "
+        edits = ebmlib.GetTrimEdits(data)
+        self.assertEquals([ edit[0:2] for edit in edits ],
+                          [(1, 3), (8, 9), (12, 15), (16, 17), (21, 23)])
+        self.assertEquals(ebmlib.ApplyTextEdits(data, edits),
+                          "a\r\n\t b\n c\r\nend")
+        self.assertEquals(ebmlib.GetTrimEdits("no trailing\nspace"), list())
+
+        # Limit to a range of the text
+        edits = ebmlib.GetTrimEdits(data, 5, 16)
+        self.assertEquals([ edit[0:2] for edit in edits ], [(8, 9), (12, 15)])
+
+        # Unicode whitespace other than the line endings is trimmed too
+        data = u"\u00e9 \u3000\nb\u00a0\r\n\u00e9c \u2028".encode('utf-8')
+        edits = ebmlib.GetTrimEdits(data)
+        self.assertEquals([ edit[0:2] for edit in edits ],
+                          [(2, 6), (8, 10), (15, 19)])
+        self.assertEquals(ebmlib.ApplyTextEdits(data, edits),
+                          u"\u00e9\nb\r\n\u00e9c".encode('utf-8'))
+        edits = ebmlib.GetTrimEdits(data, 7, 15)
+        self.assertEquals([ edit[0:2] for edit in edits ], [(8, 10)])
+
+    def testGetTabEdits(self):
+        """Test converting between tabs and spaces"""
+        data = "\tif x:\n\t\treturn\t1\n"
+        edits = ebmlib.GetTabEdits(data, 2, False)
+        spaces = ebmlib.ApplyTextEdits(data, edits)
+        self.assertEquals(spaces, "  if x:\n    return  1\n")
+        edits = ebmlib.GetTabEdits(spaces, 2, True)
+        self.assertEquals(ebmlib.ApplyTextEdits(spaces, edits), data)
+
+    def testMergeLineEdits(self):
+        """Test merging the edits on the same line"""
+        data = "\ta\tb\n\tc\r\td"
+        edits = ebmlib.GetTabEdits(data, 1, False)
+        merged = ebmlib.MergeLineEdits(data, edits)
+        self.assertEquals(merged, [(0, 3, " a "), (5, 6, " "), (8, 9, " ")])
+        self.assertEquals(ebmlib.ApplyTextEdits(data, merged),
+                          ebmlib.ApplyTextEdits(data, edits))
+
+    def testMapEditPosition(self):
+        """Test mapping positions through the edits"""
+        data = "ab  \n\tcd"
+        edits = ebmlib.GetTrimEdits(data) + ebmlib.GetTabEdits(data, 4, False)
+        self.assertEquals(ebmlib.MapEditPosition(edits, 1), 1)
+        self.assertEquals(ebmlib.MapEditPosition(edits, 3), 2)
+        self.assertEquals(ebmlib.MapEditPosition(edits, 5), 3)
+        self.assertEquals(ebmlib.MapEditPosition(edits, 7), 8)
+        self.assertEquals(ebmlib.MapEditPosition(edits, len(data)), 9)
+